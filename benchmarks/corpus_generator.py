@@ -0,0 +1,175 @@
+#
+# The contents of this file are subject to the Apache 2.0 license you may not
+# use this file except in compliance with the License.
+#
+# Software distributed under the License is distributed on an "AS IS" basis,
+# WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License
+# for the specific language governing rights and limitations under the
+# License.
+#
+#
+# Copyright 2023 KCC project (http://www.firmwaretoolkit.org).
+# All rights reserved. Use is subject to license terms.
+#
+#
+# Contributors list :
+#
+#    William Bonnet     wllmbnnt@gmail.com, wbonnet@theitmakers.com
+#
+
+""" This module generates synthetic corpora of kernel config files. Generation
+is deterministic : the same parameters always produce the same files.
+
+A corpus is made of a reference config and of board configs derived from it.
+Each symbol of a board keeps the reference value with a probability given by the
+overlap ratio, otherwise it is changed, removed, or replaced by a board specific
+symbol.
+"""
+
+import os
+import random
+
+# Distribution of the kinds of values : (kind, cumulated probability)
+_VALUE_KINDS = (("y", 0.45), ("m", 0.65), ("n", 0.85), ("string", 0.90),
+                ("hex", 0.95), ("int", 1.0))
+
+# Name of the reference config in the corpus directory
+REFERENCE_NAME = "reference.config"
+
+# -----------------------------------------------------------------------------
+#
+# class CorpusGenerator
+#
+# -----------------------------------------------------------------------------
+class CorpusGenerator(object):
+  """This class generates the files of a synthetic corpus.
+  """
+
+  # ---------------------------------------------------------------------------
+  #
+  # __init__
+  #
+  # ---------------------------------------------------------------------------
+  def __init__(self, symbols=15000, overlap=0.95, seed=0):
+    """Default constructor
+    """
+
+    # Number of symbols of the reference config
+    self.symbols = symbols
+
+    # Probability for a board to keep the reference value of a symbol
+    self.overlap = overlap
+
+    # Seed of the random generator
+    self.seed = seed
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # random_value
+  #
+  # ---------------------------------------------------------------------------
+  @staticmethod
+  def random_value(generator):
+    """ Return a random value, following the distribution of _VALUE_KINDS
+    """
+
+    draw = generator.random()
+    for kind, probability in _VALUE_KINDS:
+      if draw < probability:
+        break
+
+    if kind in ("y", "m", "n"):
+      return kind
+    if kind == "string":
+      return '"value-%d"' % generator.randrange(1000)
+    if kind == "hex":
+      return "0x%x" % generator.randrange(1 << 32)
+    return str(generator.randrange(100000))
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # format_line
+  #
+  # ---------------------------------------------------------------------------
+  @staticmethod
+  def format_line(symbol, value):
+    """ Return the config line assigning a value to a symbol
+    """
+
+    if value == "n":
+      return "# %s is not set\n" % symbol
+    return "%s=%s\n" % (symbol, value)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # reference
+  #
+  # ---------------------------------------------------------------------------
+  def reference(self):
+    """ Return the list of (symbol, value) of the reference config
+    """
+
+    generator = random.Random(self.seed)
+    return [("CONFIG_SYMBOL_%05d" % index, self.random_value(generator))
+            for index in range(self.symbols)]
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # board
+  #
+  # ---------------------------------------------------------------------------
+  def board(self, reference, number):
+    """ Return the content of the board config of the given number
+    """
+
+    generator = random.Random("%d-%d" % (self.seed, number))
+    lines = ["#\n# Board %d\n#\n" % number]
+    for symbol, value in reference:
+      if generator.random() < self.overlap:
+        lines.append(self.format_line(symbol, value))
+        continue
+
+      draw = generator.random()
+      if draw < 0.6:
+        lines.append(self.format_line(symbol, self.random_value(generator)))
+      elif draw < 0.8:
+        lines.append(self.format_line("CONFIG_BOARD_%d_%s" % (number, symbol[7:]),
+                                      self.random_value(generator)))
+    return "".join(lines)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # generate
+  #
+  # ---------------------------------------------------------------------------
+  def generate(self, directory, count):
+    """ Write the reference config and count board configs in a directory.
+    Return the path of the reference and the list of paths of the boards.
+    """
+
+    os.makedirs(directory, exist_ok=True)
+    reference = self.reference()
+
+    reference_path = os.path.join(directory, REFERENCE_NAME)
+    with open(reference_path, 'w') as working_file:
+      working_file.write("".join(self.format_line(symbol, value)
+                                 for symbol, value in reference))
+
+    paths = []
+    for number in range(count):
+      path = os.path.join(directory, "board_%04d_defconfig" % number)
+      with open(path, 'w') as working_file:
+        working_file.write(self.board(reference, number))
+      paths.append(path)
+
+    return (reference_path, paths)
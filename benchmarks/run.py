@@ -0,0 +1,331 @@
+#
+# The contents of this file are subject to the Apache 2.0 license you may not
+# use this file except in compliance with the License.
+#
+# Software distributed under the License is distributed on an "AS IS" basis,
+# WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License
+# for the specific language governing rights and limitations under the
+# License.
+#
+#
+# Copyright 2023 KCC project (http://www.firmwaretoolkit.org).
+# All rights reserved. Use is subject to license terms.
+#
+#
+# Contributors list :
+#
+#    William Bonnet     wllmbnnt@gmail.com, wbonnet@theitmakers.com
+#
+
+""" This module runs the benchmark suite. A synthetic corpus is generated, then
+parsing, each operator, the N-way comparison, fragment writing and the batch
+mode are timed for each requested corpus size. The cold start time of the kcc
+command (a process running an operator on a small config) is timed once.
+
+Results are output as JSON. When a baseline file is given, each timing is
+compared to the baseline, and the exit code is 1 if one of them is slower than
+the baseline by more than the threshold.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import subprocess
+import argparse
+import tempfile
+import contextlib
+from kcc.model import Key, Config, Configuration
+from kcc.operators import OperandSet, OperatorEngine
+from kcc.compare import CompareCorpus
+from benchmarks.corpus_generator import CorpusGenerator
+
+# Version of the JSON output format
+_RESULTS_VERSION = 1
+
+# Root of the source tree, and path of the kcc command
+_SOURCE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_KCC_COMMAND = os.path.join(_SOURCE_ROOT, "bin", "kcc")
+
+# -----------------------------------------------------------------------------
+#
+# class BenchmarkRunner
+#
+# -----------------------------------------------------------------------------
+class BenchmarkRunner(object):
+  """This class runs the benchmarks and collects the timings. Each benchmark
+  is run several times and the best time is kept, which reduces the noise due
+  to the other processes of the machine.
+  """
+
+  # ---------------------------------------------------------------------------
+  #
+  # __init__
+  #
+  # ---------------------------------------------------------------------------
+  def __init__(self, args):
+    """Default constructor
+    """
+
+    # Arguments from the command line
+    self.args = args
+
+    # Timings indexed by benchmark name. Each value is a dictionnary storing
+    # the best time in seconds and the size of the processed data
+    self.results = {}
+
+    # Temporary directory storing the corpus and the outputs
+    self.directory = None
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # measure
+  #
+  # ---------------------------------------------------------------------------
+  def measure(self, name, function, **details):
+    """ Run a function repeat times, and record its best time
+    """
+
+    best = None
+    for _ in range(self.args.repeat):
+      start = time.perf_counter()
+      function()
+      elapsed = time.perf_counter() - start
+      best = elapsed if best is None else min(best, elapsed)
+
+    details["seconds"] = best
+    self.results[name] = details
+    logging.info("%-32s %10.4f s", name, best)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # run
+  #
+  # ---------------------------------------------------------------------------
+  def run(self):
+    """ Generate the corpus then run all the benchmarks
+    """
+
+    self.directory = tempfile.mkdtemp(prefix="kcc-benchmark-")
+    try:
+      sizes = sorted(self.args.sizes)
+      generator = CorpusGenerator(self.args.symbols, self.args.overlap, self.args.seed)
+      start = time.perf_counter()
+      reference, boards = generator.generate(os.path.join(self.directory, "corpus"), sizes[-1])
+      logging.info("Corpus of %d files generated in %.1f s", len(boards),
+                   time.perf_counter() - start)
+
+      self.run_startup()
+      for size in sizes:
+        self.run_size(reference, boards[:size])
+    finally:
+      shutil.rmtree(self.directory, ignore_errors=True)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # kcc
+  #
+  # ---------------------------------------------------------------------------
+  @staticmethod
+  def kcc(arguments, stdin=None):
+    """ Run the kcc command from the source tree, with the given arguments and
+    standard input. Only warnings and errors are logged.
+    """
+
+    environment = dict(os.environ)
+    environment["PYTHONPATH"] = os.pathsep.join([_SOURCE_ROOT] +
+                                                [path for path in
+                                                 [environment.get("PYTHONPATH")] if path])
+    subprocess.run([sys.executable, _KCC_COMMAND] + arguments +
+                   [Key.OPT_LOG_LEVEL.value, "warning"], input=stdin,
+                   stdout=subprocess.DEVNULL, env=environment, check=True)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # run_startup
+  #
+  # ---------------------------------------------------------------------------
+  def run_startup(self):
+    """ Time a kcc process applying an operator to a small config, which is
+    dominated by the start up of the process
+    """
+
+    path = os.path.join(self.directory, "startup.config")
+    with open(path, 'w') as working_file:
+      working_file.write("CONFIG_STARTUP=y\n")
+
+    arguments = ["intersect", path, path, "--no-parse-cache"]
+    self.measure("startup", lambda: self.kcc(arguments), files=1)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # run_size
+  #
+  # ---------------------------------------------------------------------------
+  def run_size(self, reference, boards):
+    """ Run the benchmarks on a corpus of the given boards
+    """
+
+    size = len(boards)
+    lines = 0
+    for path in boards:
+      with open(path, 'rb') as working_file:
+        lines += working_file.read().count(b"\n")
+
+    # Parsing
+    configs = []
+    def parse():
+      configs[:] = [Config().load(path) for path in boards]
+    self.measure("parse/%d" % size, parse, files=size, lines=lines)
+
+    # Conversion to bitsets, then each operator over all the boards
+    operands = []
+    def convert():
+      operands[:] = [OperandSet.from_config(config) for config in configs]
+    self.measure("bitset/%d" % size, convert, files=size)
+
+    engine = OperatorEngine()
+    for operator in (engine.except_, engine.concat, engine.intersect):
+      name = operator.__name__.rstrip("_")
+      self.measure("%s/%d" % (name, size), lambda: operator(*operands), files=size)
+
+    # N-way comparison to the reference, using the compare command
+    cfg = Configuration()
+    cfg.reference = reference
+    cfg.inputs = boards
+    cfg.jobs = self.args.jobs
+    cfg.use_parse_cache = False
+    cfg.matrix = os.devnull
+    def compare():
+      with open(os.devnull, 'w') as null, contextlib.redirect_stdout(null):
+        CompareCorpus(cfg).compare()
+    self.measure("compare/%d" % size, compare, files=size, jobs=self.args.jobs)
+
+    # Writing the except fragment of each board
+    output = os.path.join(self.directory, "fragments")
+    os.makedirs(output, exist_ok=True)
+    reference_operand = OperandSet.from_config(Config().load(reference))
+    fragments = [engine.except_(operand, reference_operand).to_config() for operand in operands]
+    def write():
+      for number, fragment in enumerate(fragments):
+        fragment.write(os.path.join(output, "%04d.fragment" % number))
+    self.measure("write/%d" % size, write, files=size)
+
+    # The except fragment of each board, requested to a single batch process
+    requests = "".join(json.dumps({"command": "except", "inputs": [path, reference]}) + "\n"
+                       for path in boards).encode()
+    self.measure("batch/%d" % size,
+                 lambda: self.kcc(["batch", "--no-parse-cache"], stdin=requests), files=size)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # output
+  #
+  # ---------------------------------------------------------------------------
+  def output(self):
+    """ Output the results as JSON, to the output file or to stdout
+    """
+
+    document = {"version": _RESULTS_VERSION,
+                "parameters": {"symbols": self.args.symbols,
+                               "overlap": self.args.overlap,
+                               "seed": self.args.seed,
+                               "sizes": self.args.sizes,
+                               "repeat": self.args.repeat,
+                               "jobs": self.args.jobs},
+                "results": self.results}
+
+    text = json.dumps(document, indent=2, sort_keys=True)
+    if self.args.output is not None:
+      with open(self.args.output, 'w') as working_file:
+        working_file.write(text + "\n")
+    else:
+      print(text)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # check_regressions
+  #
+  # ---------------------------------------------------------------------------
+  def check_regressions(self):
+    """ Compare the results to the baseline. Return the list of the benchmarks
+    slower than the baseline by more than the threshold (and by more than the
+    minimal delta).
+    """
+
+    with open(self.args.baseline, 'r') as working_file:
+      baseline = json.load(working_file)["results"]
+
+    regressions = []
+    for name, result in sorted(self.results.items()):
+      if name not in baseline:
+        continue
+      reference = baseline[name]["seconds"]
+      if result["seconds"] > reference * (1 + self.args.threshold) and \
+         result["seconds"] - reference > self.args.min_delta:
+        regressions.append(name)
+        logging.error("Regression on %s : %.4f s, baseline %.4f s", name,
+                      result["seconds"], reference)
+    return regressions
+
+
+
+# -----------------------------------------------------------------------------
+#
+# main
+#
+# -----------------------------------------------------------------------------
+def main():
+  """ Parse the command line then run the benchmarks
+  """
+
+  parser = argparse.ArgumentParser(description="kcc benchmark suite")
+  parser.add_argument("--sizes", type=lambda text: [int(size) for size in text.split(",")],
+                      default=[1, 10, 100, 500, 2000],
+                      help="Comma separated list of corpus sizes. Default : 1,10,100,500,2000")
+  parser.add_argument("--symbols", type=int, default=15000,
+                      help="Number of symbols of the reference config. Default : 15000")
+  parser.add_argument("--overlap", type=float, default=0.95,
+                      help="Probability for a board to keep a reference value. Default : 0.95")
+  parser.add_argument("--seed", type=int, default=0,
+                      help="Seed of the corpus generator. Default : 0")
+  parser.add_argument("--repeat", type=int, default=3,
+                      help="Number of runs of each benchmark, the best one is kept")
+  parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1,
+                      help="Number of jobs of the compare benchmark")
+  parser.add_argument("--output", help="File receiving the JSON results")
+  parser.add_argument("--baseline", help="JSON results of a previous run to compare to")
+  parser.add_argument("--threshold", type=float, default=0.25,
+                      help="Allowed slow down ratio before failing. Default : 0.25")
+  parser.add_argument("--min-delta", type=float, default=0.005,
+                      help="Slow downs shorter than this number of seconds are ignored,\n"
+                           "they are only noise. Default : 0.005")
+  args = parser.parse_args()
+
+  logging.basicConfig(level=logging.INFO, format="%(message)s", stream=sys.stderr)
+
+  runner = BenchmarkRunner(args)
+  runner.run()
+  runner.output()
+
+  if args.baseline is not None and runner.check_regressions():
+    exit(1)
+
+if __name__ == "__main__":
+  main()
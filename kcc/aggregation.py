@@ -0,0 +1,303 @@
+#
+# The contents of this file are subject to the Apache 2.0 license you may not
+# use this file except in compliance with the License.
+#
+# Software distributed under the License is distributed on an "AS IS" basis,
+# WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License
+# for the specific language governing rights and limitations under the
+# License.
+#
+#
+# Copyright 2023 KCC project (http://www.firmwaretoolkit.org).
+# All rights reserved. Use is subject to license terms.
+#
+#
+# Contributors list :
+#
+#    William Bonnet     wllmbnnt@gmail.com, wbonnet@theitmakers.com
+#
+
+""" This module contains the aggregation of the test results used by the run
+command when an aggregation level is given. The results of the tests are
+rolled up into the nodes of the suite tree down to this depth, and the status
+of a node is output as soon as all its tests are done.
+
+Results are consumed as a stream. Tests are read from the suite in tree order,
+thus a node is complete once the suite moved to the next node and its last
+running test is done. Only the nodes still having running tests are kept, so
+memory is proportional to the depth of the tree and to the number of running
+tests, not to the number of tests of the suite.
+"""
+
+# -----------------------------------------------------------------------------
+#
+# class NodeStatus
+#
+# -----------------------------------------------------------------------------
+class NodeStatus(object):
+  """This class stores the aggregated status of a node of the suite tree.
+  """
+
+  __slots__ = ("path", "descriptions", "passed", "failed", "cached", "running", "submitted")
+
+  # ---------------------------------------------------------------------------
+  #
+  # __init__
+  #
+  # ---------------------------------------------------------------------------
+  def __init__(self, path, descriptions):
+    """Default constructor
+    """
+
+    # Position of the node in the suite tree, and descriptions of the node and
+    # of its parents
+    self.path = path
+    self.descriptions = descriptions
+
+    # Number of passed and failed tests, and of results read from the cache
+    self.passed = 0
+    self.failed = 0
+    self.cached = 0
+
+    # Number of tests of the node which are still running, and flag set when
+    # all the tests of the node have been read from the suite
+    self.running = 0
+    self.submitted = False
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # __str__
+  #
+  # ---------------------------------------------------------------------------
+  def __str__(self):
+    """ Return the identifier, the descriptions and the counters of the node
+    """
+
+    text = "%s %s : %d passed" % (".".join(str(index) for index in self.path),
+                                  " / ".join(self.descriptions), self.passed)
+    if self.failed:
+      text += ", %d failed" % self.failed
+    if self.cached:
+      text += " (%d cached)" % self.cached
+    return text
+
+
+
+# -----------------------------------------------------------------------------
+#
+# class ResultAggregator
+#
+# -----------------------------------------------------------------------------
+class ResultAggregator(object):
+  """This class aggregates the results of the tests at a given depth of the
+  suite tree. Tests deeper than the aggregation level are counted in their
+  enclosing nodes, from the top of the tree down to this level.
+  """
+
+  # ---------------------------------------------------------------------------
+  #
+  # __init__
+  #
+  # ---------------------------------------------------------------------------
+  def __init__(self, level, only_errors=False, status_stream=None):
+    """Default constructor
+    """
+
+    # Depth of the deepest aggregated nodes, the root nodes beeing at depth 1
+    self.level = level
+
+    # Flag set if only the failed nodes are output
+    self.only_errors = only_errors
+
+    # Stream receiving the live status line. None if no status is output
+    self.status_stream = status_stream
+
+    # Nodes having tests not done yet, indexed by path
+    self.nodes = {}
+
+    # Paths of the nodes enclosing the last test read from the suite
+    self.current = []
+
+    # Number of tests done, and length of the status line currently displayed
+    self.done = 0
+    self.status_length = 0
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # track
+  #
+  # ---------------------------------------------------------------------------
+  def track(self, tests):
+    """ Generator returning the tests, and registering them in their enclosing
+    nodes as they are read from the suite
+    """
+
+    for test in tests:
+      prefixes = self.prefixes(test)
+      for path in prefixes:
+        node = self.nodes.get(path)
+        if node is None:
+          node = self.nodes[path] = NodeStatus(path, test.descriptions[:len(path)])
+        node.running += 1
+
+      # The nodes the suite moved out of have all their tests submitted
+      self.__submitted([path for path in self.current if path not in prefixes])
+      self.current = prefixes
+      yield test
+
+    self.__submitted(self.current)
+    self.current = []
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # prefixes
+  #
+  # ---------------------------------------------------------------------------
+  def prefixes(self, test):
+    """ Return the paths of the aggregated nodes enclosing a test, from the
+    root down to the aggregation level
+    """
+
+    return [test.path[:depth] for depth in range(1, min(self.level, len(test.path) - 1) + 1)]
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # add
+  #
+  # ---------------------------------------------------------------------------
+  def add(self, result):
+    """ Count the result of a test in its enclosing nodes, and output the nodes
+    which are complete
+    """
+
+    self.done += 1
+    prefixes = self.prefixes(result.test)
+    for path in prefixes:
+      node = self.nodes[path]
+      node.running -= 1
+      if result.success:
+        node.passed += 1
+      else:
+        node.failed += 1
+      if result.cached:
+        node.cached += 1
+
+    # Deepest nodes are output first, since they complete before their parents
+    self.__complete(reversed(prefixes))
+    self.__status(prefixes[-1] if prefixes else None)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # flush
+  #
+  # ---------------------------------------------------------------------------
+  def flush(self):
+    """ Output the nodes which are not complete, because their remaining tests
+    have been cancelled
+    """
+
+    self.__clear_status()
+    for path in sorted(self.nodes, key=lambda path: (-len(path), path)):
+      node = self.nodes.pop(path)
+      print("[STOP] %s, %d not run" % (node, node.running))
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # print_line
+  #
+  # ---------------------------------------------------------------------------
+  def print_line(self, line):
+    """ Output a line, removing the status line first
+    """
+
+    self.__clear_status()
+    print(line)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # __submitted
+  #
+  # ---------------------------------------------------------------------------
+  def __submitted(self, paths):
+    """ Mark nodes as having all their tests submitted, and output the ones
+    which are complete
+    """
+
+    for path in paths:
+      self.nodes[path].submitted = True
+    self.__complete(sorted(paths, key=len, reverse=True))
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # __complete
+  #
+  # ---------------------------------------------------------------------------
+  def __complete(self, paths):
+    """ Output and forget the nodes which have all their tests done
+    """
+
+    for path in paths:
+      node = self.nodes.get(path)
+      if node is None or not node.submitted or node.running:
+        continue
+      del self.nodes[path]
+      if node.failed:
+        self.print_line("[FAIL] %s" % node)
+      elif not self.only_errors:
+        self.print_line("[ OK ] %s" % node)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # __status
+  #
+  # ---------------------------------------------------------------------------
+  def __status(self, path):
+    """ Output the live status line : the number of tests done and the partial
+    status of the node of the last result
+    """
+
+    if self.status_stream is None:
+      return
+
+    line = "%d tests done" % self.done
+    node = self.nodes.get(path) if path is not None else None
+    if node is not None:
+      line += ", %s, %d pending" % (node, node.running)
+    self.__clear_status()
+    self.status_stream.write(line)
+    self.status_stream.flush()
+    self.status_length = len(line)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # __clear_status
+  #
+  # ---------------------------------------------------------------------------
+  def __clear_status(self):
+    """ Remove the status line, if any
+    """
+
+    if self.status_length:
+      self.status_stream.write("\r" + " " * self.status_length + "\r")
+      self.status_stream.flush()
+      self.status_length = 0
@@ -0,0 +1,499 @@
+#
+# The contents of this file are subject to the Apache 2.0 license you may not
+# use this file except in compliance with the License.
+#
+# Software distributed under the License is distributed on an "AS IS" basis,
+# WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License
+# for the specific language governing rights and limitations under the
+# License.
+#
+#
+# Copyright 2023 KCC project (http://www.firmwaretoolkit.org).
+# All rights reserved. Use is subject to license terms.
+#
+#
+# Contributors list :
+#
+#    William Bonnet     wllmbnnt@gmail.com, wbonnet@theitmakers.com
+#
+
+""" This module contains the implementation of the batch command. Operation
+requests are read from stdin, one JSON object per line, and answered on stdout,
+one JSON object per line, in the same order. All the requests are processed in
+a single process : each config is parsed once, then reused by the following
+requests as long as the file is not modified.
+
+A request is an object with a 'command' member (except, concat, intersect,
+merge or compare), an 'inputs' list, and the options of the command : 'output',
+'minimize' and 'kconfig' for the operators, 'output' and 'warn_redundant' for
+merge, 'reference' and 'output' for compare. The optional 'id' member is copied
+to the response.
+
+The response has a 'status' member, 'ok' or 'error'. Errors are described by the
+'error' member, otherwise the response contains the results of the command.
+"""
+
+import os
+import sys
+import copy
+import json
+import time
+from kcc.model import Key
+from kcc.protocol import REQUEST_ID, REQUEST_COMMAND, RESPONSE_STATUS, RESPONSE_ERROR, \
+                         STATUS_OK, STATUS_ERROR
+from kcc.operators import OperandSet
+from kcc.parse_cache import ParseCache, load_config
+from kcc.kconfig import KconfigIndex
+from kcc.merge import FragmentMerger, DEFAULT_OUTPUT
+from kcc.operator_command import OperatorCommand
+from kcc.compare import expand_inputs, output_names, compare_operands, summary_counts
+from kcc.profiling import PROFILER, PHASE_KCONFIG, PHASE_OPERATORS, PHASE_COMPARE, \
+                          PHASE_OUTPUT
+
+# Commands accepted in the requests
+_OPERATORS = (Key.OP_EXCEPT.value, Key.OP_CONCAT.value, Key.OP_INTERSECT.value)
+
+# -----------------------------------------------------------------------------
+#
+# _option
+#
+# -----------------------------------------------------------------------------
+def _option(request, name, kind, default=None):
+  """ Return the value of an option of a request, or the default value if it
+  is absent or null. Raise ValueError if the value is not of the given type.
+  """
+
+  value = request.get(name)
+  if value is None:
+    return default
+  if not isinstance(value, kind):
+    raise ValueError("The '%s' member must be a %s" %
+                     (name, "boolean" if kind is bool else "string"))
+  return value
+
+
+
+# -----------------------------------------------------------------------------
+#
+# class ConfigStore
+#
+# -----------------------------------------------------------------------------
+class ConfigStore(object):
+  """This class keeps the parsed configs, their operands and the Kconfig graphs
+  in memory. A config is reloaded when the size, the modification time or the
+  inode of its file changes. Kconfig graphs are loaded once per tree.
+
+  Entries are kept in least recently used order, with an estimation of their
+  memory size, thus a long running process can evict them.
+  """
+
+  # ---------------------------------------------------------------------------
+  #
+  # __init__
+  #
+  # ---------------------------------------------------------------------------
+  def __init__(self, cache=None, kconfig_index_path=None):
+    """Default constructor
+    """
+
+    # Parse cache used to load the configs, or None to parse them directly
+    self.cache = cache
+
+    # Directory storing the Kconfig indexes
+    self.kconfig_index_path = kconfig_index_path
+
+    # Entries indexed by absolute path, least recently used first. Each value is
+    # a [stat key, config, operand, size, last use] list, the operand beeing
+    # computed on first use
+    self.entries = {}
+
+    # Estimated memory size of the entries, in bytes
+    self.size = 0
+
+    # Kconfig graphs indexed by absolute path of the kernel tree
+    self.graphs = {}
+
+    # Number of configs served from memory, and loaded from files
+    self.hits = 0
+    self.misses = 0
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # entry
+  #
+  # ---------------------------------------------------------------------------
+  def entry(self, filename):
+    """ Return the entry of a config file, loading the file if it is not in
+    memory or if it has been modified. Raise OSError if it cannot be read.
+    """
+
+    path = os.path.abspath(filename)
+    status = os.stat(path)
+    stat_key = (status.st_size, status.st_mtime_ns, status.st_ino)
+
+    # The entry is removed then inserted again, to move it to the end
+    entry = self.entries.pop(path, None)
+    if entry is not None and entry[0] == stat_key:
+      self.hits += 1
+    else:
+      if entry is not None:
+        self.size -= entry[3]
+      self.misses += 1
+      config = load_config(filename, self.cache)
+      entry = [stat_key, config, None, self.__config_size(config), None]
+      self.size += entry[3]
+
+    entry[4] = time.monotonic()
+    self.entries[path] = entry
+    return entry
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # config
+  #
+  # ---------------------------------------------------------------------------
+  def config(self, filename):
+    """ Return the Config of a file
+    """
+
+    return self.entry(filename)[1]
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # operand
+  #
+  # ---------------------------------------------------------------------------
+  def operand(self, filename):
+    """ Return the OperandSet of a file
+    """
+
+    entry = self.entry(filename)
+    if entry[2] is None:
+      entry[2] = OperandSet.from_config(entry[1])
+      operand_size = (entry[2].symbols.bit_length() + entry[2].settings.bit_length()) // 8
+      entry[3] += operand_size
+      self.size += operand_size
+    return entry[2]
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # graph
+  #
+  # ---------------------------------------------------------------------------
+  def graph(self, tree):
+    """ Return the KconfigGraph of a kernel tree
+    """
+
+    path = os.path.abspath(tree)
+    if path not in self.graphs:
+      with PROFILER.phase(PHASE_KCONFIG):
+        self.graphs[path] = KconfigIndex(self.kconfig_index_path).load(path)
+    return self.graphs[path]
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # evict
+  #
+  # ---------------------------------------------------------------------------
+  def evict(self, max_size, idle_timeout=None):
+    """ Remove the entries unused for more than idle_timeout seconds, then the
+    least recently used entries until the size is below max_size. Return the
+    number of removed entries.
+
+    Names and values stay interned in the process wide tables, since the ids
+    may be used by the other entries.
+    """
+
+    now = time.monotonic()
+    removed = 0
+    for path, entry in list(self.entries.items()):
+      idle = idle_timeout is not None and now - entry[4] > idle_timeout
+      if not idle and self.size <= max_size:
+        break
+      del self.entries[path]
+      self.size -= entry[3]
+      removed += 1
+    return removed
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # __config_size
+  #
+  # ---------------------------------------------------------------------------
+  @staticmethod
+  def __config_size(config):
+    """ Return an estimation of the memory size of a Config, in bytes
+    """
+
+    return sum(len(column) * column.itemsize for column in
+               (config.symbols, config.values, config.tristates, config.types))
+
+
+
+# -----------------------------------------------------------------------------
+#
+# class RequestHandler
+#
+# -----------------------------------------------------------------------------
+class RequestHandler(object):
+  """This class answers the operation requests. Each request is run with a
+  copy of the configuration, overridden by the options of the request, the same
+  way the command line overrides it.
+  """
+
+  # ---------------------------------------------------------------------------
+  #
+  # __init__
+  #
+  # ---------------------------------------------------------------------------
+  def __init__(self, cfg, store):
+    """Default constructor
+    """
+
+    # Configuration object storing the command line arguments
+    self.cfg = cfg
+
+    # Store of the parsed configs
+    self.store = store
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # handle
+  #
+  # ---------------------------------------------------------------------------
+  def handle(self, request):
+    """ Process a decoded request and return the response. Errors are reported
+    in the response, they never stop the processing of the next requests.
+    """
+
+    response = {}
+    if isinstance(request, dict) and REQUEST_ID in request:
+      response[REQUEST_ID] = request[REQUEST_ID]
+
+    try:
+      response.update(self.process(request))
+      response[RESPONSE_STATUS] = STATUS_OK
+    except ValueError as exception:
+      response[RESPONSE_STATUS] = STATUS_ERROR
+      response[RESPONSE_ERROR] = str(exception)
+    except OSError as exception:
+      response[RESPONSE_STATUS] = STATUS_ERROR
+      response[RESPONSE_ERROR] = "%s - %s" % (exception.filename, exception.strerror)
+    except Exception as exception:
+      # A bug triggered by a request must not end the processing of the others
+      self.cfg.logging.error("Request failed", exc_info=True)
+      response[RESPONSE_STATUS] = STATUS_ERROR
+      response[RESPONSE_ERROR] = "Unexpected error : %s: %s" % (type(exception).__name__,
+                                                                exception)
+    return response
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # process
+  #
+  # ---------------------------------------------------------------------------
+  def process(self, request):
+    """ Check a request, then call the method dedicated to its command. Return
+    the results as a dictionnary. Raise ValueError if the request is invalid.
+    """
+
+    if not isinstance(request, dict):
+      raise ValueError("A request must be a JSON object")
+
+    inputs = request.get(Key.INPUTS.value)
+    if not isinstance(inputs, list) or not inputs or \
+       not all(isinstance(item, str) for item in inputs):
+      raise ValueError("The '" + Key.INPUTS.value + "' member must be a non empty list "
+                       "of file names")
+
+    # Override a copy of the configuration with the options of the request
+    cfg = copy.copy(self.cfg)
+    cfg.inputs = inputs
+    cfg.output = _option(request, Key.OUTPUT.value, str)
+
+    command = request.get(REQUEST_COMMAND)
+    if command in _OPERATORS:
+      cfg.operator = command
+      cfg.minimize = _option(request, Key.MINIMIZE.value, bool, False)
+      cfg.kconfig = _option(request, Key.KCONFIG.value, str)
+      return self.process_operator(cfg)
+    if command == Key.MERGE.value:
+      cfg.warn_redundant = _option(request, Key.WARN_REDUNDANT.value, bool, False)
+      return self.process_merge(cfg)
+    if command == Key.COMPARE.value:
+      cfg.reference = _option(request, Key.REFERENCE.value, str)
+      if cfg.reference is None:
+        raise ValueError("The '" + Key.REFERENCE.value + "' member is required by compare")
+      return self.process_compare(cfg)
+    raise ValueError("Unknown command : %s" % command)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # process_operator
+  #
+  # ---------------------------------------------------------------------------
+  def process_operator(self, cfg):
+    """ Apply an operator. The fragment is written to the output file if any,
+    otherwise it is returned in the response.
+    """
+
+    configs = [self.store.config(filename) for filename in cfg.inputs]
+    operands = [self.store.operand(filename) for filename in cfg.inputs]
+    graph = None
+    if cfg.minimize and cfg.kconfig is not None:
+      graph = self.store.graph(cfg.kconfig)
+
+    result = OperatorCommand(cfg).apply_operator(configs, operands, graph)
+
+    with PROFILER.phase(PHASE_OUTPUT):
+      if cfg.output is not None:
+        result.write(cfg.output)
+        return {"entries": len(result), Key.OUTPUT.value: cfg.output}
+      return {"entries": len(result), "fragment": result.to_text()}
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # process_merge
+  #
+  # ---------------------------------------------------------------------------
+  def process_merge(self, cfg):
+    """ Merge fragments into a base config, and write the result. The
+    redefinition messages are returned in the response.
+    """
+
+    configs = [self.store.config(filename) for filename in cfg.inputs]
+
+    merger = FragmentMerger(cfg)
+    with PROFILER.phase(PHASE_OPERATORS):
+      result = merger.merge_configs(configs[0], configs[1:])
+
+    output = cfg.output if cfg.output is not None else DEFAULT_OUTPUT
+    with PROFILER.phase(PHASE_OUTPUT):
+      result.write(output)
+    return {"entries": len(result), Key.OUTPUT.value: output,
+            "redefined": merger.redefined, "redundant": merger.redundant,
+            "messages": merger.messages}
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # process_compare
+  #
+  # ---------------------------------------------------------------------------
+  def process_compare(self, cfg):
+    """ Compare the reference to each input file. The summary counts and the
+    differences of each file are returned in the response.
+    """
+
+    reference_config = self.store.config(cfg.reference)
+    reference = self.store.operand(cfg.reference)
+    paths = expand_inputs(cfg.inputs)
+    names = [None] * len(paths)
+    if cfg.output is not None:
+      names = output_names(paths)
+      os.makedirs(cfg.output, exist_ok=True)
+
+    files = []
+    with PROFILER.phase(PHASE_COMPARE):
+      for path, name in zip(paths, names):
+        try:
+          config = self.store.config(path)
+          operand = self.store.operand(path)
+        except OSError as exception:
+          files.append({"path": path, RESPONSE_ERROR: exception.strerror})
+          continue
+
+        differences, common = compare_operands(reference, operand, name, cfg.output,
+                                               (reference_config, config))
+        only_reference, only_file, changed = summary_counts(differences)
+        files.append({"path": path, "only_reference": only_reference,
+                      "only_file": only_file, "changed": changed, "common": common,
+                      "differences": differences})
+    return {"files": files}
+
+
+
+# -----------------------------------------------------------------------------
+#
+# class BatchRunner
+#
+# -----------------------------------------------------------------------------
+class BatchRunner(object):
+  """This class implements the batch command. It reads the requests from
+  stdin and writes the responses to stdout, flushed after each response thus
+  the caller can wait for it before sending the next request.
+  """
+
+  # ---------------------------------------------------------------------------
+  #
+  # __init__
+  #
+  # ---------------------------------------------------------------------------
+  def __init__(self, cfg):
+    """Default constructor
+    """
+
+    # Configuration object storing the command line arguments
+    self.cfg = cfg
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # run_batch
+  #
+  # ---------------------------------------------------------------------------
+  def run_batch(self):
+    """ Entry point of the batch command. The exit code is 1 if at least one
+    request failed.
+    """
+
+    cache = None
+    if self.cfg.use_parse_cache:
+      cache = ParseCache(self.cfg.parse_cache_path, self.cfg.parse_cache_size)
+    store = ConfigStore(cache, self.cfg.kconfig_index_path)
+    handler = RequestHandler(self.cfg, store)
+
+    requests = 0
+    errors = 0
+    for line in sys.stdin:
+      if not line.strip():
+        continue
+
+      requests += 1
+      try:
+        response = handler.handle(json.loads(line))
+      except ValueError as exception:
+        response = {RESPONSE_STATUS: STATUS_ERROR,
+                    RESPONSE_ERROR: "Invalid request : " + str(exception)}
+
+      if response[RESPONSE_STATUS] != STATUS_OK:
+        errors += 1
+      sys.stdout.write(json.dumps(response, sort_keys=True) + "\n")
+      sys.stdout.flush()
+
+    self.cfg.logging.info("%d requests processed, %d errors, %d configs loaded and %d "
+                          "reused", requests, errors, store.misses, store.hits)
+    if errors:
+      exit(1)
@@ -0,0 +1,80 @@
+#
+# The contents of this file are subject to the Apache 2.0 license you may not
+# use this file except in compliance with the License.
+#
+# Software distributed under the License is distributed on an "AS IS" basis,
+# WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License
+# for the specific language governing rights and limitations under the
+# License.
+#
+#
+# Copyright 2023 KCC project (http://www.firmwaretoolkit.org).
+# All rights reserved. Use is subject to license terms.
+#
+#
+# Contributors list :
+#
+#    William Bonnet     wllmbnnt@gmail.com, wbonnet@theitmakers.com
+#
+
+""" This module contains the implementation of the check-library command. The
+metadata of the scripts of the library directories are checked, and the ids
+must be unique across all the directories. The library index is updated first,
+thus only the new or changed scripts are read.
+"""
+
+import time
+from kcc.model import Key
+from kcc.library import LibraryIndex, library_directories
+
+# -----------------------------------------------------------------------------
+#
+# class CheckLibrary
+#
+# -----------------------------------------------------------------------------
+class CheckLibrary(object):
+  """This class implements the check-library command.
+  """
+
+  # ---------------------------------------------------------------------------
+  #
+  # __init__
+  #
+  # ---------------------------------------------------------------------------
+  def __init__(self, cfg):
+    """Default constructor
+    """
+
+    # Configuration object storing the command line arguments
+    self.cfg = cfg
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # check_library
+  #
+  # ---------------------------------------------------------------------------
+  def check_library(self):
+    """ Entry point of the check-library command. The exit code is 1 if a
+    problem is found.
+    """
+
+    directories = library_directories(self.cfg)
+    if not directories:
+      self.cfg.logging.critical("The test library is not defined (" + Key.OPT_LIBRARY.value +
+                                "). Aborting.")
+      exit(1)
+
+    start = time.perf_counter()
+    index = LibraryIndex(directories, self.cfg.library_index_path, self.cfg.jobs).update()
+
+    errors = 0
+    for path, message in index.errors():
+      print("%s : %s" % (path, message))
+      errors += 1
+
+    print("%d scripts checked (%d read) in %.1f s, %d errors" %
+          (index.indexed, index.scanned, time.perf_counter() - start, errors))
+    if errors:
+      exit(1)
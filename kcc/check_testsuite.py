@@ -0,0 +1,129 @@
+#
+# The contents of this file are subject to the Apache 2.0 license you may not
+# use this file except in compliance with the License.
+#
+# Software distributed under the License is distributed on an "AS IS" basis,
+# WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License
+# for the specific language governing rights and limitations under the
+# License.
+#
+#
+# Copyright 2023 KCC project (http://www.firmwaretoolkit.org).
+# All rights reserved. Use is subject to license terms.
+#
+#
+# Contributors list :
+#
+#    William Bonnet     wllmbnnt@gmail.com, wbonnet@theitmakers.com
+#
+
+""" This module contains the implementation of the check-suite command. The
+suite is walked once, and each test is checked against the library index : the
+script must exist, and the number of arguments must match the arguments
+declared in the metadata of the script. All the problems are collected during
+the walk and output at the end.
+"""
+
+import os
+import time
+from kcc.model import Key, TestSuite
+from kcc.library import LibraryIndex, library_directories, parse_args, FIELD_ARGS
+
+# -----------------------------------------------------------------------------
+#
+# class CheckTestSuite
+#
+# -----------------------------------------------------------------------------
+class CheckTestSuite(object):
+  """This class implements the check-suite command.
+  """
+
+  # ---------------------------------------------------------------------------
+  #
+  # __init__
+  #
+  # ---------------------------------------------------------------------------
+  def __init__(self, cfg):
+    """Default constructor
+    """
+
+    # Configuration object storing the command line arguments
+    self.cfg = cfg
+
+    # Number of arguments accepted by each script, as a (minimum, maximum)
+    # tuple indexed by path. None if the script does not declare its arguments
+    self.arities = {}
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # check_suite
+  #
+  # ---------------------------------------------------------------------------
+  def check_suite(self):
+    """ Entry point of the check-suite command. The exit code is 1 if a problem
+    is found.
+    """
+
+    filename = self.cfg.suite
+    if filename is None and self.cfg.configuration is not None:
+      filename = self.cfg.configuration.get(Key.TEST_SUITE_PATH.value)
+    if filename is None:
+      self.cfg.logging.critical("The test suite is not defined (" + Key.OPT_SUITE.value +
+                                "). Aborting.")
+      exit(1)
+
+    start = time.perf_counter()
+    suite = TestSuite(filename, self.cfg.suite_cache_path)
+    suite.load()
+    index = LibraryIndex(library_directories(self.cfg), self.cfg.library_index_path,
+                         self.cfg.jobs, [os.path.dirname(os.path.abspath(suite.filename))])
+    index.update()
+
+    errors = []
+    checked = 0
+    for test in suite.tests(errors):
+      checked += 1
+      message = self.check_test(index, test)
+      if message is not None:
+        errors.append("Test %s : %s" % (test, message))
+
+    for message in errors:
+      print(message)
+    print("%d tests checked in %.1f s, %d errors" % (checked, time.perf_counter() - start,
+                                                      len(errors)))
+    if errors:
+      exit(1)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # check_test
+  #
+  # ---------------------------------------------------------------------------
+  def check_test(self, index, test):
+    """ Return the problem found in a test, or None if the test is valid
+    """
+
+    path = index.find(test.script)
+    if path is None:
+      return "script '%s' is not in the library" % test.script
+
+    if path not in self.arities:
+      metadata = index.metadata(test.script)
+      arity = None
+      if metadata is not None and FIELD_ARGS in metadata:
+        try:
+          arity = parse_args(metadata[FIELD_ARGS])
+        except ValueError:
+          # Reported by check-library, the arguments cannot be checked
+          pass
+      self.arities[path] = arity
+
+    arity = self.arities[path]
+    if arity is not None and not arity[0] <= len(test.args) <= arity[1]:
+      expected = str(arity[0]) if arity[0] == arity[1] else "%d to %d" % arity
+      return "%s expects %s arguments, %d given" % (test.script, expected, len(test.args))
+    return None
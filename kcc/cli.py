@@ -24,12 +24,15 @@ The module will do actual processing and run the associated worker method
 (one of the run_foo methods)
 """
 
+import os
 import argparse
-import textwrap
 import logging
 from kcc.model import Key
 from kcc.model import Configuration
-from kcc import release
+from kcc.profiling import PROFILER, PHASE_CONFIGURATION
+
+# The modules implementing the commands are imported by the methods running
+# them, thus a run only pays for the import of the command it executes
 
 # -----------------------------------------------------------------------------
 #
@@ -50,17 +53,9 @@ class Cli(object):
     """Default constructor
     """
 
-    # Create the internal parser from argparse
-    self.parser = argparse.ArgumentParser(description=textwrap.dedent('''\
-KCC - Simple Build In Test v''' + release.__version__ + '''
-----------------------------------
-
-Available commands are :
-  . ''' + Key.CHECK_LIBRARY.value + '''       Check the test library consistency
-  . ''' + Key.CHECK_SUITE.value +  '''        Check the test suite consistency
-  . ''' + Key.RUN_SUITE.value + '''           Execute the tests defined in the given suite file
-'''), formatter_class=argparse.RawTextHelpFormatter)
-# XXX la tu met les intersect et Autres
+    # Create the internal parser from argparse. The description listing the
+    # commands is only built when the help is displayed
+    self.parser = argparse.ArgumentParser(formatter_class=argparse.RawTextHelpFormatter)
 
     # Stores the arguments from the parser
     self.args = None
@@ -74,6 +69,43 @@ Available commands are :
 
 
 
+  # -------------------------------------------------------------------------
+  #
+  # __description
+  #
+  # -------------------------------------------------------------------------
+  def __description(self):
+    """ This method returns the description of the tool, listing the available
+    commands. It is displayed by the help.
+    """
+
+    import textwrap
+    from kcc import release
+
+    return textwrap.dedent('''\
+KCC - Simple Build In Test v''' + release.__version__ + '''
+----------------------------------
+
+Available commands are :
+  . ''' + Key.BATCH.value + '''              Run the operation requests read from stdin (JSON lines)
+  . ''' + Key.CHECK_LIBRARY.value + '''       Check the test library consistency
+  . ''' + Key.CHECK_SUITE.value +  '''        Check the test suite consistency
+  . ''' + Key.COMPARE.value +  '''            Compare a reference config to a corpus of configs
+  . ''' + Key.CORPUS.value +  '''             Analyze the prevalence of symbols and the similarity of configs
+  . ''' + Key.EVAL.value +  '''               Evaluate operator expressions on configs
+  . ''' + Key.FACTOR.value +  '''             Split a corpus of configs into a common base and fragments
+  . ''' + Key.HISTORY.value +  '''            Output the changes of a config across git commits
+  . ''' + Key.INDEX.value +  '''              Build or query the index of the settings of a corpus of configs
+  . ''' + Key.MERGE.value +  '''              Merge fragments into a base config
+  . ''' + Key.OP_EXCEPT.value +  '''             Output the entries of a config not in the others
+  . ''' + Key.OP_CONCAT.value +  '''             Output the union of configs, last value wins
+  . ''' + Key.OP_INTERSECT.value +  '''          Output the entries common to all configs
+  . ''' + Key.RUN_SUITE.value + '''           Execute the tests defined in the given suite file
+  . ''' + Key.SERVE.value + '''         Run the kcc server, keeping parsed configs in memory
+''')
+
+
+
   # -------------------------------------------------------------------------
   #
   # parse
@@ -96,11 +128,33 @@ Available commands are :
       self.__add_parser_check_library()
     elif self.command == Key.RUN_SUITE.value:
       self.__add_parser_run_suite()
+    elif self.command == Key.COMPARE.value:
+      self.__add_parser_compare()
+    elif self.command == Key.CORPUS.value:
+      self.__add_parser_corpus()
+    elif self.command == Key.FACTOR.value:
+      self.__add_parser_factor()
+    elif self.command == Key.MERGE.value:
+      self.__add_parser_merge()
+    elif self.command in (Key.OP_EXCEPT.value, Key.OP_CONCAT.value, Key.OP_INTERSECT.value):
+      self.__add_parser_operator()
+    elif self.command == Key.BATCH.value:
+      self.__add_parser_batch()
+    elif self.command == Key.SERVE.value:
+      self.__add_parser_serve()
+    elif self.command == Key.EVAL.value:
+      self.__add_parser_eval()
+    elif self.command == Key.HISTORY.value:
+      self.__add_parser_history()
+    elif self.command == Key.INDEX.value:
+      self.__add_parser_index()
     elif self.command == "help":
+      self.parser.description = self.__description()
       return self.parser.parse_args(['-h'])
     else:
       # If the command word is unknown, the force the parsing of the help flag
       logging.critical("Unknown command : %s", self.command)
+      self.parser.description = self.__description()
       return self.parser.parse_args(['-h'])
 
     # Finally call the parser that has been initialized by the previous lines
@@ -118,9 +172,18 @@ Available commands are :
       command called from cli
     """
 
+    # Start profiling as early as possible
+    if self.args.profile != None:
+      PROFILER.enable()
+
     # Create the project definition object, and load its configuration
     self.cfg = Configuration()
-    self.cfg.load_configuration()
+    with PROFILER.phase(PHASE_CONFIGURATION):
+      self.cfg.load_configuration()
+
+    # Retrieve the profiling options
+    self.cfg.profile = self.args.profile
+    self.cfg.profile_pstats = self.args.profile_pstats
 
     # ---------------------------------------------------------------------
     # Override configuration with values passed on the commande line
@@ -141,36 +204,199 @@ Available commands are :
     if self.args.library != None:
       self.cfg.library = self.args.library
 
-    # Retrieve the array of categories
-    if self.args.category != None:
-      self.cfg.category = self.args.category
-
-    # Retrieve the aggregation level
-    if self.args.aggregation_level != None:
-      self.cfg.aggregation_level = self.args.aggregation_level
-
-    # Set the results cache flag
-    if self.args.no_result_cache != None:
-      self.cfg.use_results_cache = not self.args.no_result_cache
-
-    # Retrieve the failfast flag
-    self.cfg.fail_fast = bool(self.args.fail_fast != None)
-
-    # Retrieve the show hints flag
-    self.cfg.show_hints = self.args.show_hints
+    # Options specific to the check-library and check-suite commands
+    if self.command in (Key.CHECK_LIBRARY.value, Key.CHECK_SUITE.value):
+      # Retrieve the number of jobs
+      if self.args.jobs != None:
+        self.cfg.jobs = self.args.jobs
+
+    # Options specific to the run command
+    if self.command == Key.RUN_SUITE.value:
+      # Retrieve the array of categories
+      if self.args.category != None:
+        self.cfg.category = self.args.category
+
+      # Retrieve the aggregation level
+      if self.args.aggregation_level != None:
+        self.cfg.aggregation_level = self.args.aggregation_level
+
+      # Set the results cache flag
+      if self.args.no_result_cache != None:
+        self.cfg.use_results_cache = not self.args.no_result_cache
+
+      # Retrieve the failfast flag
+      self.cfg.fail_fast = self.args.fail_fast
+
+      # Retrieve the only errors and show hints flags
+      self.cfg.only_errors = self.args.only_errors
+      self.cfg.show_hints = self.args.show_hints
+
+      # Retrieve the number of jobs
+      if self.args.jobs != None:
+        self.cfg.jobs = self.args.jobs
+
+    # Options specific to the compare command
+    if self.command == Key.COMPARE.value:
+      self.cfg.reference = self.args.reference
+      self.cfg.inputs = self.args.inputs
+      self.cfg.output = self.args.output
+      self.cfg.matrix = self.args.matrix
+
+      # Retrieve the number of jobs
+      if self.args.jobs != None:
+        self.cfg.jobs = self.args.jobs
+
+      # Retrieve the kernel tree providing the Kconfig files
+      self.cfg.kconfig = self.args.kconfig
+
+    # Options specific to the corpus command
+    if self.command == Key.CORPUS.value:
+      self.cfg.inputs = self.args.inputs
+      self.cfg.output = self.args.output
+      self.cfg.metric = self.args.metric
+      self.cfg.threshold = self.args.threshold
+
+    # Options specific to the factor command
+    if self.command == Key.FACTOR.value:
+      self.cfg.inputs = self.args.inputs
+      self.cfg.output = self.args.output
+
+      # Retrieve the quorum
+      if self.args.quorum != None:
+        self.cfg.quorum = self.args.quorum
+
+    # Options specific to the merge command
+    if self.command == Key.MERGE.value:
+      self.cfg.inputs = self.args.inputs
+      self.cfg.output = self.args.output
+      self.cfg.warn_redundant = self.args.warn_redundant
+
+    # Options specific to the operator commands
+    if self.command in (Key.OP_EXCEPT.value, Key.OP_CONCAT.value, Key.OP_INTERSECT.value):
+      self.cfg.operator = self.command
+      self.cfg.inputs = self.args.inputs
+      self.cfg.output = self.args.output
+      self.cfg.minimize = self.args.minimize
+      self.cfg.kconfig = self.args.kconfig
+
+      # Sorted inputs are only used by the streaming mode
+      self.cfg.sorted = self.args.sorted
+      self.cfg.stream = self.args.stream or self.args.sorted
+
+      # Retrieve the sort buffer size, given in MiB
+      if self.args.sort_buffer != None:
+        self.cfg.sort_buffer_size = self.args.sort_buffer * 1024 * 1024
+
+    # Options specific to the eval command
+    if self.command == Key.EVAL.value:
+      self.cfg.expressions = self.args.expressions
+      self.cfg.plan = self.args.plan
+
+    # Options specific to the history command
+    if self.command == Key.HISTORY.value:
+      self.cfg.repository = self.args.repository
+      self.cfg.config_path = self.args.config_path
+      self.cfg.revisions = self.args.revisions
+
+    # Options specific to the index command. The arguments are the inputs to
+    # index, or the words of the query
+    if self.command == Key.INDEX.value:
+      self.cfg.index_action = self.args.index_action
+      if self.cfg.index_action == Key.INDEX_BUILD.value:
+        self.cfg.inputs = self.args.index_arguments
+      else:
+        self.cfg.query = self.args.index_arguments
+
+      # Retrieve the index path
+      if self.args.symbol_index_path != None:
+        self.cfg.symbol_index_path = os.path.abspath(self.args.symbol_index_path)
+
+    # Options specific to the serve command
+    if self.command == Key.SERVE.value:
+      # Retrieve the memory limit, given in MiB
+      if self.args.memory_limit != None:
+        self.cfg.memory_limit = self.args.memory_limit * 1024 * 1024
+
+      # Retrieve the idle timeout
+      if self.args.idle_timeout != None:
+        self.cfg.idle_timeout = self.args.idle_timeout
+
+    # Retrieve the server flag, for the commands which can be sent to the server
+    if self.command in (Key.COMPARE.value, Key.MERGE.value, Key.OP_EXCEPT.value,
+                        Key.OP_CONCAT.value, Key.OP_INTERSECT.value):
+      self.cfg.server = self.args.server
+
+    # Retrieve the socket path, for the server and its clients
+    if self.command in (Key.COMPARE.value, Key.MERGE.value, Key.OP_EXCEPT.value,
+                        Key.OP_CONCAT.value, Key.OP_INTERSECT.value, Key.SERVE.value):
+      if self.args.socket_path != None:
+        self.cfg.socket_path = os.path.abspath(self.args.socket_path)
+
+    # Set the parse cache flag, for the commands reading config files
+    if self.command in (Key.COMPARE.value, Key.MERGE.value, Key.OP_EXCEPT.value,
+                        Key.OP_CONCAT.value, Key.OP_INTERSECT.value, Key.BATCH.value,
+                        Key.SERVE.value, Key.EVAL.value, Key.CORPUS.value,
+                        Key.FACTOR.value, Key.INDEX.value):
+      self.cfg.use_parse_cache = not self.args.no_parse_cache
 
     # Create the logger object
     logging.basicConfig()
     self.cfg.logging = logging.getLogger()
     self.cfg.logging.setLevel(self.cfg.log_level)
 
+    # Run the command, under cProfile if requested
+    if self.cfg.profile_pstats != None:
+      import cProfile
+      profile = cProfile.Profile()
+      profile.runcall(self.__run_command)
+      profile.dump_stats(self.cfg.profile_pstats)
+    else:
+      self.__run_command()
+
+    # Output the profiling report
+    if self.cfg.profile != None:
+      PROFILER.write(self.cfg.profile)
+
+
+
+  # -------------------------------------------------------------------------
+  #
+  # __run_command
+  #
+  # -------------------------------------------------------------------------
+  def __run_command(self):
+    """ Call the method dedicated to the command
+    """
+
     # Select the method to run according to the command
-    if self.command == Key.CHECK_LIBRARY.value:
+    if self.cfg.server and not self.cfg.stream:
+      self.__run_client()
+    elif self.command == Key.CHECK_LIBRARY.value:
       self.__run_check_library()
     elif self.command == Key.CHECK_SUITE.value:
       self.__run_check_suite()
     elif self.command == Key.RUN_SUITE.value:
       self.__run_run_suite()
+    elif self.command == Key.COMPARE.value:
+      self.__run_compare()
+    elif self.command == Key.MERGE.value:
+      self.__run_merge()
+    elif self.command in (Key.OP_EXCEPT.value, Key.OP_CONCAT.value, Key.OP_INTERSECT.value):
+      self.__run_operator()
+    elif self.command == Key.BATCH.value:
+      self.__run_batch()
+    elif self.command == Key.SERVE.value:
+      self.__run_serve()
+    elif self.command == Key.EVAL.value:
+      self.__run_eval()
+    elif self.command == Key.HISTORY.value:
+      self.__run_history()
+    elif self.command == Key.INDEX.value:
+      self.__run_index()
+    elif self.command == Key.CORPUS.value:
+      self.__run_corpus()
+    elif self.command == Key.FACTOR.value:
+      self.__run_factor()
     else:
       self.cfg.logging.critical("Unnown command : %s", self.command)
       exit(1)
@@ -205,6 +431,21 @@ Available commands are :
                              dest=Key.SUITE.value,
                              help="File containing the test suite (YAML format)")
 
+    self.parser.add_argument(Key.OPT_PROFILE.value,
+                             action='store',
+                             nargs='?',
+                             const='-',
+                             dest=Key.PROFILE.value,
+                             help="Record the time spent in each phase and the counters\n"
+                                  "(files, lines, symbols, cache, bytes). The JSON report\n"
+                                  "is written to the given file, or to stderr")
+
+    self.parser.add_argument(Key.OPT_PROFILE_PSTATS.value,
+                             action='store',
+                             dest=Key.PROFILE_PSTATS.value,
+                             help="Run the command under cProfile and dump the statistics\n"
+                                  "to the given pstats file")
+
 
 
   # -------------------------------------------------------------------------
@@ -221,6 +462,13 @@ Available commands are :
     self.parser.add_argument(Key.CHECK_SUITE.value,
                              help=Key.OPT_HELP_COMMAND.value)
 
+    self.parser.add_argument(Key.OPT_JOBS.value,
+                             action='store',
+                             type=int,
+                             dest=Key.JOBS.value,
+                             help="Number of worker threads reading the library scripts.\n"
+                                  "Defaults to the number of CPU")
+
 
 
   # -------------------------------------------------------------------------
@@ -237,6 +485,13 @@ Available commands are :
     self.parser.add_argument(Key.CHECK_LIBRARY.value,
                              help=Key.OPT_HELP_COMMAND.value)
 
+    self.parser.add_argument(Key.OPT_JOBS.value,
+                             action='store',
+                             type=int,
+                             dest=Key.JOBS.value,
+                             help="Number of worker threads reading the scripts. Defaults\n"
+                                  "to the number of CPU")
+
 
 
   # -------------------------------------------------------------------------
@@ -264,6 +519,7 @@ Available commands are :
     self.parser.add_argument(Key.OPT_AGGREGATION_LEVEL.value,
                              action='store',
                              dest=Key.AGGREGATION_LEVEL.value,
+                             type=int,
                              help="Defines the test depth used for results aggreation")
 
     # Defines the reverse order search path
@@ -272,7 +528,9 @@ Available commands are :
                              dest=Key.NO_RESULT_CACHE.value,
                              help="Deactivate script result cache. Scripts can be run\n"
                                   "multiple times with the same argumets, instead of\n"
-                                  "once per arguments distinct set of values")
+                                  "once per arguments distinct set of values. Only\n"
+                                  "successful results are cached, failed scripts are\n"
+                                  "always run again")
 
     self.parser.add_argument(Key.OPT_FAIL_FAST.value,
                              action='store_true',
@@ -295,6 +553,465 @@ Available commands are :
                                   "the tests fails. Hints have to be defined in the tests\n"
                                   "scripts and are optional")
 
+    self.parser.add_argument(Key.OPT_JOBS.value,
+                             action='store',
+                             type=int,
+                             dest=Key.JOBS.value,
+                             help="Number of tests run concurrently. Default value : number\n"
+                                  "of CPU")
+
+
+
+  # -------------------------------------------------------------------------
+  #
+  # __add_parser_compare
+  #
+  # -------------------------------------------------------------------------
+  def __add_parser_compare(self):
+
+    """ This method add parser options specific to the comparison of a reference
+    config to a corpus of configs.
+    """
+
+    self.parser.add_argument(Key.COMPARE.value,
+                             help=Key.OPT_HELP_COMMAND.value)
+
+    self.parser.add_argument(Key.OPT_REFERENCE.value,
+                             action='store',
+                             dest=Key.REFERENCE.value,
+                             required=True,
+                             help="Reference config file")
+
+    self.parser.add_argument(Key.INPUTS.value,
+                             nargs='+',
+                             help="Config files, directories or glob patterns to compare\n"
+                                  "to the reference")
+
+    self.parser.add_argument(Key.OPT_JOBS.value,
+                             action='store',
+                             type=int,
+                             dest=Key.JOBS.value,
+                             help="Number of worker processes used to parse and compare\n"
+                                  "files. Default value : number of CPU")
+
+    self.parser.add_argument(Key.OPT_OUTPUT.value,
+                             action='store',
+                             dest=Key.OUTPUT.value,
+                             help="Directory where the per file except and intersect\n"
+                                  "fragments are written, in the subdirectories of the\n"
+                                  "files relative to their common directory")
+
+    self.parser.add_argument(Key.OPT_MATRIX.value,
+                             action='store',
+                             dest=Key.MATRIX.value,
+                             help="CSV file receiving the matrix of differences (symbol x\n"
+                                  "file). Default is to output it on stdout")
+
+    self.__add_option_kconfig()
+    self.__add_option_no_parse_cache()
+    self.__add_option_server()
+
+
+
+  # -------------------------------------------------------------------------
+  #
+  # __add_parser_corpus
+  #
+  # -------------------------------------------------------------------------
+  def __add_parser_corpus(self):
+
+    """ This method add parser options specific to the analysis of a corpus of
+    configs.
+    """
+
+    self.parser.add_argument(Key.CORPUS.value,
+                             help=Key.OPT_HELP_COMMAND.value)
+
+    self.parser.add_argument(Key.INPUTS.value,
+                             nargs='+',
+                             help="Config files, directories or glob patterns to analyze")
+
+    self.parser.add_argument(Key.OPT_METRIC.value,
+                             action='store',
+                             dest=Key.METRIC.value,
+                             choices=[Key.METRIC_JACCARD.value, Key.METRIC_HAMMING.value],
+                             default=Key.METRIC_JACCARD.value,
+                             help="Similarity of two configs : Jaccard index of their\n"
+                                  "settings, or number of symbols with different values.\n"
+                                  "Default value : jaccard")
+
+    self.parser.add_argument(Key.OPT_THRESHOLD.value,
+                             action='store',
+                             type=float,
+                             dest=Key.THRESHOLD.value,
+                             help="Minimum similarity (jaccard) or maximum distance\n"
+                                  "(hamming) of near-identical configs. Default value :\n"
+                                  "0.95 (jaccard), 10 (hamming)")
+
+    self.parser.add_argument(Key.OPT_OUTPUT.value,
+                             action='store',
+                             dest=Key.OUTPUT.value,
+                             help="Directory where the prevalence of the symbols and the\n"
+                                  "similarity matrix are written as CSV files")
+
+    self.__add_option_no_parse_cache()
+
+
+
+  # -------------------------------------------------------------------------
+  #
+  # __add_parser_factor
+  #
+  # -------------------------------------------------------------------------
+  def __add_parser_factor(self):
+
+    """ This method add parser options specific to the factorization of a
+    corpus of configs into a base and fragments.
+    """
+
+    self.parser.add_argument(Key.FACTOR.value,
+                             help=Key.OPT_HELP_COMMAND.value)
+
+    self.parser.add_argument(Key.INPUTS.value,
+                             nargs='+',
+                             help="Config files, directories or glob patterns to factor")
+
+    self.parser.add_argument(Key.OPT_OUTPUT.value,
+                             action='store',
+                             dest=Key.OUTPUT.value,
+                             required=True,
+                             help="Directory where the base config and the per file except\n"
+                                  "fragments are written, the fragments in the\n"
+                                  "subdirectories of the files relative to their common\n"
+                                  "directory")
+
+    self.parser.add_argument(Key.OPT_QUORUM.value,
+                             action='store',
+                             type=float,
+                             dest=Key.QUORUM.value,
+                             help="Ratio of the configs which must share a setting to put\n"
+                                  "it in the base. Default value : 1.0, the intersect of\n"
+                                  "all the configs")
+
+    self.__add_option_no_parse_cache()
+
+
+
+  # -------------------------------------------------------------------------
+  #
+  # __add_parser_merge
+  #
+  # -------------------------------------------------------------------------
+  def __add_parser_merge(self):
+
+    """ This method add parser options specific to the merge of fragments into
+    a base config.
+    """
+
+    self.parser.add_argument(Key.MERGE.value,
+                             help=Key.OPT_HELP_COMMAND.value)
+
+    self.parser.add_argument(Key.INPUTS.value,
+                             nargs='+',
+                             help="Base config file, followed by the fragments to apply\n"
+                                  "in order")
+
+    self.parser.add_argument(Key.OPT_OUTPUT.value,
+                             action='store',
+                             dest=Key.OUTPUT.value,
+                             help="File receiving the merged config. Default value : .config")
+
+    self.parser.add_argument(Key.OPT_WARN_REDUNDANT.value,
+                             action='store_true',
+                             dest=Key.WARN_REDUNDANT.value,
+                             help="If this flag is activated, kcc will also report the\n"
+                                  "symbols redefined with the same value by a fragment")
+
+    self.__add_option_no_parse_cache()
+    self.__add_option_server()
+
+
+
+  # -------------------------------------------------------------------------
+  #
+  # __add_parser_operator
+  #
+  # -------------------------------------------------------------------------
+  def __add_parser_operator(self):
+
+    """ This method add parser options specific to the except, concat and
+    intersect operators.
+    """
+
+    self.parser.add_argument(self.command,
+                             help=Key.OPT_HELP_COMMAND.value)
+
+    self.parser.add_argument(Key.INPUTS.value,
+                             nargs='+',
+                             help="Config files the operator is applied to, in order")
+
+    self.parser.add_argument(Key.OPT_OUTPUT.value,
+                             action='store',
+                             dest=Key.OUTPUT.value,
+                             help="File receiving the resulting fragment. Default is to\n"
+                                  "output it on stdout")
+
+    self.parser.add_argument(Key.OPT_MINIMIZE.value,
+                             action='store_true',
+                             dest=Key.MINIMIZE.value,
+                             help="If this flag is activated, the result of except is\n"
+                                  "reduced to the smallest fragment reproducing the first\n"
+                                  "config once merged on the others (savedefconfig). It\n"
+                                  "requires " + Key.OPT_KCONFIG.value)
+
+    self.parser.add_argument(Key.OPT_STREAM.value,
+                             action='store_true',
+                             dest=Key.STREAM.value,
+                             help="Run the operator in streaming mode, in the current\n"
+                                  "process. Inputs are read line by line ('-' is stdin)\n"
+                                  "and sorted by symbol name, the result is written as it\n"
+                                  "is produced, sorted by symbol name")
+
+    self.parser.add_argument(Key.OPT_SORTED.value,
+                             action='store_true',
+                             dest=Key.SORTED.value,
+                             help="The inputs are already sorted by symbol name, they are\n"
+                                  "used as they come. Implies " + Key.OPT_STREAM.value)
+
+    self.parser.add_argument(Key.OPT_SORT_BUFFER.value,
+                             action='store',
+                             type=int,
+                             dest=Key.SORT_BUFFER.value,
+                             help="Memory used to sort the inputs in streaming mode, in\n"
+                                  "MiB. Larger inputs are sorted through temporary files.\n"
+                                  "Default value : 64")
+
+    self.__add_option_kconfig()
+    self.__add_option_no_parse_cache()
+    self.__add_option_server()
+
+
+
+  # -------------------------------------------------------------------------
+  #
+  # __add_parser_batch
+  #
+  # -------------------------------------------------------------------------
+  def __add_parser_batch(self):
+
+    """ This method add parser options specific to the batch mode, which reads
+    the operation requests from stdin.
+    """
+
+    self.parser.add_argument(Key.BATCH.value,
+                             help=Key.OPT_HELP_COMMAND.value)
+
+    self.__add_option_no_parse_cache()
+
+
+
+  # -------------------------------------------------------------------------
+  #
+  # __add_parser_eval
+  #
+  # -------------------------------------------------------------------------
+  def __add_parser_eval(self):
+
+    """ This method add parser options specific to the evaluation of operator
+    expressions.
+    """
+
+    self.parser.add_argument(Key.EVAL.value,
+                             help=Key.OPT_HELP_COMMAND.value)
+
+    self.parser.add_argument(Key.EXPRESSIONS.value,
+                             nargs='*',
+                             help="Operator expressions, such as\n"
+                                  "  'out.config = (base concat board) except vendor'\n"
+                                  "Results of the expressions without output are written\n"
+                                  "to stdout")
+
+    self.parser.add_argument(Key.OPT_PLAN.value,
+                             action='store',
+                             dest=Key.PLAN.value,
+                             help="File containing more expressions, one per line. Empty\n"
+                                  "lines and lines starting with # are ignored")
+
+    self.__add_option_no_parse_cache()
+
+
+
+  # -------------------------------------------------------------------------
+  #
+  # __add_parser_history
+  #
+  # -------------------------------------------------------------------------
+  def __add_parser_history(self):
+
+    """ This method add parser options specific to the history of a config
+    stored in a git repository.
+    """
+
+    self.parser.add_argument(Key.HISTORY.value,
+                             help=Key.OPT_HELP_COMMAND.value)
+
+    self.parser.add_argument(Key.REPOSITORY.value,
+                             help="Path to the git repository")
+
+    self.parser.add_argument(Key.CONFIG_PATH.value,
+                             help="Path of the config file, relative to the root of the\n"
+                                  "repository")
+
+    self.parser.add_argument(Key.REVISIONS.value,
+                             help="Revision range to walk, such as v6.1..v6.6")
+
+
+
+  # -------------------------------------------------------------------------
+  #
+  # __add_parser_index
+  #
+  # -------------------------------------------------------------------------
+  def __add_parser_index(self):
+
+    """ This method add parser options specific to the index of the settings
+    of a corpus of configs.
+    """
+
+    self.parser.add_argument(Key.INDEX.value,
+                             help=Key.OPT_HELP_COMMAND.value)
+
+    self.parser.add_argument(Key.INDEX_ACTION.value,
+                             choices=[Key.INDEX_BUILD.value, Key.INDEX_QUERY.value],
+                             help="Create or update the index, or query it")
+
+    self.parser.add_argument(Key.INDEX_ARGUMENTS.value,
+                             nargs='*',
+                             help="build : config files, directories or glob patterns to\n"
+                                  "index. Default value : the inputs of the previous build\n"
+                                  "query : predicates SYMBOL=value (the value n matches\n"
+                                  "the 'is not set' lines) or SYMBOL (defined, whatever\n"
+                                  "the value), combined with and, or, not and parentheses")
+
+    self.parser.add_argument(Key.OPT_INDEX.value,
+                             action='store',
+                             dest=Key.SYMBOL_INDEX_PATH.value,
+                             help="Path of the index file. Default value :\n"
+                                  "~/.cache/kcc/symbols.idx")
+
+    self.__add_option_no_parse_cache()
+
+
+
+  # -------------------------------------------------------------------------
+  #
+  # __add_parser_serve
+  #
+  # -------------------------------------------------------------------------
+  def __add_parser_serve(self):
+
+    """ This method add parser options specific to the kcc server.
+    """
+
+    self.parser.add_argument(Key.SERVE.value,
+                             help=Key.OPT_HELP_COMMAND.value)
+
+    self.parser.add_argument(Key.OPT_MEMORY_LIMIT.value,
+                             action='store',
+                             type=int,
+                             dest=Key.MEMORY_LIMIT.value,
+                             help="Memory used by the configs kept in memory, in MiB. Least\n"
+                                  "recently used configs are evicted above this limit.\n"
+                                  "Default value : 512")
+
+    self.parser.add_argument(Key.OPT_IDLE_TIMEOUT.value,
+                             action='store',
+                             type=float,
+                             dest=Key.IDLE_TIMEOUT.value,
+                             help="Delay in seconds after which an unused config is evicted.\n"
+                                  "Default value : 600")
+
+    self.__add_option_socket()
+    self.__add_option_no_parse_cache()
+
+
+
+  # -------------------------------------------------------------------------
+  #
+  # __add_option_kconfig
+  #
+  # -------------------------------------------------------------------------
+  def __add_option_kconfig(self):
+
+    """ This method add the option giving the kernel source tree used to know
+    the dependencies between symbols.
+    """
+
+    self.parser.add_argument(Key.OPT_KCONFIG.value,
+                             action='store',
+                             dest=Key.KCONFIG.value,
+                             help="Path to the kernel source tree. Its Kconfig files are\n"
+                                  "used to classify differences as root or derived")
+
+
+
+  # -------------------------------------------------------------------------
+  #
+  # __add_option_no_parse_cache
+  #
+  # -------------------------------------------------------------------------
+  def __add_option_no_parse_cache(self):
+
+    """ This method add the option used to deactivate the parse cache, shared
+    by the commands reading config files.
+    """
+
+    self.parser.add_argument(Key.OPT_NO_PARSE_CACHE.value,
+                             action='store_true',
+                             dest=Key.NO_PARSE_CACHE.value,
+                             help="Deactivate the persistent cache of parsed config files.\n"
+                                  "Files are parsed on each run")
+
+
+
+  # -------------------------------------------------------------------------
+  #
+  # __add_option_socket
+  #
+  # -------------------------------------------------------------------------
+  def __add_option_socket(self):
+
+    """ This method add the option giving the path of the socket of the kcc
+    server.
+    """
+
+    self.parser.add_argument(Key.OPT_SOCKET.value,
+                             action='store',
+                             dest=Key.SOCKET_PATH.value,
+                             help="Path of the Unix socket of the kcc server. Default value :\n"
+                                  "~/.cache/kcc/server.sock")
+
+
+
+  # -------------------------------------------------------------------------
+  #
+  # __add_option_server
+  #
+  # -------------------------------------------------------------------------
+  def __add_option_server(self):
+
+    """ This method add the options used to send the command to a running kcc
+    server, shared by the commands the server can run.
+    """
+
+    self.parser.add_argument(Key.OPT_SERVER.value,
+                             action='store_true',
+                             dest=Key.SERVER.value,
+                             help="Send the command to the kcc server (see the serve\n"
+                                  "command) instead of running it in this process")
+
+    self.__add_option_socket()
+
 
 
   # -------------------------------------------------------------------------
@@ -307,6 +1024,8 @@ Available commands are :
       Create the business objet, then execute the entry point
     """
 
+    from kcc import check_library
+
     # Create the business object
     command = check_library.CheckLibrary(self.cfg)
 
@@ -321,10 +1040,12 @@ Available commands are :
   #
   # -------------------------------------------------------------------------
   def __run_check_suite(self):
-    """ Method used to handle the check_library command.
+    """ Method used to handle the check_suite command.
       Create the business objet, then execute the entry point
     """
 
+    from kcc import check_testsuite
+
     # Create the business object
     command = check_testsuite.CheckTestSuite(self.cfg)
 
@@ -343,8 +1064,230 @@ Available commands are :
       Create the business objet, then execute the entry point
     """
 
+    from kcc import run_testsuite
+
     # Create the business object
     command = run_testsuite.RunTestSuite(self.cfg)
 
     # Then call the dedicated method
     command.run_suite()
+
+
+
+  # -------------------------------------------------------------------------
+  #
+  # __run_compare
+  #
+  # -------------------------------------------------------------------------
+  def __run_compare(self):
+    """ Method used to handle the compare command.
+      Create the business objet, then execute the entry point
+    """
+
+    from kcc import compare
+
+    # Create the business object
+    command = compare.CompareCorpus(self.cfg)
+
+    # Then call the dedicated method
+    command.compare()
+
+
+
+  # -------------------------------------------------------------------------
+  #
+  # __run_merge
+  #
+  # -------------------------------------------------------------------------
+  def __run_merge(self):
+    """ Method used to handle the merge command.
+      Create the business objet, then execute the entry point
+    """
+
+    from kcc import merge
+
+    # Create the business object
+    command = merge.FragmentMerger(self.cfg)
+
+    # Then call the dedicated method
+    command.merge()
+
+
+
+  # -------------------------------------------------------------------------
+  #
+  # __run_operator
+  #
+  # -------------------------------------------------------------------------
+  def __run_operator(self):
+    """ Method used to handle the except, concat and intersect commands.
+      Create the business objet, then execute the entry point
+    """
+
+    from kcc import operator_command
+
+    # Create the business object
+    command = operator_command.OperatorCommand(self.cfg)
+
+    # Then call the dedicated method
+    command.run_operator()
+
+
+
+  # -------------------------------------------------------------------------
+  #
+  # __run_batch
+  #
+  # -------------------------------------------------------------------------
+  def __run_batch(self):
+    """ Method used to handle the batch command.
+      Create the business objet, then execute the entry point
+    """
+
+    from kcc import batch
+
+    # Create the business object
+    command = batch.BatchRunner(self.cfg)
+
+    # Then call the dedicated method
+    command.run_batch()
+
+
+
+  # -------------------------------------------------------------------------
+  #
+  # __run_eval
+  #
+  # -------------------------------------------------------------------------
+  def __run_eval(self):
+    """ Method used to handle the eval command.
+      Create the business objet, then execute the entry point
+    """
+
+    from kcc import expression_command
+
+    # Create the business object
+    command = expression_command.ExpressionCommand(self.cfg)
+
+    # Then call the dedicated method
+    command.run_expressions()
+
+
+
+  # -------------------------------------------------------------------------
+  #
+  # __run_corpus
+  #
+  # -------------------------------------------------------------------------
+  def __run_corpus(self):
+    """ Method used to handle the corpus command.
+      Create the business objet, then execute the entry point
+    """
+
+    from kcc import corpus
+
+    # Create the business object
+    command = corpus.CorpusAnalysis(self.cfg)
+
+    # Then call the dedicated method
+    command.run_corpus()
+
+
+
+  # -------------------------------------------------------------------------
+  #
+  # __run_factor
+  #
+  # -------------------------------------------------------------------------
+  def __run_factor(self):
+    """ Method used to handle the factor command.
+      Create the business objet, then execute the entry point
+    """
+
+    from kcc import factor
+
+    # Create the business object
+    command = factor.CorpusFactorization(self.cfg)
+
+    # Then call the dedicated method
+    command.run_factor()
+
+
+
+  # -------------------------------------------------------------------------
+  #
+  # __run_index
+  #
+  # -------------------------------------------------------------------------
+  def __run_index(self):
+    """ Method used to handle the index command.
+      Create the business objet, then execute the entry point
+    """
+
+    from kcc import symbol_index
+
+    # Create the business object
+    command = symbol_index.SymbolIndexCommand(self.cfg)
+
+    # Then call the dedicated method
+    command.run_index()
+
+
+
+  # -------------------------------------------------------------------------
+  #
+  # __run_history
+  #
+  # -------------------------------------------------------------------------
+  def __run_history(self):
+    """ Method used to handle the history command.
+      Create the business objet, then execute the entry point
+    """
+
+    from kcc import history
+
+    # Create the business object
+    command = history.ConfigHistory(self.cfg)
+
+    # Then call the dedicated method
+    command.run_history()
+
+
+
+  # -------------------------------------------------------------------------
+  #
+  # __run_serve
+  #
+  # -------------------------------------------------------------------------
+  def __run_serve(self):
+    """ Method used to handle the serve command.
+      Create the business objet, then execute the entry point
+    """
+
+    from kcc import server
+
+    # Create the business object
+    command = server.KccServer(self.cfg)
+
+    # Then call the dedicated method
+    command.serve()
+
+
+
+  # -------------------------------------------------------------------------
+  #
+  # __run_client
+  #
+  # -------------------------------------------------------------------------
+  def __run_client(self):
+    """ Method used to send the command to the kcc server.
+      Create the business objet, then execute the entry point
+    """
+
+    from kcc import client
+
+    # Create the business object
+    command = client.ServerClient(self.cfg)
+
+    # Then call the dedicated method
+    command.run_client(self.command)
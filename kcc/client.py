@@ -0,0 +1,178 @@
+#
+# The contents of this file are subject to the Apache 2.0 license you may not
+# use this file except in compliance with the License.
+#
+# Software distributed under the License is distributed on an "AS IS" basis,
+# WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License
+# for the specific language governing rights and limitations under the
+# License.
+#
+#
+# Copyright 2023 KCC project (http://www.firmwaretoolkit.org).
+# All rights reserved. Use is subject to license terms.
+#
+#
+# Contributors list :
+#
+#    William Bonnet     wllmbnnt@gmail.com, wbonnet@theitmakers.com
+#
+
+""" This module contains the client of the kcc server, used by the operator,
+merge and compare commands when the --server flag is given. The command is
+sent as a single request to the server, then the response is output the same
+way the command would have output its results.
+
+The client only imports what it needs to build the request, thus its start up
+is as short as possible. Paths are made absolute since the server does not run
+in the directory of the client.
+"""
+
+import os
+import sys
+import json
+import socket
+from kcc.model import Key
+from kcc.protocol import REQUEST_COMMAND, RESPONSE_STATUS, RESPONSE_ERROR, STATUS_OK
+
+# -----------------------------------------------------------------------------
+#
+# class ServerClient
+#
+# -----------------------------------------------------------------------------
+class ServerClient(object):
+  """This class sends a command to the kcc server and outputs its response.
+  """
+
+  # ---------------------------------------------------------------------------
+  #
+  # __init__
+  #
+  # ---------------------------------------------------------------------------
+  def __init__(self, cfg):
+    """Default constructor
+    """
+
+    # Configuration object storing the command line arguments
+    self.cfg = cfg
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # run_client
+  #
+  # ---------------------------------------------------------------------------
+  def run_client(self, command):
+    """ Entry point of the client. The command is the command word given on
+    the command line.
+    """
+
+    request = self.build_request(command)
+    response = self.send(request)
+
+    if response.get(RESPONSE_STATUS) != STATUS_OK:
+      self.cfg.logging.critical("Error: " + str(response.get(RESPONSE_ERROR)))
+      exit(1)
+
+    if command == Key.COMPARE.value:
+      self.output_compare(response)
+    elif command == Key.MERGE.value:
+      for message in response["messages"]:
+        print(message)
+        print()
+      self.cfg.logging.info("Merged %d fragments into %s (%d redefined, %d redundant)",
+                            len(request[Key.INPUTS.value]) - 1, response[Key.OUTPUT.value],
+                            response["redefined"], response["redundant"])
+    elif "fragment" in response:
+      sys.stdout.write(response["fragment"])
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # build_request
+  #
+  # ---------------------------------------------------------------------------
+  def build_request(self, command):
+    """ Build the request of a command from the configuration
+    """
+
+    request = {REQUEST_COMMAND: command}
+
+    if command == Key.COMPARE.value:
+      from kcc.compare import expand_inputs
+      inputs = expand_inputs(self.cfg.inputs)
+      if not inputs:
+        self.cfg.logging.critical("No config file found in : %s", " ".join(self.cfg.inputs))
+        exit(1)
+      request[Key.REFERENCE.value] = os.path.abspath(self.cfg.reference)
+      if self.cfg.kconfig is not None:
+        self.cfg.logging.warning("The server does not classify differences, " +
+                                 Key.OPT_KCONFIG.value + " is ignored")
+    else:
+      inputs = self.cfg.inputs
+    request[Key.INPUTS.value] = [os.path.abspath(path) for path in inputs]
+
+    output = self.cfg.output
+    if command == Key.MERGE.value:
+      from kcc.merge import DEFAULT_OUTPUT
+      output = output if output is not None else DEFAULT_OUTPUT
+      request[Key.WARN_REDUNDANT.value] = self.cfg.warn_redundant
+    elif command != Key.COMPARE.value:
+      request[Key.MINIMIZE.value] = self.cfg.minimize
+      if self.cfg.kconfig is not None:
+        request[Key.KCONFIG.value] = os.path.abspath(self.cfg.kconfig)
+    if output is not None:
+      request[Key.OUTPUT.value] = os.path.abspath(output)
+
+    return request
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # send
+  #
+  # ---------------------------------------------------------------------------
+  def send(self, request):
+    """ Send a request to the server and return its decoded response
+    """
+
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+      connection.connect(self.cfg.socket_path)
+      connection.sendall(json.dumps(request).encode() + b"\n")
+      connection.shutdown(socket.SHUT_WR)
+      with connection.makefile('rb') as stream:
+        line = stream.readline()
+    except OSError as exception:
+      self.cfg.logging.critical("Cannot reach the kcc server on " + self.cfg.socket_path +
+                                " - " + str(exception.strerror))
+      exit(1)
+    finally:
+      connection.close()
+
+    if not line:
+      self.cfg.logging.critical("The kcc server closed the connection without answering")
+      exit(1)
+    return json.loads(line)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # output_compare
+  #
+  # ---------------------------------------------------------------------------
+  def output_compare(self, response):
+    """ Output the results of a comparison as the compare command does
+    """
+
+    from kcc.compare import CompareCorpus
+
+    corpus = CompareCorpus(self.cfg)
+    corpus.results = [(result["path"], result.get(RESPONSE_ERROR),
+                       [tuple(difference) for difference in result.get("differences", [])],
+                       result.get("common", 0))
+                      for result in response["files"]]
+    corpus.output_results()
@@ -0,0 +1,439 @@
+#
+# The contents of this file are subject to the Apache 2.0 license you may not
+# use this file except in compliance with the License.
+#
+# Software distributed under the License is distributed on an "AS IS" basis,
+# WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License
+# for the specific language governing rights and limitations under the
+# License.
+#
+#
+# Copyright 2023 KCC project (http://www.firmwaretoolkit.org).
+# All rights reserved. Use is subject to license terms.
+#
+#
+# Contributors list :
+#
+#    William Bonnet     wllmbnnt@gmail.com, wbonnet@theitmakers.com
+#
+
+""" This module contains the implementation of the compare command. A reference
+config is compared to a corpus of configs (files, directories or glob patterns).
+Each file is parsed and compared in a pool of worker processes, then a summary
+matrix of the differing symbols is built from the per file results.
+"""
+
+import os
+import csv
+import sys
+import glob
+import concurrent.futures
+from kcc.model import SYMBOL_TABLE, STRING_POOL
+from kcc.operators import OperandSet, OperatorEngine
+from kcc.parse_cache import ParseCache, load_config
+from kcc.kconfig import KconfigIndex
+from kcc.profiling import PROFILER, PHASE_KCONFIG, PHASE_COMPARE, PHASE_OUTPUT
+
+# Config of the reference and its operand, loaded once per worker process
+_REFERENCE_CONFIG = None
+_REFERENCE = None
+
+# Parse cache used by the worker process, if any
+_CACHE = None
+
+# Directory where the fragments are written by the workers, if any
+_OUTPUT = None
+
+# Extensions of the fragments written in the output directory
+_EXCEPT_EXTENSION = ".except"
+_INTERSECT_EXTENSION = ".intersect"
+
+# Content of the matrix cells
+_MATRIX_ABSENT = "-"
+_MATRIX_SAME = ""
+
+# -----------------------------------------------------------------------------
+#
+# expand_inputs
+#
+# -----------------------------------------------------------------------------
+def expand_inputs(inputs):
+  """ Expand a list of files, directories and glob patterns into a sorted list
+  of file paths. Directories contribute the regular files they contain.
+  """
+
+  paths = set()
+  for item in inputs:
+    if os.path.isdir(item):
+      for entry in os.scandir(item):
+        if entry.is_file():
+          paths.add(entry.path)
+    elif os.path.isfile(item):
+      paths.add(item)
+    else:
+      for path in glob.glob(item):
+        if os.path.isfile(path):
+          paths.add(path)
+  return sorted(paths)
+
+
+
+# -----------------------------------------------------------------------------
+#
+# output_names
+#
+# -----------------------------------------------------------------------------
+def output_names(paths):
+  """ Return the names of the files written for each input file, as a list.
+  Names are the paths relative to the deepest directory containing all the
+  inputs, thus inputs of different directories sharing a basename are written
+  to different subdirectories. Raise ValueError if two inputs give the same
+  name.
+  """
+
+  absolute = [os.path.abspath(path) for path in paths]
+  if not absolute:
+    return []
+
+  root = os.path.commonpath([os.path.dirname(path) for path in absolute])
+  names = [os.path.relpath(path, root) for path in absolute]
+  inputs = {}
+  for path, name in zip(paths, names):
+    if name in inputs:
+      raise ValueError("%s and %s would be written to the same output file %s" %
+                       (inputs[name], path, name))
+    inputs[name] = path
+  return names
+
+
+
+# -----------------------------------------------------------------------------
+#
+# _init_worker
+#
+# -----------------------------------------------------------------------------
+def _init_worker(reference, output, cache_path, cache_size):
+  """ Initialize a worker process. The reference is parsed once per worker,
+  not once per compared file. The cache path is None if the parse cache is not
+  used.
+  """
+
+  global _REFERENCE_CONFIG, _REFERENCE, _OUTPUT, _CACHE
+  if cache_path is not None:
+    _CACHE = ParseCache(cache_path, cache_size)
+  _REFERENCE_CONFIG = load_config(reference, _CACHE)
+  _REFERENCE = OperandSet.from_config(_REFERENCE_CONFIG)
+  _OUTPUT = output
+
+
+
+# -----------------------------------------------------------------------------
+#
+# _init_pool_worker
+#
+# -----------------------------------------------------------------------------
+def _init_pool_worker(profile, *arguments):
+  """ Initialize a worker process of the pool, with the arguments of
+  _init_worker. Its profiler is enabled if the main process is profiled.
+  """
+
+  if profile:
+    PROFILER.enable()
+  _init_worker(*arguments)
+
+
+
+# -----------------------------------------------------------------------------
+#
+# _compare_in_pool
+#
+# -----------------------------------------------------------------------------
+def _compare_in_pool(path, name):
+  """ Compare one file to the reference in a worker of the pool. Return the
+  (result, counters) tuple of the result of _compare_file and of the profiling
+  counters recorded while computing it.
+  """
+
+  result = _compare_file(path, name)
+  return (result, PROFILER.take_counters())
+
+
+
+# -----------------------------------------------------------------------------
+#
+# _compare_file
+#
+# -----------------------------------------------------------------------------
+def _compare_file(path, name):
+  """ Compare one file to the reference. This function runs in the workers,
+  and returns only names and values, since symbol ids are local to a process.
+  The fragments of the file, if any, are written under the given name.
+
+  The result is a (path, error, differences, common) tuple where differences is
+  a list of (symbol, reference value, file value) with None for absent values.
+  """
+
+  try:
+    config = load_config(path, _CACHE)
+  except OSError as exception:
+    return (path, exception.strerror, [], 0)
+
+  return (path, None) + compare_operands(_REFERENCE, OperandSet.from_config(config), name,
+                                         _OUTPUT, (_REFERENCE_CONFIG, config))
+
+
+
+# -----------------------------------------------------------------------------
+#
+# compare_operands
+#
+# -----------------------------------------------------------------------------
+def compare_operands(reference, operand, name=None, output=None, configs=None):
+  """ Compare an operand to the reference operand. The result is a
+  (differences, common) tuple where differences is a list of (symbol, reference
+  value, file value) with None for absent values.
+
+  If an output directory is given, the except and intersect fragments are
+  written there, named after the name of the compared file (see output_names),
+  which may contain subdirectories. configs is the
+  (reference, file) tuple of the Configs of the operands, which gives the order
+  of the differences and of the fragments.
+  """
+
+  reference_order, file_order = ((configs[0],), (configs[1],)) if configs else ((), ())
+  engine = OperatorEngine()
+  only_reference = engine.except_(reference, operand).to_config(order=reference_order)
+  only_file = engine.except_(operand, reference).to_config(order=file_order)
+  common = engine.intersect(reference, operand)
+
+  # Write the fragments from the worker, no need to send them back
+  if output is not None:
+    os.makedirs(os.path.dirname(os.path.join(output, name)), exist_ok=True)
+    only_file.write(os.path.join(output, name + _EXCEPT_EXTENSION))
+    common.to_config(order=reference_order).write(os.path.join(output, name + _INTERSECT_EXTENSION))
+
+  names = SYMBOL_TABLE.names
+  file_values = dict(zip(only_file.symbols, only_file.values))
+  differences = []
+  for symbol_id, value_id in zip(only_reference.symbols, only_reference.values):
+    file_value = file_values.pop(symbol_id, None)
+    differences.append((names[symbol_id], STRING_POOL.value(value_id),
+                        None if file_value is None else STRING_POOL.value(file_value)))
+  for symbol_id, value_id in file_values.items():
+    differences.append((names[symbol_id], None, STRING_POOL.value(value_id)))
+
+  return (differences, len(common))
+
+
+
+# -----------------------------------------------------------------------------
+#
+# summary_counts
+#
+# -----------------------------------------------------------------------------
+def summary_counts(differences):
+  """ Return the number of symbols only in the reference, only in the file, and
+  with different values, from a list of differences
+  """
+
+  only_reference = sum(1 for _, _, value in differences if value is None)
+  only_file = sum(1 for _, value, _ in differences if value is None)
+  return (only_reference, only_file, len(differences) - only_reference - only_file)
+
+
+
+# -----------------------------------------------------------------------------
+#
+# class CompareCorpus
+#
+# -----------------------------------------------------------------------------
+class CompareCorpus(object):
+  """This class implements the compare command. It compares a reference
+  config to every file of a corpus, and outputs a summary line per file and a
+  matrix of differences (symbol x file).
+  """
+
+  # ---------------------------------------------------------------------------
+  #
+  # __init__
+  #
+  # ---------------------------------------------------------------------------
+  def __init__(self, cfg):
+    """Default constructor
+    """
+
+    # Configuration object storing the command line arguments
+    self.cfg = cfg
+
+    # Per file results, in input order
+    self.results = []
+
+    # Kconfig dependency graph used to classify differences, if any
+    self.graph = None
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # compare
+  #
+  # ---------------------------------------------------------------------------
+  def compare(self):
+    """ Entry point of the compare command
+    """
+
+    paths = expand_inputs(self.cfg.inputs)
+    if not paths:
+      self.cfg.logging.critical("No config file found in : %s", " ".join(self.cfg.inputs))
+      exit(1)
+
+    if not os.path.isfile(self.cfg.reference):
+      self.cfg.logging.critical("The reference file " + self.cfg.reference +
+                                " does not exist. Aborting.")
+      exit(1)
+
+    names = []
+    if self.cfg.output is not None:
+      try:
+        names = output_names(paths)
+      except ValueError as exception:
+        self.cfg.logging.critical(str(exception) + ". Aborting.")
+        exit(1)
+      os.makedirs(self.cfg.output, exist_ok=True)
+
+    if self.cfg.kconfig is not None:
+      with PROFILER.phase(PHASE_KCONFIG):
+        self.graph = KconfigIndex(self.cfg.kconfig_index_path).load(self.cfg.kconfig)
+
+    # When a pool is used, parsing happens in the workers and is accounted in
+    # the compare phase only
+    self.cfg.logging.debug("Comparing %d files using %d jobs", len(paths), self.cfg.jobs)
+    with PROFILER.phase(PHASE_COMPARE):
+      self.results = self.run_comparisons(paths, names)
+
+    self.output_results()
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # output_results
+  #
+  # ---------------------------------------------------------------------------
+  def output_results(self):
+    """ Output the summary, then the matrix to its file or to stdout. When the
+    matrix goes to stdout, the summary goes to stderr, thus stdout is valid CSV.
+    """
+
+    with PROFILER.phase(PHASE_OUTPUT):
+      if self.cfg.matrix is not None:
+        self.output_summary(sys.stdout)
+        with open(self.cfg.matrix, 'w', newline='') as working_file:
+          self.output_matrix(working_file)
+      else:
+        self.output_summary(sys.stderr)
+        self.output_matrix(sys.stdout)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # run_comparisons
+  #
+  # ---------------------------------------------------------------------------
+  def run_comparisons(self, paths, names):
+    """ Compare each file to the reference. Files are dispatched by chunks to a
+    pool of processes, or compared in the current process if only one job is
+    requested. names are the output names of the files, if fragments are
+    written.
+    """
+
+    names = names or [None] * len(paths)
+    cache_path = self.cfg.parse_cache_path if self.cfg.use_parse_cache else None
+    init_arguments = (self.cfg.reference, self.cfg.output, cache_path, self.cfg.parse_cache_size)
+    if self.cfg.jobs <= 1 or len(paths) == 1:
+      _init_worker(*init_arguments)
+      return [_compare_file(path, name) for path, name in zip(paths, names)]
+
+    jobs = min(self.cfg.jobs, len(paths))
+    chunk_size = max(1, len(paths) // (jobs * 4))
+    # Workers are profiled along with the main process, and send back their
+    # counters with their results
+    pool_arguments = (PROFILER.enabled,) + init_arguments
+    results = []
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs,
+                                                initializer=_init_pool_worker,
+                                                initargs=pool_arguments) as executor:
+      for result, counters in executor.map(_compare_in_pool, paths, names,
+                                           chunksize=chunk_size):
+        PROFILER.merge_counters(counters)
+        results.append(result)
+    return results
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # output_summary
+  #
+  # ---------------------------------------------------------------------------
+  def output_summary(self, stream):
+    """ Output one line per compared file, with the number of symbols only in
+    the reference, only in the file, with different values, and in common. If
+    the Kconfig graph is known, the number of root and derived differences is
+    output too. Lines are written to the given stream.
+    """
+
+    for path, error, differences, common in self.results:
+      if error is not None:
+        self.cfg.logging.error("Cannot compare %s : %s", path, error)
+        continue
+
+      only_reference, only_file, changed = summary_counts(differences)
+      summary = "%s : %d only in reference, %d only in file, %d changed, %d common" % \
+                (path, only_reference, only_file, changed, common)
+
+      if self.graph is not None:
+        causes = self.graph.classify([symbol for symbol, _, _ in differences])
+        derived = sum(1 for symbol_causes in causes.values() if symbol_causes)
+        summary += " (%d root, %d derived)" % (len(causes) - derived, derived)
+
+      stream.write(summary + "\n")
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # output_matrix
+  #
+  # ---------------------------------------------------------------------------
+  def output_matrix(self, stream):
+    """ Output the matrix of differences as CSV. There is one row per symbol
+    differing in at least one file, and one column per file. Cells contain the
+    value of the symbol in the file, an empty string if the value is the same as
+    in the reference, or '-' if the symbol is not defined.
+    """
+
+    results = [result for result in self.results if result[1] is None]
+
+    reference_values = {}
+    rows = {}
+    for column, (_, _, differences, _) in enumerate(results):
+      for symbol, reference_value, file_value in differences:
+        reference_values[symbol] = reference_value
+        rows.setdefault(symbol, {})[column] = file_value
+
+    writer = csv.writer(stream)
+    writer.writerow(["symbol", "reference"] + [result[0] for result in results])
+    for symbol in sorted(rows):
+      reference_value = reference_values[symbol]
+      cells = rows[symbol]
+      line = [symbol, _MATRIX_ABSENT if reference_value is None else reference_value]
+      for column in range(len(results)):
+        if column not in cells:
+          line.append(_MATRIX_SAME if reference_value is not None else _MATRIX_ABSENT)
+        elif cells[column] is None:
+          line.append(_MATRIX_ABSENT)
+        else:
+          line.append(cells[column])
+      writer.writerow(line)
@@ -0,0 +1,346 @@
+#
+# The contents of this file are subject to the Apache 2.0 license you may not
+# use this file except in compliance with the License.
+#
+# Software distributed under the License is distributed on an "AS IS" basis,
+# WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License
+# for the specific language governing rights and limitations under the
+# License.
+#
+#
+# Copyright 2023 KCC project (http://www.firmwaretoolkit.org).
+# All rights reserved. Use is subject to license terms.
+#
+#
+# Contributors list :
+#
+#    William Bonnet     wllmbnnt@gmail.com, wbonnet@theitmakers.com
+#
+
+""" This module contains the decoding of the config inputs. Besides plain
+config files, kcc reads :
+
+  - gzip, xz and zstd compressed configs (/proc/config.gz, .config.xz, etc.).
+    zstd needs the optional zstandard module
+  - kernel images built with CONFIG_IKCONFIG. The config is stored as a gzip
+    payload between the IKCFG_ST and IKCFG_ED markers. The markers are searched
+    in the image itself (vmlinux), then in the kernel compressed inside the
+    image (bzImage, zImage), as the extract-ikconfig script does
+
+The format is detected from the content, not from the file name. Compressed
+data is decompressed by chunks, and each chunk is scanned as soon as it is
+available, thus no temporary file is written and the whole decompressed config
+is never held in memory. Inputs read from a stream (stdin for instance) are
+decoded the same way, except kernel images which need random access.
+"""
+
+import errno
+import zlib
+import lzma
+import itertools
+from kcc.defconfig_line import DefconfigParser
+
+# Magic numbers of the supported compression formats
+_GZIP_MAGIC = b"\x1f\x8b\x08"
+_XZ_MAGIC = b"\xfd7zXZ\x00"
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+# Markers surrounding the config embedded in a kernel image
+_IKCONFIG_START = b"IKCFG_ST"
+_IKCONFIG_END = b"IKCFG_ED"
+
+# Errors raised by the decompressors on invalid or truncated data
+_DECOMPRESSION_ERRORS = (zlib.error, lzma.LZMAError, EOFError, ValueError)
+
+# Size of the chunks of compressed data, and of the beginning of the input
+# checked for binary content
+_CHUNK_SIZE = 256 * 1024
+_BINARY_PROBE_SIZE = 4096
+
+# -----------------------------------------------------------------------------
+#
+# scan_input
+#
+# -----------------------------------------------------------------------------
+def scan_input(buffer, filename=None):
+  """ Generator yielding the records of DefconfigParser.scan for a config
+  input held in a buffer (bytes or mmap), whatever its format. Raise OSError,
+  with the given filename, if the input cannot be decoded.
+  """
+
+  try:
+    for magic, decompressor in ((_GZIP_MAGIC, _gzip_decompressor),
+                                (_XZ_MAGIC, lzma.LZMADecompressor),
+                                (_ZSTD_MAGIC, _ZstdDecompressor)):
+      if buffer[:len(magic)] == magic:
+        yield from _scan_chunks(_decompress(_chunks(buffer, 0, len(buffer)), decompressor,
+                                            magic))
+        return
+
+    # Config files are text, kernel images are not
+    if b"\0" not in buffer[:_BINARY_PROBE_SIZE]:
+      yield from DefconfigParser.scan(buffer)
+      return
+
+    payload = _find_ikconfig(buffer)
+    if payload is None:
+      raise OSError(errno.EINVAL, "No embedded config found (CONFIG_IKCONFIG)", filename)
+    yield from _scan_chunks(_decompress(payload, _gzip_decompressor, _GZIP_MAGIC))
+  except _DECOMPRESSION_ERRORS as exception:
+    raise OSError(errno.EINVAL, "Corrupted compressed data (" + str(exception) + ")",
+                  filename)
+  except ImportError:
+    raise OSError(errno.ENOTSUP, "The zstandard module is needed to read zstd files",
+                  filename)
+
+
+
+# -----------------------------------------------------------------------------
+#
+# scan_stream
+#
+# -----------------------------------------------------------------------------
+def scan_stream(stream, filename=None):
+  """ Generator yielding the records of DefconfigParser.scan for a config
+  input read from a binary stream, by chunks. Compressed configs are decoded,
+  kernel images are not supported since the markers of their config cannot be
+  searched without holding the whole image. Raise OSError, with the given
+  filename, if the input cannot be decoded.
+  """
+
+  head = stream.read(_CHUNK_SIZE)
+  chunks = itertools.chain((head,), iter(lambda: stream.read(_CHUNK_SIZE), b""))
+  try:
+    for magic, decompressor in ((_GZIP_MAGIC, _gzip_decompressor),
+                                (_XZ_MAGIC, lzma.LZMADecompressor),
+                                (_ZSTD_MAGIC, _ZstdDecompressor)):
+      if head[:len(magic)] == magic:
+        yield from _scan_chunks(_decompress(chunks, decompressor, magic))
+        return
+  except _DECOMPRESSION_ERRORS as exception:
+    raise OSError(errno.EINVAL, "Corrupted compressed data (" + str(exception) + ")",
+                  filename)
+  except ImportError:
+    raise OSError(errno.ENOTSUP, "The zstandard module is needed to read zstd files",
+                  filename)
+
+  if b"\0" in head[:_BINARY_PROBE_SIZE]:
+    raise OSError(errno.EINVAL, "Binary input, kernel images cannot be read as a stream",
+                  filename)
+  yield from _scan_chunks(chunks)
+
+
+
+# -----------------------------------------------------------------------------
+#
+# _gzip_decompressor
+#
+# -----------------------------------------------------------------------------
+def _gzip_decompressor():
+  """ Return a decompressor of a gzip member
+  """
+
+  return zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+
+
+# -----------------------------------------------------------------------------
+#
+# class _ZstdDecompressor
+#
+# -----------------------------------------------------------------------------
+class _ZstdDecompressor(object):
+  """This class adapts the decompressor of the zstandard module to the
+  interface of the zlib and lzma ones. Its errors are raised as ValueError.
+  """
+
+  # ---------------------------------------------------------------------------
+  #
+  # __init__
+  #
+  # ---------------------------------------------------------------------------
+  def __init__(self):
+    """Default constructor. Raise ImportError if the zstandard module is not
+    installed.
+    """
+
+    # zstandard is optional, it is only imported when a zstd input is read
+    import zstandard
+
+    # Decompressor of the current frame, and error class of the module
+    self.decompressor = zstandard.ZstdDecompressor().decompressobj()
+    self.error = zstandard.ZstdError
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # decompress
+  #
+  # ---------------------------------------------------------------------------
+  def decompress(self, data):
+    """ Return the decompressed data of a chunk
+    """
+
+    try:
+      return self.decompressor.decompress(data)
+    except self.error as exception:
+      raise ValueError(str(exception))
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # __getattr__
+  #
+  # ---------------------------------------------------------------------------
+  def __getattr__(self, name):
+    """ Give access to the eof and unused_data attributes, when the version of
+    zstandard provides them
+    """
+
+    return getattr(self.decompressor, name)
+
+
+
+# -----------------------------------------------------------------------------
+#
+# _chunks
+#
+# -----------------------------------------------------------------------------
+def _chunks(buffer, start, end):
+  """ Generator yielding the content of a buffer between two offsets by chunks.
+  Chunks are copies, thus no reference to the buffer is kept (an mmap cannot be
+  closed while a memoryview on it exists).
+  """
+
+  for offset in range(start, end, _CHUNK_SIZE):
+    yield buffer[offset:min(offset + _CHUNK_SIZE, end)]
+
+
+
+# -----------------------------------------------------------------------------
+#
+# _decompress
+#
+# -----------------------------------------------------------------------------
+def _decompress(chunks, new_decompressor, magic):
+  """ Generator yielding the decompressed data of a sequence of chunks.
+  Concatenated streams (several gzip members for instance) are decompressed
+  one after the other. Data following the last stream is ignored.
+  """
+
+  decompressor = new_decompressor()
+  pending = b""
+  for chunk in chunks:
+    data = pending + chunk
+    pending = b""
+    while data:
+      # The previous stream is finished. The data starts a new one only if it
+      # starts with the magic number, which may be split between two chunks
+      if decompressor is None:
+        if len(data) < len(magic):
+          pending = data
+          break
+        if data[:len(magic)] != magic:
+          return
+        decompressor = new_decompressor()
+
+      yield decompressor.decompress(data)
+      data = b""
+      if getattr(decompressor, "eof", False):
+        data = decompressor.unused_data
+        decompressor = None
+
+  # A stream which is not complete means the input has been truncated
+  if decompressor is not None and hasattr(decompressor, "eof") and not decompressor.eof:
+    raise EOFError("compressed data is truncated")
+
+
+
+# -----------------------------------------------------------------------------
+#
+# _scan_chunks
+#
+# -----------------------------------------------------------------------------
+def _scan_chunks(chunks):
+  """ Generator yielding the records of the lines held in a sequence of data
+  chunks. Lines split between two chunks are scanned once complete.
+  """
+
+  rest = b""
+  for data in chunks:
+    cut = data.rfind(b"\n") + 1
+    if cut == 0:
+      rest += data
+      continue
+    yield from DefconfigParser.scan(rest + data[:cut])
+    rest = data[cut:]
+  if rest:
+    yield from DefconfigParser.scan(rest)
+
+
+
+# -----------------------------------------------------------------------------
+#
+# _find_ikconfig
+#
+# -----------------------------------------------------------------------------
+def _find_ikconfig(buffer):
+  """ Return the gzip payload of the config embedded in a kernel image, as a
+  list of chunks, or None if the image does not contain a config
+  """
+
+  start = buffer.find(_IKCONFIG_START)
+  if start >= 0:
+    end = buffer.find(_IKCONFIG_END, start)
+    if end >= 0:
+      return _chunks(buffer, start + len(_IKCONFIG_START), end)
+
+  # The kernel may be compressed inside the image. Each position of a magic
+  # number is tried, most of them beeing false positives failing quickly
+  for magic, decompressor in ((_GZIP_MAGIC, _gzip_decompressor),
+                              (_XZ_MAGIC, lzma.LZMADecompressor),
+                              (_ZSTD_MAGIC, _ZstdDecompressor)):
+    position = buffer.find(magic)
+    while position >= 0:
+      try:
+        payload = _search_payload(_decompress(_chunks(buffer, position, len(buffer)),
+                                              decompressor, magic))
+      except _DECOMPRESSION_ERRORS + (ImportError,):
+        payload = None
+      if payload is not None:
+        return [payload]
+      position = buffer.find(magic, position + 1)
+  return None
+
+
+
+# -----------------------------------------------------------------------------
+#
+# _search_payload
+#
+# -----------------------------------------------------------------------------
+def _search_payload(chunks):
+  """ Return the data between the IKCONFIG markers found in a sequence of
+  decompressed chunks, or None if there is no such data. Only the data
+  following the start marker is kept in memory.
+  """
+
+  window = b""
+  payload = None
+  for data in chunks:
+    if payload is None:
+      window += data
+      start = window.find(_IKCONFIG_START)
+      if start < 0:
+        # Keep the end of the data, which may hold the beginning of the marker
+        window = window[-(len(_IKCONFIG_START) - 1):]
+        continue
+      payload = window[start + len(_IKCONFIG_START):]
+    else:
+      payload += data
+    end = payload.find(_IKCONFIG_END)
+    if end >= 0:
+      return payload[:end]
+  return None
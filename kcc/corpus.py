@@ -0,0 +1,577 @@
+#
+# The contents of this file are subject to the Apache 2.0 license you may not
+# use this file except in compliance with the License.
+#
+# Software distributed under the License is distributed on an "AS IS" basis,
+# WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License
+# for the specific language governing rights and limitations under the
+# License.
+#
+#
+# Copyright 2023 KCC project (http://www.firmwaretoolkit.org).
+# All rights reserved. Use is subject to license terms.
+#
+#
+# Contributors list :
+#
+#    William Bonnet     wllmbnnt@gmail.com, wbonnet@theitmakers.com
+#
+
+""" This module contains the implementation of the corpus command. The configs
+of a corpus are loaded into a single matrix of value codes, with one row per
+config and one column per symbol id, then analyzed with vectorized operations :
+
+  - prevalence of each symbol : number of configs defining it, setting it to
+    y, m or n, number of distinct values and most common value
+  - similarity of each pair of configs : Jaccard index of their sets of
+    settings (symbol and value), or Hamming distance (number of symbols not
+    having the same value in both configs)
+  - clusters of near-identical configs
+
+Symbols defined by a single config are kept out of the matrix, they only count
+in the size of their config. The matrix is processed by blocks of columns, and
+the number of settings common to each pair of configs is the product of a
+block of one-hot columns by its transpose, thus the cost is a few matrix
+products instead of loops over the pairs of files.
+
+NumPy is an optional dependency, only needed by this command.
+"""
+
+import os
+import csv
+from kcc.model import SYMBOL_TABLE, STRING_POOL, Key, Tristate
+from kcc.parse_cache import ParseCache, load_config
+from kcc.compare import expand_inputs
+from kcc.profiling import PROFILER, PHASE_COMPARE, PHASE_OUTPUT
+
+try:
+  import numpy
+except ImportError:
+  # Checked by the command, which cannot run without it
+  numpy = None
+
+# Number of matrix columns processed at once, and maximum number of one-hot
+# columns given to a matrix product
+_BLOCK_COLUMNS = 1024
+_PRODUCT_COLUMNS = 4096
+
+# Number of config entries gathered in a chunk while loading
+_CHUNK_ENTRIES = 1024 * 1024
+
+# Tristate code of the absent symbols
+_ABSENT = -2
+
+# Default threshold of the near-identical configs for each metric
+_DEFAULT_THRESHOLDS = {Key.METRIC_JACCARD.value: 0.95, Key.METRIC_HAMMING.value: 10}
+
+# Files written in the output directory
+_PREVALENCE_FILE = "prevalence.csv"
+_SIMILARITY_FILE = "similarity.csv"
+
+# -----------------------------------------------------------------------------
+#
+# load_corpus
+#
+# -----------------------------------------------------------------------------
+def load_corpus(cfg):
+  """ Return the CorpusMatrix of the configs given by the inputs of the
+  configuration. The files which cannot be loaded are reported and skipped,
+  the command is aborted if no file is left.
+  """
+
+  paths = expand_inputs(cfg.inputs)
+  if not paths:
+    cfg.logging.critical("No config file found in : %s", " ".join(cfg.inputs))
+    exit(1)
+
+  cache = None
+  if cfg.use_parse_cache:
+    cache = ParseCache(cfg.parse_cache_path, cfg.parse_cache_size)
+
+  corpus = CorpusMatrix().load(paths, cache)
+  for path, error in corpus.errors:
+    cfg.logging.error("Cannot load %s : %s", path, error)
+  if not corpus.paths:
+    cfg.logging.critical("No config file could be loaded. Aborting.")
+    exit(1)
+
+  cfg.logging.info("%d configs loaded, matrix of %d x %d codes", len(corpus.paths),
+                   corpus.codes.shape[0], corpus.codes.shape[1])
+  return corpus
+
+
+
+# -----------------------------------------------------------------------------
+#
+# near_identical
+#
+# -----------------------------------------------------------------------------
+def near_identical(similarity, metric, threshold):
+  """ Return the clusters of near-identical configs, as sorted lists of row
+  indexes, largest clusters first. Two configs are linked if their similarity
+  is at least the threshold (jaccard) or their distance at most the threshold
+  (hamming), and a cluster is a connected component of the links. Configs
+  linked to no other one are not returned.
+  """
+
+  if metric == Key.METRIC_JACCARD.value:
+    links = similarity >= threshold
+  else:
+    links = similarity <= threshold
+  numpy.fill_diagonal(links, False)
+
+  clusters = []
+  visited = numpy.zeros(len(links), dtype=bool)
+  for row in numpy.flatnonzero(links.any(axis=1)):
+    if visited[row]:
+      continue
+    visited[row] = True
+    members = [row]
+    pending = [row]
+    while pending:
+      neighbours = numpy.flatnonzero(links[pending.pop()] & ~visited)
+      visited[neighbours] = True
+      members.extend(neighbours.tolist())
+      pending.extend(neighbours.tolist())
+    clusters.append(sorted(members))
+
+  clusters.sort(key=len, reverse=True)
+  return clusters
+
+
+
+# -----------------------------------------------------------------------------
+#
+# class CorpusMatrix
+#
+# -----------------------------------------------------------------------------
+class CorpusMatrix(object):
+  """This class stores a corpus of configs as a matrix of value codes, and
+  computes the statistics of its columns and the similarity of its rows.
+  """
+
+  # ---------------------------------------------------------------------------
+  #
+  # __init__
+  #
+  # ---------------------------------------------------------------------------
+  def __init__(self):
+    """Default constructor
+    """
+
+    # Path of the config of each row
+    self.paths = []
+
+    # (path, error message) of the configs which could not be loaded
+    self.errors = []
+
+    # Symbol id of each column
+    self.columns = None
+
+    # Value codes (value id + 1, or 0 if the symbol is not defined), one row
+    # per config and one column per symbol defined by several configs
+    self.codes = None
+
+    # Number of symbols defined by each config
+    self.sizes = None
+
+    # Row, symbol id and value id of the symbols defined by a single config
+    self.singles = None
+
+    # Statistics of each column computed by analyze : number of configs
+    # defining the symbol, setting it to y, m and n, number of distinct values,
+    # most common value id and number of configs using it
+    self.defined = None
+    self.yes = None
+    self.modules = None
+    self.no = None
+    self.distinct = None
+    self.modes = None
+    self.mode_counts = None
+
+    # Number of settings, and of symbols, common to each pair of configs. They
+    # are computed by analyze, when a metric needs them
+    self.common_settings = None
+    self.common_symbols = None
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # load
+  #
+  # ---------------------------------------------------------------------------
+  def load(self, paths, cache=None):
+    """ Load the configs of the given paths, through the parse cache if any.
+    The files which cannot be loaded are recorded in errors and left out of
+    the matrix.
+    """
+
+    # The entries of the configs are gathered in large chunks, thus the memory
+    # of the parsed configs is reused instead of being scattered
+    chunks = []
+    pending = []
+    pending_size = 0
+    for path in paths:
+      try:
+        config = load_config(path, cache)
+      except OSError as exception:
+        self.errors.append((path, exception.strerror))
+        continue
+
+      self.paths.append(path)
+      pending.append((numpy.frombuffer(config.symbols, dtype=config.symbols.typecode),
+                      numpy.frombuffer(config.values, dtype=config.values.typecode)))
+      pending_size += len(config.symbols)
+      if pending_size >= _CHUNK_ENTRIES:
+        chunks.append(self.__merge(pending))
+        pending = []
+        pending_size = 0
+    if pending:
+      chunks.append(self.__merge(pending))
+
+    # The symbol table only grows, thus the last counts cover the previous ones
+    counts = numpy.zeros(len(SYMBOL_TABLE.names), dtype=numpy.int64)
+    for _, symbols, _ in chunks:
+      found = numpy.bincount(symbols)
+      counts[:len(found)] += found
+    self.columns = numpy.flatnonzero(counts >= 2)
+    positions = numpy.full(len(counts), -1, dtype=numpy.int64)
+    positions[self.columns] = numpy.arange(len(self.columns))
+
+    # Chunks are moved into the matrix, and released once copied
+    self.codes = numpy.zeros((len(self.paths), len(self.columns)), dtype=numpy.uint32)
+    self.sizes = numpy.zeros(len(self.paths), dtype=numpy.int64)
+    singles = []
+    first_row = 0
+    while chunks:
+      sizes, symbols, values = chunks.pop(0)
+      rows = numpy.repeat(numpy.arange(first_row, first_row + len(sizes)), sizes)
+      columns = positions[symbols]
+      shared = columns >= 0
+      self.codes[rows[shared], columns[shared]] = values[shared] + 1
+      self.sizes[first_row:first_row + len(sizes)] = sizes
+      single = ~shared
+      singles.append((rows[single], symbols[single], values[single]))
+      first_row += len(sizes)
+
+    if singles:
+      self.singles = tuple(numpy.concatenate(part) for part in zip(*singles))
+    else:
+      self.singles = (numpy.zeros(0, dtype=numpy.int64),) * 3
+    return self
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # analyze
+  #
+  # ---------------------------------------------------------------------------
+  def analyze(self, metric=None):
+    """ Compute the statistics of the columns and, if a metric is given, the
+    number of settings common to each pair of configs. The number of common
+    symbols is computed too for the hamming metric.
+    """
+
+    count, width = self.codes.shape
+    self.defined = numpy.zeros(width, dtype=numpy.int64)
+    self.yes = numpy.zeros(width, dtype=numpy.int64)
+    self.modules = numpy.zeros(width, dtype=numpy.int64)
+    self.no = numpy.zeros(width, dtype=numpy.int64)
+    self.distinct = numpy.zeros(width, dtype=numpy.int64)
+    self.modes = numpy.zeros(width, dtype=numpy.int64)
+    self.mode_counts = numpy.zeros(width, dtype=numpy.int64)
+    self.common_settings = None
+    self.common_symbols = None
+    if metric is not None:
+      self.common_settings = numpy.zeros((count, count))
+    if metric == Key.METRIC_HAMMING.value:
+      self.common_symbols = numpy.zeros((count, count))
+
+    # Tristate code of each value code
+    tristates = numpy.concatenate(([_ABSENT], numpy.frombuffer(
+        STRING_POOL.tristates, dtype=STRING_POOL.tristates.typecode))).astype(numpy.int8)
+
+    for start in range(0, width, _BLOCK_COLUMNS):
+      block = self.codes[:, start:start + _BLOCK_COLUMNS]
+      end = start + block.shape[1]
+      states = tristates[block]
+      self.defined[start:end] = numpy.count_nonzero(block, axis=0)
+      self.yes[start:end] = numpy.count_nonzero(states == Tristate.YES.value, axis=0)
+      self.modules[start:end] = numpy.count_nonzero(states == Tristate.MODULE.value, axis=0)
+      self.no[start:end] = numpy.count_nonzero(states == Tristate.NO.value, axis=0)
+
+      # Each run of equal codes in a sorted column is one value of the symbol
+      run_columns, run_codes, run_lengths = self.__runs(block)
+      self.distinct[start:end] = numpy.bincount(run_columns, minlength=end - start)
+
+      # The most common value of a column is its longest run, the first one
+      # (smallest value id) in case of tie
+      longest = numpy.zeros(end - start, dtype=numpy.int64)
+      numpy.maximum.at(longest, run_columns, run_lengths)
+      best = numpy.flatnonzero(run_lengths == longest[run_columns])
+      columns, first = numpy.unique(run_columns[best], return_index=True)
+      self.modes[start + columns] = run_codes[best[first]].astype(numpy.int64) - 1
+      self.mode_counts[start + columns] = run_lengths[best[first]]
+
+      if self.common_settings is not None:
+        # A value used by all the configs is common to every pair, and a value
+        # used by a single config is only common to the config and itself
+        self.common_settings += numpy.count_nonzero(run_lengths == count)
+        shared = (run_lengths >= 2) & (run_lengths < count)
+        self.__add_products(self.common_settings, block, run_columns[shared],
+                            run_codes[shared])
+
+      if self.common_symbols is not None:
+        defined = self.defined[start:end]
+        self.common_symbols += numpy.count_nonzero(defined == count)
+        self.__add_products(self.common_symbols, block,
+                            numpy.flatnonzero(defined < count), None)
+
+    # The diagonal includes the symbols defined by a single config
+    if self.common_settings is not None:
+      numpy.fill_diagonal(self.common_settings, self.sizes)
+    if self.common_symbols is not None:
+      numpy.fill_diagonal(self.common_symbols, self.sizes)
+    return self
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # similarity
+  #
+  # ---------------------------------------------------------------------------
+  def similarity(self, metric):
+    """ Return the matrix of the similarity of each pair of configs, computed
+    by analyze : the Jaccard index of their settings (1.0 for identical
+    configs), or the number of symbols not having the same value in both
+    configs (0 for identical configs)
+    """
+
+    sizes = self.sizes.astype(numpy.float64)
+    totals = sizes[:, None] + sizes[None, :]
+    if metric == Key.METRIC_HAMMING.value:
+      return totals - self.common_symbols - self.common_settings
+
+    union = totals - self.common_settings
+    return numpy.divide(self.common_settings, union, out=numpy.ones_like(union),
+                        where=union > 0)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # prevalence
+  #
+  # ---------------------------------------------------------------------------
+  def prevalence(self):
+    """ Generator returning a (symbol, configs, y, m, n, distinct, most common
+    value, configs using it) tuple per symbol, in symbol id order for the
+    columns of the matrix, then for the symbols defined by a single config
+    """
+
+    names = SYMBOL_TABLE.names
+    for row in zip(self.columns.tolist(), self.defined.tolist(), self.yes.tolist(),
+                   self.modules.tolist(), self.no.tolist(), self.distinct.tolist(),
+                   self.modes.tolist(), self.mode_counts.tolist()):
+      yield (names[row[0]],) + row[1:6] + (STRING_POOL.value(row[6]), row[7])
+
+    tristates = STRING_POOL.tristates
+    for symbol_id, value_id in zip(self.singles[1].tolist(), self.singles[2].tolist()):
+      state = tristates[value_id]
+      yield (names[symbol_id], 1, int(state == Tristate.YES.value),
+             int(state == Tristate.MODULE.value), int(state == Tristate.NO.value), 1,
+             STRING_POOL.value(value_id), 1)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # __merge
+  #
+  # ---------------------------------------------------------------------------
+  @staticmethod
+  def __merge(entries):
+    """ Return a (sizes, symbols, values) chunk concatenating the symbol and
+    value arrays of several configs
+    """
+
+    return (numpy.array([len(symbols) for symbols, _ in entries], dtype=numpy.int64),
+            numpy.concatenate([symbols for symbols, _ in entries]),
+            numpy.concatenate([values for _, values in entries]))
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # __runs
+  #
+  # ---------------------------------------------------------------------------
+  @staticmethod
+  def __runs(block):
+    """ Return the (column, code, length) arrays of the runs of equal defined
+    codes in the sorted columns of a block, ordered by column then code
+    """
+
+    count = block.shape[0]
+    ordered = numpy.sort(block.T, axis=1).ravel()
+    starts = numpy.ones(len(ordered), dtype=bool)
+    starts[1:] = ordered[1:] != ordered[:-1]
+    starts[::count] = True
+    first = numpy.flatnonzero(starts)
+    lengths = numpy.diff(numpy.append(first, len(ordered)))
+
+    # Runs of absent symbols are not values
+    defined = ordered[first] != 0
+    first = first[defined]
+    return (first // count, ordered[first], lengths[defined])
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # __add_products
+  #
+  # ---------------------------------------------------------------------------
+  @staticmethod
+  def __add_products(gram, block, columns, codes):
+    """ Add to a gram matrix the products of the one-hot columns of a block by
+    their transpose. Each one-hot column marks the rows of a block column
+    having the given code, or defining the symbol if codes is None.
+    """
+
+    for start in range(0, len(columns), _PRODUCT_COLUMNS):
+      selected = block[:, columns[start:start + _PRODUCT_COLUMNS]]
+      if codes is None:
+        onehot = (selected != 0).astype(numpy.float32)
+      else:
+        onehot = (selected == codes[start:start + _PRODUCT_COLUMNS]).astype(numpy.float32)
+      gram += onehot @ onehot.T
+
+
+
+# -----------------------------------------------------------------------------
+#
+# class CorpusAnalysis
+#
+# -----------------------------------------------------------------------------
+class CorpusAnalysis(object):
+  """This class implements the corpus command. It outputs the clusters of
+  near-identical configs of a corpus, and optionally writes the prevalence of
+  the symbols and the similarity matrix as CSV files.
+  """
+
+  # ---------------------------------------------------------------------------
+  #
+  # __init__
+  #
+  # ---------------------------------------------------------------------------
+  def __init__(self, cfg):
+    """Default constructor
+    """
+
+    # Configuration object storing the command line arguments
+    self.cfg = cfg
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # run_corpus
+  #
+  # ---------------------------------------------------------------------------
+  def run_corpus(self):
+    """ Entry point of the corpus command
+    """
+
+    if numpy is None:
+      self.cfg.logging.critical("The numpy module is needed by the corpus command. Aborting.")
+      exit(1)
+
+    threshold = self.cfg.threshold
+    if threshold is None:
+      threshold = _DEFAULT_THRESHOLDS[self.cfg.metric]
+
+    corpus = load_corpus(self.cfg)
+    with PROFILER.phase(PHASE_COMPARE):
+      corpus.analyze(self.cfg.metric)
+      similarity = corpus.similarity(self.cfg.metric)
+      clusters = near_identical(similarity, self.cfg.metric, threshold)
+
+    with PROFILER.phase(PHASE_OUTPUT):
+      self.output_clusters(corpus, similarity, clusters)
+      if self.cfg.output is not None:
+        os.makedirs(self.cfg.output, exist_ok=True)
+        with open(os.path.join(self.cfg.output, _PREVALENCE_FILE), 'w',
+                  newline='') as working_file:
+          self.output_prevalence(corpus, working_file)
+        with open(os.path.join(self.cfg.output, _SIMILARITY_FILE), 'w',
+                  newline='') as working_file:
+          self.output_similarity(corpus, similarity, working_file)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # output_clusters
+  #
+  # ---------------------------------------------------------------------------
+  def output_clusters(self, corpus, similarity, clusters):
+    """ Output the clusters with their members and their lowest similarity (or
+    highest distance), then a summary line
+    """
+
+    for number, members in enumerate(clusters, 1):
+      values = similarity[numpy.ix_(members, members)]
+      if self.cfg.metric == Key.METRIC_HAMMING.value:
+        bound = "distance <= %d" % values.max()
+      else:
+        bound = "similarity >= %.4f" % values.min()
+      print("Cluster %d : %d configs, %s" % (number, len(members), bound))
+      for row in members:
+        print("  " + corpus.paths[row])
+
+    print("%d configs, %d symbols (%d in several configs), %d clusters of %d "
+          "near-identical configs" %
+          (len(corpus.paths), len(corpus.columns) + len(corpus.singles[1]),
+           len(corpus.columns), len(clusters), sum(len(members) for members in clusters)))
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # output_prevalence
+  #
+  # ---------------------------------------------------------------------------
+  @staticmethod
+  def output_prevalence(corpus, stream):
+    """ Output the prevalence of the symbols as CSV, one row per symbol sorted
+    by name. Values which are not tristates are counted as other.
+    """
+
+    writer = csv.writer(stream)
+    writer.writerow(["symbol", "configs", "y", "m", "n", "other", "distinct", "mode",
+                     "mode_configs"])
+    for symbol, defined, yes, modules, no, distinct, mode, mode_count in \
+        sorted(corpus.prevalence()):
+      writer.writerow([symbol, defined, yes, modules, no, defined - yes - modules - no,
+                       distinct, mode, mode_count])
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # output_similarity
+  #
+  # ---------------------------------------------------------------------------
+  def output_similarity(self, corpus, similarity, stream):
+    """ Output the similarity matrix as CSV, one row and one column per config
+    """
+
+    cell = "%d" if self.cfg.metric == Key.METRIC_HAMMING.value else "%.4f"
+    writer = csv.writer(stream)
+    writer.writerow(["config"] + corpus.paths)
+    for path, row in zip(corpus.paths, similarity.tolist()):
+      writer.writerow([path] + [cell % value for value in row])
@@ -17,334 +17,329 @@
 #    William Bonnet     wllmbnnt@gmail.com, wbonnet@theitmakers.com
 #
 
-""" This module contains the class and the methods used to crate parsers dedicated to the
-different words of command supported by kcc.
+""" This module contains the definition of a line of a kernel .config or defconfig
+file, and the streaming parser used to read such files.
 
-The module will do actual processing and run the associated worker method
-(one of the run_foo methods)
+The parser never loads the whole file as a list of lines. Files are memory mapped
+and scanned by a single compiled regular expression, which yields one typed record
+per line of input.
 """
 
-import argparse
-import textwrap
-import logging
-from kcc.model import Key
-from kcc.model import Configuration
-from kcc import release
+import os
+import re
+import mmap
+import itertools
+from enum import Enum
+
+# Regular expression matching exactly one line of a config file. Only one of the
+# groups is set by each match :
+#   1, 2 : symbol and value of a CONFIG_FOO=value line
+#   3    : symbol of a '# CONFIG_FOO is not set' line
+#   4    : text of any other comment line
+#   5    : remaining content, empty for a blank line, otherwise invalid content
+_LINE_PATTERN = rb'^[ \t]*(?:(CONFIG_\w+)[ \t]*=[ \t]*(.*?)' \
+                rb'|#[ \t]*(CONFIG_\w+) is not set' \
+                rb'|#[ \t]?(.*?)' \
+                rb'|(.*?))[ \t\r]*$'
+
+_LINE_REGEX = re.compile(_LINE_PATTERN, re.MULTILINE)
+
+# Regular expression used to detect integer values
+_INT_REGEX = re.compile(rb'^-?[0-9]+$')
+
+# Encoding used to decode bytes read from config files. surrogateescape guarantees
+# that lines can be written back byte for byte, even if they are not valid utf-8
+_ENCODING = "utf-8"
+_ERRORS = "surrogateescape"
 
 # -----------------------------------------------------------------------------
 #
-#  Class Cli
+# class LineType
 #
 # -----------------------------------------------------------------------------
-class Cli(object):
-  """This class represent the command line parser for this tool. It brings
-  methods used to parse command line arguments then run the program itself
+class LineType(Enum):
+  """This class defines the different kinds of lines found in a config file.
   """
 
-  # -------------------------------------------------------------------------
-  #
-  # __init__
-  #
-  # -------------------------------------------------------------------------
-  def __init__(self):
-    """Default constructor
-    """
+  # CONFIG_FOO=value
+  SYMBOL = 0
+
+  # CONFIG_FOO is not set
+  NOT_SET = 1
+
+  # Any other comment line
+  COMMENT = 2
+
+  # Empty line, or only white spaces
+  BLANK = 3
 
-    # Create the internal parser from argparse
-    self.parser = argparse.ArgumentParser(description=textwrap.dedent('''\
-KCC - Simple Build In Test v''' + release.__version__ + '''
-----------------------------------
+  # Content which is not recognized as a valid config line
+  INVALID = 4
+
+
+
+# -----------------------------------------------------------------------------
+#
+# class ValueType
+#
+# -----------------------------------------------------------------------------
+class ValueType(Enum):
+  """This class defines the type of the value assigned to a symbol. The numerical
+  values are used as compact codes by the model layer and must not be changed.
+  """
+
+  # y, m or n
+  TRISTATE = 0
+
+  # "quoted string"
+  STRING = 1
+
+  # 0x1234abcd
+  HEX = 2
+
+  # 1234 or -1234
+  INT = 3
+
+  # Anything else (empty values, unquoted strings, etc.)
+  UNKNOWN = 4
+
+
+
+# -----------------------------------------------------------------------------
+#
+# value_type_of
+#
+# -----------------------------------------------------------------------------
+def value_type_of(value):
+  """ Return the ValueType of a raw value read from a config file. The value
+  is expected as bytes, as produced by the scanner.
+  """
 
-Available commands are :
-  . ''' + Key.CHECK_LIBRARY.value + '''       Check the test library consistency
-  . ''' + Key.CHECK_SUITE.value +  '''        Check the test suite consistency
-  . ''' + Key.RUN_SUITE.value + '''           Execute the tests defined in the given suite file
-'''), formatter_class=argparse.RawTextHelpFormatter)
-# XXX la tu met les intersect et Autres
+  if value in (b"y", b"m", b"n"):
+    return ValueType.TRISTATE
+  if value[:1] == b'"':
+    return ValueType.STRING
+  if value[:2] in (b"0x", b"0X"):
+    return ValueType.HEX
+  if _INT_REGEX.match(value):
+    return ValueType.INT
+  return ValueType.UNKNOWN
 
-    # Stores the arguments from the parser
-    self.args = None
 
-    # Stores the argument in the instance
-    self.command = None
 
-    # Stores the configuration definition object (will cntains all the information
-    #retrieved from the command line
-    self.cfg = None
+# -----------------------------------------------------------------------------
+#
+# class DefconfigLine
+#
+# -----------------------------------------------------------------------------
+class DefconfigLine(object):
+  """This class represent one line of a .config or defconfig file. Symbol and
+  value are only defined for SYMBOL and NOT_SET lines, the text is only defined
+  for comments and invalid lines.
 
+  A 'not set' line is considered as the symbol beeing assigned the value n.
+  """
 
+  # Instances are created for each and every line read, thus no dict per object
+  __slots__ = ("line_type", "symbol", "value", "value_type", "text", "line_number")
 
-  # -------------------------------------------------------------------------
+  # ---------------------------------------------------------------------------
   #
-  # parse
+  # __init__
   #
-  # -------------------------------------------------------------------------
-  def parse(self, args):
-    """ This method build the parser, add all options and run it. The result of
-    parser execution is stored in a member variable.
+  # ---------------------------------------------------------------------------
+  def __init__(self, line_type, symbol=None, value=None, value_type=None,
+               text=None, line_number=0):
+    """Default constructor
     """
 
-    # Stores the argument in the instance
-    self.command = args
+    # Kind of line (LineType)
+    self.line_type = line_type
 
-    self.__add_parser_common()
+    # Name of the symbol including the CONFIG_ prefix, or None
+    self.symbol = symbol
 
-    # According to the command, call the method dedicated to parse the arguments
-    if   self.command == Key.CHECK_SUITE.value:
-      self.__add_parser_check_suite()
-    elif self.command == Key.CHECK_LIBRARY.value:
-      self.__add_parser_check_library()
-    elif self.command == Key.RUN_SUITE.value:
-      self.__add_parser_run_suite()
-    elif self.command == "help":
-      return self.parser.parse_args(['-h'])
-    else:
-      # If the command word is unknown, the force the parsing of the help flag
-      logging.critical("Unknown command : %s", self.command)
-      return self.parser.parse_args(['-h'])
+    # Value of the symbol as written in the file (quotes are kept), or None
+    self.value = value
 
-    # Finally call the parser that has been initialized by the previous lines
-    self.args = self.parser.parse_args()
+    # Type of the value (ValueType), or None
+    self.value_type = value_type
 
+    # Text of comment or invalid lines, without the leading '#'
+    self.text = text
 
+    # Number of the line in the source file, starting from 1
+    self.line_number = line_number
 
-  # -------------------------------------------------------------------------
+
+
+  # ---------------------------------------------------------------------------
   #
-  # run
+  # is_setting
   #
-  # -------------------------------------------------------------------------
-  def run(self):
-    """ According to the command, call the method dedicated to run the
-      command called from cli
+  # ---------------------------------------------------------------------------
+  def is_setting(self):
+    """ Return True if the line assigns a value to a symbol (either set or not
+    set), False for comments, blank and invalid lines.
     """
 
-    # Create the project definition object, and load its configuration
-    self.cfg = Configuration()
-    self.cfg.load_configuration()
-
-    # ---------------------------------------------------------------------
-    # Override configuration with values passed on the commande line
-    # ---------------------------------------------------------------------
-
-    # Get the log_level from command line
-    if self.args.log_level != None:
-      self.cfg.log_level = self.args.log_level.upper()
-    # If not command line value, defaults to log
-    else:
-      self.cfg.log_level = Key.LOG_LEVEL_INFO.value
-
-    # Retrieve the suite path from command line
-    if self.args.suite != None:
-      self.cfg.suite = self.args.suite
-
-    # Retrieve the library path from command line
-    if self.args.library != None:
-      self.cfg.library = self.args.library
-
-    # Retrieve the array of categories
-    if self.args.category != None:
-      self.cfg.category = self.args.category
-
-    # Retrieve the aggregation level
-    if self.args.aggregation_level != None:
-      self.cfg.aggregation_level = self.args.aggregation_level
-
-    # Set the results cache flag
-    if self.args.no_result_cache != None:
-      self.cfg.use_results_cache = not self.args.no_result_cache
-
-    # Retrieve the failfast flag
-    self.cfg.fail_fast = bool(self.args.fail_fast != None)
-
-    # Retrieve the show hints flag
-    self.cfg.show_hints = self.args.show_hints
-
-    # Create the logger object
-    logging.basicConfig()
-    self.cfg.logging = logging.getLogger()
-    self.cfg.logging.setLevel(self.cfg.log_level)
-
-    # Select the method to run according to the command
-    if self.command == Key.CHECK_LIBRARY.value:
-      self.__run_check_library()
-    elif self.command == Key.CHECK_SUITE.value:
-      self.__run_check_suite()
-    elif self.command == Key.RUN_SUITE.value:
-      self.__run_run_suite()
-    else:
-      self.cfg.logging.critical("Unnown command : %s", self.command)
-      exit(1)
-
-
-  # -------------------------------------------------------------------------
+    return self.line_type in (LineType.SYMBOL, LineType.NOT_SET)
+
+
+
+  # ---------------------------------------------------------------------------
   #
-  # __add_parser_common
+  # __str__
   #
-  # -------------------------------------------------------------------------
-  def __add_parser_common(self):
-    """ This method add parser options common to all command
-    Configuration file store the definition of rootfs. Option can be
-    overriden by arguments on the command line (like --log-level)
+  # ---------------------------------------------------------------------------
+  def __str__(self):
+    """ Output the line as it would be written in a config file (without the
+    end of line character).
     """
 
-    # Defines the level of the log to output
-    self.parser.add_argument(Key.OPT_LOG_LEVEL.value,
-                             action='store',
-                             dest=Key.LOG_LEVEL.value,
-                             choices=['debug', 'info', 'warning', 'error', 'critical'],
-                             help="Defines the minimal log level. Default value : warning")
-
-    self.parser.add_argument(Key.OPT_LIBRARY.value,
-                             action='store',
-                             nargs='*',
-                             dest=Key.LIBRARY.value,
-                             help="Path to the directory storing the test scripts")
-
-    self.parser.add_argument(Key.OPT_SUITE.value,
-                             action='store',
-                             dest=Key.SUITE.value,
-                             help="File containing the test suite (YAML format)")
+    if self.line_type == LineType.SYMBOL:
+      return self.symbol + "=" + self.value
+    if self.line_type == LineType.NOT_SET:
+      return "# " + self.symbol + " is not set"
+    if self.line_type == LineType.COMMENT:
+      return "# " + self.text if self.text else "#"
+    if self.line_type == LineType.BLANK:
+      return ""
+    return self.text
 
 
 
-  # -------------------------------------------------------------------------
+  # ---------------------------------------------------------------------------
   #
-  # __add_parser_check_suite
+  # __repr__
   #
-  # -------------------------------------------------------------------------
-  def __add_parser_check_suite(self):
-
-    """ This method add parser options specific to check validity and syntax
-    of the test suite.
+  # ---------------------------------------------------------------------------
+  def __repr__(self):
+    """ Debug output of the line
     """
 
-    self.parser.add_argument(Key.CHECK_SUITE.value,
-                             help=Key.OPT_HELP_COMMAND.value)
+    return "DefconfigLine(%s, %d, %r)" % (self.line_type.name, self.line_number, str(self))
+
 
 
+# -----------------------------------------------------------------------------
+#
+# class DefconfigParser
+#
+# -----------------------------------------------------------------------------
+class DefconfigParser(object):
+  """This class implements the parser of kernel config files. It provides
+  generators yielding DefconfigLine objects from a file, a buffer or a stream.
+
+  The scan method is the low level entry point. It yields raw tuples and is used
+  by the model layer to build configs without creating one object per line.
+  """
 
-  # -------------------------------------------------------------------------
+  # ---------------------------------------------------------------------------
   #
-  # __add_parser_check_library
+  # scan
   #
-  # -------------------------------------------------------------------------
-  def __add_parser_check_library(self):
-
-    """ This method add parser options specific to check validity of the test
-    script library content (meta data, unique ids, etc.)
+  # ---------------------------------------------------------------------------
+  @staticmethod
+  def scan(buffer):
+    """ Generator scanning a buffer (bytes, bytearray or mmap) and yielding
+    one (line_type, symbol, value, text) tuple per line. Symbol, value and text
+    are raw bytes or None.
     """
 
-    self.parser.add_argument(Key.CHECK_LIBRARY.value,
-                             help=Key.OPT_HELP_COMMAND.value)
+    end = len(buffer)
+    for match in _LINE_REGEX.finditer(buffer):
+      # An empty match at the very end of the buffer is not a line, it is what
+      # follows the last end of line character
+      if match.start() == end:
+        break
 
+      symbol, value, unset, comment, other = match.groups()
+      if symbol is not None:
+        yield (LineType.SYMBOL, symbol, value, None)
+      elif unset is not None:
+        yield (LineType.NOT_SET, unset, b"n", None)
+      elif comment is not None:
+        yield (LineType.COMMENT, None, None, comment)
+      elif other:
+        yield (LineType.INVALID, None, None, other)
+      else:
+        yield (LineType.BLANK, None, None, None)
 
 
-  # -------------------------------------------------------------------------
+
+  # ---------------------------------------------------------------------------
   #
-  # __add_parser_run_suite
+  # __build_lines
   #
-  # -------------------------------------------------------------------------
-  def __add_parser_run_suite(self):
-
-    """ This method add parser options specific to the test suite execution
-    smethod.
+  # ---------------------------------------------------------------------------
+  @staticmethod
+  def __build_lines(records):
+    """ Generator converting the raw tuples produced by scan into numbered
+    DefconfigLine objects
     """
 
-    self.parser.add_argument(Key.RUN_SUITE.value,
-                             help=Key.OPT_HELP_COMMAND.value)
-
-    # Defines the reverse order search path
-    self.parser.add_argument(Key.OPT_CATEGORY.value,
-                             action='store',
-                             nargs='*',
-                             dest=Key.CATEGORY.value,
-                             help="Defines the list of test category to execute")
-
-    # Defines the reverse order search path
-    self.parser.add_argument(Key.OPT_AGGREGATION_LEVEL.value,
-                             action='store',
-                             dest=Key.AGGREGATION_LEVEL.value,
-                             help="Defines the test depth used for results aggreation")
-
-    # Defines the reverse order search path
-    self.parser.add_argument(Key.OPT_NO_RESULT_CACHE.value,
-                             action='store_true',
-                             dest=Key.NO_RESULT_CACHE.value,
-                             help="Deactivate script result cache. Scripts can be run\n"
-                                  "multiple times with the same argumets, instead of\n"
-                                  "once per arguments distinct set of values")
-
-    self.parser.add_argument(Key.OPT_FAIL_FAST.value,
-                             action='store_true',
-                             dest=Key.FAIL_FAST.value,
-                             help="If this flag is activated, kcc will stop at the first\n"
-                                  "error encountered, otherwise it will continue to run\n"
-                                  "as long as possible and will report all errors")
-
-    self.parser.add_argument(Key.OPT_ONLY_ERRORS.value,
-                             action='store_true',
-                             dest=Key.ONLY_ERRORS.value,
-                             help="If this flag is activated, kcc will output only failed\n"
-                                  "tests. Success are taken in account, but not displayed\n"
-                                  "to reduce output verbosity")
-
-    self.parser.add_argument(Key.OPT_SHOW_HINTS.value,
-                             action='store_true',
-                             dest=Key.SHOW_HINTS.value,
-                             help="If this flag is activated, kcc will display hints when\n"
-                                  "the tests fails. Hints have to be defined in the tests\n"
-                                  "scripts and are optional")
-
-
-
-  # -------------------------------------------------------------------------
+    line_number = 0
+    for line_type, symbol, value, text in records:
+      line_number += 1
+      if symbol is not None:
+        yield DefconfigLine(line_type,
+                            symbol=symbol.decode(_ENCODING, _ERRORS),
+                            value=value.decode(_ENCODING, _ERRORS),
+                            value_type=value_type_of(value),
+                            line_number=line_number)
+      elif text is not None:
+        yield DefconfigLine(line_type,
+                            text=text.decode(_ENCODING, _ERRORS),
+                            line_number=line_number)
+      else:
+        yield DefconfigLine(line_type, line_number=line_number)
+
+
+
+  # ---------------------------------------------------------------------------
   #
-  # __run_check_library
+  # parse_buffer
   #
-  # -------------------------------------------------------------------------
-  def __run_check_library(self):
-    """ Method used to handle the check_library command.
-      Create the business objet, then execute the entry point
+  # ---------------------------------------------------------------------------
+  def parse_buffer(self, buffer):
+    """ Generator yielding a DefconfigLine for each line of the given buffer
     """
 
-    # Create the business object
-    command = check_library.CheckLibrary(self.cfg)
+    return self.__build_lines(self.scan(buffer))
 
-    # Then call the dedicated method
-    command.check_library()
 
 
-
-  # -------------------------------------------------------------------------
+  # ---------------------------------------------------------------------------
   #
-  # __run_check_suite
+  # parse
   #
-  # -------------------------------------------------------------------------
-  def __run_check_suite(self):
-    """ Method used to handle the check_library command.
-      Create the business objet, then execute the entry point
+  # ---------------------------------------------------------------------------
+  def parse(self, filename):
+    """ Generator yielding a DefconfigLine for each line of the given file.
+    The file is memory mapped, and is unmapped once the generator is exhausted
+    or closed.
     """
 
-    # Create the business object
-    command = check_testsuite.CheckTestSuite(self.cfg)
+    with open(filename, 'rb') as working_file:
+      # Empty files cannot be memory mapped, and have no line anyway
+      if os.fstat(working_file.fileno()).st_size == 0:
+        return
 
-    # Then call the dedicated method
-    command.check_suite()
+      with mmap.mmap(working_file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        yield from self.parse_buffer(buffer)
 
 
 
-  # -------------------------------------------------------------------------
+  # ---------------------------------------------------------------------------
   #
-  # __run_run_suite
+  # parse_stream
   #
-  # -------------------------------------------------------------------------
-  def __run_run_suite(self):
-    """ Method used to handle the check_library command.
-      Create the business objet, then execute the entry point
+  # ---------------------------------------------------------------------------
+  def parse_stream(self, stream):
+    """ Generator yielding a DefconfigLine for each line read from a binary
+    stream (pipe, decompressor, etc.). Lines are read one at a time, thus
+    memory usage does not depend on the size of the input.
     """
 
-    # Create the business object
-    command = run_testsuite.RunTestSuite(self.cfg)
-
-    # Then call the dedicated method
-    command.run_suite()
+    return self.__build_lines(itertools.chain.from_iterable(map(self.scan, stream)))
@@ -0,0 +1,420 @@
+#
+# The contents of this file are subject to the Apache 2.0 license you may not
+# use this file except in compliance with the License.
+#
+# Software distributed under the License is distributed on an "AS IS" basis,
+# WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License
+# for the specific language governing rights and limitations under the
+# License.
+#
+#
+# Copyright 2023 KCC project (http://www.firmwaretoolkit.org).
+# All rights reserved. Use is subject to license terms.
+#
+#
+# Contributors list :
+#
+#    William Bonnet     wllmbnnt@gmail.com, wbonnet@theitmakers.com
+#
+
+""" This module contains the operator expression language used by the eval
+command. An expression combines config files with the except, concat and
+intersect operators, for instance :
+
+  (base concat board) except (vendor intersect upstream)
+
+intersect binds tighter than except and concat, which have the same precedence
+and are left associative. Parentheses group sub-expressions, and file names
+matching an operator word or containing spaces or parentheses can be quoted.
+An expression may be prefixed with 'output =' (the '=' surrounded by spaces)
+to name the file receiving its result.
+
+All the expressions of a run are compiled into a single plan. Identical sub-
+expressions are shared, chains of the same operator are fused into one n-ary
+operation when the intermediate result is not used elsewhere, and the plan is
+evaluated lazily : a node is only computed, and a file only loaded, when an
+output needs it, and each of them is computed once.
+"""
+
+import os
+import re
+from kcc.model import Key
+from kcc.operators import OperandSet, OperatorEngine
+
+# Tokens of the expressions : parentheses, quoted names and words
+_TOKEN = re.compile(r'\s*(?:(\()|(\))|"((?:[^"\\]|\\.)*)"|([^\s()"]+))')
+
+# Token separating the output from the expression
+_ASSIGNMENT = "="
+
+# Operators, by increasing precedence
+_LOW_PRECEDENCE = (Key.OP_EXCEPT.value, Key.OP_CONCAT.value)
+_HIGH_PRECEDENCE = (Key.OP_INTERSECT.value,)
+
+# Operators which are associative, thus chains can be fused whatever the side
+_ASSOCIATIVE = (Key.OP_CONCAT.value, Key.OP_INTERSECT.value)
+
+# -----------------------------------------------------------------------------
+#
+# class ExpressionParser
+#
+# -----------------------------------------------------------------------------
+class ExpressionParser(object):
+  """This class parses an expression into a tree. Leaves are ('file', path)
+  tuples, and operations are (operator, left, right) tuples.
+  """
+
+  # ---------------------------------------------------------------------------
+  #
+  # __init__
+  #
+  # ---------------------------------------------------------------------------
+  def __init__(self):
+    """Default constructor
+    """
+
+    # Tokens of the expression beeing parsed. Each token is a (kind, text)
+    # tuple, kind beeing '(', ')', 'name' or 'word'
+    self.tokens = []
+
+    # Position of the next token
+    self.position = 0
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # tokenize
+  #
+  # ---------------------------------------------------------------------------
+  @staticmethod
+  def tokenize(text):
+    """ Split an expression into tokens. Raise ValueError on unbalanced quotes
+    """
+
+    tokens = []
+    position = 0
+    text = text.rstrip()
+    while position < len(text):
+      match = _TOKEN.match(text, position)
+      if match is None:
+        raise ValueError("Syntax error at position %d of : %s" % (position, text))
+      opening, closing, quoted, word = match.groups()
+      if opening is not None:
+        tokens.append(("(", opening))
+      elif closing is not None:
+        tokens.append((")", closing))
+      elif quoted is not None:
+        tokens.append(("name", re.sub(r'\\(.)', r'\1', quoted)))
+      else:
+        tokens.append(("word", word))
+      position = match.end()
+    return tokens
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # parse
+  #
+  # ---------------------------------------------------------------------------
+  def parse(self, text):
+    """ Parse an expression and return an (output, tree) tuple. The output is
+    None if the expression is not assigned to a file. Raise ValueError if the
+    expression is not valid.
+    """
+
+    self.tokens = self.tokenize(text)
+    self.position = 0
+
+    output = None
+    if len(self.tokens) > 2 and self.tokens[0][0] in ("name", "word") and \
+       self.tokens[1] == ("word", _ASSIGNMENT):
+      output = self.tokens[0][1]
+      self.position = 2
+
+    tree = self.__expression()
+    if self.position != len(self.tokens):
+      raise ValueError("Unexpected '%s' in : %s" % (self.tokens[self.position][1], text))
+    return (output, tree)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # __expression
+  #
+  # ---------------------------------------------------------------------------
+  def __expression(self):
+    """ Parse a chain of except and concat operations
+    """
+
+    tree = self.__term()
+    while self.__next_operator(_LOW_PRECEDENCE):
+      operator = self.tokens[self.position][1]
+      self.position += 1
+      tree = (operator, tree, self.__term())
+    return tree
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # __term
+  #
+  # ---------------------------------------------------------------------------
+  def __term(self):
+    """ Parse a chain of intersect operations
+    """
+
+    tree = self.__factor()
+    while self.__next_operator(_HIGH_PRECEDENCE):
+      operator = self.tokens[self.position][1]
+      self.position += 1
+      tree = (operator, tree, self.__factor())
+    return tree
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # __factor
+  #
+  # ---------------------------------------------------------------------------
+  def __factor(self):
+    """ Parse a file name or a sub-expression between parentheses
+    """
+
+    if self.position >= len(self.tokens):
+      raise ValueError("Unexpected end of expression")
+
+    kind, text = self.tokens[self.position]
+    self.position += 1
+    if kind == "(":
+      tree = self.__expression()
+      if self.position >= len(self.tokens) or self.tokens[self.position][0] != ")":
+        raise ValueError("Missing closing parenthesis")
+      self.position += 1
+      return tree
+    if kind == "name" or (kind == "word" and text not in _LOW_PRECEDENCE + _HIGH_PRECEDENCE):
+      return ("file", text)
+    raise ValueError("Unexpected '%s', a file name was expected" % text)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # __next_operator
+  #
+  # ---------------------------------------------------------------------------
+  def __next_operator(self, operators):
+    """ Return True if the next token is one of the given operators
+    """
+
+    return self.position < len(self.tokens) and \
+           self.tokens[self.position][0] == "word" and \
+           self.tokens[self.position][1] in operators
+
+
+
+# -----------------------------------------------------------------------------
+#
+# class QueryPlan
+#
+# -----------------------------------------------------------------------------
+class QueryPlan(object):
+  """This class is the plan evaluating a set of expressions. Nodes are
+  interned : adding an expression reuses the nodes of the identical sub-
+  expressions already in the plan. Each node is an (operator, operands) tuple,
+  where operands is a tuple of node ids, or the absolute path of the file for
+  the leaves (whose operator is None).
+  """
+
+  # ---------------------------------------------------------------------------
+  #
+  # __init__
+  #
+  # ---------------------------------------------------------------------------
+  def __init__(self):
+    """Default constructor
+    """
+
+    # Nodes of the plan, indexed by node id. Operands always have a lower id
+    # than the nodes using them
+    self.nodes = []
+
+    # Ids of the nodes, indexed by node
+    self.ids = {}
+
+    # List of (output, node id) of the expressions
+    self.outputs = []
+
+    # Results of the evaluated nodes, indexed by node id
+    self.results = {}
+
+    # Configs of the loaded leaves, indexed by path. They give the order of
+    # the entries of the results
+    self.configs = {}
+
+    # Number of nodes evaluated and files loaded
+    self.evaluated = 0
+    self.loaded = 0
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # node
+  #
+  # ---------------------------------------------------------------------------
+  def node(self, operator, operands):
+    """ Return the id of a node, adding it to the plan if needed
+    """
+
+    key = (operator, operands)
+    node_id = self.ids.get(key)
+    if node_id is None:
+      node_id = len(self.nodes)
+      self.nodes.append(key)
+      self.ids[key] = node_id
+    return node_id
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # add
+  #
+  # ---------------------------------------------------------------------------
+  def add(self, output, tree):
+    """ Add an expression tree, whose result is written to the output
+    """
+
+    self.outputs.append((output, self.__add_tree(tree)))
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # __add_tree
+  #
+  # ---------------------------------------------------------------------------
+  def __add_tree(self, tree):
+    """ Add the nodes of a tree, and return the id of its root
+    """
+
+    if tree[0] == "file":
+      return self.node(None, os.path.abspath(tree[1]))
+    return self.node(tree[0], (self.__add_tree(tree[1]), self.__add_tree(tree[2])))
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # optimize
+  #
+  # ---------------------------------------------------------------------------
+  def optimize(self):
+    """ Return a new plan where chains of the same operator are fused into a
+    single operation, when the intermediate result is used only once. For
+    except, only the left operand can be fused : (a except b) except c is
+    a except (b concat c) with the n-ary except, a except (b except c) is not.
+    """
+
+    references = [0] * len(self.nodes)
+    for operator, operands in self.nodes:
+      if operator is not None:
+        for operand in operands:
+          references[operand] += 1
+    for _, node_id in self.outputs:
+      references[node_id] += 1
+
+    plan = QueryPlan()
+    mapping = []
+    for operator, operands in self.nodes:
+      if operator is None:
+        mapping.append(plan.node(None, operands))
+        continue
+
+      fused = []
+      for position, operand in enumerate(operands):
+        operand_operator = self.nodes[operand][0]
+        if operand_operator == operator and references[operand] == 1 and \
+           (operator in _ASSOCIATIVE or position == 0):
+          fused.extend(plan.nodes[mapping[operand]][1])
+        else:
+          fused.append(mapping[operand])
+      mapping.append(plan.node(operator, tuple(fused)))
+
+    plan.outputs = [(output, mapping[node_id]) for output, node_id in self.outputs]
+    return plan
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # evaluate
+  #
+  # ---------------------------------------------------------------------------
+  def evaluate(self, node_id, load):
+    """ Return the OperandSet of a node, computing it and its operands if they
+    have not been computed yet. load is the function returning the Config of a
+    file.
+    """
+
+    result = self.results.get(node_id)
+    if result is not None:
+      return result
+
+    operator, operands = self.nodes[node_id]
+    if operator is None:
+      self.configs[operands] = load(operands)
+      result = OperandSet.from_config(self.configs[operands])
+      self.loaded += 1
+    else:
+      values = [self.evaluate(operand, load) for operand in operands]
+      result = OperatorEngine().apply(operator, values)
+      self.evaluated += 1
+
+    self.results[node_id] = result
+    return result
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # leaves
+  #
+  # ---------------------------------------------------------------------------
+  def leaves(self, node_id):
+    """ Return the configs of the leaves of a node, left to right, each of
+    them once. The node must have been evaluated.
+    """
+
+    operator, operands = self.nodes[node_id]
+    if operator is None:
+      return [self.configs[operands]]
+
+    configs = []
+    for operand in operands:
+      for config in self.leaves(operand):
+        if not any(config is known for known in configs):
+          configs.append(config)
+    return configs
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # describe
+  #
+  # ---------------------------------------------------------------------------
+  def describe(self, node_id):
+    """ Return the text of the sub-expression of a node
+    """
+
+    operator, operands = self.nodes[node_id]
+    if operator is None:
+      return os.path.relpath(operands)
+    return "(" + (" " + operator + " ").join(self.describe(operand)
+                                               for operand in operands) + ")"
@@ -0,0 +1,118 @@
+#
+# The contents of this file are subject to the Apache 2.0 license you may not
+# use this file except in compliance with the License.
+#
+# Software distributed under the License is distributed on an "AS IS" basis,
+# WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License
+# for the specific language governing rights and limitations under the
+# License.
+#
+#
+# Copyright 2023 KCC project (http://www.firmwaretoolkit.org).
+# All rights reserved. Use is subject to license terms.
+#
+#
+# Contributors list :
+#
+#    William Bonnet     wllmbnnt@gmail.com, wbonnet@theitmakers.com
+#
+
+""" This module contains the implementation of the eval command. The operator
+expressions given on the command line, or read from a plan file, are compiled
+into a single plan, evaluated, and each result is written to its output file or
+to stdout.
+"""
+
+import sys
+from kcc.model import Key
+from kcc.parse_cache import ParseCache, load_config
+from kcc.expression import ExpressionParser, QueryPlan
+from kcc.profiling import PROFILER, PHASE_OPERATORS, PHASE_OUTPUT, COUNTER_BYTES_WRITTEN
+
+# Character starting the comment lines of the plan files
+_COMMENT = "#"
+
+# -----------------------------------------------------------------------------
+#
+# class ExpressionCommand
+#
+# -----------------------------------------------------------------------------
+class ExpressionCommand(object):
+  """This class implements the eval command.
+  """
+
+  # ---------------------------------------------------------------------------
+  #
+  # __init__
+  #
+  # ---------------------------------------------------------------------------
+  def __init__(self, cfg):
+    """Default constructor
+    """
+
+    # Configuration object storing the command line arguments
+    self.cfg = cfg
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # run_expressions
+  #
+  # ---------------------------------------------------------------------------
+  def run_expressions(self):
+    """ Entry point of the eval command
+    """
+
+    texts = list(self.cfg.expressions or [])
+    if self.cfg.plan is not None:
+      try:
+        with open(self.cfg.plan, 'r') as working_file:
+          texts += [line.strip() for line in working_file
+                    if line.strip() and not line.lstrip().startswith(_COMMENT)]
+      except OSError as exception:
+        self.cfg.logging.critical("Error: " + exception.filename + "- " + exception.strerror)
+        exit(1)
+
+    if not texts:
+      self.cfg.logging.critical("No expression to evaluate. Aborting.")
+      exit(1)
+
+    # Compile all the expressions into a single plan
+    parser = ExpressionParser()
+    plan = QueryPlan()
+    for text in texts:
+      try:
+        plan.add(*parser.parse(text))
+      except ValueError as exception:
+        self.cfg.logging.critical("Invalid expression '%s' : %s", text, exception)
+        exit(1)
+    plan = plan.optimize()
+    for output, node_id in plan.outputs:
+      self.cfg.logging.debug("%s <- %s", output if output is not None else "stdout",
+                             plan.describe(node_id))
+
+    cache = None
+    if self.cfg.use_parse_cache:
+      cache = ParseCache(self.cfg.parse_cache_path, self.cfg.parse_cache_size)
+
+    try:
+      with PROFILER.phase(PHASE_OPERATORS):
+        results = [(output, plan.evaluate(node_id, lambda path: load_config(path, cache)),
+                    plan.leaves(node_id))
+                   for output, node_id in plan.outputs]
+    except OSError as exception:
+      self.cfg.logging.critical("Error: " + exception.filename + "- " + exception.strerror)
+      exit(1)
+    self.cfg.logging.debug("%d operations evaluated, %d files loaded", plan.evaluated,
+                           plan.loaded)
+
+    with PROFILER.phase(PHASE_OUTPUT):
+      for output, result, order in results:
+        config = result.to_config(output, order)
+        if output is not None:
+          config.write(output)
+        else:
+          data = config.to_text().encode(Key.UTF8.value, "surrogateescape")
+          sys.stdout.buffer.write(data)
+          PROFILER.count(COUNTER_BYTES_WRITTEN, len(data))
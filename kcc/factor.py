@@ -0,0 +1,191 @@
+#
+# The contents of this file are subject to the Apache 2.0 license you may not
+# use this file except in compliance with the License.
+#
+# Software distributed under the License is distributed on an "AS IS" basis,
+# WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License
+# for the specific language governing rights and limitations under the
+# License.
+#
+#
+# Copyright 2023 KCC project (http://www.firmwaretoolkit.org).
+# All rights reserved. Use is subject to license terms.
+#
+#
+# Contributors list :
+#
+#    William Bonnet     wllmbnnt@gmail.com, wbonnet@theitmakers.com
+#
+
+""" This module contains the implementation of the factor command. A corpus of
+configs is stored as a base config and one fragment per config, such that
+merging the fragment into the base (merge_config.sh, or kcc merge) gives back
+the config :
+
+  - the base holds the settings shared by a quorum of the configs. With the
+    default quorum of 1.0, it is the intersect of all the configs
+  - the fragment of a config is the config except the base
+
+Both are computed on the matrix of the corpus command in one vectorized pass,
+the configs are never compared pair by pair.
+"""
+
+import os
+import math
+from kcc.model import Config, Key
+from kcc.corpus import load_corpus
+from kcc.compare import output_names
+from kcc.profiling import PROFILER, PHASE_OPERATORS, PHASE_OUTPUT
+
+try:
+  import numpy
+except ImportError:
+  # Checked by the command, which cannot run without it
+  numpy = None
+
+# Name of the base config, and extension of the fragments, written in the
+# output directory
+_BASE_NAME = "base.config"
+_EXCEPT_EXTENSION = ".except"
+
+# Number of matrix rows processed at once when computing the fragments
+_BLOCK_ROWS = 256
+
+# -----------------------------------------------------------------------------
+#
+# common_base
+#
+# -----------------------------------------------------------------------------
+def common_base(corpus, quorum):
+  """ Return the matrix columns of the base, and the value code of each of
+  them. A symbol is in the base if its most common value is used by at least
+  the quorum (a ratio) of the configs. The corpus must have been analyzed.
+  """
+
+  # The rounding avoids requiring one more config because of float errors
+  required = max(1, math.ceil(round(quorum * len(corpus.paths), 6)))
+  columns = numpy.flatnonzero(corpus.mode_counts >= required)
+  return (columns, corpus.modes[columns] + 1)
+
+
+
+# -----------------------------------------------------------------------------
+#
+# fragments
+#
+# -----------------------------------------------------------------------------
+def fragments(corpus, base_columns, base_codes):
+  """ Generator returning a (row, symbol ids, value ids, missing) tuple per
+  config of the corpus. The ids are the entries of the config except the base,
+  in symbol id order, and missing is the number of symbols of the base not
+  defined by the config.
+  """
+
+  count, width = corpus.codes.shape
+  reference = numpy.zeros(width, dtype=corpus.codes.dtype)
+  reference[base_columns] = base_codes
+
+  # The symbols defined by a single config are never in the base
+  single_rows, single_symbols, single_values = corpus.singles
+  single_starts = numpy.searchsorted(single_rows, numpy.arange(count + 1))
+
+  for start in range(0, count, _BLOCK_ROWS):
+    block = corpus.codes[start:start + _BLOCK_ROWS]
+    kept = (block != 0) & (block != reference)
+    missing = numpy.count_nonzero((block == 0) & (reference != 0), axis=1)
+    for offset in range(len(block)):
+      row = start + offset
+      columns = numpy.flatnonzero(kept[offset])
+      symbols = numpy.concatenate((corpus.columns[columns],
+                                   single_symbols[single_starts[row]:single_starts[row + 1]]))
+      values = numpy.concatenate((block[offset, columns].astype(numpy.int64) - 1,
+                                  single_values[single_starts[row]:single_starts[row + 1]]))
+      order = numpy.argsort(symbols, kind='stable')
+      yield (row, symbols[order], values[order], int(missing[offset]))
+
+
+
+# -----------------------------------------------------------------------------
+#
+# class CorpusFactorization
+#
+# -----------------------------------------------------------------------------
+class CorpusFactorization(object):
+  """This class implements the factor command. It writes the base config and
+  the fragments of a corpus in the output directory.
+  """
+
+  # ---------------------------------------------------------------------------
+  #
+  # __init__
+  #
+  # ---------------------------------------------------------------------------
+  def __init__(self, cfg):
+    """Default constructor
+    """
+
+    # Configuration object storing the command line arguments
+    self.cfg = cfg
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # run_factor
+  #
+  # ---------------------------------------------------------------------------
+  def run_factor(self):
+    """ Entry point of the factor command
+    """
+
+    if numpy is None:
+      self.cfg.logging.critical("The numpy module is needed by the factor command. Aborting.")
+      exit(1)
+
+    if not 0 < self.cfg.quorum <= 1:
+      self.cfg.logging.critical("The quorum must be greater than 0 and at most 1 (" +
+                                Key.OPT_QUORUM.value + "). Aborting.")
+      exit(1)
+
+    corpus = load_corpus(self.cfg)
+
+    # Fragments are written in the subdirectories of the configs relative to
+    # their common directory, thus configs sharing a basename do not collide
+    try:
+      names = output_names(corpus.paths)
+    except ValueError as exception:
+      self.cfg.logging.critical(str(exception) + ". Aborting.")
+      exit(1)
+
+    with PROFILER.phase(PHASE_OPERATORS):
+      corpus.analyze()
+      base_columns, base_codes = common_base(corpus, self.cfg.quorum)
+
+    os.makedirs(self.cfg.output, exist_ok=True)
+    with PROFILER.phase(PHASE_OUTPUT):
+      base = Config(os.path.join(self.cfg.output, _BASE_NAME))
+      for symbol_id, value_code in zip(corpus.columns[base_columns].tolist(),
+                                       base_codes.tolist()):
+        base.append(symbol_id, value_code - 1)
+      base.write(base.filename)
+
+      entries = 0
+      for row, symbols, values, missing in fragments(corpus, base_columns, base_codes):
+        path = corpus.paths[row]
+        fragment = Config(os.path.join(self.cfg.output, names[row] + _EXCEPT_EXTENSION))
+        os.makedirs(os.path.dirname(fragment.filename), exist_ok=True)
+        for symbol_id, value_id in zip(symbols.tolist(), values.tolist()):
+          fragment.append(symbol_id, value_id)
+        fragment.write(fragment.filename)
+        entries += len(fragment)
+
+        # A fragment cannot remove a symbol, the merge of a config lacking
+        # symbols of the base defines them
+        if missing:
+          self.cfg.logging.warning("%s does not define %d symbols of the base, they are "
+                                   "defined after the merge", path, missing)
+
+    print("Base of %d symbols, %d fragments of %.1f symbols on average "
+          "(%d entries instead of %d)" %
+          (len(base), len(corpus.paths), entries / len(corpus.paths), len(base) + entries,
+           int(corpus.sizes.sum())))
@@ -0,0 +1,293 @@
+#
+# The contents of this file are subject to the Apache 2.0 license you may not
+# use this file except in compliance with the License.
+#
+# Software distributed under the License is distributed on an "AS IS" basis,
+# WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License
+# for the specific language governing rights and limitations under the
+# License.
+#
+#
+# Copyright 2023 KCC project (http://www.firmwaretoolkit.org).
+# All rights reserved. Use is subject to license terms.
+#
+#
+# Contributors list :
+#
+#    William Bonnet     wllmbnnt@gmail.com, wbonnet@theitmakers.com
+#
+
+""" This module contains the implementation of the history command. It outputs
+the timeline of the changes of a config file stored in a git repository : for
+each commit of a revision range modifying the file, the symbols added, removed
+or changed by the commit.
+
+Git is run twice, whatever the number of revisions : git log lists the commits,
+then a single git cat-file --batch process streams the content of the file at
+each of them. Each version is parsed once, revisions where the file content did
+not change are not parsed at all, and only the delta between two consecutive
+versions is computed.
+"""
+
+import os
+import sys
+import subprocess
+import threading
+from kcc.model import Config, SYMBOL_TABLE, STRING_POOL
+from kcc.profiling import PROFILER, PHASE_PARSE, PHASE_OPERATORS, PHASE_OUTPUT
+
+# Separator of the fields of the git log output (%x00 in the format)
+_FIELD_SEPARATOR = "\x00"
+
+# Length of the commit hashes in the output
+_SHORT_HASH = 12
+
+# -----------------------------------------------------------------------------
+#
+# class GitObjectReader
+#
+# -----------------------------------------------------------------------------
+class GitObjectReader(object):
+  """This class reads the content of objects through a long lived git
+  cat-file --batch process. Object names are written to the process by a
+  thread while the contents are read, thus the pipes never fill up.
+  """
+
+  # ---------------------------------------------------------------------------
+  #
+  # __init__
+  #
+  # ---------------------------------------------------------------------------
+  def __init__(self, repository):
+    """Default constructor
+    """
+
+    # Path of the git repository
+    self.repository = repository
+
+    # Number of objects read
+    self.count = 0
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # read
+  #
+  # ---------------------------------------------------------------------------
+  def read(self, names):
+    """ Generator returning an (object id, content) tuple for each object name
+    (such as 'commit:path'), in order. Both are None for the missing objects.
+    Raise OSError if git cannot be run.
+    """
+
+    process = subprocess.Popen(["git", "-C", self.repository, "cat-file", "--batch"],
+                               stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+    writer = threading.Thread(target=self.__write_names, args=(process.stdin, names),
+                              daemon=True)
+    writer.start()
+    try:
+      for _ in names:
+        header = process.stdout.readline().split()
+        if len(header) != 3:
+          # '<name> missing' or '<name> ambiguous'
+          yield (None, None)
+          continue
+        content = process.stdout.read(int(header[2]))
+        process.stdout.read(1)
+        self.count += 1
+        yield (header[0].decode(), content)
+    finally:
+      # Closing the output first stops git if the contents were not all read,
+      # thus the writer cannot stay blocked
+      process.stdout.close()
+      writer.join()
+      process.wait()
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # __write_names
+  #
+  # ---------------------------------------------------------------------------
+  @staticmethod
+  def __write_names(stream, names):
+    """ Write the object names to the git process, then close its input
+    """
+
+    try:
+      for name in names:
+        stream.write(name.encode() + b"\n")
+      stream.close()
+    except OSError:
+      # The process exited, the reader reports it
+      pass
+
+
+
+# -----------------------------------------------------------------------------
+#
+# class ConfigHistory
+#
+# -----------------------------------------------------------------------------
+class ConfigHistory(object):
+  """This class implements the history command.
+  """
+
+  # ---------------------------------------------------------------------------
+  #
+  # __init__
+  #
+  # ---------------------------------------------------------------------------
+  def __init__(self, cfg):
+    """Default constructor
+    """
+
+    # Configuration object storing the command line arguments
+    self.cfg = cfg
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # run_history
+  #
+  # ---------------------------------------------------------------------------
+  def run_history(self):
+    """ Entry point of the history command
+    """
+
+    try:
+      commits = self.list_commits()
+      if not commits:
+        print("No commit of %s in %s" % (self.cfg.config_path, self.cfg.revisions))
+        return
+
+      # The version preceding the first commit is the starting point. It does
+      # not exist if the first commit created the file
+      names = [commits[0][0] + "^:" + self.cfg.config_path] + \
+              [commit[0] + ":" + self.cfg.config_path for commit in commits]
+      reader = GitObjectReader(self.cfg.repository)
+      versions = reader.read(names)
+
+      try:
+        previous_id, previous = self.__state(next(versions))
+        changes = 0
+        changed_commits = 0
+        for commit, (object_id, content) in zip(commits, versions):
+          if object_id == previous_id:
+            continue
+          state = self.__state((object_id, content))[1]
+          with PROFILER.phase(PHASE_OPERATORS):
+            delta = self.delta(previous, state)
+          if any(delta):
+            changed_commits += 1
+            changes += sum(len(part) for part in delta)
+            with PROFILER.phase(PHASE_OUTPUT):
+              self.output_commit(commit, previous, state, delta)
+          previous_id, previous = object_id, state
+      finally:
+        # Waits for the git process
+        versions.close()
+    except BrokenPipeError:
+      # The output has been closed (piped to head for instance), not a git
+      # error. Stdout is redirected to /dev/null, thus flushing it at exit does
+      # not fail again, then the command stops quietly
+      os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+      exit(1)
+    except OSError as exception:
+      self.cfg.logging.critical("Error: %s- %s", exception.filename or "git",
+                                exception.strerror)
+      exit(1)
+
+    self.cfg.logging.info("%d commits, %d of them changing settings (%d changes), %d versions read",
+                          len(commits), changed_commits, changes, reader.count)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # list_commits
+  #
+  # ---------------------------------------------------------------------------
+  def list_commits(self):
+    """ Return the (hash, date, subject) tuples of the commits of the revision
+    range modifying the config file, oldest first
+    """
+
+    result = subprocess.run(["git", "-C", self.cfg.repository, "log", "--reverse",
+                             "--date=short",
+                             "--format=%H%x00%ad%x00%s",
+                             self.cfg.revisions, "--", self.cfg.config_path],
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+      self.cfg.logging.critical("git log failed : %s",
+                                result.stderr.decode(errors="replace").strip())
+      exit(1)
+
+    return [tuple(line.split(_FIELD_SEPARATOR, 2))
+            for line in result.stdout.decode(errors="replace").splitlines() if line]
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # delta
+  #
+  # ---------------------------------------------------------------------------
+  @staticmethod
+  def delta(previous, state):
+    """ Return the (added, removed, changed) lists of symbol ids between two
+    states. States are dictionaries of value ids indexed by symbol id, in file
+    order.
+    """
+
+    added = [symbol_id for symbol_id in state if symbol_id not in previous]
+    removed = [symbol_id for symbol_id in previous if symbol_id not in state]
+    changed = [symbol_id for symbol_id, value_id in state.items()
+               if symbol_id in previous and previous[symbol_id] != value_id]
+    return (added, removed, changed)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # output_commit
+  #
+  # ---------------------------------------------------------------------------
+  @staticmethod
+  def output_commit(commit, previous, state, delta):
+    """ Output the changes made by a commit
+    """
+
+    commit_hash, date, subject = (commit + ("", ""))[:3]
+    added, removed, changed = delta
+    print("%s %s %s" % (commit_hash[:_SHORT_HASH], date, subject))
+    for symbol_id in added:
+      print("  + " + Config.format_line(symbol_id, state[symbol_id]))
+    for symbol_id in removed:
+      print("  - " + Config.format_line(symbol_id, previous[symbol_id]))
+    for symbol_id in changed:
+      print("  ~ %s : %s -> %s" % (SYMBOL_TABLE.names[symbol_id],
+                                   STRING_POOL.value(previous[symbol_id]),
+                                   STRING_POOL.value(state[symbol_id])))
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # __state
+  #
+  # ---------------------------------------------------------------------------
+  def __state(self, version):
+    """ Return the (object id, state) of a version read from git. A missing
+    file has an empty state.
+    """
+
+    object_id, content = version
+    if content is None:
+      return (None, {})
+    with PROFILER.phase(PHASE_PARSE):
+      config = Config(self.cfg.config_path).load_buffer(content)
+    return (object_id, dict(zip(config.symbols, config.values)))
@@ -0,0 +1,991 @@
+#
+# The contents of this file are subject to the Apache 2.0 license you may not
+# use this file except in compliance with the License.
+#
+# Software distributed under the License is distributed on an "AS IS" basis,
+# WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License
+# for the specific language governing rights and limitations under the
+# License.
+#
+#
+# Copyright 2023 KCC project (http://www.firmwaretoolkit.org).
+# All rights reserved. Use is subject to license terms.
+#
+#
+# Contributors list :
+#
+#    William Bonnet     wllmbnnt@gmail.com, wbonnet@theitmakers.com
+#
+
+""" This module contains the Kconfig parser and the symbol dependency graph
+built from a kernel source tree.
+
+The parser understands the subset of the Kconfig language needed to know how
+symbols relate to each other : types, prompts, defaults, depends on, select and
+imply, including the dependencies inherited from enclosing if, menu and choice
+blocks. Expressions are kept as text, only the symbols they reference are
+extracted.
+
+Files are parsed from the top level Kconfig, following the source statements,
+thus the symbols of a sourced file inherit the conditions of the blocks around
+the statement. Macros in the sourced paths ($(SRCARCH) for instance) match any
+name, thus the definitions of every architecture are merged. Kconfig files not
+reached this way are then parsed on their own.
+
+Parsing the whole tree is slow, thus the graph is stored in a versioned index,
+validated against the list of the Kconfig files of the tree, and the size,
+modification time and hash of each of them.
+"""
+
+import os
+import re
+import glob
+import marshal
+import hashlib
+import logging
+import tempfile
+
+# Version of the index format. Must be increased each time the content of the
+# index or the parser output changes
+_INDEX_VERSION = 3
+
+# Extension of the index files
+_INDEX_EXTENSION = ".idx"
+
+# Prefix of the symbols in config files, not used in Kconfig files
+CONFIG_PREFIX = "CONFIG_"
+
+# Types of the symbols
+_TYPES = ("bool", "tristate", "string", "hex", "int")
+
+# Regular expressions used to split the lines and extract symbol references
+_KEYWORD_REGEX = re.compile(r'^(\S+)\s*(.*)$')
+_MACRO_REGEX = re.compile(r'\$\([^)]*\)')
+_QUOTED_REGEX = re.compile(r'"(?:[^"\\]|\\.)*"|\'(?:[^\'\\]|\\.)*\'')
+_TOKEN_REGEX = re.compile(r'[A-Za-z0-9_]+')
+_NUMBER_REGEX = re.compile(r'^(?:-?[0-9]+|0[xX][0-9a-fA-F]+)$')
+_IF_REGEX = re.compile(r'\s+if\s+')
+
+# Constant values, which are not symbol references
+_CONSTANTS = ("y", "m", "n")
+
+# Width of a tab, used to compute the indentation of help texts
+_TAB_WIDTH = 8
+
+# Tokens of the expressions
+_EXPRESSION_TOKEN_REGEX = re.compile(r'\s*(&&|\|\||!=|<=|>=|[!=<>()]|"(?:[^"\\]|\\.)*"'
+                                     r'|\'(?:[^\'\\]|\\.)*\'|\$\([^)]*\)|[^\s!=<>()&|]+)')
+
+# Tristate values used when evaluating expressions
+TRISTATE_VALUES = {"n": 0, "m": 1, "y": 2}
+TRISTATE_NAMES = ("n", "m", "y")
+
+# -----------------------------------------------------------------------------
+#
+# symbol_references
+#
+# -----------------------------------------------------------------------------
+def symbol_references(expression):
+  """ Return the list of symbols referenced by a Kconfig expression. Quoted
+  strings, macros, numbers and constants are ignored.
+  """
+
+  if not expression:
+    return []
+
+  expression = _QUOTED_REGEX.sub(" ", _MACRO_REGEX.sub(" ", expression))
+  return [token for token in _TOKEN_REGEX.findall(expression)
+          if token not in _CONSTANTS and not _NUMBER_REGEX.match(token)]
+
+
+
+# -----------------------------------------------------------------------------
+#
+# split_condition
+#
+# -----------------------------------------------------------------------------
+def split_condition(text):
+  """ Split a 'value if condition' text in a (value, condition) tuple. The
+  condition is None if there is no 'if'. Quoted strings are not searched.
+  """
+
+  masked = _QUOTED_REGEX.sub(lambda match: "_" * len(match.group(0)), text)
+  match = _IF_REGEX.search(masked)
+  if match is None:
+    return (text.strip(), None)
+  return (text[:match.start()].strip(), text[match.end():].strip())
+
+
+
+# -----------------------------------------------------------------------------
+#
+# strip_comment
+#
+# -----------------------------------------------------------------------------
+def strip_comment(line):
+  """ Remove the comment ending a line, if any. Quoted strings are kept.
+  """
+
+  if "#" not in line:
+    return line
+
+  masked = _QUOTED_REGEX.sub(lambda match: "_" * len(match.group(0)), line)
+  position = masked.find("#")
+  if position < 0:
+    return line
+  return line[:position]
+
+
+
+# -----------------------------------------------------------------------------
+#
+# class ExpressionEvaluator
+#
+# -----------------------------------------------------------------------------
+class ExpressionEvaluator(object):
+  """This class evaluates Kconfig expressions to a tristate value (0 for n,
+  1 for m, 2 for y). Symbol values are provided by a callable returning the
+  value of a symbol as a string (without quotes), 'n' if it is not defined.
+
+  Grammar, from the lowest to the highest priority :
+    expr := and ('||' and)*
+    and  := not ('&&' not)*
+    not  := '!' not | term (('=' | '!=' | '<' | '<=' | '>' | '>=') term)?
+    term := '(' expr ')' | symbol | constant
+  """
+
+  # ---------------------------------------------------------------------------
+  #
+  # __init__
+  #
+  # ---------------------------------------------------------------------------
+  def __init__(self, value_of):
+    """Default constructor
+    """
+
+    # Callable returning the value of a symbol
+    self.value_of = value_of
+
+    # Tokens of the expression beeing evaluated, and current position
+    self.tokens = []
+    self.position = 0
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # evaluate
+  #
+  # ---------------------------------------------------------------------------
+  def evaluate(self, expression):
+    """ Return the tristate value of an expression. An empty or None expression
+    is always true. Invalid expressions evaluate to n.
+    """
+
+    if expression is None or not expression.strip():
+      return 2
+
+    self.tokens = _EXPRESSION_TOKEN_REGEX.findall(expression)
+    self.position = 0
+    try:
+      result = self.__or()
+    except IndexError:
+      return 0
+    return result if self.position == len(self.tokens) else 0
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # value
+  #
+  # ---------------------------------------------------------------------------
+  def value(self, word):
+    """ Return the value of a word of an expression, which is either a constant
+    or a symbol
+    """
+
+    if word[:1] in ('"', "'"):
+      return word[1:-1]
+    if word in TRISTATE_VALUES or _NUMBER_REGEX.match(word):
+      return word
+    if word.startswith("$("):
+      return "n"
+    return self.value_of(word)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # __or
+  #
+  # ---------------------------------------------------------------------------
+  def __or(self):
+    """ Evaluate a || expression
+    """
+
+    result = self.__and()
+    while self.position < len(self.tokens) and self.tokens[self.position] == "||":
+      self.position += 1
+      result = max(result, self.__and())
+    return result
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # __and
+  #
+  # ---------------------------------------------------------------------------
+  def __and(self):
+    """ Evaluate a && expression
+    """
+
+    result = self.__not()
+    while self.position < len(self.tokens) and self.tokens[self.position] == "&&":
+      self.position += 1
+      result = min(result, self.__not())
+    return result
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # __not
+  #
+  # ---------------------------------------------------------------------------
+  def __not(self):
+    """ Evaluate a negation or a comparison
+    """
+
+    if self.tokens[self.position] == "!":
+      self.position += 1
+      return 2 - self.__not()
+
+    left = self.__term()
+    if self.position < len(self.tokens) and \
+       self.tokens[self.position] in ("=", "!=", "<", "<=", ">", ">="):
+      operator = self.tokens[self.position]
+      self.position += 1
+      right = self.__term()
+      return 2 if self.__compare(operator, left, right) else 0
+
+    if isinstance(left, int):
+      return left
+    return TRISTATE_VALUES.get(left, 0)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # __term
+  #
+  # ---------------------------------------------------------------------------
+  def __term(self):
+    """ Evaluate a term. Return an int for sub expressions, otherwise the string
+    value of the term
+    """
+
+    token = self.tokens[self.position]
+    self.position += 1
+    if token == "(":
+      result = self.__or()
+      if self.tokens[self.position] != ")":
+        raise IndexError(self.position)
+      self.position += 1
+      return result
+    return self.value(token)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # __compare
+  #
+  # ---------------------------------------------------------------------------
+  @staticmethod
+  def __compare(operator, left, right):
+    """ Compare two values. Numbers are compared as numbers, other values as
+    strings
+    """
+
+    if isinstance(left, int):
+      left = TRISTATE_NAMES[left]
+    if isinstance(right, int):
+      right = TRISTATE_NAMES[right]
+
+    try:
+      left, right = int(left, 0), int(right, 0)
+    except ValueError:
+      pass
+
+    if operator == "=":
+      return left == right
+    if operator == "!=":
+      return left != right
+    try:
+      if operator == "<":
+        return left < right
+      if operator == "<=":
+        return left <= right
+      if operator == ">":
+        return left > right
+      return left >= right
+    except TypeError:
+      return False
+
+
+
+# -----------------------------------------------------------------------------
+#
+# class KconfigSymbol
+#
+# -----------------------------------------------------------------------------
+class KconfigSymbol(object):
+  """This class stores the definition of a Kconfig symbol. When a symbol is
+  defined several times (per architecture for instance), the definitions are
+  merged.
+  """
+
+  __slots__ = ("name", "type", "prompt", "defaults", "depends", "selects", "implies")
+
+  # ---------------------------------------------------------------------------
+  #
+  # __init__
+  #
+  # ---------------------------------------------------------------------------
+  def __init__(self, name):
+    """Default constructor
+    """
+
+    # Name of the symbol, without the CONFIG_ prefix
+    self.name = name
+
+    # Type of the symbol (bool, tristate, string, hex or int), or None
+    self.type = None
+
+    # List of the conditions of the prompts of the symbol, None if unconditional.
+    # The symbol can be set by the user if one of them is true, it has no prompt
+    # if the list is empty
+    self.prompt = []
+
+    # List of (value, condition) defaults. Condition is None if unconditional
+    self.defaults = []
+
+    # List of depends on expressions, including the inherited ones
+    self.depends = []
+
+    # List of (symbol, condition) selected and implied by this symbol
+    self.selects = []
+    self.implies = []
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # to_tuple
+  #
+  # ---------------------------------------------------------------------------
+  def to_tuple(self):
+    """ Return the content of the symbol as plain tuples and lists, which can be
+    stored with marshal
+    """
+
+    return (self.type, self.prompt, self.defaults, self.depends, self.selects, self.implies)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # from_tuple
+  #
+  # ---------------------------------------------------------------------------
+  @classmethod
+  def from_tuple(cls, name, content):
+    """ Build a symbol from the output of to_tuple
+    """
+
+    symbol = cls(name)
+    (symbol.type, symbol.prompt, symbol.defaults, symbol.depends,
+     symbol.selects, symbol.implies) = content
+    return symbol
+
+
+
+# -----------------------------------------------------------------------------
+#
+# class KconfigParser
+#
+# -----------------------------------------------------------------------------
+class KconfigParser(object):
+  """This class implements the parser of Kconfig files. Files are parsed one
+  after the other, and the symbols are accumulated in the symbols dictionnary.
+  Source statements are followed when parsing a tree.
+  """
+
+  # ---------------------------------------------------------------------------
+  #
+  # __init__
+  #
+  # ---------------------------------------------------------------------------
+  def __init__(self):
+    """Default constructor
+    """
+
+    # Dictionnary of KconfigSymbol indexed by name
+    self.symbols = {}
+
+    # Root of the tree beeing parsed, source paths are relative to it. None when
+    # files are parsed on their own
+    self.tree = None
+
+    # Set of the files already parsed
+    self.parsed = set()
+
+    # Initialize the defaultlogger
+    self.logging = logging.getLogger()
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # symbol
+  #
+  # ---------------------------------------------------------------------------
+  def symbol(self, name):
+    """ Return the symbol of the given name, creating it if needed
+    """
+
+    symbol = self.symbols.get(name)
+    if symbol is None:
+      symbol = KconfigSymbol(name)
+      self.symbols[name] = symbol
+    return symbol
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # parse_file
+  #
+  # ---------------------------------------------------------------------------
+  def parse_tree(self, tree, filenames):
+    """ Parse the Kconfig files of a tree, starting from the top level Kconfig.
+    The given files which are not sourced from it are parsed on their own.
+    """
+
+    self.tree = tree
+    top_level = os.path.join(tree, "Kconfig")
+    if os.path.isfile(top_level):
+      self.parse_file(top_level)
+    for filename in filenames:
+      self.parse_file(filename)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # parse_file
+  #
+  # ---------------------------------------------------------------------------
+  def parse_file(self, filename, blocks=None):
+    """ Parse a Kconfig file, unless it has already been parsed. blocks is the
+    stack of the conditions inherited from the file sourcing it.
+    """
+
+    if filename in self.parsed:
+      return
+    self.parsed.add(filename)
+
+    with open(filename, 'r', encoding="utf-8", errors="replace") as working_file:
+      self.parse_lines(working_file, blocks, os.path.dirname(filename))
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # parse_lines
+  #
+  # ---------------------------------------------------------------------------
+  def parse_lines(self, lines, blocks=None, directory=None):
+    """ Parse the lines of a Kconfig file. blocks is the stack of the inherited
+    conditions, and directory the one of the file, used by rsource.
+    """
+
+    # Stack of the conditions of the enclosing if, menu and choice blocks. Each
+    # item is a list, since a block can have several depends on
+    blocks = [list(conditions) for conditions in blocks or []]
+
+    # Current entry. Either a KconfigSymbol, or the list of conditions of a menu
+    # or choice block beeing defined
+    current = None
+
+    # Help text handling
+    help_keyword_indent = None
+    help_indent = None
+
+    continued = ""
+    for raw_line in lines:
+      line = raw_line.rstrip("\n")
+
+      # Skip help texts. They end with the first line less indented than the
+      # first line of the text
+      if help_keyword_indent is not None:
+        if not line.strip():
+          continue
+        indent = len(line.expandtabs(_TAB_WIDTH)) - len(line.expandtabs(_TAB_WIDTH).lstrip())
+        if help_indent is None and indent > help_keyword_indent:
+          help_indent = indent
+          continue
+        if help_indent is not None and indent >= help_indent:
+          continue
+        help_keyword_indent = None
+        help_indent = None
+
+      # Join continued lines
+      if line.endswith("\\"):
+        continued += line[:-1] + " "
+        continue
+      line = continued + line
+      continued = ""
+
+      text = strip_comment(line).strip()
+      if not text:
+        continue
+
+      match = _KEYWORD_REGEX.match(text)
+      keyword, argument = match.group(1), match.group(2).strip()
+
+      if keyword in ("config", "menuconfig"):
+        current = self.symbol(argument)
+        for conditions in blocks:
+          current.depends.extend(conditions)
+
+      elif keyword in ("menu", "choice"):
+        current = []
+        blocks.append(current)
+
+      elif keyword == "if":
+        blocks.append([argument])
+        current = None
+
+      elif keyword in ("endif", "endmenu", "endchoice"):
+        if blocks:
+          blocks.pop()
+        current = None
+
+      elif keyword in ("help", "---help---"):
+        help_keyword_indent = len(line.expandtabs(_TAB_WIDTH)) - \
+                              len(line.expandtabs(_TAB_WIDTH).lstrip())
+
+      elif keyword in ("source", "osource", "rsource", "orsource"):
+        current = None
+        self.__source(keyword, argument, directory, blocks)
+
+      elif keyword in ("comment", "mainmenu"):
+        current = None
+
+      elif keyword == "depends":
+        expression = argument[3:].strip() if argument.startswith("on ") else argument
+        if isinstance(current, KconfigSymbol):
+          current.depends.append(expression)
+        elif current is not None:
+          current.append(expression)
+
+      elif isinstance(current, KconfigSymbol):
+        self.__parse_attribute(current, keyword, argument)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # __source
+  #
+  # ---------------------------------------------------------------------------
+  def __source(self, keyword, argument, directory, blocks):
+    """ Parse the files of a source statement, with the conditions of the
+    enclosing blocks. Nothing is done when the parser does not parse a tree.
+    """
+
+    if self.tree is None:
+      return
+
+    path = argument.strip().strip('"')
+    base = directory if keyword in ("rsource", "orsource") and directory else self.tree
+    filenames = sorted(glob.glob(os.path.join(base, _MACRO_REGEX.sub("*", path))))
+    if not filenames and keyword in ("source", "rsource"):
+      self.logging.debug("Sourced Kconfig file not found : %s", path)
+    for filename in filenames:
+      if os.path.isfile(filename):
+        self.parse_file(filename, blocks)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # __parse_attribute
+  #
+  # ---------------------------------------------------------------------------
+  @staticmethod
+  def __parse_attribute(symbol, keyword, argument):
+    """ Parse an attribute line of a config entry
+    """
+
+    if keyword in _TYPES:
+      symbol.type = keyword
+      if argument:
+        symbol.prompt.append(split_condition(argument)[1])
+
+    elif keyword in ("def_bool", "def_tristate"):
+      symbol.type = keyword[4:]
+      symbol.defaults.append(split_condition(argument))
+
+    elif keyword == "prompt":
+      symbol.prompt.append(split_condition(argument)[1])
+
+    elif keyword == "default":
+      symbol.defaults.append(split_condition(argument))
+
+    elif keyword == "select":
+      symbol.selects.append(split_condition(argument))
+
+    elif keyword == "imply":
+      symbol.implies.append(split_condition(argument))
+
+
+
+# -----------------------------------------------------------------------------
+#
+# class KconfigGraph
+#
+# -----------------------------------------------------------------------------
+class KconfigGraph(object):
+  """This class is the dependency graph of the symbols of a kernel tree. For
+  each symbol it knows the symbols it depends on (through depends on, prompt
+  conditions, defaults and enclosing blocks) and the symbols selecting or implying it.
+  """
+
+  # ---------------------------------------------------------------------------
+  #
+  # __init__
+  #
+  # ---------------------------------------------------------------------------
+  def __init__(self, symbols=None):
+    """Default constructor
+    """
+
+    # Dictionnary of KconfigSymbol indexed by name
+    self.symbols = symbols if symbols is not None else {}
+
+    # Reverse edges, built on demand : symbol name to the set of symbols it
+    # depends on, and symbol name to the set of symbols selecting or implying it
+    self.__parents = None
+    self.__selected_by = None
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # selected_by
+  #
+  # ---------------------------------------------------------------------------
+  def selected_by(self, name):
+    """ Return the set of symbols selecting or implying the given symbol
+    """
+
+    self.__build_edges()
+    return self.__selected_by.get(name, frozenset())
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # parents
+  #
+  # ---------------------------------------------------------------------------
+  def parents(self, name):
+    """ Return the set of symbols whose value can change the value of the given
+    symbol : dependencies, symbols referenced by defaults, and symbols selecting
+    or implying it
+    """
+
+    self.__build_edges()
+    return self.__parents.get(name, frozenset())
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # __build_edges
+  #
+  # ---------------------------------------------------------------------------
+  def __build_edges(self):
+    """ Compute the parents and selected_by sets of every symbol
+    """
+
+    if self.__parents is not None:
+      return
+
+    self.__parents = {}
+    self.__selected_by = {}
+    for name, symbol in self.symbols.items():
+      parents = set()
+      for expression in symbol.depends:
+        parents.update(symbol_references(expression))
+      for value, condition in symbol.defaults:
+        parents.update(symbol_references(value))
+        parents.update(symbol_references(condition))
+      for condition in symbol.prompt:
+        parents.update(symbol_references(condition))
+      parents.discard(name)
+      self.__parents[name] = parents
+
+      for target, _ in symbol.selects + symbol.implies:
+        self.__selected_by.setdefault(target, set()).add(name)
+
+    for target, selectors in self.__selected_by.items():
+      self.__parents.setdefault(target, set()).update(selectors)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # classify
+  #
+  # ---------------------------------------------------------------------------
+  def classify(self, differences):
+    """ Classify a set of differing symbols (config names, with the CONFIG_
+    prefix) as root or derived differences. A difference is derived when one of
+    its parents also differs, since it may only be the consequence of it.
+
+    Return a dictionnary mapping each difference to the sorted list of the
+    differing parents causing it. The list is empty for root differences.
+    """
+
+    prefix_length = len(CONFIG_PREFIX)
+    names = {symbol[prefix_length:] if symbol.startswith(CONFIG_PREFIX) else symbol
+             for symbol in differences}
+
+    result = {}
+    for symbol in differences:
+      name = symbol[prefix_length:] if symbol.startswith(CONFIG_PREFIX) else symbol
+      causes = self.parents(name) & names
+      result[symbol] = sorted(CONFIG_PREFIX + cause for cause in causes)
+    return result
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # to_data
+  #
+  # ---------------------------------------------------------------------------
+  def to_data(self):
+    """ Return the graph as plain data, which can be stored with marshal
+    """
+
+    return {name: symbol.to_tuple() for name, symbol in self.symbols.items()}
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # from_data
+  #
+  # ---------------------------------------------------------------------------
+  @classmethod
+  def from_data(cls, data):
+    """ Build a graph from the output of to_data
+    """
+
+    return cls({name: KconfigSymbol.from_tuple(name, content)
+                for name, content in data.items()})
+
+
+
+# -----------------------------------------------------------------------------
+#
+# class KconfigIndex
+#
+# -----------------------------------------------------------------------------
+class KconfigIndex(object):
+  """This class manages the on-disk index of the Kconfig graphs. There is one
+  index file per kernel tree. It stores the graph, and the size, modification
+  time and hash of each Kconfig file of the tree.
+
+  When loading, files are only hashed if their size or modification time
+  changed. The graph is rebuilt only if a file content actually changed.
+  """
+
+  # ---------------------------------------------------------------------------
+  #
+  # __init__
+  #
+  # ---------------------------------------------------------------------------
+  def __init__(self, path):
+    """Default constructor
+    """
+
+    # Directory storing the index files
+    self.path = path
+
+    # Initialize the defaultlogger
+    self.logging = logging.getLogger()
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # load
+  #
+  # ---------------------------------------------------------------------------
+  def load(self, tree):
+    """ Return the KconfigGraph of a kernel tree, from the index if it is up to
+    date, otherwise by parsing the tree then updating the index
+    """
+
+    tree = os.path.abspath(tree)
+    index_file = os.path.join(self.path, hashlib.sha1(tree.encode("utf-8", "surrogateescape"))
+                              .hexdigest() + _INDEX_EXTENSION)
+
+    content = self.__read(index_file)
+    if content is not None:
+      files, data = content
+      files, changed = self.__check_files(tree, files)
+      if files is not None:
+        self.logging.debug("Loaded Kconfig index of %s", tree)
+        if changed:
+          self.__write(index_file, files, data)
+        return KconfigGraph.from_data(data)
+
+    self.logging.debug("Building Kconfig index of %s", tree)
+    parser = KconfigParser()
+    files = []
+    filenames = self.find_kconfig_files(tree)
+    for filename in filenames:
+      status = os.stat(filename)
+      files.append((os.path.relpath(filename, tree), status.st_size, status.st_mtime_ns,
+                    self.__hash_file(filename)))
+    parser.parse_tree(tree, filenames)
+
+    graph = KconfigGraph(parser.symbols)
+    self.__write(index_file, files, graph.to_data())
+    return graph
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # find_kconfig_files
+  #
+  # ---------------------------------------------------------------------------
+  @staticmethod
+  def find_kconfig_files(tree):
+    """ Return the sorted list of the Kconfig files of a tree
+    """
+
+    result = []
+    for directory, subdirectories, filenames in os.walk(tree):
+      # Skip hidden directories (.git, etc.)
+      subdirectories[:] = [name for name in subdirectories if not name.startswith(".")]
+      for filename in filenames:
+        if filename == "Kconfig" or filename.startswith("Kconfig."):
+          result.append(os.path.join(directory, filename))
+    return sorted(result)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # __check_files
+  #
+  # ---------------------------------------------------------------------------
+  def __check_files(self, tree, files):
+    """ Check the files recorded in an index are unchanged, and that no Kconfig
+    file has been added to the tree. Return the updated list of files (None if
+    a content or the list changed) and a flag set if the modification time of a
+    file changed without changing its content.
+    """
+
+    names = [os.path.relpath(filename, tree) for filename in self.find_kconfig_files(tree)]
+    if names != [entry[0] for entry in files]:
+      return (None, True)
+
+    result = []
+    changed = False
+    for name, size, mtime, content_hash in files:
+      filename = os.path.join(tree, name)
+      try:
+        status = os.stat(filename)
+      except OSError:
+        return (None, True)
+
+      if status.st_size == size and status.st_mtime_ns == mtime:
+        result.append((name, size, mtime, content_hash))
+        continue
+
+      if status.st_size != size or self.__hash_file(filename) != content_hash:
+        return (None, True)
+      result.append((name, size, status.st_mtime_ns, content_hash))
+      changed = True
+
+    return (result, changed)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # __hash_file
+  #
+  # ---------------------------------------------------------------------------
+  @staticmethod
+  def __hash_file(filename):
+    """ Return the hash of the content of a file
+    """
+
+    with open(filename, 'rb') as working_file:
+      return hashlib.sha1(working_file.read()).hexdigest()
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # __read
+  #
+  # ---------------------------------------------------------------------------
+  def __read(self, index_file):
+    """ Return the (files, data) content of an index file, or None if it does
+    not exist, is not valid or has another version
+    """
+
+    try:
+      with open(index_file, 'rb') as working_file:
+        version, files, data = marshal.load(working_file)
+    except (OSError, EOFError, ValueError, TypeError):
+      return None
+
+    if version != _INDEX_VERSION:
+      return None
+    return (files, data)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # __write
+  #
+  # ---------------------------------------------------------------------------
+  def __write(self, index_file, files, data):
+    """ Write an index file. The file is written to a temporary file renamed
+    once complete.
+    """
+
+    try:
+      os.makedirs(self.path, exist_ok=True)
+      descriptor, temporary = tempfile.mkstemp(dir=self.path)
+      with os.fdopen(descriptor, 'wb') as working_file:
+        marshal.dump((_INDEX_VERSION, files, data), working_file)
+      os.replace(temporary, index_file)
+    except OSError as exception:
+      # The index is only an optimization, failing to write it is not an error
+      self.logging.warning("Cannot write Kconfig index : %s", exception.strerror)
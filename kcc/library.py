@@ -0,0 +1,467 @@
+#
+# The contents of this file are subject to the Apache 2.0 license you may not
+# use this file except in compliance with the License.
+#
+# Software distributed under the License is distributed on an "AS IS" basis,
+# WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License
+# for the specific language governing rights and limitations under the
+# License.
+#
+#
+# Copyright 2023 KCC project (http://www.firmwaretoolkit.org).
+# All rights reserved. Use is subject to license terms.
+#
+#
+# Contributors list :
+#
+#    William Bonnet     wllmbnnt@gmail.com, wbonnet@theitmakers.com
+#
+
+""" This module contains the index of the test script library. The metadata of
+a script is defined in the comment lines at the top of the script, for
+instance :
+
+  #!/bin/sh
+  # kcc-id: NET-0012
+  # kcc-description: Check the network drivers are built as modules
+  # kcc-category: network drivers
+  # kcc-args: config [arch]
+
+The id and the description are mandatory. The categories and the names of the
+arguments are separated by spaces, optional arguments beeing between brackets.
+
+The index of a library directory is stored in a JSON file named after the hash
+of the directory path. Each script is indexed by its path relative to the
+directory, with its size, modification time and mode, thus only the new or
+changed scripts are read again. They are read by a pool of worker threads.
+
+The index is shared by the commands using the library : check-library, check-
+suite and run resolve the script names through it.
+"""
+
+import os
+import re
+import json
+import hashlib
+import logging
+import tempfile
+import concurrent.futures
+from kcc.model import Key
+
+# Version of the index files. Must be increased each time their content changes
+_VERSION = 1
+
+# Extension of the index files
+_INDEX_EXTENSION = ".json"
+
+# Metadata line of the scripts
+_METADATA = re.compile(r"#\s*kcc-([\w-]+)\s*:\s*(.*?)\s*$")
+
+# Metadata fields
+FIELD_ID = "id"
+FIELD_DESCRIPTION = "description"
+FIELD_CATEGORY = "category"
+FIELD_ARGS = "args"
+_FIELDS = (FIELD_ID, FIELD_DESCRIPTION, FIELD_CATEGORY, FIELD_ARGS)
+_MANDATORY_FIELDS = (FIELD_ID, FIELD_DESCRIPTION)
+
+# Positions of the values of the index entries
+_SIZE = 0
+_MTIME = 1
+_MODE = 2
+_METADATA_ENTRY = 3
+_ERRORS = 4
+
+# -----------------------------------------------------------------------------
+#
+# library_directories
+#
+# -----------------------------------------------------------------------------
+def library_directories(cfg):
+  """ Return the library directories given on the command line, or defined in
+  the configuration file
+  """
+
+  directories = cfg.library
+  if not directories and cfg.configuration is not None:
+    directories = cfg.configuration.get(Key.TEST_LIBRARY_PATH.value)
+  if isinstance(directories, str):
+    directories = [directories]
+  return [os.path.expanduser(directory) for directory in directories or []]
+
+
+
+# -----------------------------------------------------------------------------
+#
+# read_metadata
+#
+# -----------------------------------------------------------------------------
+def read_metadata(path):
+  """ Read the metadata block of a script. Return a (metadata, errors) tuple,
+  where metadata is a dictionary of the fields, and errors the list of the
+  problems found in the block. Raise OSError if the script cannot be read.
+  """
+
+  metadata = {}
+  errors = []
+  with open(path, 'r', errors="replace") as working_file:
+    for line_number, line in enumerate(working_file, 1):
+      line = line.strip()
+      if line_number == 1 and line.startswith("#!"):
+        continue
+      # The block ends at the first line which is not a comment
+      if line and not line.startswith("#"):
+        break
+      match = _METADATA.match(line)
+      if match is None:
+        continue
+
+      field, value = match.groups()
+      if field not in _FIELDS:
+        errors.append("line %d : unknown metadata field '%s'" % (line_number, field))
+      elif field in metadata:
+        errors.append("line %d : metadata field '%s' is defined twice" % (line_number, field))
+      elif field in (FIELD_CATEGORY, FIELD_ARGS):
+        metadata[field] = value.split()
+      else:
+        metadata[field] = value
+
+  for field in _MANDATORY_FIELDS:
+    if not metadata.get(field):
+      errors.append("metadata field '%s' is missing" % field)
+  try:
+    parse_args(metadata.get(FIELD_ARGS, []))
+  except ValueError as exception:
+    errors.append(str(exception))
+  return (metadata, errors)
+
+
+
+# -----------------------------------------------------------------------------
+#
+# parse_args
+#
+# -----------------------------------------------------------------------------
+def parse_args(names):
+  """ Return the (minimum, maximum) number of arguments of a script from the
+  names of its arguments. Raise ValueError if a mandatory argument follows an
+  optional one.
+  """
+
+  optional = [name.startswith("[") and name.endswith("]") for name in names]
+  mandatory = optional.count(False)
+  if any(optional[:mandatory]):
+    raise ValueError("mandatory arguments must be declared before the optional ones")
+  return (mandatory, len(names))
+
+
+
+# -----------------------------------------------------------------------------
+#
+# class LibraryIndex
+#
+# -----------------------------------------------------------------------------
+class LibraryIndex(object):
+  """This class implements the index of the scripts of a set of library
+  directories. Scripts are identified by their name, that is their path
+  relative to the library directory. When several directories contain the
+  same name, the first one wins, as when the scripts are run.
+  """
+
+  # ---------------------------------------------------------------------------
+  #
+  # __init__
+  #
+  # ---------------------------------------------------------------------------
+  def __init__(self, directories, index_path=None, jobs=1, fallback=()):
+    """Default constructor
+    """
+
+    # Library directories, in search order
+    self.directories = directories
+
+    # Directories searched, without beeing indexed, for the scripts which are
+    # not in the library (the directory of the suite file for instance), and
+    # the paths already found there, indexed by name
+    self.fallback = list(fallback)
+    self.fallback_paths = {}
+
+    # Directory storing the index files. None if the index is not persistent
+    self.index_path = index_path
+
+    # Number of worker threads reading the scripts
+    self.jobs = max(1, jobs)
+
+    # Index entries of each directory, indexed by script name. Each entry is a
+    # [size, mtime, mode, metadata, errors] list
+    self.entries = {}
+
+    # Paths of the scripts, and names of the scripts defining an id (several
+    # names if the id is not unique), indexed by name and by id
+    self.paths = {}
+    self.ids = {}
+
+    # Number of scripts indexed, and number of scripts read during the update
+    self.indexed = 0
+    self.scanned = 0
+
+    # Initialize the defaultlogger
+    self.logging = logging.getLogger()
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # update
+  #
+  # ---------------------------------------------------------------------------
+  def update(self):
+    """ Bring the index up to date with the library directories, reading only
+    the new or changed scripts, and store it
+    """
+
+    changed = []
+    for directory in self.directories:
+      previous = self.__read_index(directory)
+      entries = self.entries[directory] = {}
+      for name, status in self.__walk(directory):
+        entry = previous.get(name)
+        if entry is None or entry[_SIZE] != status.st_size or \
+           entry[_MTIME] != status.st_mtime_ns or entry[_MODE] != status.st_mode:
+          entry = [status.st_size, status.st_mtime_ns, status.st_mode, {}, []]
+          changed.append((os.path.join(directory, name), entry))
+        entries[name] = entry
+
+    # Scripts are read by the workers, each one filling its own entry
+    with concurrent.futures.ThreadPoolExecutor(max_workers=self.jobs) as executor:
+      for _ in executor.map(self.__scan, changed):
+        pass
+    self.scanned = len(changed)
+
+    for directory in self.directories:
+      self.__write_index(directory)
+    self.__build()
+    return self
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # find
+  #
+  # ---------------------------------------------------------------------------
+  def find(self, name):
+    """ Return the path of a script, or None if it is neither in the library
+    nor in the fallback directories
+    """
+
+    path = self.paths.get(os.path.normpath(name))
+    if path is not None:
+      return path
+
+    if name not in self.fallback_paths:
+      if os.path.isabs(name):
+        path = name if os.path.isfile(name) else None
+      else:
+        for directory in self.fallback:
+          candidate = os.path.join(directory, name)
+          if os.path.isfile(candidate):
+            path = candidate
+            break
+      self.fallback_paths[name] = path
+    return self.fallback_paths[name]
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # metadata
+  #
+  # ---------------------------------------------------------------------------
+  def metadata(self, name):
+    """ Return the metadata of a script, or None if it is not in the library
+    """
+
+    entry = self.__entry(name)
+    return entry[_METADATA_ENTRY] if entry is not None else None
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # errors
+  #
+  # ---------------------------------------------------------------------------
+  def errors(self):
+    """ Generator returning the (path, message) of the problems found in the
+    scripts of all the directories, including the scripts hidden by another one
+    """
+
+    for directory in self.directories:
+      for name, entry in sorted(self.entries[directory].items()):
+        path = os.path.join(directory, name)
+        for message in entry[_ERRORS]:
+          yield (path, message)
+        if not entry[_MODE] & 0o111:
+          yield (path, "script is not executable")
+
+    for script_id, names in sorted(self.ids.items()):
+      if len(names) > 1:
+        for name in names:
+          yield (self.paths[name], "id '%s' is also defined by %s" %
+                 (script_id, ", ".join(self.paths[other] for other in names if other != name)))
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # __build
+  #
+  # ---------------------------------------------------------------------------
+  def __build(self):
+    """ Build the name and id lookup tables
+    """
+
+    self.paths = {}
+    self.ids = {}
+    for directory in self.directories:
+      for name in self.entries[directory]:
+        if name not in self.paths:
+          self.paths[name] = os.path.join(directory, name)
+    for name in self.paths:
+      script_id = self.metadata(name).get(FIELD_ID)
+      if script_id:
+        self.ids.setdefault(script_id, []).append(name)
+    self.indexed = len(self.paths)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # __entry
+  #
+  # ---------------------------------------------------------------------------
+  def __entry(self, name):
+    """ Return the index entry of a script, or None if it is not in the library
+    """
+
+    name = os.path.normpath(name)
+    for directory in self.directories:
+      entry = self.entries[directory].get(name)
+      if entry is not None:
+        return entry
+    return None
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # __scan
+  #
+  # ---------------------------------------------------------------------------
+  @staticmethod
+  def __scan(work):
+    """ Read the metadata of a script into its index entry
+    """
+
+    path, entry = work
+    try:
+      entry[_METADATA_ENTRY], entry[_ERRORS] = read_metadata(path)
+    except OSError as exception:
+      entry[_ERRORS] = ["cannot be read : " + exception.strerror]
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # __walk
+  #
+  # ---------------------------------------------------------------------------
+  @staticmethod
+  def __walk(directory):
+    """ Generator returning the (name, stat) of the files of a directory and of
+    its sub directories. Hidden files and directories are skipped.
+    """
+
+    pending = [""]
+    while pending:
+      relative = pending.pop()
+      try:
+        iterator = os.scandir(os.path.join(directory, relative))
+      except OSError:
+        continue
+      with iterator:
+        for entry in iterator:
+          if entry.name.startswith("."):
+            continue
+          name = os.path.join(relative, entry.name)
+          if entry.is_dir():
+            pending.append(name)
+          elif entry.is_file():
+            yield (name, entry.stat())
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # __index_filename
+  #
+  # ---------------------------------------------------------------------------
+  def __index_filename(self, directory):
+    """ Return the path of the index file of a directory
+    """
+
+    name = hashlib.sha1(os.path.abspath(directory).encode()).hexdigest()
+    return os.path.join(self.index_path, name + _INDEX_EXTENSION)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # __read_index
+  #
+  # ---------------------------------------------------------------------------
+  def __read_index(self, directory):
+    """ Return the entries stored in the index file of a directory, or an empty
+    dictionary if there is no valid index
+    """
+
+    if self.index_path is None:
+      return {}
+    try:
+      with open(self.__index_filename(directory), 'r') as working_file:
+        index = json.load(working_file)
+    except (OSError, ValueError):
+      return {}
+    if not isinstance(index, dict) or index.get("version") != _VERSION:
+      return {}
+    return index.get("scripts", {})
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # __write_index
+  #
+  # ---------------------------------------------------------------------------
+  def __write_index(self, directory):
+    """ Atomically store the index of a directory. Failures are only logged,
+    since the index is an optimization.
+    """
+
+    if self.index_path is None:
+      return
+    content = json.dumps({"version": _VERSION, "directory": os.path.abspath(directory),
+                          "scripts": self.entries[directory]})
+    try:
+      os.makedirs(self.index_path, exist_ok=True)
+      handle, temporary_path = tempfile.mkstemp(dir=self.index_path)
+      try:
+        with os.fdopen(handle, 'w') as working_file:
+          working_file.write(content)
+        os.replace(temporary_path, self.__index_filename(directory))
+      except OSError:
+        os.unlink(temporary_path)
+        raise
+    except OSError as exception:
+      self.logging.warning("Cannot write the library index : %s", exception.strerror)
@@ -0,0 +1,147 @@
+#
+# The contents of this file are subject to the Apache 2.0 license you may not
+# use this file except in compliance with the License.
+#
+# Software distributed under the License is distributed on an "AS IS" basis,
+# WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License
+# for the specific language governing rights and limitations under the
+# License.
+#
+#
+# Copyright 2023 KCC project (http://www.firmwaretoolkit.org).
+# All rights reserved. Use is subject to license terms.
+#
+#
+# Contributors list :
+#
+#    William Bonnet     wllmbnnt@gmail.com, wbonnet@theitmakers.com
+#
+
+""" This module contains the implementation of the merge command. It applies a
+list of fragments to a base config, in order, the same way the merge_config.sh
+script from the kernel sources does, but in a single pass over the files.
+"""
+
+from kcc.model import Config, SYMBOL_TABLE
+from kcc.parse_cache import ParseCache, load_config
+from kcc.profiling import PROFILER, PHASE_OPERATORS, PHASE_OUTPUT
+
+# Name of the file written when no output is given, as merge_config.sh does
+DEFAULT_OUTPUT = ".config"
+
+# -----------------------------------------------------------------------------
+#
+# class FragmentMerger
+#
+# -----------------------------------------------------------------------------
+class FragmentMerger(object):
+  """This class implements the merge command. The first input is the base
+  config, the following ones are the fragments applied in order.
+
+  Values are tracked in a single dictionnary indexed by symbol id, thus the
+  merge is linear in the total number of lines. A symbol redefined by a fragment
+  keeps its position in the output.
+  """
+
+  # ---------------------------------------------------------------------------
+  #
+  # __init__
+  #
+  # ---------------------------------------------------------------------------
+  def __init__(self, cfg):
+    """Default constructor
+    """
+
+    # Configuration object storing the command line arguments
+    self.cfg = cfg
+
+    # Number of symbols redefined with a different value, and with the same value
+    self.redefined = 0
+    self.redundant = 0
+
+    # Redefinition messages, formatted as merge_config.sh does
+    self.messages = []
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # merge
+  #
+  # ---------------------------------------------------------------------------
+  def merge(self):
+    """ Entry point of the merge command
+    """
+
+    cache = None
+    if self.cfg.use_parse_cache:
+      cache = ParseCache(self.cfg.parse_cache_path, self.cfg.parse_cache_size)
+
+    try:
+      configs = [load_config(filename, cache) for filename in self.cfg.inputs]
+    except OSError as exception:
+      self.cfg.logging.critical("Error: " + exception.filename + "- " + exception.strerror)
+      exit(1)
+
+    with PROFILER.phase(PHASE_OPERATORS):
+      result = self.merge_configs(configs[0], configs[1:])
+
+    output = self.cfg.output if self.cfg.output is not None else DEFAULT_OUTPUT
+    with PROFILER.phase(PHASE_OUTPUT):
+      for message in self.messages:
+        print(message)
+        print()
+      result.write(output)
+    self.cfg.logging.info("Merged %d fragments into %s (%d redefined, %d redundant)",
+                          len(configs) - 1, output, self.redefined, self.redundant)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # merge_configs
+  #
+  # ---------------------------------------------------------------------------
+  def merge_configs(self, base, fragments):
+    """ Apply the fragments to the base config and return the resulting Config.
+    Redefined symbols are recorded in the messages as they are found.
+    """
+
+    values = dict(zip(base.symbols, base.values))
+
+    for fragment in fragments:
+      for symbol_id, value_id in zip(fragment.symbols, fragment.values):
+        previous = values.get(symbol_id)
+        if previous is None:
+          values[symbol_id] = value_id
+        elif previous != value_id:
+          self.redefined += 1
+          self.report("redefined", fragment, symbol_id, previous, value_id)
+          values[symbol_id] = value_id
+        else:
+          self.redundant += 1
+          if self.cfg.warn_redundant:
+            self.report("redundant", fragment, symbol_id, previous, value_id)
+
+    result = Config(self.cfg.output)
+    for symbol_id, value_id in values.items():
+      result.append(symbol_id, value_id)
+    return result
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # report
+  #
+  # ---------------------------------------------------------------------------
+  def report(self, kind, fragment, symbol_id, previous, value_id):
+    """ Record a redefinition message, formatted as merge_config.sh does
+    """
+
+    self.messages.append("Value of %s is %s by fragment %s:\n"
+                         "Previous  value: %s\n"
+                         "New value:       %s" % (SYMBOL_TABLE.name(symbol_id), kind,
+                                                  fragment.filename,
+                                                  Config.format_line(symbol_id, previous),
+                                                  Config.format_line(symbol_id, value_id)))
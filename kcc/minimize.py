@@ -0,0 +1,234 @@
+#
+# The contents of this file are subject to the Apache 2.0 license you may not
+# use this file except in compliance with the License.
+#
+# Software distributed under the License is distributed on an "AS IS" basis,
+# WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License
+# for the specific language governing rights and limitations under the
+# License.
+#
+#
+# Copyright 2023 KCC project (http://www.firmwaretoolkit.org).
+# All rights reserved. Use is subject to license terms.
+#
+#
+# Contributors list :
+#
+#    William Bonnet     wllmbnnt@gmail.com, wbonnet@theitmakers.com
+#
+
+""" This module contains the fragment minimizer. It shrinks the result of an
+except operation to the smallest fragment reproducing the target config once
+merged on the base config, the same way 'make savedefconfig' does, but using
+the Kconfig graph instead of running the kconfig tools.
+
+An entry is dropped when the value kconfig would compute for the symbol
+without it is already the target value. The computation uses the target values
+of the other symbols : every entry either is kept, or is reproduced from values
+which are themselves kept or reproduced, thus a single pass over the entries is
+enough.
+"""
+
+from kcc.model import Config, SYMBOL_TABLE, STRING_POOL
+from kcc.kconfig import CONFIG_PREFIX, TRISTATE_VALUES, TRISTATE_NAMES, ExpressionEvaluator
+
+# Types of the symbols handled as tristates
+_TRISTATE_TYPES = ("bool", "tristate")
+
+# -----------------------------------------------------------------------------
+#
+# unquote
+#
+# -----------------------------------------------------------------------------
+def unquote(value):
+  """ Remove the quotes around a string value
+  """
+
+  if len(value) >= 2 and value[0] == '"' and value[-1] == '"':
+    return value[1:-1].replace('\\"', '"').replace('\\\\', '\\')
+  return value
+
+
+
+# -----------------------------------------------------------------------------
+#
+# config_values
+#
+# -----------------------------------------------------------------------------
+def config_values(config):
+  """ Return a dictionnary mapping the symbols of a config (without the CONFIG_
+  prefix) to their unquoted values
+  """
+
+  prefix_length = len(CONFIG_PREFIX)
+  return {symbol[prefix_length:]: unquote(value) for symbol, value in config.items()}
+
+
+
+# -----------------------------------------------------------------------------
+#
+# class FragmentMinimizer
+#
+# -----------------------------------------------------------------------------
+class FragmentMinimizer(object):
+  """This class removes from a fragment the entries kconfig would compute by
+  itself, using a KconfigGraph. Entries of symbols unknown to the graph are
+  always kept.
+  """
+
+  # ---------------------------------------------------------------------------
+  #
+  # __init__
+  #
+  # ---------------------------------------------------------------------------
+  def __init__(self, graph):
+    """Default constructor
+    """
+
+    # Kconfig dependency graph
+    self.graph = graph
+
+    # Values of the target and base configs, indexed by Kconfig name
+    self.target = {}
+    self.base = {}
+
+    # Evaluator of the expressions, using the target values
+    self.evaluator = ExpressionEvaluator(lambda name: self.target.get(name, "n"))
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # minimize
+  #
+  # ---------------------------------------------------------------------------
+  def minimize(self, fragment, target, base=None):
+    """ Return a new Config holding the entries of the fragment which are needed
+    to reproduce the target once merged on the base config. If base is None,
+    the fragment is minimized against the Kconfig defaults (savedefconfig).
+    """
+
+    self.target = config_values(target)
+    self.base = config_values(base) if base is not None else {}
+
+    prefix_length = len(CONFIG_PREFIX)
+    names = SYMBOL_TABLE.names
+    result = Config(fragment.filename)
+    for symbol_id, value_id in zip(fragment.symbols, fragment.values):
+      name = names[symbol_id]
+      if name.startswith(CONFIG_PREFIX):
+        name = name[prefix_length:]
+      if self.is_needed(name, unquote(STRING_POOL.value(value_id))):
+        result.append(symbol_id, value_id)
+    return result
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # is_needed
+  #
+  # ---------------------------------------------------------------------------
+  def is_needed(self, name, value):
+    """ Return True if the entry assigning the value to the symbol is needed
+    in the fragment
+    """
+
+    symbol = self.graph.symbols.get(name)
+    if symbol is None:
+      return True
+
+    # Symbols without visible prompt cannot be set by a fragment, kconfig
+    # computes them
+    if self.visibility(symbol)[1] == 0:
+      return False
+
+    return self.computed_value(symbol) != value
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # visibility
+  #
+  # ---------------------------------------------------------------------------
+  def visibility(self, symbol):
+    """ Return the (dependencies, prompt) tristate levels of a symbol. The first
+    one limits the defaults, the second one, which includes the conditions of
+    the prompts, limits the user value. The prompt level is 0 without prompt.
+    """
+
+    evaluate = self.evaluator.evaluate
+    dependencies = min([evaluate(expression) for expression in symbol.depends] + [2])
+    prompt = max([evaluate(condition) for condition in symbol.prompt] + [0])
+    return (dependencies, min(dependencies, prompt))
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # computed_value
+  #
+  # ---------------------------------------------------------------------------
+  def computed_value(self, symbol):
+    """ Return the value kconfig would give to a symbol if the fragment does not
+    define it, or None if the symbol would not be output at all
+    """
+
+    evaluate = self.evaluator.evaluate
+    dependencies, visibility = self.visibility(symbol)
+    user_value = self.base.get(symbol.name)
+
+    if symbol.type not in _TRISTATE_TYPES:
+      if dependencies == 0:
+        return None
+      if user_value is not None and visibility > 0:
+        return user_value
+      for value, condition in symbol.defaults:
+        if evaluate(condition):
+          return unquote(self.evaluator.value(value))
+      return None
+
+    # The user value is only used when the prompt is visible, otherwise the
+    # defaults and implies apply, limited by the dependencies
+    if user_value is not None and visibility > 0:
+      value = min(TRISTATE_VALUES.get(user_value, 0), visibility)
+    else:
+      value = 0
+      for default, condition in symbol.defaults:
+        condition_value = evaluate(condition)
+        if condition_value:
+          value = min(evaluate(default), condition_value, dependencies)
+          break
+      value = max(value, min(self.__reverse_level(symbol.name, implied=True), dependencies))
+
+    value = max(value, self.__reverse_level(symbol.name, implied=False))
+
+    # Bool symbols cannot be modules
+    if symbol.type == "bool" and value == 1:
+      value = 2
+    return TRISTATE_NAMES[value]
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # __reverse_level
+  #
+  # ---------------------------------------------------------------------------
+  def __reverse_level(self, name, implied):
+    """ Return the highest level a symbol is selected (or implied) to by the
+    other symbols, according to their target values
+    """
+
+    evaluate = self.evaluator.evaluate
+    level = 0
+    for selector_name in self.graph.selected_by(name):
+      selector = self.graph.symbols[selector_name]
+      selector_value = TRISTATE_VALUES.get(self.target.get(selector_name, "n"), 0)
+      if selector_value == 0:
+        continue
+      for target, condition in (selector.implies if implied else selector.selects):
+        if target == name:
+          level = max(level, min(selector_value, evaluate(condition)))
+    return level
@@ -20,12 +20,22 @@
 """ This module contains the definition of the constants used in the kcc tool,
 and the definition of the configuration clsss. The class implements the methods
 used to load its content fom yaml configuration file.
+
+It also contains the compact in-memory representation of kernel config files.
+Symbol names and values are interned once per process, and each config only
+stores parallel arrays of integer codes.
 """
 
 import os
+import mmap
+import shlex
+import array
 import logging
 from enum import Enum
-import yaml
+from kcc.defconfig_line import value_type_of
+from kcc.config_input import scan_input
+from kcc.profiling import PROFILER, COUNTER_FILES, COUNTER_LINES, COUNTER_SYMBOLS, \
+                          COUNTER_BYTES_READ, COUNTER_BYTES_WRITTEN
 
 
 # -----------------------------------------------------------------------------
@@ -44,35 +54,111 @@ class Key(Enum):
   # Define each and every key and associated string used in the tool
   AGGREGATION_LEVEL = "aggregation_level"
   ARGS = "args"
+  BATCH = "batch"
   CATEGORY = "category"
   CHECK_LIBRARY = "check-library"
   CHECK_SUITE = "check-suite"
+  CONFIG_PATH = "config_path"
+  COMPARE = "compare"
+  CORPUS = "corpus"
+  EVAL = "eval"
+  EXPRESSIONS = "expressions"
+  FACTOR = "factor"
   FAIL_FAST = "fail_fast"
+  HISTORY = "history"
+  IDLE_TIMEOUT = "idle_timeout"
+  INDEX = "index"
+  INDEX_ACTION = "index_action"
+  INDEX_ARGUMENTS = "index_arguments"
+  INDEX_BUILD = "build"
+  INDEX_QUERY = "query"
+  INPUTS = "inputs"
+  JOBS = "jobs"
+  KCONFIG = "kconfig"
+  KCONFIG_INDEX_PATH = "kconfig_index_path"
   LIBRARY = "library"
+  LIBRARY_INDEX_PATH = "library_index_path"
   LOG_LEVEL = "log_level"
   LOG_LEVEL_INFO = "INFO"
+  MATRIX = "matrix"
+  MEMORY_LIMIT = "memory_limit"
+  MERGE = "merge"
+  METRIC = "metric"
+  METRIC_HAMMING = "hamming"
+  METRIC_JACCARD = "jaccard"
+  MINIMIZE = "minimize"
+  NO_PARSE_CACHE = "no_parse_cache"
   NO_RESULT_CACHE = "no_result_cache"
   ONLY_ERRORS = "only_errors"
+  OUTPUT = "output"
+  OP_CONCAT = "concat"
+  OP_EXCEPT = "except"
+  OP_INTERSECT = "intersect"
   OPT_AGGREGATION_LEVEL = "--aggregation-level"
   OPT_CATEGORY = "--category"
   OPT_FAIL_FAST = "--fail-fast"
+  OPT_IDLE_TIMEOUT = "--idle-timeout"
+  OPT_INDEX = "--index"
   OPT_HELP_COMMAND = "Command to execute"
+  OPT_JOBS = "--jobs"
+  OPT_KCONFIG = "--kconfig"
   OPT_LIBRARY = "--library"
   OPT_LOG_LEVEL = "--log-level"
+  OPT_MATRIX = "--matrix"
+  OPT_MEMORY_LIMIT = "--memory-limit"
+  OPT_METRIC = "--metric"
+  OPT_MINIMIZE = "--minimize"
   OPT_ONLY_ERRORS = "--only-errors"
+  OPT_PLAN = "--plan"
+  OPT_OUTPUT = "--output"
+  OPT_PROFILE = "--profile"
+  OPT_PROFILE_PSTATS = "--profile-pstats"
+  OPT_QUORUM = "--quorum"
+  OPT_REFERENCE = "--reference"
+  OPT_SERVER = "--server"
+  OPT_SOCKET = "--socket"
+  OPT_SORT_BUFFER = "--sort-buffer"
+  OPT_SORTED = "--sorted"
+  OPT_STREAM = "--stream"
   OPT_SUITE = "--suite"
   OPT_SHOW_HINTS = "--show-hints"
+  OPT_THRESHOLD = "--threshold"
+  OPT_WARN_REDUNDANT = "--warn-redundant"
+  OPT_NO_PARSE_CACHE = "--no-parse-cache"
   OPT_NO_RESULT_CACHE = "--no-result-cache"
+  PARSE_CACHE_PATH = "parse_cache_path"
+  PLAN = "plan"
+  PARSE_CACHE_SIZE = "parse_cache_size"
+  PROFILE = "profile"
+  PROFILE_PSTATS = "profile_pstats"
+  QUORUM = "quorum"
+  REFERENCE = "reference"
+  REPOSITORY = "repository"
+  REVISIONS = "revisions"
+  RESULT_CACHE_ENVIRONMENT = "result_cache_environment"
+  RESULT_CACHE_PATH = "result_cache_path"
+  RESULT_CACHE_SIZE = "result_cache_size"
+  RESULT_CACHE_TTL = "result_cache_ttl"
   RUN_SUITE = "run"
+  SERVE = "serve"
+  SERVER = "server"
+  SOCKET_PATH = "socket_path"
+  SORT_BUFFER = "sort_buffer"
+  SORTED = "sorted"
+  STREAM = "stream"
   SCRIPT = "script"
   DESCRIPTION = "description"
   SUITE = "suite"
+  SUITE_CACHE_PATH = "suite_cache_path"
+  SYMBOL_INDEX_PATH = "symbol_index_path"
   SHOW_HINTS = "show_hints"
   TEST = "test"
   TEST_LIBRARY_PATH = "test_library_path"
   TEST_SUITE = "test-suite"
   TEST_SUITE_PATH = "test_suite_path"
+  THRESHOLD = "threshold"
   UTF8 = "utf-8"
+  WARN_REDUNDANT = "warn_redundant"
   OUTPUT_RESULT_PADDING = 75
 
 
@@ -121,6 +207,12 @@ class Configuration(object):
     # Floag used to know if we have to display the hints or not
     self.show_hints = None
 
+    # Flag used to stop at the first failed test
+    self.fail_fast = False
+
+    # Flag used to output only the failed tests
+    self.only_errors = False
+
     # Defines the path to the directory containing the test scripts
     self.library = None
 
@@ -138,6 +230,123 @@ class Configuration(object):
     # diffrent argument values)
     self.use_results_cache = True
 
+    # Directory storing the script results, its maximum size in bytes, the time
+    # to live of a result in seconds, and the names of the environment variables
+    # which may change the result of a script. All can be defined in the
+    # configuration file
+    self.result_cache_path = os.path.expanduser("~/.cache/kcc/results")
+    self.result_cache_size = 64 * 1024 * 1024
+    self.result_cache_ttl = 7 * 24 * 3600
+    self.result_cache_environment = ["PATH"]
+
+    # Path to the reference config used by the compare command
+    self.reference = None
+
+    # List of files, directories or glob patterns of the configs to compare
+    self.inputs = None
+
+    # Number of worker processes. Defaults to the number of CPU
+    self.jobs = os.cpu_count() or 1
+
+    # Directory where the fragments produced by the compare command are written.
+    # Default value is None, which means fragments are not written
+    self.output = None
+
+    # Path of the CSV file receiving the matrix of differences. Default value is
+    # None, which means the matrix is output on stdout
+    self.matrix = None
+
+    # Flag used to activate the persistent cache of parsed config files
+    self.use_parse_cache = True
+
+    # Directory storing the parse cache, and its maximum size in bytes. Both can
+    # be defined in the configuration file
+    self.parse_cache_path = os.path.expanduser("~/.cache/kcc/parse")
+    self.parse_cache_size = 256 * 1024 * 1024
+
+    # Flag used to report symbols redefined with the same value by a fragment
+    self.warn_redundant = False
+
+    # Path to the kernel source tree providing the Kconfig files. Default value
+    # is None, which means dependencies between symbols are not known
+    self.kconfig = None
+
+    # Directory storing the Kconfig indexes. It can be defined in the
+    # configuration file
+    self.kconfig_index_path = os.path.expanduser("~/.cache/kcc/kconfig")
+
+    # Operator applied by the except, concat and intersect commands
+    self.operator = None
+
+    # Flag used to shrink the result of except to a minimal fragment
+    self.minimize = False
+
+    # Flag used to run the operators in streaming mode, flag telling the inputs
+    # are already sorted by symbol name, and memory used to sort the inputs
+    # which are not, in bytes
+    self.stream = False
+    self.sorted = False
+    self.sort_buffer_size = 64 * 1024 * 1024
+
+    # Operator expressions evaluated by the eval command, and path of the file
+    # containing more expressions, one per line
+    self.expressions = None
+    self.plan = None
+
+    # Path of the git repository, path of the config file in the repository,
+    # and revision range walked by the history command
+    self.repository = None
+    self.config_path = None
+    self.revisions = None
+
+    # Metric used by the corpus command to compare configs, and similarity
+    # (jaccard) or distance (hamming) threshold of the near-identical configs.
+    # Default value of the threshold is None, which means the metric default
+    self.metric = Key.METRIC_JACCARD.value
+    self.threshold = None
+
+    # Ratio of the configs which must share a setting for the factor command
+    # to put it in the base. The default value gives the intersect of all the
+    # configs
+    self.quorum = 1.0
+
+    # Action of the index command (build or query), and words of the query
+    self.index_action = None
+    self.query = None
+
+    # Path of the index of the settings of a corpus of configs. It can be
+    # defined in the configuration file
+    self.symbol_index_path = os.path.expanduser("~/.cache/kcc/symbols.idx")
+
+    # Destination of the profiling report, a file path or '-' for stderr.
+    # Default value is None, which means profiling is deactivated
+    self.profile = None
+
+    # Path of the pstats file written by cProfile. Default value is None, which
+    # means cProfile is not used
+    self.profile_pstats = None
+
+    # Directory storing the compiled test suites. It can be defined in the
+    # configuration file
+    self.suite_cache_path = os.path.expanduser("~/.cache/kcc/suite")
+
+    # Directory storing the index of the test script library. It can be defined
+    # in the configuration file
+    self.library_index_path = os.path.expanduser("~/.cache/kcc/library")
+
+    # Path of the Unix socket of the kcc server. It can be defined in the
+    # configuration file
+    self.socket_path = os.path.expanduser("~/.cache/kcc/server.sock")
+
+    # Flag used to send the request to the kcc server instead of running it
+    self.server = False
+
+    # Memory used by the configs kept by the server before evicting them, in bytes
+    # (given in MiB by the memory_limit setting and the --memory-limit option),
+    # and delay in seconds after which an unused config is evicted
+    self.memory_limit = 512 * 1024 * 1024
+    self.idle_timeout = 600
+
   # ---------------------------------------------------------------------------
   #
   # load_configuration
@@ -161,18 +370,66 @@ class Configuration(object):
     try:
       # Check it the configuration file exist
       if os.path.isfile(self.filename):
-        # Yes then, load it
-        with open(self.filename, 'r') as working_file:
-          self.configuration = yaml.load(working_file)
-
-          # Now we may have to expand a few paths...
-          # First check if the configurationis really defined
-          if self.configuration is not None:
-            # First let's process test_suite_path
-            if Key.TEST_SUITE_PATH.value in self.configuration:
-              # Check if path starts with ~ and need expension
-              self.configuration[Key.TEST_SUITE_PATH.value] = \
-                          os.path.expanduser(self.configuration[Key.TEST_SUITE_PATH.value])
+        # Yes then, load it. yaml_cache is imported here, thus the commands
+        # which do not load any YAML file do not pay for its import
+        from kcc.yaml_cache import load_yaml
+        self.configuration = load_yaml(self.filename, self.logging)
+
+        # Now we may have to expand a few paths...
+        # First check if the configurationis really defined
+        if self.configuration is not None:
+          # First let's process test_suite_path
+          if Key.TEST_SUITE_PATH.value in self.configuration:
+            # Check if path starts with ~ and need expension
+            self.configuration[Key.TEST_SUITE_PATH.value] = \
+                        os.path.expanduser(self.configuration[Key.TEST_SUITE_PATH.value])
+
+          # Then the parse cache location and size
+          if Key.PARSE_CACHE_PATH.value in self.configuration:
+            self.parse_cache_path = \
+                        os.path.expanduser(self.configuration[Key.PARSE_CACHE_PATH.value])
+          if Key.PARSE_CACHE_SIZE.value in self.configuration:
+            self.parse_cache_size = int(self.configuration[Key.PARSE_CACHE_SIZE.value])
+
+          # And the Kconfig index location
+          if Key.KCONFIG_INDEX_PATH.value in self.configuration:
+            self.kconfig_index_path = \
+                        os.path.expanduser(self.configuration[Key.KCONFIG_INDEX_PATH.value])
+
+          # And the settings index location
+          if Key.SYMBOL_INDEX_PATH.value in self.configuration:
+            self.symbol_index_path = \
+                        os.path.expanduser(self.configuration[Key.SYMBOL_INDEX_PATH.value])
+
+          # And the compiled test suite cache location
+          if Key.SUITE_CACHE_PATH.value in self.configuration:
+            self.suite_cache_path = \
+                        os.path.expanduser(self.configuration[Key.SUITE_CACHE_PATH.value])
+
+          # And the library index location
+          if Key.LIBRARY_INDEX_PATH.value in self.configuration:
+            self.library_index_path = \
+                        os.path.expanduser(self.configuration[Key.LIBRARY_INDEX_PATH.value])
+
+          # And the script result cache location, size, time to live and inputs
+          if Key.RESULT_CACHE_PATH.value in self.configuration:
+            self.result_cache_path = \
+                        os.path.expanduser(self.configuration[Key.RESULT_CACHE_PATH.value])
+          if Key.RESULT_CACHE_SIZE.value in self.configuration:
+            self.result_cache_size = int(self.configuration[Key.RESULT_CACHE_SIZE.value])
+          if Key.RESULT_CACHE_TTL.value in self.configuration:
+            self.result_cache_ttl = float(self.configuration[Key.RESULT_CACHE_TTL.value])
+          if Key.RESULT_CACHE_ENVIRONMENT.value in self.configuration:
+            self.result_cache_environment = \
+                        list(self.configuration[Key.RESULT_CACHE_ENVIRONMENT.value] or [])
+
+          # And the server socket location, memory limit and idle timeout
+          if Key.SOCKET_PATH.value in self.configuration:
+            self.socket_path = os.path.expanduser(self.configuration[Key.SOCKET_PATH.value])
+          if Key.MEMORY_LIMIT.value in self.configuration:
+            self.memory_limit = int(self.configuration[Key.MEMORY_LIMIT.value]) * 1024 * 1024
+          if Key.IDLE_TIMEOUT.value in self.configuration:
+            self.idle_timeout = float(self.configuration[Key.IDLE_TIMEOUT.value])
 
     # Catch all OSError exceptions that may have occured. Mostly file errors...
     except OSError as exception:
@@ -180,6 +437,71 @@ class Configuration(object):
       self.logging.critical("Error: " + exception.filename + "- " + exception.strerror)
       exit(1)
 
+# -----------------------------------------------------------------------------
+#
+# class TestCase
+#
+# -----------------------------------------------------------------------------
+class TestCase(object):
+  """This class defines a test of a test suite, that is a leaf of the suite
+  tree : a script and its arguments. Categories are inherited from the
+  enclosing nodes.
+  """
+
+  __slots__ = ("path", "descriptions", "script", "args", "categories")
+
+  # ---------------------------------------------------------------------------
+  #
+  # __init__
+  #
+  # ---------------------------------------------------------------------------
+  def __init__(self, path, descriptions, script, args, categories):
+    """Default constructor
+    """
+
+    # Position of the test in the suite tree, as a tuple of indexes starting at 1
+    self.path = path
+
+    # Descriptions of the enclosing nodes and of the test itself
+    self.descriptions = descriptions
+
+    # Name of the script, and list of its arguments
+    self.script = script
+    self.args = args
+
+    # Set of the categories of the test
+    self.categories = categories
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # identifier
+  #
+  # ---------------------------------------------------------------------------
+  def identifier(self):
+    """ Return the position of the test in the suite tree, such as 2.1.3
+    """
+
+    return ".".join(str(index) for index in self.path)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # __str__
+  #
+  # ---------------------------------------------------------------------------
+  def __str__(self):
+    """ Return the identifier and the descriptions of the test
+    """
+
+    # Nodes without description do not add an empty component
+    descriptions = [description for description in self.descriptions if description]
+    return self.identifier() + " " + " / ".join(descriptions)
+
+
+
 # -----------------------------------------------------------------------------
 #
 # class TestSuite
@@ -192,6 +514,11 @@ class TestSuite(object):
   YAML description of this object.
 
   This class provides method needed to load the test description.
+
+  The suite file contains a test-suite list of nodes. Each node has a
+  description, optional categories (a name or a list of names), and either a
+  script with its optional args (a list, a number, or a string split as a shell
+  would), or a test list of child nodes.
   """
 
   # ---------------------------------------------------------------------------
@@ -199,7 +526,7 @@ class TestSuite(object):
   # __init__
   #
   # ---------------------------------------------------------------------------
-  def __init__(self, filename=None):
+  def __init__(self, filename=None, cache_path=None):
     """
     """
 
@@ -208,6 +535,10 @@ class TestSuite(object):
     if filename is not None:
       self.filename = filename
 
+    # Directory of the compiled suite cache. Default value is None, which means
+    # the suite is loaded from the YAML file on each run
+    self.cache_path = cache_path
+
     # Initialize the defaultlogger
     self.logging = logging.getLogger()
 
@@ -241,9 +572,9 @@ class TestSuite(object):
     try:
       # Check it the configuration file exist
       if os.path.isfile(self.filename):
-        # Yes then, load it
-        with open(self.filename, 'r') as working_file:
-          self.suite = yaml.load(working_file)
+        # Yes then, load it, through the compiled cache if any
+        from kcc.yaml_cache import load_yaml
+        self.suite = load_yaml(self.filename, self.logging, self.cache_path)
       else:
         # No then output an error
         self.logging.critical("The file " + self.filename + " does not exist. Aborting.")
@@ -253,3 +584,595 @@ class TestSuite(object):
     except OSError as exception:
       self.logging.critical("Error: " + exception.filename + "- " + exception.strerror)
       exit(1)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # tests
+  #
+  # ---------------------------------------------------------------------------
+  def tests(self, errors=None):
+    """ Generator returning the TestCase of each script of the suite, in suite
+    order. Raise ValueError if a node of the suite is not valid, unless errors
+    is a list, in which case the messages are appended to it and the invalid
+    nodes are skipped.
+    """
+
+    if not isinstance(self.suite, dict) or \
+       not isinstance(self.suite.get(Key.TEST_SUITE.value), list):
+      message = "The suite must contain a '" + Key.TEST_SUITE.value + "' list"
+      if errors is None:
+        raise ValueError(message)
+      errors.append(message)
+      return
+
+    # Stack of the nodes to walk, as (nodes, index of the next node, path,
+    # descriptions, categories) lists. Memory is proportional to the depth
+    stack = [[self.suite[Key.TEST_SUITE.value], 0, (), (), frozenset()]]
+    while stack:
+      level = stack[-1]
+      nodes, index, path, descriptions, categories = level
+      if index >= len(nodes):
+        stack.pop()
+        continue
+      level[1] += 1
+
+      node = nodes[index]
+      node_path = path + (index + 1,)
+      location = ".".join(str(position) for position in node_path)
+      message = None
+      args = None
+      if not isinstance(node, dict):
+        message = "Test " + location + " is not a mapping"
+      elif Key.TEST.value in node:
+        if not isinstance(node[Key.TEST.value], list):
+          message = "The '" + Key.TEST.value + "' of test " + location + " is not a list"
+      elif Key.SCRIPT.value in node:
+        args = node.get(Key.ARGS.value, [])
+        if isinstance(args, str):
+          try:
+            args = shlex.split(args)
+          except ValueError as exception:
+            message = "The '" + Key.ARGS.value + "' of test " + location + " : " + \
+                      str(exception)
+        elif isinstance(args, list):
+          args = [str(arg) for arg in args]
+        elif isinstance(args, dict):
+          message = "The '" + Key.ARGS.value + "' of test " + location + \
+                    " is neither a list nor a scalar"
+        else:
+          args = [str(args)]
+      else:
+        message = "Test " + location + " has neither '" + Key.SCRIPT.value + \
+                  "' nor '" + Key.TEST.value + "'"
+      if message is not None:
+        if errors is None:
+          raise ValueError(message)
+        errors.append(message)
+        continue
+
+      node_descriptions = descriptions + (str(node.get(Key.DESCRIPTION.value, "")),)
+      node_categories = node.get(Key.CATEGORY.value, [])
+      if isinstance(node_categories, str):
+        node_categories = [node_categories]
+      node_categories = categories | frozenset(str(name) for name in node_categories)
+
+      if args is None:
+        stack.append([node[Key.TEST.value], 0, node_path, node_descriptions, node_categories])
+        continue
+      yield TestCase(node_path, node_descriptions, str(node[Key.SCRIPT.value]), args,
+                     node_categories)
+
+
+
+# -----------------------------------------------------------------------------
+#
+# class Tristate
+#
+# -----------------------------------------------------------------------------
+class Tristate(Enum):
+  """This class defines the codes stored in the tristate column of a Config.
+  Symbols whose value is not y, m or n use the NONE code.
+  """
+
+  NONE = -1
+  NO = 0
+  MODULE = 1
+  YES = 2
+
+# Tristate codes of the raw tristate values
+TRISTATE_CODES = {b"y": Tristate.YES.value, b"m": Tristate.MODULE.value, b"n": Tristate.NO.value}
+
+
+# -----------------------------------------------------------------------------
+#
+# class SymbolTable
+#
+# -----------------------------------------------------------------------------
+class SymbolTable(object):
+  """This class interns the CONFIG_ symbol names. Each name is stored once per
+  process and identified by a small integer, allocated in order of first use.
+
+  Names are indexed by the raw bytes read from the files, which avoids decoding
+  each and every line while loading.
+  """
+
+  __slots__ = ("ids", "names")
+
+  # ---------------------------------------------------------------------------
+  #
+  # __init__
+  #
+  # ---------------------------------------------------------------------------
+  def __init__(self):
+    """Default constructor
+    """
+
+    # Dictionnary mapping encoded names to their id
+    self.ids = {}
+
+    # List of names (str) indexed by id
+    self.names = []
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # intern
+  #
+  # ---------------------------------------------------------------------------
+  def intern(self, name):
+    """ Return the id of the given name (str or bytes), allocating a new id if
+    the name is not yet known
+    """
+
+    if isinstance(name, str):
+      name = name.encode(Key.UTF8.value, "surrogateescape")
+
+    symbol_id = self.ids.get(name)
+    if symbol_id is None:
+      symbol_id = len(self.names)
+      self.ids[name] = symbol_id
+      self.names.append(name.decode(Key.UTF8.value, "surrogateescape"))
+    return symbol_id
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # lookup
+  #
+  # ---------------------------------------------------------------------------
+  def lookup(self, name):
+    """ Return the id of the given name (str or bytes), or None if the name has
+    never been interned
+    """
+
+    if isinstance(name, str):
+      name = name.encode(Key.UTF8.value, "surrogateescape")
+    return self.ids.get(name)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # name
+  #
+  # ---------------------------------------------------------------------------
+  def name(self, symbol_id):
+    """ Return the name associated to a symbol id
+    """
+
+    return self.names[symbol_id]
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # __len__
+  #
+  # ---------------------------------------------------------------------------
+  def __len__(self):
+    """ Return the number of interned symbols
+    """
+
+    return len(self.names)
+
+
+
+# -----------------------------------------------------------------------------
+#
+# class StringPool
+#
+# -----------------------------------------------------------------------------
+class StringPool(object):
+  """This class interns the values assigned to symbols. The raw bytes of each
+  distinct value are appended once to a shared buffer, and values are identified
+  by their index in the pool. Value type and tristate code are computed once per
+  distinct value and stored in parallel arrays.
+  """
+
+  __slots__ = ("ids", "data", "starts", "types", "tristates")
+
+  # ---------------------------------------------------------------------------
+  #
+  # __init__
+  #
+  # ---------------------------------------------------------------------------
+  def __init__(self):
+    """Default constructor
+    """
+
+    # Dictionnary mapping raw values to their index in the pool
+    self.ids = {}
+
+    # Shared buffer storing the bytes of every distinct value
+    self.data = bytearray()
+
+    # Offsets of the values in the buffer. There is one more offset than there
+    # are values, the last one being the end of the buffer
+    self.starts = array.array('I', [0])
+
+    # ValueType code of each value
+    self.types = array.array('B')
+
+    # Tristate code of each value
+    self.tristates = array.array('b')
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # intern
+  #
+  # ---------------------------------------------------------------------------
+  def intern(self, value):
+    """ Return the index of the given value (str or bytes), adding it to the
+    pool if needed
+    """
+
+    if isinstance(value, str):
+      value = value.encode(Key.UTF8.value, "surrogateescape")
+
+    value_id = self.ids.get(value)
+    if value_id is None:
+      value_id = len(self.types)
+      self.ids[value] = value_id
+      self.data += value
+      self.starts.append(len(self.data))
+      self.types.append(value_type_of(value).value)
+      self.tristates.append(TRISTATE_CODES.get(value, Tristate.NONE.value))
+    return value_id
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # raw
+  #
+  # ---------------------------------------------------------------------------
+  def raw(self, value_id):
+    """ Return the bytes of a value
+    """
+
+    return bytes(self.data[self.starts[value_id]:self.starts[value_id + 1]])
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # value
+  #
+  # ---------------------------------------------------------------------------
+  def value(self, value_id):
+    """ Return a value as a string
+    """
+
+    return self.raw(value_id).decode(Key.UTF8.value, "surrogateescape")
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # __len__
+  #
+  # ---------------------------------------------------------------------------
+  def __len__(self):
+    """ Return the number of distinct values
+    """
+
+    return len(self.types)
+
+
+
+# Process wide tables shared by all the Config objects
+SYMBOL_TABLE = SymbolTable()
+STRING_POOL = StringPool()
+
+# -----------------------------------------------------------------------------
+#
+# class Config
+#
+# -----------------------------------------------------------------------------
+class Config(object):
+  """This class is the in-memory representation of a kernel config file. Only
+  symbol assignments are kept (comments and blank lines are dropped), in the
+  order they appear in the file.
+
+  Each assignment is stored as one entry in four parallel arrays. There is no
+  object or dictionnary per line : symbol and value are interned in the process
+  wide SYMBOL_TABLE and STRING_POOL, and referenced by their integer ids. Two
+  configs assigning the same value to a symbol store the same pair of integers.
+
+  When a symbol is assigned several times in a file, the last value is kept, as
+  kconfig does.
+  """
+
+  __slots__ = ("filename", "symbols", "values", "tristates", "types")
+
+  # ---------------------------------------------------------------------------
+  #
+  # __init__
+  #
+  # ---------------------------------------------------------------------------
+  def __init__(self, filename=None):
+    """Default constructor
+    """
+
+    # Path of the file the config was loaded from, if any
+    self.filename = filename
+
+    # Symbol id of each entry
+    self.symbols = array.array('I')
+
+    # Index of the value of each entry in the STRING_POOL
+    self.values = array.array('I')
+
+    # Tristate code of each entry
+    self.tristates = array.array('b')
+
+    # ValueType code of each entry
+    self.types = array.array('B')
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # load
+  #
+  # ---------------------------------------------------------------------------
+  def load(self, filename=None):
+    """ This method load the content of a config file. The file is memory
+    mapped and scanned without beeing split into a list of lines.
+    """
+
+    # If a new filename has been passed as argument, then store it
+    if filename is not None:
+      self.filename = filename
+
+    with open(self.filename, 'rb') as working_file:
+      # Empty files cannot be memory mapped
+      if os.fstat(working_file.fileno()).st_size == 0:
+        return self
+
+      with mmap.mmap(working_file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        self.load_buffer(buffer)
+
+        if PROFILER.enabled:
+          PROFILER.count(COUNTER_FILES)
+          PROFILER.count(COUNTER_BYTES_READ, len(buffer))
+          PROFILER.count(COUNTER_SYMBOLS, len(self))
+
+    return self
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # load_buffer
+  #
+  # ---------------------------------------------------------------------------
+  def load_buffer(self, buffer):
+    """ This method load the content of a config held in a buffer (bytes or
+    mmap). Compressed configs and kernel images embedding their config are
+    decoded on the fly (see kcc.config_input). Entries are appended to the
+    already loaded content.
+    """
+
+    self.load_records(scan_input(buffer, self.filename))
+    return self
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # load_records
+  #
+  # ---------------------------------------------------------------------------
+  def load_records(self, records):
+    """ This method load the raw records produced by DefconfigParser.scan.
+    Entries are appended to the already loaded content.
+    """
+
+    # The scanner produces one record per line, counting them avoids another
+    # pass over the buffer
+    if PROFILER.enabled:
+      records = self.__count_lines(records)
+
+    # Comments, blank and invalid lines are not stored
+    return self.load_pairs((symbol, value) for _, symbol, value, _ in records
+                           if symbol is not None)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # __count_lines
+  #
+  # ---------------------------------------------------------------------------
+  @staticmethod
+  def __count_lines(records):
+    """ Pass the records through, and count them as lines once consumed
+    """
+
+    lines = 0
+    for record in records:
+      lines += 1
+      yield record
+    PROFILER.count(COUNTER_LINES, lines)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # load_pairs
+  #
+  # ---------------------------------------------------------------------------
+  def load_pairs(self, pairs):
+    """ This method load (symbol, value) pairs of raw bytes, such as those read
+    from the parse cache. Entries are appended to the already loaded content.
+    """
+
+    # Local references avoid attribute lookups in the loop
+    symbol_ids = SYMBOL_TABLE.ids
+    value_ids = STRING_POOL.ids
+    symbols = self.symbols
+    values = self.values
+
+    for symbol, value in pairs:
+      symbol_id = symbol_ids.get(symbol)
+      if symbol_id is None:
+        symbol_id = SYMBOL_TABLE.intern(symbol)
+      value_id = value_ids.get(value)
+      if value_id is None:
+        value_id = STRING_POOL.intern(value)
+
+      symbols.append(symbol_id)
+      values.append(value_id)
+
+    self.__update_columns()
+    return self
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # append
+  #
+  # ---------------------------------------------------------------------------
+  def append(self, symbol_id, value_id):
+    """ Add an entry to the config. Callers are responsible for not adding the
+    same symbol twice.
+    """
+
+    self.symbols.append(symbol_id)
+    self.values.append(value_id)
+    self.tristates.append(STRING_POOL.tristates[value_id])
+    self.types.append(STRING_POOL.types[value_id])
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # __update_columns
+  #
+  # ---------------------------------------------------------------------------
+  def __update_columns(self):
+    """ Remove duplicated symbols (last assignment wins) then rebuild the
+    tristate and type columns from the value column
+    """
+
+    if len(set(self.symbols)) != len(self.symbols):
+      last = {symbol_id: row for row, symbol_id in enumerate(self.symbols)}
+      rows = [row for row, symbol_id in enumerate(self.symbols) if last[symbol_id] == row]
+      self.symbols = array.array('I', [self.symbols[row] for row in rows])
+      self.values = array.array('I', [self.values[row] for row in rows])
+
+    tristates = STRING_POOL.tristates
+    types = STRING_POOL.types
+    self.tristates = array.array('b', [tristates[value_id] for value_id in self.values])
+    self.types = array.array('B', [types[value_id] for value_id in self.values])
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # items
+  #
+  # ---------------------------------------------------------------------------
+  def items(self):
+    """ Generator yielding (symbol, value) string pairs, in file order
+    """
+
+    names = SYMBOL_TABLE.names
+    for symbol_id, value_id in zip(self.symbols, self.values):
+      yield names[symbol_id], STRING_POOL.value(value_id)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # format_line
+  #
+  # ---------------------------------------------------------------------------
+  @staticmethod
+  def format_line(symbol_id, value_id):
+    """ Return the config line (without end of line) assigning a value to a
+    symbol. Symbols set to n are output as 'is not set' comments.
+    """
+
+    if STRING_POOL.tristates[value_id] == Tristate.NO.value:
+      return "# " + SYMBOL_TABLE.names[symbol_id] + " is not set"
+    return SYMBOL_TABLE.names[symbol_id] + "=" + STRING_POOL.value(value_id)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # to_text
+  #
+  # ---------------------------------------------------------------------------
+  def to_text(self):
+    """ Return the content of the config as it would be written in a config
+    file. Symbols set to n are output as 'is not set' comments.
+    """
+
+    names = SYMBOL_TABLE.names
+    no_code = Tristate.NO.value
+    lines = []
+    for symbol_id, value_id, tristate in zip(self.symbols, self.values, self.tristates):
+      if tristate == no_code:
+        lines.append("# " + names[symbol_id] + " is not set\n")
+      else:
+        lines.append(names[symbol_id] + "=" + STRING_POOL.value(value_id) + "\n")
+    return "".join(lines)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # write
+  #
+  # ---------------------------------------------------------------------------
+  def write(self, filename):
+    """ Write the config to the given file, using a single buffered write
+    """
+
+    data = self.to_text().encode(Key.UTF8.value, "surrogateescape")
+    with open(filename, 'wb') as working_file:
+      working_file.write(data)
+    PROFILER.count(COUNTER_BYTES_WRITTEN, len(data))
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # __len__
+  #
+  # ---------------------------------------------------------------------------
+  def __len__(self):
+    """ Return the number of symbols assigned by the config
+    """
+
+    return len(self.symbols)
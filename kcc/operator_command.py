@@ -0,0 +1,208 @@
+#
+# The contents of this file are subject to the Apache 2.0 license you may not
+# use this file except in compliance with the License.
+#
+# Software distributed under the License is distributed on an "AS IS" basis,
+# WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License
+# for the specific language governing rights and limitations under the
+# License.
+#
+#
+# Copyright 2023 KCC project (http://www.firmwaretoolkit.org).
+# All rights reserved. Use is subject to license terms.
+#
+#
+# Contributors list :
+#
+#    William Bonnet     wllmbnnt@gmail.com, wbonnet@theitmakers.com
+#
+
+""" This module contains the implementation of the except, concat and intersect
+commands. The operator is applied to the config files given on the command line
+and the resulting fragment is written to a file or to stdout.
+
+In streaming mode, the inputs are not loaded but joined as they are read (see
+kcc.streaming).
+"""
+
+import os
+import sys
+from kcc.model import Key
+from kcc import streaming
+from kcc.operators import OperandSet, OperatorEngine
+from kcc.parse_cache import ParseCache, load_config
+from kcc.kconfig import KconfigIndex
+from kcc.minimize import FragmentMinimizer
+from kcc.profiling import PROFILER, PHASE_KCONFIG, PHASE_OPERATORS, PHASE_OUTPUT, \
+                          COUNTER_BYTES_WRITTEN
+
+# -----------------------------------------------------------------------------
+#
+# class OperatorCommand
+#
+# -----------------------------------------------------------------------------
+class OperatorCommand(object):
+  """This class implements the operator commands. The operator to apply is the
+  command word stored in the configuration.
+  """
+
+  # ---------------------------------------------------------------------------
+  #
+  # __init__
+  #
+  # ---------------------------------------------------------------------------
+  def __init__(self, cfg):
+    """Default constructor
+    """
+
+    # Configuration object storing the command line arguments
+    self.cfg = cfg
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # run_operator
+  #
+  # ---------------------------------------------------------------------------
+  def run_operator(self):
+    """ Entry point of the operator commands
+    """
+
+    if self.cfg.stream:
+      self.run_stream()
+      return
+
+    cache = None
+    if self.cfg.use_parse_cache:
+      cache = ParseCache(self.cfg.parse_cache_path, self.cfg.parse_cache_size)
+
+    try:
+      configs = [load_config(filename, cache) for filename in self.cfg.inputs]
+    except OSError as exception:
+      self.cfg.logging.critical("Error: " + exception.filename + "- " + exception.strerror)
+      exit(1)
+
+    graph = None
+    if self.cfg.minimize and self.cfg.kconfig is not None:
+      with PROFILER.phase(PHASE_KCONFIG):
+        graph = KconfigIndex(self.cfg.kconfig_index_path).load(self.cfg.kconfig)
+
+    try:
+      operands = [OperandSet.from_config(config) for config in configs]
+      result = self.apply_operator(configs, operands, graph)
+    except ValueError as exception:
+      self.cfg.logging.critical(str(exception))
+      exit(1)
+
+    with PROFILER.phase(PHASE_OUTPUT):
+      if self.cfg.output is not None:
+        result.write(self.cfg.output)
+      else:
+        data = result.to_text().encode(Key.UTF8.value, "surrogateescape")
+        sys.stdout.buffer.write(data)
+        PROFILER.count(COUNTER_BYTES_WRITTEN, len(data))
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # apply_operator
+  #
+  # ---------------------------------------------------------------------------
+  def apply_operator(self, configs, operands, graph=None):
+    """ Apply the operator to the loaded configs and their operands, then
+    minimize the result using the Kconfig graph if requested. Return the
+    resulting Config. Raise ValueError if the options are not consistent.
+    """
+
+    if self.cfg.minimize and (self.cfg.operator != Key.OP_EXCEPT.value or graph is None):
+      raise ValueError("Minimization requires the except operator and the Kconfig "
+                       "tree (" + Key.OPT_KCONFIG.value + "). Aborting.")
+
+    with PROFILER.phase(PHASE_OPERATORS):
+      engine = OperatorEngine()
+      result = engine.apply(self.cfg.operator, operands).to_config(self.cfg.output, configs)
+
+      if self.cfg.minimize:
+        base = None
+        if len(operands) > 1:
+          base = engine.concat(*operands[1:]).to_config(order=configs[1:])
+        size = len(result)
+        result = FragmentMinimizer(graph).minimize(result, configs[0], base)
+        self.cfg.logging.debug("Fragment minimized from %d to %d entries", size, len(result))
+
+    return result
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # run_stream
+  #
+  # ---------------------------------------------------------------------------
+  def run_stream(self):
+    """ Apply the operator in streaming mode. Each input is read line by line,
+    and the result is written as it is produced.
+    """
+
+    if self.cfg.minimize:
+      self.cfg.logging.critical("Minimization cannot be used in streaming mode (" +
+                                Key.OPT_STREAM.value + "). Aborting.")
+      exit(1)
+
+    if self.cfg.inputs.count(streaming.STDIN) > 1:
+      self.cfg.logging.critical("Only one input can be read from stdin. Aborting.")
+      exit(1)
+
+    # The sort buffer is shared by the inputs, all of them are sorted before the
+    # first result is produced
+    buffer_size = max(1, self.cfg.sort_buffer_size // len(self.cfg.inputs))
+
+    streams = []
+    output = None
+    try:
+      inputs = []
+      for name in self.cfg.inputs:
+        streams.append(streaming.open_input(name))
+        entries = streaming.read_entries(streams[-1], name)
+        if self.cfg.sorted:
+          entries = streaming.check_sorted(entries, name)
+        else:
+          entries = streaming.external_sort(entries, buffer_size)
+        inputs.append(streaming.last_definitions(entries))
+
+      if self.cfg.output is not None:
+        output = open(self.cfg.output, 'wb')
+      stream = output if output is not None else sys.stdout.buffer
+
+      written = 0
+      with PROFILER.phase(PHASE_OPERATORS):
+        for symbol, value in streaming.merge_join(self.cfg.operator, inputs):
+          line = streaming.format_entry(symbol, value)
+          stream.write(line)
+          written += len(line)
+      stream.flush()
+      PROFILER.count(COUNTER_BYTES_WRITTEN, written)
+
+    except BrokenPipeError:
+      # The output has been closed (piped to head for instance). Stdout is
+      # redirected to /dev/null, thus flushing it at exit does not fail again,
+      # then the command stops quietly
+      os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+      exit(1)
+    except OSError as exception:
+      if exception.filename is None:
+        self.cfg.logging.critical("Error: " + str(exception))
+      else:
+        self.cfg.logging.critical("Error: " + exception.filename + "- " + exception.strerror)
+      exit(1)
+    except ValueError as exception:
+      self.cfg.logging.critical(str(exception))
+      exit(1)
+    finally:
+      for input_stream in streams:
+        if input_stream is not sys.stdin.buffer:
+          input_stream.close()
+      if output is not None:
+        output.close()
@@ -0,0 +1,379 @@
+#
+# The contents of this file are subject to the Apache 2.0 license you may not
+# use this file except in compliance with the License.
+#
+# Software distributed under the License is distributed on an "AS IS" basis,
+# WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License
+# for the specific language governing rights and limitations under the
+# License.
+#
+#
+# Copyright 2023 KCC project (http://www.firmwaretoolkit.org).
+# All rights reserved. Use is subject to license terms.
+#
+#
+# Contributors list :
+#
+#    William Bonnet     wllmbnnt@gmail.com, wbonnet@theitmakers.com
+#
+
+""" This module contains the operator engine. It implements the operators
+described in test-dataset/operator examples.ods :
+
+  . A except B     entries of A which are not in B (same symbol and same value)
+  . A concat B     entries of A, then the entries of B defining new symbols. When
+                   both define the same symbol, the value from B is kept, as it
+                   would be by merge_config.sh
+  . A intersect B  entries defined with the same value in both A and B
+
+Each config is converted into two bitsets, stored as python integers. The first
+one is indexed by symbol id, the second one by setting id (the id of a symbol and
+value pair), and is used to check values are equal. Operators are then computed
+by bitwise operations on whole integers, and accept any number of operands.
+"""
+
+import array
+from kcc.model import Key, Config, SYMBOL_TABLE
+
+# -----------------------------------------------------------------------------
+#
+# bitset_from_positions
+#
+# -----------------------------------------------------------------------------
+def bitset_from_positions(positions, size):
+  """ Build a bitset (python integer) from an iterable of bit positions all
+  lower than size
+  """
+
+  buffer = bytearray((size >> 3) + 1)
+  for position in positions:
+    buffer[position >> 3] |= 1 << (position & 7)
+  return int.from_bytes(buffer, "little")
+
+
+
+# -----------------------------------------------------------------------------
+#
+# bit_positions
+#
+# -----------------------------------------------------------------------------
+def bit_positions(bitset):
+  """ Generator yielding the positions of the bits set in a bitset, in
+  increasing order. The search is done on the binary string representation,
+  which is scanned in C rather than bit by bit.
+  """
+
+  # Binary representation, least significant bit first, without the 0b prefix
+  bits = bin(bitset)[:1:-1]
+  position = bits.find("1")
+  while position >= 0:
+    yield position
+    position = bits.find("1", position + 1)
+
+
+
+# -----------------------------------------------------------------------------
+#
+# class SettingTable
+#
+# -----------------------------------------------------------------------------
+class SettingTable(object):
+  """This class interns the (symbol id, value id) pairs. Two configs assigning
+  the same value to the same symbol share the same setting id, thus comparing
+  values is reduced to comparing bits.
+  """
+
+  __slots__ = ("ids", "symbols", "values")
+
+  # ---------------------------------------------------------------------------
+  #
+  # __init__
+  #
+  # ---------------------------------------------------------------------------
+  def __init__(self):
+    """Default constructor
+    """
+
+    # Dictionnary mapping (symbol_id << 32 | value_id) keys to setting ids
+    self.ids = {}
+
+    # Symbol id and value id of each setting
+    self.symbols = array.array('I')
+    self.values = array.array('I')
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # intern
+  #
+  # ---------------------------------------------------------------------------
+  def intern(self, symbol_id, value_id):
+    """ Return the id of the given pair, allocating a new id if needed
+    """
+
+    key = symbol_id << 32 | value_id
+    setting_id = self.ids.get(key)
+    if setting_id is None:
+      setting_id = len(self.symbols)
+      self.ids[key] = setting_id
+      self.symbols.append(symbol_id)
+      self.values.append(value_id)
+    return setting_id
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # __len__
+  #
+  # ---------------------------------------------------------------------------
+  def __len__(self):
+    """ Return the number of interned settings
+    """
+
+    return len(self.symbols)
+
+
+
+# Process wide setting table, shared by all the operands
+SETTING_TABLE = SettingTable()
+
+# -----------------------------------------------------------------------------
+#
+# class OperandSet
+#
+# -----------------------------------------------------------------------------
+class OperandSet(object):
+  """This class is the bitset representation of a config used by the operator
+  engine. Converting a Config is linear in its number of entries, and is meant
+  to be done once per config, whatever the number of operations it is used in.
+  """
+
+  __slots__ = ("symbols", "settings")
+
+  # ---------------------------------------------------------------------------
+  #
+  # __init__
+  #
+  # ---------------------------------------------------------------------------
+  def __init__(self, symbols=0, settings=0):
+    """Default constructor
+    """
+
+    # Bitset of the symbol ids defined by the config
+    self.symbols = symbols
+
+    # Bitset of the setting ids (symbol and value pairs) of the config
+    self.settings = settings
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # from_config
+  #
+  # ---------------------------------------------------------------------------
+  @classmethod
+  def from_config(cls, config):
+    """ Build the bitsets of a Config
+    """
+
+    setting_ids = SETTING_TABLE.ids
+    settings = []
+    for symbol_id, value_id in zip(config.symbols, config.values):
+      setting_id = setting_ids.get(symbol_id << 32 | value_id)
+      if setting_id is None:
+        setting_id = SETTING_TABLE.intern(symbol_id, value_id)
+      settings.append(setting_id)
+
+    return cls(bitset_from_positions(config.symbols, len(SYMBOL_TABLE)),
+               bitset_from_positions(settings, len(SETTING_TABLE)))
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # from_settings
+  #
+  # ---------------------------------------------------------------------------
+  @classmethod
+  def from_settings(cls, settings):
+    """ Build an operand from a bitset of settings. The symbol bitset is
+    computed from the settings it contains.
+    """
+
+    setting_symbols = SETTING_TABLE.symbols
+    symbols = bitset_from_positions((setting_symbols[setting_id]
+                                     for setting_id in bit_positions(settings)),
+                                    len(SYMBOL_TABLE))
+    return cls(symbols, settings)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # to_config
+  #
+  # ---------------------------------------------------------------------------
+  def to_config(self, filename=None, order=()):
+    """ Convert the operand back to a Config. Entries follow the file order of
+    the configs given in order, usually the ones the operand was computed
+    from : the symbols of the first config in its order, then the symbols
+    only defined by the next ones in theirs. Symbols defined by none of them
+    are output last, in setting id order.
+    """
+
+    config = Config(filename)
+    setting_symbols = SETTING_TABLE.symbols
+    setting_values = SETTING_TABLE.values
+    values = {setting_symbols[setting_id]: setting_values[setting_id]
+              for setting_id in bit_positions(self.settings)}
+
+    for source in order:
+      if not values:
+        break
+      for symbol_id in source.symbols:
+        value_id = values.pop(symbol_id, None)
+        if value_id is not None:
+          config.append(symbol_id, value_id)
+
+    for symbol_id, value_id in values.items():
+      config.append(symbol_id, value_id)
+    return config
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # __len__
+  #
+  # ---------------------------------------------------------------------------
+  def __len__(self):
+    """ Return the number of settings of the operand
+    """
+
+    return bin(self.settings).count("1")
+
+
+
+# -----------------------------------------------------------------------------
+#
+# class OperatorEngine
+#
+# -----------------------------------------------------------------------------
+class OperatorEngine(object):
+  """This class implements the except, concat and intersect operators. Each
+  operator accepts OperandSet or Config objects (which are converted on the
+  fly), and returns an OperandSet.
+  """
+
+  # ---------------------------------------------------------------------------
+  #
+  # operand
+  #
+  # ---------------------------------------------------------------------------
+  @staticmethod
+  def operand(item):
+    """ Return the OperandSet of a Config, or the item itself if it already
+    is an OperandSet
+    """
+
+    if isinstance(item, OperandSet):
+      return item
+    return OperandSet.from_config(item)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # except_
+  #
+  # ---------------------------------------------------------------------------
+  def except_(self, first, *others):
+    """ Return the entries of the first operand which are not defined with the
+    same value in any of the other operands
+    """
+
+    first = self.operand(first)
+    excluded = 0
+    for other in others:
+      excluded |= self.operand(other).settings
+    return OperandSet.from_settings(first.settings & ~excluded)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # intersect
+  #
+  # ---------------------------------------------------------------------------
+  def intersect(self, first, *others):
+    """ Return the entries defined with the same value in all the operands
+    """
+
+    first = self.operand(first)
+    symbols = first.symbols
+    settings = first.settings
+    for other in others:
+      other = self.operand(other)
+      symbols &= other.symbols
+      settings &= other.settings
+
+    # Symbols defined everywhere but with different values are not kept
+    if bin(symbols).count("1") != bin(settings).count("1"):
+      return OperandSet.from_settings(settings)
+    return OperandSet(symbols, settings)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # concat
+  #
+  # ---------------------------------------------------------------------------
+  def concat(self, first, *others):
+    """ Return the union of the operands. When several operands define the same
+    symbol, the value from the last one is kept.
+    """
+
+    operands = [self.operand(first)] + [self.operand(other) for other in others]
+
+    # Start from the last operand, then walk back and only add the settings of
+    # the symbols not yet defined. Only the settings which differ from the
+    # current result are looked at one by one
+    symbols = operands[-1].symbols
+    settings = operands[-1].settings
+    setting_symbols = SETTING_TABLE.symbols
+    for operand in reversed(operands[:-1]):
+      if not operand.symbols & ~symbols:
+        continue
+
+      defined = symbols.to_bytes((len(SYMBOL_TABLE) >> 3) + 1, "little")
+      added = [setting_id for setting_id in bit_positions(operand.settings & ~settings)
+               if not defined[setting_symbols[setting_id] >> 3] >>
+               (setting_symbols[setting_id] & 7) & 1]
+      settings |= bitset_from_positions(added, len(SETTING_TABLE))
+      symbols |= operand.symbols
+
+    return OperandSet(symbols, settings)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # apply
+  #
+  # ---------------------------------------------------------------------------
+  def apply(self, operator, operands):
+    """ Apply an operator given by its name (Key.OP_EXCEPT, Key.OP_CONCAT or
+    Key.OP_INTERSECT value) to a list of operands
+    """
+
+    if operator == Key.OP_EXCEPT.value:
+      return self.except_(*operands)
+    if operator == Key.OP_CONCAT.value:
+      return self.concat(*operands)
+    if operator == Key.OP_INTERSECT.value:
+      return self.intersect(*operands)
+    raise ValueError("Unknown operator : " + str(operator))
@@ -0,0 +1,418 @@
+#
+# The contents of this file are subject to the Apache 2.0 license you may not
+# use this file except in compliance with the License.
+#
+# Software distributed under the License is distributed on an "AS IS" basis,
+# WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License
+# for the specific language governing rights and limitations under the
+# License.
+#
+#
+# Copyright 2023 KCC project (http://www.firmwaretoolkit.org).
+# All rights reserved. Use is subject to license terms.
+#
+#
+# Contributors list :
+#
+#    William Bonnet     wllmbnnt@gmail.com, wbonnet@theitmakers.com
+#
+
+""" This module contains the persistent cache of parsed config files.
+
+Each parsed config is stored as a compact binary entry named after the hash of
+the file content. Entries are memory mapped when loaded back, and contain the
+columns of the config : the symbol names, the distinct values, the index of the
+value of each entry, and the tristate and type columns. Symbol and value ids are
+local to a process, thus the names and the distinct values are interned again,
+but no line is parsed and the columns are rebuilt by array operations. A second
+level of small files maps the path, size and modification time of a file to its
+content hash, which allows to skip hashing unchanged files.
+
+The cache size is bounded. Least recently used entries are evicted first, the
+modification time of an entry beeing updated each time it is used. The cache
+directory is only scanned when the estimated size of the cache exceeds the
+limit, and entries are then evicted below a lower target, thus the following
+writes do not scan it again.
+"""
+
+import os
+import mmap
+import array
+import struct
+import hashlib
+import logging
+import tempfile
+from kcc.model import Config, SYMBOL_TABLE, STRING_POOL
+from kcc.profiling import PROFILER, PHASE_PARSE, COUNTER_FILES, COUNTER_SYMBOLS, \
+                          COUNTER_CACHE_HITS, COUNTER_CACHE_MISSES, \
+                          COUNTER_BYTES_READ
+
+# Header of the binary entries : magic, format version, number of entries,
+# number of distinct values, size of the symbols block and size of the values
+# block. The blocks are followed by the value indexes of the entries, then by
+# their tristate and type codes, which do not depend on the process
+_MAGIC = b"KCCP"
+_VERSION = 2
+_HEADER = struct.Struct("<4sIIIII")
+
+# Type code of the value indexes
+_INDEX_TYPE = 'I'
+
+# Ratio of the maximum size the cache is reduced to when evicting entries
+_EVICTION_TARGET = 0.9
+
+# Extension of the cache entries, and name of the directory storing the stat keys
+_ENTRY_EXTENSION = ".kcc"
+_STAT_DIRECTORY = "stat"
+
+# Separator of the symbols and values in the blocks. Config lines cannot contain
+# an end of line character
+_SEPARATOR = b"\n"
+
+# -----------------------------------------------------------------------------
+#
+# load_config
+#
+# -----------------------------------------------------------------------------
+def load_config(filename, cache=None):
+  """ Load a config file through the given ParseCache, or parse it directly if
+  the cache is None
+  """
+
+  with PROFILER.phase(PHASE_PARSE):
+    if cache is None:
+      return Config().load(filename)
+    return cache.load(filename)
+
+
+
+# -----------------------------------------------------------------------------
+#
+# class ParseCache
+#
+# -----------------------------------------------------------------------------
+class ParseCache(object):
+  """This class implements the persistent cache of parsed configs. The load
+  method is a drop-in replacement for Config().load(filename).
+  """
+
+  # ---------------------------------------------------------------------------
+  #
+  # __init__
+  #
+  # ---------------------------------------------------------------------------
+  def __init__(self, path, max_size):
+    """Default constructor
+    """
+
+    # Directory storing the cache entries
+    self.path = path
+
+    # Maximum size of the cache in bytes
+    self.max_size = max_size
+
+    # Number of configs loaded from the cache, and number of configs parsed
+    self.hits = 0
+    self.misses = 0
+
+    # Estimated size of the cache in bytes. Default value is None, which means
+    # the directory has not been scanned yet
+    self.size = None
+
+    # Initialize the defaultlogger
+    self.logging = logging.getLogger()
+
+    os.makedirs(os.path.join(self.path, _STAT_DIRECTORY), exist_ok=True)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # load
+  #
+  # ---------------------------------------------------------------------------
+  def load(self, filename):
+    """ Return the Config of the given file, loaded from the cache if possible,
+    otherwise parsed then stored in the cache
+    """
+
+    status = os.stat(filename)
+    stat_key = self.__stat_key(filename, status)
+
+    # If the file did not change since last time, its hash is already known
+    content_hash = self.__read_stat_key(stat_key)
+    if content_hash is not None:
+      config = self.__read_entry(content_hash, filename)
+      if config is not None:
+        self.hits += 1
+        PROFILER.count(COUNTER_CACHE_HITS)
+        return config
+
+    with open(filename, 'rb') as working_file:
+      if status.st_size == 0:
+        buffer = b""
+      else:
+        buffer = mmap.mmap(working_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+      try:
+        # The file may have been moved or touched, but have a known content
+        content_hash = hashlib.sha1(buffer).hexdigest()
+        self.__write_stat_key(stat_key, content_hash)
+        config = self.__read_entry(content_hash, filename)
+        if config is not None:
+          self.hits += 1
+          PROFILER.count(COUNTER_CACHE_HITS)
+          return config
+
+        self.misses += 1
+        config = Config(filename).load_buffer(buffer)
+
+        if PROFILER.enabled:
+          PROFILER.count(COUNTER_CACHE_MISSES)
+          PROFILER.count(COUNTER_FILES)
+          PROFILER.count(COUNTER_BYTES_READ, status.st_size)
+          PROFILER.count(COUNTER_SYMBOLS, len(config))
+      finally:
+        if status.st_size != 0:
+          buffer.close()
+
+    self.__write_entry(content_hash, config)
+    return config
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # evict
+  #
+  # ---------------------------------------------------------------------------
+  def evict(self):
+    """ Compute the size of the cache, and if it is above the limit, remove the
+    least recently used entries until it is below the eviction target. Stat
+    keys older than the last evicted entry are removed too.
+    """
+
+    entries = []
+    total_size = 0
+    for entry in os.scandir(self.path):
+      if entry.is_file() and entry.name.endswith(_ENTRY_EXTENSION):
+        status = entry.stat()
+        entries.append((status.st_mtime, status.st_size, entry.path))
+        total_size += status.st_size
+
+    self.size = total_size
+    if total_size <= self.max_size:
+      return
+
+    entries.sort()
+    cutoff = 0
+    for mtime, size, path in entries:
+      if total_size <= self.max_size * _EVICTION_TARGET:
+        break
+      self.__remove(path)
+      total_size -= size
+      cutoff = mtime
+    self.size = total_size
+
+    for entry in os.scandir(os.path.join(self.path, _STAT_DIRECTORY)):
+      if entry.stat().st_mtime <= cutoff:
+        self.__remove(entry.path)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # __stat_key
+  #
+  # ---------------------------------------------------------------------------
+  def __stat_key(self, filename, status):
+    """ Return the path of the stat key of a file, built from its absolute path,
+    size and modification time
+    """
+
+    key = "%s\0%d\0%d" % (os.path.abspath(filename), status.st_size, status.st_mtime_ns)
+    return os.path.join(self.path, _STAT_DIRECTORY,
+                        hashlib.sha1(key.encode("utf-8", "surrogateescape")).hexdigest())
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # __read_stat_key
+  #
+  # ---------------------------------------------------------------------------
+  def __read_stat_key(self, stat_key):
+    """ Return the content hash stored in a stat key, or None if it does not
+    exist
+    """
+
+    try:
+      with open(stat_key, 'r') as working_file:
+        return working_file.read().strip() or None
+    except OSError:
+      return None
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # __write_stat_key
+  #
+  # ---------------------------------------------------------------------------
+  def __write_stat_key(self, stat_key, content_hash):
+    """ Store the content hash of a file in its stat key
+    """
+
+    self.__atomic_write(stat_key, content_hash.encode("ascii"))
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # __read_entry
+  #
+  # ---------------------------------------------------------------------------
+  def __read_entry(self, content_hash, filename):
+    """ Load a config from the cache entry of the given hash. Return None if
+    the entry does not exist or is not valid.
+    """
+
+    path = os.path.join(self.path, content_hash + _ENTRY_EXTENSION)
+    try:
+      with open(path, 'rb') as working_file:
+        with mmap.mmap(working_file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+          magic, version, count, distinct, symbols_size, values_size = \
+                                                                _HEADER.unpack_from(buffer)
+          indexes_size = count * array.array(_INDEX_TYPE).itemsize
+          if magic != _MAGIC or version != _VERSION or \
+             len(buffer) != _HEADER.size + symbols_size + values_size + indexes_size + \
+                            2 * count:
+            self.logging.debug("Ignoring invalid parse cache entry %s", path)
+            return None
+
+          config = Config(filename)
+          if count > 0:
+            start = _HEADER.size
+            names = buffer[start:start + symbols_size].split(_SEPARATOR)
+            start += symbols_size
+            values = buffer[start:start + values_size].split(_SEPARATOR)
+            start += values_size
+            indexes = array.array(_INDEX_TYPE)
+            indexes.frombytes(buffer[start:start + indexes_size])
+            start += indexes_size
+            if len(names) != count or len(values) != distinct:
+              self.logging.debug("Ignoring invalid parse cache entry %s", path)
+              return None
+            self.__load_columns(config, names, values, indexes)
+            config.tristates.frombytes(buffer[start:start + count])
+            config.types.frombytes(buffer[start + count:start + 2 * count])
+
+          PROFILER.count(COUNTER_FILES)
+          PROFILER.count(COUNTER_BYTES_READ, len(buffer))
+          PROFILER.count(COUNTER_SYMBOLS, count)
+
+      # Mark the entry as recently used
+      os.utime(path)
+      return config
+
+    except (OSError, ValueError, IndexError, struct.error):
+      return None
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # __load_columns
+  #
+  # ---------------------------------------------------------------------------
+  @staticmethod
+  def __load_columns(config, names, values, indexes):
+    """ Fill the symbol and value columns of a config from the symbol names of
+    its entries, its distinct values, and the index of the value of each entry.
+    Entries are unique, they have been written from a loaded config.
+    """
+
+    # Lookups are done in C, names are only interned one by one when some of
+    # them are not known yet (the array cannot hold None)
+    symbol_ids = list(map(SYMBOL_TABLE.ids.get, names))
+    try:
+      config.symbols = array.array('I', symbol_ids)
+    except TypeError:
+      config.symbols = array.array('I', [SYMBOL_TABLE.intern(name) if symbol_id is None
+                                         else symbol_id
+                                         for name, symbol_id in zip(names, symbol_ids)])
+    value_ids = [STRING_POOL.intern(value) for value in values]
+    config.values = array.array('I', map(value_ids.__getitem__, indexes))
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # __write_entry
+  #
+  # ---------------------------------------------------------------------------
+  def __write_entry(self, content_hash, config):
+    """ Store a config in the cache, then evict old entries if the estimated
+    size of the cache exceeds the limit
+    """
+
+    names = SYMBOL_TABLE.names
+    symbols = _SEPARATOR.join(names[symbol_id].encode("utf-8", "surrogateescape")
+                              for symbol_id in config.symbols)
+
+    # Values are stored once, entries refer to them by index
+    distinct = {}
+    indexes = array.array(_INDEX_TYPE, [distinct.setdefault(value_id, len(distinct))
+                                        for value_id in config.values])
+    values = _SEPARATOR.join(STRING_POOL.raw(value_id) for value_id in distinct)
+    content = _HEADER.pack(_MAGIC, _VERSION, len(config), len(distinct), len(symbols),
+                           len(values)) + symbols + values + indexes.tobytes() + \
+              config.tristates.tobytes() + config.types.tobytes()
+
+    try:
+      self.__atomic_write(os.path.join(self.path, content_hash + _ENTRY_EXTENSION), content)
+      if self.size is not None:
+        self.size += len(content)
+      if self.size is None or self.size > self.max_size:
+        self.evict()
+    except OSError as exception:
+      # The cache is only an optimization, failing to write it is not an error
+      self.logging.warning("Cannot write parse cache entry : %s", exception.strerror)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # __atomic_write
+  #
+  # ---------------------------------------------------------------------------
+  def __atomic_write(self, path, content):
+    """ Write a file through a temporary file renamed once complete, thus
+    concurrent readers never see partial content
+    """
+
+    descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(path))
+    try:
+      with os.fdopen(descriptor, 'wb') as working_file:
+        working_file.write(content)
+      os.replace(temporary, path)
+    except OSError:
+      self.__remove(temporary)
+      raise
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # __remove
+  #
+  # ---------------------------------------------------------------------------
+  @staticmethod
+  def __remove(path):
+    """ Remove a file, ignoring errors (it may have been removed concurrently)
+    """
+
+    try:
+      os.unlink(path)
+    except OSError:
+      pass
@@ -0,0 +1,227 @@
+#
+# The contents of this file are subject to the Apache 2.0 license you may not
+# use this file except in compliance with the License.
+#
+# Software distributed under the License is distributed on an "AS IS" basis,
+# WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License
+# for the specific language governing rights and limitations under the
+# License.
+#
+#
+# Copyright 2023 KCC project (http://www.firmwaretoolkit.org).
+# All rights reserved. Use is subject to license terms.
+#
+#
+# Contributors list :
+#
+#    William Bonnet     wllmbnnt@gmail.com, wbonnet@theitmakers.com
+#
+
+""" This module contains the profiler used by the --profile option. It records
+the wall clock and CPU time spent in each phase of a run (configuration loading,
+parsing, operators, output, etc.) and a set of counters (files, lines, symbols,
+cache hits and misses, bytes read and written).
+
+The profiler is process wide and disabled by default. When disabled, recording
+a phase or a counter costs a single test. Worker processes have their own
+profiler, their counters are sent back with their results and merged in the
+main process. The time they spend is only accounted in the phase of the main
+process waiting for them.
+"""
+
+import sys
+import json
+import time
+import contextlib
+
+# Names of the phases
+PHASE_CONFIGURATION = "configuration"
+PHASE_PARSE = "parse"
+PHASE_KCONFIG = "kconfig"
+PHASE_OPERATORS = "operators"
+PHASE_COMPARE = "compare"
+PHASE_OUTPUT = "output"
+
+# Names of the counters
+COUNTER_FILES = "files"
+COUNTER_LINES = "lines"
+COUNTER_SYMBOLS = "symbols"
+COUNTER_CACHE_HITS = "cache_hits"
+COUNTER_CACHE_MISSES = "cache_misses"
+COUNTER_BYTES_READ = "bytes_read"
+COUNTER_BYTES_WRITTEN = "bytes_written"
+
+# Destination meaning the report is output on stderr
+STDERR = "-"
+
+# -----------------------------------------------------------------------------
+#
+# class Profiler
+#
+# -----------------------------------------------------------------------------
+class Profiler(object):
+  """This class accumulates the time spent in the phases and the counters.
+  Phases may be nested, the time of a phase includes the time of the phases it
+  contains.
+  """
+
+  # ---------------------------------------------------------------------------
+  #
+  # __init__
+  #
+  # ---------------------------------------------------------------------------
+  def __init__(self):
+    """Default constructor
+    """
+
+    # Flag used to activate the recording
+    self.enabled = False
+
+    # Dictionnary of phases. Each value is a [wall, cpu, calls] list
+    self.phases = {}
+
+    # Dictionnary of counters
+    self.counters = {}
+
+    # Wall and CPU time of the start of the run
+    self.start_wall = None
+    self.start_cpu = None
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # enable
+  #
+  # ---------------------------------------------------------------------------
+  def enable(self):
+    """ Activate the recording, and reset what has been recorded
+    """
+
+    self.enabled = True
+    self.phases = {}
+    self.counters = {}
+    self.start_wall = time.perf_counter()
+    self.start_cpu = time.process_time()
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # phase
+  #
+  # ---------------------------------------------------------------------------
+  def phase(self, name):
+    """ Return a context manager recording the time spent in the given phase
+    """
+
+    if not self.enabled:
+      return contextlib.nullcontext()
+    return self.__record(name)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # __record
+  #
+  # ---------------------------------------------------------------------------
+  @contextlib.contextmanager
+  def __record(self, name):
+    """ Context manager adding the time spent in its block to a phase
+    """
+
+    start_wall = time.perf_counter()
+    start_cpu = time.process_time()
+    try:
+      yield
+    finally:
+      phase = self.phases.setdefault(name, [0.0, 0.0, 0])
+      phase[0] += time.perf_counter() - start_wall
+      phase[1] += time.process_time() - start_cpu
+      phase[2] += 1
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # count
+  #
+  # ---------------------------------------------------------------------------
+  def count(self, name, value=1):
+    """ Add a value to a counter
+    """
+
+    if self.enabled:
+      self.counters[name] = self.counters.get(name, 0) + value
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # take_counters
+  #
+  # ---------------------------------------------------------------------------
+  def take_counters(self):
+    """ Return the counters recorded since the last call, and reset them. Worker
+    processes send them to the main process with their results.
+    """
+
+    counters = self.counters
+    self.counters = {}
+    return counters
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # merge_counters
+  #
+  # ---------------------------------------------------------------------------
+  def merge_counters(self, counters):
+    """ Add the counters recorded by another process
+    """
+
+    for name, value in counters.items():
+      self.count(name, value)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # report
+  #
+  # ---------------------------------------------------------------------------
+  def report(self):
+    """ Return the recorded phases and counters as a dictionnary
+    """
+
+    return {"total": {"wall": time.perf_counter() - self.start_wall,
+                      "cpu": time.process_time() - self.start_cpu},
+            "phases": {name: {"wall": wall, "cpu": cpu, "calls": calls}
+                       for name, (wall, cpu, calls) in self.phases.items()},
+            "counters": dict(self.counters)}
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # write
+  #
+  # ---------------------------------------------------------------------------
+  def write(self, destination):
+    """ Output the report as JSON to a file, or to stderr if the destination is
+    STDERR
+    """
+
+    text = json.dumps(self.report(), indent=2, sort_keys=True) + "\n"
+    if destination == STDERR:
+      sys.stderr.write(text)
+    else:
+      with open(destination, 'w') as working_file:
+        working_file.write(text)
+
+
+
+# Process wide profiler
+PROFILER = Profiler()
@@ -0,0 +1,33 @@
+#
+# The contents of this file are subject to the Apache 2.0 license you may not
+# use this file except in compliance with the License.
+#
+# Software distributed under the License is distributed on an "AS IS" basis,
+# WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License
+# for the specific language governing rights and limitations under the
+# License.
+#
+#
+# Copyright 2023 KCC project (http://www.firmwaretoolkit.org).
+# All rights reserved. Use is subject to license terms.
+#
+#
+# Contributors list :
+#
+#    William Bonnet     wllmbnnt@gmail.com, wbonnet@theitmakers.com
+#
+
+""" This module contains the names shared by the JSON lines protocol of the
+batch command, the kcc server and its client. It has no dependency, thus the
+client can use it without importing the implementation of the commands.
+"""
+
+# Members of the requests and responses which are not command options
+REQUEST_ID = "id"
+REQUEST_COMMAND = "command"
+RESPONSE_STATUS = "status"
+RESPONSE_ERROR = "error"
+
+# Values of the status member of the responses
+STATUS_OK = "ok"
+STATUS_ERROR = "error"
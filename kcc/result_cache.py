@@ -0,0 +1,296 @@
+#
+# The contents of this file are subject to the Apache 2.0 license you may not
+# use this file except in compliance with the License.
+#
+# Software distributed under the License is distributed on an "AS IS" basis,
+# WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License
+# for the specific language governing rights and limitations under the
+# License.
+#
+#
+# Copyright 2023 KCC project (http://www.firmwaretoolkit.org).
+# All rights reserved. Use is subject to license terms.
+#
+#
+# Contributors list :
+#
+#    William Bonnet     wllmbnnt@gmail.com, wbonnet@theitmakers.com
+#
+
+""" This module contains the persistent cache of the test script results. A
+result is stored under a key computed from the hash of the script content, the
+arguments, and the values of a selected set of environment variables. Editing a
+script changes its hash, thus only the tests using this script are run again.
+
+Each entry is a small JSON file, written atomically, thus the cache can be
+shared by the worker threads and by concurrent kcc processes. In a process, a
+script is run once per key even if several tests request it at the same time :
+the other tests wait for the first one and use its result.
+
+Only successful results (zero return code) are stored : a failure may be
+transient, thus failed scripts are run again on the next run instead of
+replaying the failure for the whole time to live.
+
+Entries older than the time to live are ignored and evicted. When the size of
+the cache exceeds its limit, the least recently used entries are evicted.
+"""
+
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+
+# Version of the entries. Must be increased each time their content changes, or
+# the entries which are stored change
+_VERSION = 2
+
+# Extension of the cache entries
+_ENTRY_EXTENSION = ".json"
+
+# Size of the blocks read when hashing a script
+_BLOCK_SIZE = 1024 * 1024
+
+# -----------------------------------------------------------------------------
+#
+# class ResultCache
+#
+# -----------------------------------------------------------------------------
+class ResultCache(object):
+  """This class implements the persistent result cache. Results are
+  (return code, output) tuples.
+  """
+
+  # ---------------------------------------------------------------------------
+  #
+  # __init__
+  #
+  # ---------------------------------------------------------------------------
+  def __init__(self, path, max_size, ttl, environment=()):
+    """Default constructor
+    """
+
+    # Directory storing the entries, maximum size of the entries in bytes, and
+    # time to live of an entry in seconds
+    self.path = path
+    self.max_size = max_size
+    self.ttl = ttl
+
+    # Names of the environment variables which are part of the keys
+    self.environment = sorted(environment)
+
+    # Hashes of the scripts already read, indexed by path. Each value is a
+    # (size, modification time, hash) tuple
+    self.script_hashes = {}
+
+    # Events of the keys beeing computed by a thread of this process
+    self.pending = {}
+
+    # Lock protecting the pending events, the script hashes and the statistics
+    self.lock = threading.Lock()
+
+    # Statistics : entries found, not found, and stored
+    self.hits = 0
+    self.misses = 0
+    self.stored = 0
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # key
+  #
+  # ---------------------------------------------------------------------------
+  def key(self, script, args):
+    """ Return the key of a script run with the given arguments. Raise OSError
+    if the script cannot be read.
+    """
+
+    inputs = {"script": self.script_hash(script),
+              "args": list(args),
+              "environment": {name: os.environ.get(name) for name in self.environment}}
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode()).hexdigest()
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # script_hash
+  #
+  # ---------------------------------------------------------------------------
+  def script_hash(self, script):
+    """ Return the hash of the content of a script. Scripts are hashed once per
+    process, unless they are modified.
+    """
+
+    status = os.stat(script)
+    with self.lock:
+      known = self.script_hashes.get(script)
+    if known is not None and known[0] == status.st_size and known[1] == status.st_mtime_ns:
+      return known[2]
+
+    digest = hashlib.sha256()
+    with open(script, 'rb') as working_file:
+      for block in iter(lambda: working_file.read(_BLOCK_SIZE), b""):
+        digest.update(block)
+    with self.lock:
+      self.script_hashes[script] = (status.st_size, status.st_mtime_ns, digest.hexdigest())
+    return digest.hexdigest()
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # fetch
+  #
+  # ---------------------------------------------------------------------------
+  def fetch(self, key, compute):
+    """ Return a (return code, output, cached) tuple for a key. If the result
+    is not in the cache, compute is called to produce it, and it is stored if
+    it is a success.
+    compute returns a (return code, output) tuple, or None if there is no result
+    (the script has been cancelled), in which case fetch returns None.
+    """
+
+    with self.lock:
+      event = self.pending.get(key)
+      owner = event is None
+      if owner:
+        event = self.pending[key] = threading.Event()
+
+    # Another thread is running the same script, wait for its result
+    if not owner:
+      event.wait()
+
+    try:
+      result = self.get(key)
+      if result is not None:
+        return result + (True,)
+
+      result = compute()
+      if result is None:
+        return None
+      # Only successes are stored. Failures may be transient, and scripts which
+      # could not be run, or were killed by a signal, have no reliable result
+      if result[0] == 0:
+        self.put(key, result[0], result[1])
+      return result + (False,)
+    finally:
+      if owner:
+        with self.lock:
+          del self.pending[key]
+        event.set()
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # get
+  #
+  # ---------------------------------------------------------------------------
+  def get(self, key):
+    """ Return the (return code, output) tuple stored for a key, or None if
+    there is no valid entry
+    """
+
+    entry_path = self.__entry_path(key)
+    try:
+      with open(entry_path, 'r') as working_file:
+        entry = json.load(working_file)
+      valid = entry.get("version") == _VERSION and time.time() - entry["created"] <= self.ttl
+      if valid:
+        # The modification time is the last use, for the eviction
+        os.utime(entry_path)
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+      valid = False
+
+    with self.lock:
+      if valid:
+        self.hits += 1
+      else:
+        self.misses += 1
+    return (entry["returncode"], entry["output"]) if valid else None
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # put
+  #
+  # ---------------------------------------------------------------------------
+  def put(self, key, returncode, output):
+    """ Store a result. Failures are ignored, since the cache is an
+    optimization.
+    """
+
+    entry_path = self.__entry_path(key)
+    content = json.dumps({"version": _VERSION, "created": time.time(),
+                          "returncode": returncode, "output": output})
+    directory = os.path.dirname(entry_path)
+    try:
+      os.makedirs(directory, exist_ok=True)
+      handle, temporary_path = tempfile.mkstemp(dir=directory)
+      try:
+        with os.fdopen(handle, 'w') as working_file:
+          working_file.write(content)
+        os.replace(temporary_path, entry_path)
+      except OSError:
+        os.unlink(temporary_path)
+        raise
+    except OSError:
+      return
+
+    with self.lock:
+      self.stored += 1
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # evict
+  #
+  # ---------------------------------------------------------------------------
+  def evict(self):
+    """ Remove the expired entries, then the least recently used ones until the
+    size of the cache is below the limit. Return the number of removed entries.
+    """
+
+    entries = []
+    if os.path.isdir(self.path):
+      for directory in os.scandir(self.path):
+        if not directory.is_dir():
+          continue
+        for entry in os.scandir(directory.path):
+          if entry.name.endswith(_ENTRY_EXTENSION):
+            status = entry.stat()
+            entries.append((status.st_mtime, status.st_size, entry.path))
+
+    # Entries not used during the time to live cannot be valid anymore
+    now = time.time()
+    size = sum(entry_size for _, entry_size, _ in entries)
+    removed = 0
+    for mtime, entry_size, entry_path in sorted(entries):
+      if size <= self.max_size and now - mtime <= self.ttl:
+        break
+      try:
+        os.remove(entry_path)
+      except OSError:
+        continue
+      size -= entry_size
+      removed += 1
+    return removed
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # __entry_path
+  #
+  # ---------------------------------------------------------------------------
+  def __entry_path(self, key):
+    """ Return the path of the entry of a key. Entries are spread in sub
+    directories named after the first characters of the key.
+    """
+
+    return os.path.join(self.path, key[:2], key + _ENTRY_EXTENSION)
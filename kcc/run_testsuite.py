@@ -0,0 +1,442 @@
+#
+# The contents of this file are subject to the Apache 2.0 license you may not
+# use this file except in compliance with the License.
+#
+# Software distributed under the License is distributed on an "AS IS" basis,
+# WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License
+# for the specific language governing rights and limitations under the
+# License.
+#
+#
+# Copyright 2023 KCC project (http://www.firmwaretoolkit.org).
+# All rights reserved. Use is subject to license terms.
+#
+#
+# Contributors list :
+#
+#    William Bonnet     wllmbnnt@gmail.com, wbonnet@theitmakers.com
+#
+
+""" This module contains the implementation of the run command. The tests of
+the suite are run concurrently by a bounded pool of worker threads, each test
+beeing a script executed in its own process. A test succeeds when its script
+exits with a zero return code.
+
+Tests are read from the suite and submitted to the pool as workers become
+available, thus only a few tests are queued at any time. When fail fast is
+requested, the first failure stops the submission, cancels the queued tests
+and terminates the running scripts.
+
+Scripts can give hints about a failure by outputting lines starting with
+'HINT:'. They are displayed when the show hints flag is set.
+
+When an aggregation level is given, the results are rolled up into the nodes
+of the suite tree by kcc.aggregation, and only the failed tests and the status
+of the nodes are output.
+
+Unless the result cache is deactivated, the results of the scripts are stored
+in the persistent cache of kcc.result_cache, and a script is not run again
+while its content, its arguments and the selected environment variables are
+unchanged.
+"""
+
+import os
+import sys
+import time
+import signal
+import threading
+import subprocess
+import concurrent.futures
+from kcc.model import Key, TestSuite
+from kcc.library import LibraryIndex, library_directories
+from kcc.result_cache import ResultCache
+from kcc.aggregation import ResultAggregator
+
+# Prefix of the lines of the script output giving a hint on the failure
+_HINT_PREFIX = "HINT:"
+
+# Number of tests submitted to the pool per worker
+_QUEUE_FACTOR = 2
+
+# Delay given to the terminated scripts to exit before beeing killed, in seconds
+_TERMINATE_DELAY = 2
+
+# -----------------------------------------------------------------------------
+#
+# class TestResult
+#
+# -----------------------------------------------------------------------------
+class TestResult(object):
+  """This class stores the result of the execution of a test.
+  """
+
+  __slots__ = ("test", "success", "returncode", "output", "hints", "duration", "cached")
+
+  # ---------------------------------------------------------------------------
+  #
+  # __init__
+  #
+  # ---------------------------------------------------------------------------
+  def __init__(self, test, success, returncode, output, hints, duration, cached=False):
+    """Default constructor
+    """
+
+    # TestCase which has been run
+    self.test = test
+
+    # Flag set if the test succeeded, and return code of the script. The return
+    # code is None if the script could not be run
+    self.success = success
+    self.returncode = returncode
+
+    # Output of the script (stdout and stderr), and the hints it contains
+    self.output = output
+    self.hints = hints
+
+    # Execution time in seconds, and flag set if the result has been read from
+    # the result cache instead of running the script
+    self.duration = duration
+    self.cached = cached
+
+
+
+# -----------------------------------------------------------------------------
+#
+# class RunTestSuite
+#
+# -----------------------------------------------------------------------------
+class RunTestSuite(object):
+  """This class implements the run command.
+  """
+
+  # ---------------------------------------------------------------------------
+  #
+  # __init__
+  #
+  # ---------------------------------------------------------------------------
+  def __init__(self, cfg):
+    """Default constructor
+    """
+
+    # Configuration object storing the command line arguments
+    self.cfg = cfg
+
+    # Index of the library, resolving the names of the scripts
+    self.index = None
+
+    # Event set when the execution has to stop (fail fast)
+    self.stop = threading.Event()
+
+    # Processes of the running scripts, and the lock protecting the set
+    self.running = set()
+    self.lock = threading.Lock()
+
+    # Cache of the script results. None if the cache is deactivated
+    self.cache = None
+    if cfg.use_results_cache:
+      self.cache = ResultCache(cfg.result_cache_path, cfg.result_cache_size,
+                               cfg.result_cache_ttl, cfg.result_cache_environment)
+
+    # Number of passed and failed tests
+    self.passed = 0
+    self.failed = 0
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # run_suite
+  #
+  # ---------------------------------------------------------------------------
+  def run_suite(self):
+    """ Entry point of the run command. The exit code is 1 if a test failed.
+    """
+
+    suite = self.load_suite()
+    self.index = LibraryIndex(library_directories(self.cfg), self.cfg.library_index_path,
+                              self.cfg.jobs, [os.path.dirname(os.path.abspath(suite.filename))])
+    self.index.update()
+
+    # The status line is only output on a terminal
+    aggregator = None
+    tests = self.select(suite.tests())
+    if self.cfg.aggregation_level is not None:
+      if self.cfg.aggregation_level < 1:
+        self.cfg.logging.critical("The aggregation level must be at least 1. Aborting.")
+        exit(1)
+      aggregator = ResultAggregator(self.cfg.aggregation_level, self.cfg.only_errors,
+                                    sys.stderr if sys.stderr.isatty() else None)
+      tests = aggregator.track(tests)
+
+    start = time.perf_counter()
+    try:
+      for result in self.execute(tests):
+        self.report(result, aggregator)
+    except ValueError as exception:
+      self.cfg.logging.critical("Invalid test suite " + suite.filename + " : " + str(exception))
+      exit(1)
+    if aggregator is not None:
+      aggregator.flush()
+
+    print("%d tests passed, %d failed in %.1f s" % (self.passed, self.failed,
+                                                   time.perf_counter() - start))
+    if self.stop.is_set():
+      print("Execution stopped at the first failure, remaining tests were not run")
+    if self.cache is not None:
+      removed = self.cache.evict()
+      self.cfg.logging.info("Result cache : %d hits, %d misses, %d stored, %d evicted",
+                            self.cache.hits, self.cache.misses, self.cache.stored, removed)
+    if self.failed:
+      exit(1)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # load_suite
+  #
+  # ---------------------------------------------------------------------------
+  def load_suite(self):
+    """ Load the suite file given on the command line, or defined in the
+    configuration file
+    """
+
+    filename = self.cfg.suite
+    if filename is None and self.cfg.configuration is not None:
+      filename = self.cfg.configuration.get(Key.TEST_SUITE_PATH.value)
+    if filename is None:
+      self.cfg.logging.critical("The test suite is not defined (" + Key.OPT_SUITE.value +
+                                "). Aborting.")
+      exit(1)
+
+    suite = TestSuite(filename, self.cfg.suite_cache_path)
+    suite.load()
+    return suite
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # find_script
+  #
+  # ---------------------------------------------------------------------------
+  def find_script(self, name):
+    """ Return the path of a script, searched in the library then in the
+    directory of the suite file, or None if it is not found
+    """
+
+    return self.index.find(name)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # select
+  #
+  # ---------------------------------------------------------------------------
+  def select(self, tests):
+    """ Generator returning the tests belonging to one of the requested
+    categories, or all the tests if no category is requested
+    """
+
+    categories = frozenset(self.cfg.category or [])
+    for test in tests:
+      if not categories or categories & test.categories:
+        yield test
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # execute
+  #
+  # ---------------------------------------------------------------------------
+  def execute(self, tests):
+    """ Generator running the tests in the worker pool, and returning their
+    results as they complete. Once fail fast tripped, no other result is
+    returned, even for the tests which were already running.
+    """
+
+    jobs = max(1, self.cfg.jobs)
+    tests = iter(tests)
+    pending = set()
+    exhausted = False
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as executor:
+      while True:
+        # Keep the pool busy, without reading the whole suite in advance
+        while not exhausted and not self.stop.is_set() and len(pending) < jobs * _QUEUE_FACTOR:
+          test = next(tests, None)
+          if test is None:
+            exhausted = True
+          else:
+            pending.add(executor.submit(self.run_test, test))
+        if not pending:
+          break
+
+        done, pending = concurrent.futures.wait(pending,
+                                                return_when=concurrent.futures.FIRST_COMPLETED)
+        for future in done:
+          result = future.result() if not future.cancelled() else None
+          if result is None or self.stop.is_set():
+            continue
+          yield result
+          if not result.success and self.cfg.fail_fast and not self.stop.is_set():
+            self.cancel()
+            for queued in pending:
+              queued.cancel()
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # run_test
+  #
+  # ---------------------------------------------------------------------------
+  def run_test(self, test):
+    """ Run the script of a test and return its TestResult, or None if the
+    test has been cancelled
+    """
+
+    if self.stop.is_set():
+      return None
+
+    start = time.perf_counter()
+    path = self.find_script(test.script)
+    if path is None:
+      return TestResult(test, False, None, "Script not found : " + test.script, [],
+                        time.perf_counter() - start)
+
+    cached = False
+    if self.cache is None:
+      result = self.__execute(path, test.args)
+    else:
+      try:
+        key = self.cache.key(path, test.args)
+      except OSError as exception:
+        return TestResult(test, False, None, "Cannot read " + path + " : " + exception.strerror,
+                          [], time.perf_counter() - start)
+      result = self.cache.fetch(key, lambda: self.__execute(path, test.args))
+      if result is not None:
+        result, cached = result[:2], result[2]
+    if result is None:
+      return None
+
+    returncode, output = result
+    if returncode is None:
+      return TestResult(test, False, None, output, [], time.perf_counter() - start)
+
+    hints = [line[len(_HINT_PREFIX):].strip() for line in output.splitlines()
+             if line.startswith(_HINT_PREFIX)]
+    return TestResult(test, returncode == 0, returncode, output, hints,
+                      time.perf_counter() - start, cached)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # __execute
+  #
+  # ---------------------------------------------------------------------------
+  def __execute(self, path, args):
+    """ Run a script and return its (return code, output) tuple. The return
+    code is None if the script could not be run. Return None if the script has
+    been cancelled.
+    """
+
+    if self.stop.is_set():
+      return None
+
+    try:
+      # Each script runs in its own session, thus the processes it starts are
+      # terminated with it
+      process = subprocess.Popen([path] + args, stdout=subprocess.PIPE,
+                                 stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL,
+                                 start_new_session=True)
+    except OSError as exception:
+      return (None, "Cannot run " + path + " : " + exception.strerror)
+
+    # A script started while the execution is beeing cancelled is terminated
+    # right away, since cancel may already have signaled the running ones
+    with self.lock:
+      self.running.add(process)
+      if self.stop.is_set():
+        os.killpg(process.pid, signal.SIGTERM)
+    try:
+      output = process.communicate()[0].decode(errors="replace")
+    finally:
+      with self.lock:
+        self.running.discard(process)
+
+    # A script killed because of fail fast has no meaningful result
+    if process.returncode < 0 and self.stop.is_set():
+      return None
+    return (process.returncode, output)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # cancel
+  #
+  # ---------------------------------------------------------------------------
+  def cancel(self):
+    """ Stop the execution : no new test is started, and the running scripts
+    are terminated, then killed if they are still running after a delay
+    """
+
+    self.stop.set()
+    self.__signal_running(signal.SIGTERM)
+    timer = threading.Timer(_TERMINATE_DELAY, self.__signal_running, (signal.SIGKILL,))
+    timer.daemon = True
+    timer.start()
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # __signal_running
+  #
+  # ---------------------------------------------------------------------------
+  def __signal_running(self, signal_number):
+    """ Send a signal to the process groups of the running scripts
+    """
+
+    with self.lock:
+      for process in self.running:
+        try:
+          os.killpg(process.pid, signal_number)
+        except OSError:
+          pass
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # report
+  #
+  # ---------------------------------------------------------------------------
+  def report(self, result, aggregator=None):
+    """ Output the result of a test. Successful tests are not output if only
+    errors are requested, or if they are counted in an aggregated node.
+    """
+
+    output = print if aggregator is None else aggregator.print_line
+    aggregated = aggregator is not None and bool(aggregator.prefixes(result.test))
+
+    if result.success:
+      self.passed += 1
+      if not self.cfg.only_errors and not aggregated:
+        output("[ OK ] %s%s" % (result.test, " (cached)" if result.cached else ""))
+    else:
+      self.failed += 1
+      output("[FAIL] %s%s" % (result.test, " (cached)" if result.cached else ""))
+      if self.cfg.show_hints:
+        for hint in result.hints:
+          output("       hint : %s" % hint)
+      self.cfg.logging.debug("Output of %s (return code %s) :\n%s", result.test.script,
+                             result.returncode, result.output)
+
+    # The enclosing nodes are output after the failed test
+    if aggregator is not None:
+      aggregator.add(result)
@@ -0,0 +1,233 @@
+#
+# The contents of this file are subject to the Apache 2.0 license you may not
+# use this file except in compliance with the License.
+#
+# Software distributed under the License is distributed on an "AS IS" basis,
+# WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License
+# for the specific language governing rights and limitations under the
+# License.
+#
+#
+# Copyright 2023 KCC project (http://www.firmwaretoolkit.org).
+# All rights reserved. Use is subject to license terms.
+#
+#
+# Contributors list :
+#
+#    William Bonnet     wllmbnnt@gmail.com, wbonnet@theitmakers.com
+#
+
+""" This module contains the implementation of the serve command. The kcc
+server listens on a Unix domain socket and answers the requests of the clients,
+using the JSON lines protocol of the batch command. Parsed configs and the
+symbol table stay in memory between the requests, thus a request on unchanged
+files does not parse them again.
+
+Clients are handled concurrently by an asyncio event loop. Requests are
+processed one at a time by a single worker thread, since they work on the
+process wide symbol and value tables, thus the loop keeps accepting and reading
+the requests of the other clients meanwhile. Configs unused for longer than the idle timeout
+are evicted, as are the least recently used ones when the memory limit is
+exceeded.
+"""
+
+import os
+import json
+import signal
+import socket
+import asyncio
+import concurrent.futures
+from kcc.parse_cache import ParseCache
+from kcc.batch import ConfigStore, RequestHandler
+from kcc.protocol import RESPONSE_STATUS, RESPONSE_ERROR, STATUS_ERROR
+
+# Maximal length of a request line, in bytes
+_LINE_LIMIT = 16 * 1024 * 1024
+
+# Maximal delay between two idle evictions, in seconds
+_EVICTION_PERIOD = 30
+
+# -----------------------------------------------------------------------------
+#
+# class KccServer
+#
+# -----------------------------------------------------------------------------
+class KccServer(object):
+  """This class implements the serve command. It owns the store of parsed
+  configs and answers the requests of the clients connected to the socket.
+  """
+
+  # ---------------------------------------------------------------------------
+  #
+  # __init__
+  #
+  # ---------------------------------------------------------------------------
+  def __init__(self, cfg):
+    """Default constructor
+    """
+
+    # Configuration object storing the command line arguments
+    self.cfg = cfg
+
+    # Store of the parsed configs, and handler of the requests
+    self.store = None
+    self.handler = None
+
+    # Single thread executor processing the requests and the evictions, thus
+    # the store is never accessed concurrently
+    self.executor = None
+
+    # Number of requests answered since the start of the server
+    self.requests = 0
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # serve
+  #
+  # ---------------------------------------------------------------------------
+  def serve(self):
+    """ Entry point of the serve command. It returns when the server receives
+    SIGINT or SIGTERM.
+    """
+
+    path = self.cfg.socket_path
+    if os.path.exists(path):
+      # Refuse to replace the socket of a running server, remove a stale one
+      probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+      try:
+        probe.connect(path)
+        self.cfg.logging.critical("A kcc server is already listening on " + path +
+                                  ". Aborting.")
+        exit(1)
+      except OSError:
+        os.remove(path)
+      finally:
+        probe.close()
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    cache = None
+    if self.cfg.use_parse_cache:
+      cache = ParseCache(self.cfg.parse_cache_path, self.cfg.parse_cache_size)
+    self.store = ConfigStore(cache, self.cfg.kconfig_index_path)
+    self.handler = RequestHandler(self.cfg, self.store)
+
+    self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+    try:
+      asyncio.run(self.__serve())
+    finally:
+      self.executor.shutdown()
+      if os.path.exists(path):
+        os.remove(path)
+    self.cfg.logging.info("Server stopped after %d requests", self.requests)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # __serve
+  #
+  # ---------------------------------------------------------------------------
+  async def __serve(self):
+    """ Listen on the socket until a stop signal is received
+    """
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signal_number in (signal.SIGINT, signal.SIGTERM):
+      loop.add_signal_handler(signal_number, stop.set)
+
+    server = await asyncio.start_unix_server(self.handle_client, path=self.cfg.socket_path,
+                                             limit=_LINE_LIMIT)
+    # Only the user running the server can send requests
+    os.chmod(self.cfg.socket_path, 0o600)
+    self.cfg.logging.info("Server listening on %s", self.cfg.socket_path)
+
+    eviction = asyncio.create_task(self.__evict_idle())
+    async with server:
+      await stop.wait()
+    eviction.cancel()
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # __evict_idle
+  #
+  # ---------------------------------------------------------------------------
+  async def __evict_idle(self):
+    """ Periodically evict the configs unused for longer than the idle timeout
+    """
+
+    loop = asyncio.get_running_loop()
+    period = max(1, min(_EVICTION_PERIOD, self.cfg.idle_timeout))
+    while True:
+      await asyncio.sleep(period)
+      removed = await loop.run_in_executor(self.executor, self.store.evict,
+                                           self.cfg.memory_limit, self.cfg.idle_timeout)
+      if removed:
+        self.cfg.logging.debug("%d idle configs evicted, %d kept (%d bytes)", removed,
+                               len(self.store.entries), self.store.size)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # handle_client
+  #
+  # ---------------------------------------------------------------------------
+  async def handle_client(self, reader, writer):
+    """ Answer the requests of a client until it closes the connection
+    """
+
+    loop = asyncio.get_running_loop()
+    try:
+      while True:
+        line = await reader.readline()
+        if not line:
+          break
+        if not line.strip():
+          continue
+
+        try:
+          response = await loop.run_in_executor(self.executor, self.answer, line)
+          data = json.dumps(response, sort_keys=True).encode()
+        except Exception as exception:
+          # The client gets an answer, and the connection stays usable
+          self.cfg.logging.error("Request failed", exc_info=True)
+          data = json.dumps({RESPONSE_STATUS: STATUS_ERROR,
+                             RESPONSE_ERROR: "Unexpected error : %s: %s" %
+                                             (type(exception).__name__, exception)},
+                            sort_keys=True).encode()
+        writer.write(data + b"\n")
+        await writer.drain()
+    except (ConnectionError, ValueError) as exception:
+      # ValueError is raised by readline when a line is longer than the limit
+      self.cfg.logging.error("Client connection closed : %s", exception)
+    finally:
+      writer.close()
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # answer
+  #
+  # ---------------------------------------------------------------------------
+  def answer(self, line):
+    """ Decode a request line and return the response. The memory limit is
+    enforced after each request. It runs in the thread of the executor.
+    """
+
+    self.requests += 1
+    try:
+      request = json.loads(line)
+    except ValueError as exception:
+      return {RESPONSE_STATUS: STATUS_ERROR, RESPONSE_ERROR: "Invalid request : " + str(exception)}
+
+    response = self.handler.handle(request)
+    removed = self.store.evict(self.cfg.memory_limit)
+    if removed:
+      self.cfg.logging.debug("%d configs evicted to stay under the memory limit", removed)
+    return response
@@ -0,0 +1,280 @@
+#
+# The contents of this file are subject to the Apache 2.0 license you may not
+# use this file except in compliance with the License.
+#
+# Software distributed under the License is distributed on an "AS IS" basis,
+# WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License
+# for the specific language governing rights and limitations under the
+# License.
+#
+#
+# Copyright 2023 KCC project (http://www.firmwaretoolkit.org).
+# All rights reserved. Use is subject to license terms.
+#
+#
+# Contributors list :
+#
+#    William Bonnet     wllmbnnt@gmail.com, wbonnet@theitmakers.com
+#
+
+""" This module contains the streaming execution of the except, concat and
+intersect operators. Inputs are never loaded as a whole : they are read line by
+line, sorted by symbol name, then joined by a k-way merge holding one entry per
+input. The result is written as it is produced, sorted by symbol name.
+
+Inputs may be compressed (gzip, xz or zstd), they are decompressed on the fly.
+Inputs already sorted by symbol name ('is not set' lines at the position of
+their symbol, as kcc outputs them in this mode) are used as they come. Other
+inputs go through an external sort : they are cut in chunks sorted in memory,
+which are spilled to temporary files then merged.
+
+When a symbol is defined several times by an input, the last definition is
+used, as merge_config.sh does.
+"""
+
+import sys
+import heapq
+import tempfile
+import itertools
+from operator import itemgetter
+from kcc.model import Key
+from kcc.config_input import scan_stream
+
+# Name of the input read from stdin
+STDIN = "-"
+
+# Estimated memory used by an entry held in a chunk, in addition to the size
+# of its symbol and value
+_ENTRY_OVERHEAD = 128
+
+# Maximum number of temporary files merged at once
+_MERGE_WIDTH = 64
+
+# Separator of symbol and value in the temporary files. Symbol names never
+# contain it, and values never contain an end of line
+_SEPARATOR = b"="
+_END_OF_LINE = b"\n"
+
+# Value of the symbols which are not set
+_NOT_SET = b"n"
+
+# -----------------------------------------------------------------------------
+#
+# read_entries
+#
+# -----------------------------------------------------------------------------
+def read_entries(stream, name=None):
+  """ Generator yielding the (symbol, value) bytes of each setting read from a
+  binary stream, by chunks. Compressed inputs are decoded on the fly. Raise
+  OSError, with the given name, if the input cannot be decoded.
+  """
+
+  for _, symbol, value, _ in scan_stream(stream, name):
+    if symbol is not None:
+      yield (symbol, value)
+
+
+
+# -----------------------------------------------------------------------------
+#
+# check_sorted
+#
+# -----------------------------------------------------------------------------
+def check_sorted(entries, name):
+  """ Generator yielding the entries of an input expected to be sorted by
+  symbol name. Raise ValueError when an entry is out of order.
+  """
+
+  previous = b""
+  for position, entry in enumerate(entries, 1):
+    if entry[0] < previous:
+      raise ValueError("%s is not sorted by symbol name (%s after %s, setting %d)" %
+                       (name, entry[0].decode(errors="replace"),
+                        previous.decode(errors="replace"), position))
+    previous = entry[0]
+    yield entry
+
+
+
+# -----------------------------------------------------------------------------
+#
+# external_sort
+#
+# -----------------------------------------------------------------------------
+def external_sort(entries, buffer_size):
+  """ Generator yielding the entries sorted by symbol name. Entries of the
+  same symbol keep their input order. Chunks of about buffer_size bytes are
+  sorted in memory, and spilled to temporary files if there are several.
+  """
+
+  runs = []
+  try:
+    chunk = []
+    size = 0
+    for entry in entries:
+      chunk.append(entry)
+      size += len(entry[0]) + len(entry[1]) + _ENTRY_OVERHEAD
+      if size >= buffer_size:
+        chunk.sort(key=itemgetter(0))
+        runs.append(_spill(chunk))
+        chunk = []
+        size = 0
+    chunk.sort(key=itemgetter(0))
+
+    # Small inputs are sorted in memory only
+    if not runs:
+      yield from chunk
+      return
+    if chunk:
+      runs.append(_spill(chunk))
+      chunk = None
+
+    # Limit the number of files open at once
+    while len(runs) > _MERGE_WIDTH:
+      merged = _spill(heapq.merge(*[_read_run(run) for run in runs[:_MERGE_WIDTH]],
+                                  key=itemgetter(0)))
+      for run in runs[:_MERGE_WIDTH]:
+        run.close()
+      # The merged run holds the earliest entries, it stays first thus the
+      # entries of a symbol keep their input order
+      runs = [merged] + runs[_MERGE_WIDTH:]
+
+    yield from heapq.merge(*[_read_run(run) for run in runs], key=itemgetter(0))
+  finally:
+    for run in runs:
+      run.close()
+
+
+
+# -----------------------------------------------------------------------------
+#
+# last_definitions
+#
+# -----------------------------------------------------------------------------
+def last_definitions(entries):
+  """ Generator yielding the last entry of each symbol of sorted entries
+  """
+
+  previous = None
+  for entry in entries:
+    if previous is not None and previous[0] != entry[0]:
+      yield previous
+    previous = entry
+  if previous is not None:
+    yield previous
+
+
+
+# -----------------------------------------------------------------------------
+#
+# merge_join
+#
+# -----------------------------------------------------------------------------
+def merge_join(operator, inputs):
+  """ Generator yielding the (symbol, value) entries resulting of an operator
+  (Key.OP_EXCEPT, Key.OP_CONCAT or Key.OP_INTERSECT value) applied to inputs
+  sorted by symbol name, each symbol beeing defined once per input
+  """
+
+  if operator not in (Key.OP_EXCEPT.value, Key.OP_CONCAT.value, Key.OP_INTERSECT.value):
+    raise ValueError("Unknown operator : " + str(operator))
+
+  # Entries are (symbol, input index, value), thus the definitions of a symbol
+  # come out of the merge together and in input order
+  merged = heapq.merge(*[_tag(entries, index) for index, entries in enumerate(inputs)])
+  for symbol, group in itertools.groupby(merged, key=itemgetter(0)):
+    definitions = [(index, value) for _, index, value in group]
+
+    if operator == Key.OP_CONCAT.value:
+      yield (symbol, definitions[-1][1])
+
+    elif operator == Key.OP_EXCEPT.value:
+      index, value = definitions[0]
+      if index == 0 and all(other != value for _, other in definitions[1:]):
+        yield (symbol, value)
+
+    elif len(definitions) == len(inputs):
+      value = definitions[0][1]
+      if all(other == value for _, other in definitions[1:]):
+        yield (symbol, value)
+
+
+
+# -----------------------------------------------------------------------------
+#
+# format_entry
+#
+# -----------------------------------------------------------------------------
+def format_entry(symbol, value):
+  """ Return the config line (bytes, with its end of line) assigning a value
+  to a symbol. Symbols set to n are output as 'is not set' comments.
+  """
+
+  if value == _NOT_SET:
+    return b"# " + symbol + b" is not set\n"
+  return symbol + _SEPARATOR + value + _END_OF_LINE
+
+
+
+# -----------------------------------------------------------------------------
+#
+# open_input
+#
+# -----------------------------------------------------------------------------
+def open_input(name):
+  """ Return the binary stream of an input, stdin for '-'
+  """
+
+  if name == STDIN:
+    return sys.stdin.buffer
+  return open(name, 'rb')
+
+
+
+# -----------------------------------------------------------------------------
+#
+# _tag
+#
+# -----------------------------------------------------------------------------
+def _tag(entries, index):
+  """ Generator adding the index of their input to entries
+  """
+
+  for symbol, value in entries:
+    yield (symbol, index, value)
+
+
+
+# -----------------------------------------------------------------------------
+#
+# _spill
+#
+# -----------------------------------------------------------------------------
+def _spill(entries):
+  """ Write entries to a new temporary file, and return it. The file is
+  deleted when closed.
+  """
+
+  run = tempfile.TemporaryFile(prefix="kcc-sort-")
+  try:
+    run.writelines(symbol + _SEPARATOR + value + _END_OF_LINE for symbol, value in entries)
+    run.seek(0)
+  except OSError:
+    run.close()
+    raise
+  return run
+
+
+
+# -----------------------------------------------------------------------------
+#
+# _read_run
+#
+# -----------------------------------------------------------------------------
+def _read_run(run):
+  """ Generator yielding the entries written to a temporary file by _spill
+  """
+
+  for line in run:
+    symbol, _, value = line[:-1].partition(_SEPARATOR)
+    yield (symbol, value)
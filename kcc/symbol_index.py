@@ -0,0 +1,888 @@
+#
+# The contents of this file are subject to the Apache 2.0 license you may not
+# use this file except in compliance with the License.
+#
+# Software distributed under the License is distributed on an "AS IS" basis,
+# WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License
+# for the specific language governing rights and limitations under the
+# License.
+#
+#
+# Copyright 2023 KCC project (http://www.firmwaretoolkit.org).
+# All rights reserved. Use is subject to license terms.
+#
+#
+# Contributors list :
+#
+#    William Bonnet     wllmbnnt@gmail.com, wbonnet@theitmakers.com
+#
+
+""" This module contains the implementation of the index command. It maintains
+an on-disk inverted index of a corpus of configs : for each setting (such as
+CONFIG_FOO=y, or CONFIG_FOO=n for the 'is not set' lines), the posting list of
+the config files defining it. Queries are boolean combinations of settings,
+answered from the index without reading the configs.
+
+The index is a single file :
+
+  - a header, then the metadata (inputs and documents) as JSON. Documents are
+    identified by their position in the list, removed documents leave a null
+    slot reused by the next new document
+  - the directory, one fixed size entry per setting sorted by key, giving the
+    position of the key and of its posting list
+  - the keys, then the posting lists. A posting list is the zlib compressed
+    bitmap of the documents defining the setting
+
+The file is memory mapped, and a lookup is a binary search of the directory
+followed by the decompression of a single posting list.
+
+The index is updated incrementally. Documents whose size and modification
+time did not change are not read again, their bits are kept as they are in the
+posting lists, while the bits of the changed and removed documents are cleared
+before the ones of the new content are added. The new index is written to a
+temporary file renamed once complete, thus concurrent queries never see a
+partial index.
+"""
+
+import os
+import re
+import json
+import mmap
+import zlib
+import heapq
+import bisect
+import struct
+import tempfile
+import itertools
+from kcc.model import Key, SYMBOL_TABLE, STRING_POOL
+from kcc.parse_cache import ParseCache, load_config
+from kcc.compare import expand_inputs
+from kcc.operators import bitset_from_positions, bit_positions
+from kcc.profiling import PROFILER, PHASE_OPERATORS, PHASE_OUTPUT
+
+# Layout of the index file. The header holds the magic number, the format
+# version, the number of keys, and the sizes of the metadata and of the keys.
+# Directory entries hold the offset and length of the key, then the offset and
+# length of the posting list
+_MAGIC = b"KCCI"
+_VERSION = 1
+_HEADER = struct.Struct("<4sIQQQ")
+_ENTRY = struct.Struct("<QIQI")
+
+# Fields of the metadata
+_INPUTS = "inputs"
+_DOCUMENTS = "documents"
+
+# Positions of the values of the document entries. The size and modification
+# time are the last ones
+_PATH = 0
+_SIZE = 1
+
+# Separator of the symbol and the value in the keys. Symbol names never
+# contain it
+_SEPARATOR = b"="
+
+# Tokens of the queries : parentheses and words. Words may contain quoted
+# strings, which may contain spaces or parentheses
+_TOKEN = re.compile(r'\s*(?:(\()|(\))|((?:[^\s()"]|"(?:[^"\\]|\\.)*")+))')
+
+# Boolean operators of the queries
+_AND = "and"
+_OR = "or"
+_NOT = "not"
+
+# Valid symbol names in the predicates
+_SYMBOL = re.compile(r"[A-Za-z0-9_]+")
+
+# -----------------------------------------------------------------------------
+#
+# setting_key
+#
+# -----------------------------------------------------------------------------
+def setting_key(symbol_id, value_id):
+  """ Return the index key (bytes) of a symbol set to a value
+  """
+
+  return SYMBOL_TABLE.names[symbol_id].encode(Key.UTF8.value, "surrogateescape") + \
+         _SEPARATOR + STRING_POOL.raw(value_id)
+
+
+
+# -----------------------------------------------------------------------------
+#
+# write_index
+#
+# -----------------------------------------------------------------------------
+def write_index(path, inputs, documents, entries):
+  """ Write an index file atomically. Entries are the (key, compressed posting
+  list) tuples, sorted by key. Return the number of keys written.
+  """
+
+  directory = bytearray()
+  keys = bytearray()
+  postings = bytearray()
+  for key, posting in entries:
+    directory += _ENTRY.pack(len(keys), len(key), len(postings), len(posting))
+    keys += key
+    postings += posting
+
+  metadata = json.dumps({_INPUTS: inputs, _DOCUMENTS: documents},
+                        separators=(",", ":")).encode(Key.UTF8.value)
+  count = len(directory) // _ENTRY.size
+
+  os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+  descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(path) or ".")
+  try:
+    with os.fdopen(descriptor, 'wb') as working_file:
+      working_file.write(_HEADER.pack(_MAGIC, _VERSION, count, len(metadata), len(keys)))
+      working_file.write(metadata)
+      working_file.write(directory)
+      working_file.write(keys)
+      working_file.write(postings)
+    os.replace(temporary, path)
+  except OSError:
+    try:
+      os.unlink(temporary)
+    except OSError:
+      pass
+    raise
+  return count
+
+
+
+# -----------------------------------------------------------------------------
+#
+# compress_posting
+#
+# -----------------------------------------------------------------------------
+def compress_posting(bitset, slots):
+  """ Return the compressed posting list of a bitset of documents, out of the
+  given number of document slots
+  """
+
+  return zlib.compress(bitset.to_bytes((slots + 7) >> 3, "little"))
+
+
+
+# -----------------------------------------------------------------------------
+#
+# class SymbolIndex
+#
+# -----------------------------------------------------------------------------
+class SymbolIndex(object):
+  """This class gives access to an index file. The file is memory mapped, and
+  the object is a sequence of the keys, sorted, thus it can be searched with
+  the bisect module.
+  """
+
+  # ---------------------------------------------------------------------------
+  #
+  # __init__
+  #
+  # ---------------------------------------------------------------------------
+  def __init__(self):
+    """Default constructor
+    """
+
+    # Path of the index file
+    self.path = None
+
+    # Inputs given to the last build, and documents entries. Each entry is a
+    # [path, size, mtime_ns] list, or None for a free slot
+    self.inputs = []
+    self.documents = []
+
+    # Number of keys
+    self.count = 0
+
+    # Memory mapped content of the file, and offsets of its sections
+    self.buffer = None
+    self.directory_offset = 0
+    self.keys_offset = 0
+    self.postings_offset = 0
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # open
+  #
+  # ---------------------------------------------------------------------------
+  def open(self, path):
+    """ Map an index file. Raise OSError if the file cannot be read, and
+    ValueError if it is not a valid index.
+    """
+
+    self.path = path
+    with open(path, 'rb') as working_file:
+      size = os.fstat(working_file.fileno()).st_size
+      if size < _HEADER.size:
+        raise ValueError(path + " is not a kcc index")
+      self.buffer = mmap.mmap(working_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    magic, version, self.count, metadata_size, keys_size = _HEADER.unpack_from(self.buffer)
+    if magic != _MAGIC or version != _VERSION:
+      self.close()
+      raise ValueError(path + " is not a kcc index, or was written by another version")
+
+    self.directory_offset = _HEADER.size + metadata_size
+    self.keys_offset = self.directory_offset + self.count * _ENTRY.size
+    self.postings_offset = self.keys_offset + keys_size
+    if self.postings_offset > size:
+      self.close()
+      raise ValueError(path + " is truncated")
+
+    try:
+      metadata = json.loads(self.buffer[_HEADER.size:self.directory_offset])
+      self.inputs = metadata[_INPUTS]
+      self.documents = metadata[_DOCUMENTS]
+    except (ValueError, KeyError, TypeError):
+      self.close()
+      raise ValueError(path + " is corrupted")
+    return self
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # close
+  #
+  # ---------------------------------------------------------------------------
+  def close(self):
+    """ Unmap the index file
+    """
+
+    if self.buffer is not None:
+      self.buffer.close()
+      self.buffer = None
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # live
+  #
+  # ---------------------------------------------------------------------------
+  def live(self):
+    """ Return the bitset of the documents of the index
+    """
+
+    return bitset_from_positions((slot for slot, document in enumerate(self.documents)
+                                  if document is not None), len(self.documents))
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # paths
+  #
+  # ---------------------------------------------------------------------------
+  def paths(self, bitset):
+    """ Return the paths of the documents of a bitset, in slot order
+    """
+
+    return [self.documents[slot][_PATH] for slot in bit_positions(bitset)]
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # lookup
+  #
+  # ---------------------------------------------------------------------------
+  def lookup(self, key):
+    """ Return the bitset of the documents defining a key (bytes)
+    """
+
+    position = bisect.bisect_left(self, key)
+    if position < self.count and self[position] == key:
+      return self.posting(position)
+    return 0
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # lookup_prefix
+  #
+  # ---------------------------------------------------------------------------
+  def lookup_prefix(self, prefix):
+    """ Return the bitset of the documents defining a key starting with a
+    prefix (bytes)
+    """
+
+    bitset = 0
+    position = bisect.bisect_left(self, prefix)
+    while position < self.count and self[position].startswith(prefix):
+      bitset |= self.posting(position)
+      position += 1
+    return bitset
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # posting
+  #
+  # ---------------------------------------------------------------------------
+  def posting(self, position):
+    """ Return the bitset of the documents of the key at a position
+    """
+
+    return int.from_bytes(zlib.decompress(self.raw_posting(position)), "little")
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # raw_posting
+  #
+  # ---------------------------------------------------------------------------
+  def raw_posting(self, position):
+    """ Return the compressed posting list of the key at a position
+    """
+
+    _, _, offset, length = _ENTRY.unpack_from(self.buffer,
+                                              self.directory_offset + position * _ENTRY.size)
+    offset += self.postings_offset
+    return self.buffer[offset:offset + length]
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # __getitem__
+  #
+  # ---------------------------------------------------------------------------
+  def __getitem__(self, position):
+    """ Return the key at a position
+    """
+
+    if not 0 <= position < self.count:
+      raise IndexError(position)
+    offset, length, _, _ = _ENTRY.unpack_from(self.buffer,
+                                              self.directory_offset + position * _ENTRY.size)
+    offset += self.keys_offset
+    return self.buffer[offset:offset + length]
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # __len__
+  #
+  # ---------------------------------------------------------------------------
+  def __len__(self):
+    """ Return the number of keys
+    """
+
+    return self.count
+
+
+
+# -----------------------------------------------------------------------------
+#
+# class IndexBuilder
+#
+# -----------------------------------------------------------------------------
+class IndexBuilder(object):
+  """This class computes the content of an updated index from the previous
+  one and the current list of files. Only the new and modified files are read.
+  """
+
+  # ---------------------------------------------------------------------------
+  #
+  # __init__
+  #
+  # ---------------------------------------------------------------------------
+  def __init__(self, cache=None):
+    """Default constructor
+    """
+
+    # Parse cache used to load the configs, or None
+    self.cache = cache
+
+    # Document entries of the updated index
+    self.documents = []
+
+    # (path, error) tuples of the files which could not be read. They are not
+    # in the updated index
+    self.errors = []
+
+    # Number of files read, kept unchanged, and removed from the index
+    self.read = 0
+    self.unchanged = 0
+    self.removed = 0
+
+    # Bitset of the slots whose previous bits are cleared, and new posting
+    # lists, as lists of slots indexed by setting (symbol id << 32 | value id)
+    self.stale = 0
+    self.postings = {}
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # update
+  #
+  # ---------------------------------------------------------------------------
+  def update(self, previous, paths):
+    """ Compare the files (absolute paths) to the documents of the previous
+    SymbolIndex, or None, and load the new and modified ones. Return True if the
+    index has to be written.
+    """
+
+    self.documents = list(previous.documents) if previous is not None else []
+    current = set(paths)
+    slots = {}
+    stale = []
+    for slot, document in enumerate(self.documents):
+      if document is None:
+        continue
+      if document[_PATH] in current:
+        slots[document[_PATH]] = slot
+      else:
+        self.documents[slot] = None
+        stale.append(slot)
+        self.removed += 1
+    free = [slot for slot, document in enumerate(self.documents) if document is None]
+    free.reverse()
+
+    for path in paths:
+      slot = slots.get(path)
+      try:
+        status = os.stat(path)
+        if slot is not None and \
+           self.documents[slot][_SIZE:] == [status.st_size, status.st_mtime_ns]:
+          self.unchanged += 1
+          continue
+        config = load_config(path, self.cache)
+      except OSError as exception:
+        self.errors.append((path, exception.strerror))
+        if slot is not None:
+          self.documents[slot] = None
+          stale.append(slot)
+          self.removed += 1
+        continue
+
+      if slot is not None:
+        stale.append(slot)
+      elif free:
+        slot = free.pop()
+      else:
+        slot = len(self.documents)
+        self.documents.append(None)
+      self.documents[slot] = [path, status.st_size, status.st_mtime_ns]
+      self.read += 1
+
+      with PROFILER.phase(PHASE_OPERATORS):
+        postings = self.postings
+        get = postings.get
+        for setting in [symbol_id << 32 | value_id
+                        for symbol_id, value_id in zip(config.symbols, config.values)]:
+          posting = get(setting)
+          if posting is None:
+            postings[setting] = [slot]
+          else:
+            posting.append(slot)
+
+    # Free slots at the end are not kept
+    while self.documents and self.documents[-1] is None:
+      self.documents.pop()
+
+    self.stale = bitset_from_positions(stale, max(stale, default=0) + 1)
+    return previous is None or self.read > 0 or self.stale != 0 or \
+           self.documents != previous.documents
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # entries
+  #
+  # ---------------------------------------------------------------------------
+  def entries(self, previous):
+    """ Generator yielding the (key, compressed posting list) tuples of the
+    updated index, sorted by key. Keys left without document are dropped.
+    """
+
+    slots = len(self.documents)
+    new = sorted((setting_key(setting >> 32, setting & 0xFFFFFFFF), posting)
+                 for setting, posting in self.postings.items())
+    streams = [((key, 1, posting) for key, posting in new)]
+    if previous is not None:
+      streams.append(((previous[position], 0, position) for position in range(len(previous))))
+
+    # The entries of a key come out of the merge together, the previous one
+    # first
+    for key, group in itertools.groupby(heapq.merge(*streams), key=lambda entry: entry[0]):
+      group = list(group)
+      position = group[0][2] if group[0][1] == 0 else None
+      posting = group[-1][2] if group[-1][1] == 1 else None
+
+      # Posting lists without stale bits nor new ones are copied as they are
+      bitset = 0
+      if position is not None:
+        raw = previous.raw_posting(position)
+        if posting is None and self.stale == 0:
+          yield (key, raw)
+          continue
+        bitset = int.from_bytes(zlib.decompress(raw), "little")
+        if posting is None and not bitset & self.stale:
+          yield (key, raw)
+          continue
+        bitset &= ~self.stale
+      if posting is not None:
+        bitset |= bitset_from_positions(posting, slots)
+      if bitset:
+        yield (key, compress_posting(bitset, slots))
+
+
+
+# -----------------------------------------------------------------------------
+#
+# class QueryParser
+#
+# -----------------------------------------------------------------------------
+class QueryParser(object):
+  """This class parses a query into a tree. Leaves are ('setting', key) tuples
+  for the SYMBOL=value predicates, and ('symbol', prefix) tuples for the bare
+  SYMBOL predicates, true when the symbol is defined whatever its value.
+  Operations are ('and', left, right), ('or', left, right) and ('not', operand)
+  tuples.
+  """
+
+  # ---------------------------------------------------------------------------
+  #
+  # __init__
+  #
+  # ---------------------------------------------------------------------------
+  def __init__(self):
+    """Default constructor
+    """
+
+    # Tokens of the query beeing parsed. Each token is a (kind, text) tuple,
+    # kind beeing '(', ')' or 'word'
+    self.tokens = []
+
+    # Position of the next token
+    self.position = 0
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # tokenize
+  #
+  # ---------------------------------------------------------------------------
+  @staticmethod
+  def tokenize(text):
+    """ Split a query into tokens. Raise ValueError on unbalanced quotes
+    """
+
+    tokens = []
+    position = 0
+    text = text.rstrip()
+    while position < len(text):
+      match = _TOKEN.match(text, position)
+      if match is None:
+        raise ValueError("Syntax error at position %d of : %s" % (position, text))
+      opening, closing, word = match.groups()
+      if opening is not None:
+        tokens.append(("(", opening))
+      elif closing is not None:
+        tokens.append((")", closing))
+      else:
+        tokens.append(("word", word))
+      position = match.end()
+    return tokens
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # parse
+  #
+  # ---------------------------------------------------------------------------
+  def parse(self, text):
+    """ Parse a query and return its tree. Raise ValueError if the query is
+    not valid.
+    """
+
+    self.tokens = self.tokenize(text)
+    self.position = 0
+    tree = self.__expression()
+    if self.position != len(self.tokens):
+      raise ValueError("Unexpected '%s' in : %s" % (self.tokens[self.position][1], text))
+    return tree
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # __expression
+  #
+  # ---------------------------------------------------------------------------
+  def __expression(self):
+    """ Parse a chain of or operations
+    """
+
+    tree = self.__term()
+    while self.__next_word(_OR):
+      self.position += 1
+      tree = (_OR, tree, self.__term())
+    return tree
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # __term
+  #
+  # ---------------------------------------------------------------------------
+  def __term(self):
+    """ Parse a chain of and operations
+    """
+
+    tree = self.__factor()
+    while self.__next_word(_AND):
+      self.position += 1
+      tree = (_AND, tree, self.__factor())
+    return tree
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # __factor
+  #
+  # ---------------------------------------------------------------------------
+  def __factor(self):
+    """ Parse a predicate, a negation or a sub-query between parentheses
+    """
+
+    if self.position >= len(self.tokens):
+      raise ValueError("Unexpected end of query")
+
+    kind, text = self.tokens[self.position]
+    self.position += 1
+    if kind == "(":
+      tree = self.__expression()
+      if self.position >= len(self.tokens) or self.tokens[self.position][0] != ")":
+        raise ValueError("Missing closing parenthesis")
+      self.position += 1
+      return tree
+    if kind == "word" and text == _NOT:
+      return (_NOT, self.__factor())
+    if kind == "word" and text not in (_AND, _OR):
+      return self.predicate(text)
+    raise ValueError("Unexpected '%s', a predicate was expected" % text)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # predicate
+  #
+  # ---------------------------------------------------------------------------
+  @staticmethod
+  def predicate(text):
+    """ Return the leaf of a SYMBOL=value or SYMBOL predicate
+    """
+
+    symbol, separator, value = text.partition(_SEPARATOR.decode())
+    if not _SYMBOL.fullmatch(symbol):
+      raise ValueError("Invalid predicate '%s', SYMBOL=value or SYMBOL was expected" % text)
+    key = (symbol + separator + value).encode(Key.UTF8.value, "surrogateescape")
+    if separator:
+      return ("setting", key)
+    return ("symbol", key + _SEPARATOR)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # __next_word
+  #
+  # ---------------------------------------------------------------------------
+  def __next_word(self, word):
+    """ Return True if the next token is the given word
+    """
+
+    return self.position < len(self.tokens) and self.tokens[self.position] == ("word", word)
+
+
+
+# -----------------------------------------------------------------------------
+#
+# evaluate_query
+#
+# -----------------------------------------------------------------------------
+def evaluate_query(tree, index, live=None):
+  """ Return the bitset of the documents of an index matching a query tree.
+  live is the bitset of the documents of the index, computed if not given.
+  """
+
+  if live is None:
+    live = index.live()
+
+  operator = tree[0]
+  if operator == "setting":
+    return index.lookup(tree[1])
+  if operator == "symbol":
+    return index.lookup_prefix(tree[1])
+  if operator == _NOT:
+    return live & ~evaluate_query(tree[1], index, live)
+  if operator == _AND:
+    left = evaluate_query(tree[1], index, live)
+    return left and left & evaluate_query(tree[2], index, live)
+  return evaluate_query(tree[1], index, live) | evaluate_query(tree[2], index, live)
+
+
+
+# -----------------------------------------------------------------------------
+#
+# class SymbolIndexCommand
+#
+# -----------------------------------------------------------------------------
+class SymbolIndexCommand(object):
+  """This class implements the index command, and its build and query
+  actions.
+  """
+
+  # ---------------------------------------------------------------------------
+  #
+  # __init__
+  #
+  # ---------------------------------------------------------------------------
+  def __init__(self, cfg):
+    """Default constructor
+    """
+
+    # Configuration object storing the command line arguments
+    self.cfg = cfg
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # run_index
+  #
+  # ---------------------------------------------------------------------------
+  def run_index(self):
+    """ Entry point of the index command
+    """
+
+    if self.cfg.index_action == Key.INDEX_BUILD.value:
+      self.run_build()
+    else:
+      self.run_query()
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # run_build
+  #
+  # ---------------------------------------------------------------------------
+  def run_build(self):
+    """ Create or update the index of the configs given by the inputs. Without
+    inputs, the ones of the previous build are used.
+    """
+
+    previous = None
+    if os.path.exists(self.cfg.symbol_index_path):
+      try:
+        previous = self.open_index()
+      except ValueError as exception:
+        # The index is rebuilt from scratch
+        self.cfg.logging.warning("%s, it is rebuilt", exception)
+
+    inputs = [os.path.abspath(item) for item in self.cfg.inputs or []]
+    if not inputs and previous is not None:
+      inputs = previous.inputs
+    if not inputs:
+      self.cfg.logging.critical("No input to index. Aborting.")
+      exit(1)
+
+    paths = [os.path.abspath(path) for path in expand_inputs(inputs)]
+    if not paths:
+      self.cfg.logging.critical("No config file found in : %s", " ".join(inputs))
+      exit(1)
+
+    cache = None
+    if self.cfg.use_parse_cache:
+      cache = ParseCache(self.cfg.parse_cache_path, self.cfg.parse_cache_size)
+
+    try:
+      builder = IndexBuilder(cache)
+      changed = builder.update(previous, paths) or inputs != previous.inputs
+      for path, error in builder.errors:
+        self.cfg.logging.error("Cannot load %s : %s", path, error)
+
+      count = len(previous) if previous is not None else 0
+      if changed:
+        with PROFILER.phase(PHASE_OUTPUT):
+          count = write_index(self.cfg.symbol_index_path, inputs, builder.documents,
+                              builder.entries(previous))
+    except OSError as exception:
+      self.cfg.logging.critical("Error: " + exception.filename + "- " + exception.strerror)
+      exit(1)
+    finally:
+      if previous is not None:
+        previous.close()
+
+    print("%d configs indexed (%d read, %d unchanged, %d removed), %d settings" %
+          (builder.read + builder.unchanged, builder.read, builder.unchanged, builder.removed,
+           count))
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # run_query
+  #
+  # ---------------------------------------------------------------------------
+  def run_query(self):
+    """ Output the paths of the configs of the index matching the query
+    """
+
+    try:
+      tree = QueryParser().parse(" ".join(self.cfg.query or []))
+      index = self.open_index()
+    except ValueError as exception:
+      self.cfg.logging.critical(str(exception))
+      exit(1)
+
+    try:
+      with PROFILER.phase(PHASE_OPERATORS):
+        bitset = evaluate_query(tree, index)
+      with PROFILER.phase(PHASE_OUTPUT):
+        paths = sorted(index.paths(bitset))
+        for path in paths:
+          print(path)
+    finally:
+      index.close()
+
+    self.cfg.logging.info("%d configs out of %d match", len(paths),
+                          sum(document is not None for document in index.documents))
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # open_index
+  #
+  # ---------------------------------------------------------------------------
+  def open_index(self):
+    """ Return the SymbolIndex of the configuration. Raise ValueError if the
+    index is not valid, and abort if it cannot be read.
+    """
+
+    try:
+      return SymbolIndex().open(self.cfg.symbol_index_path)
+    except OSError as exception:
+      self.cfg.logging.critical("Error: " + exception.filename + "- " + exception.strerror +
+                                " (run '" + Key.INDEX.value + " " + Key.INDEX_BUILD.value +
+                                "' first)")
+      exit(1)
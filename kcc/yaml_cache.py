@@ -0,0 +1,151 @@
+#
+# The contents of this file are subject to the Apache 2.0 license you may not
+# use this file except in compliance with the License.
+#
+# Software distributed under the License is distributed on an "AS IS" basis,
+# WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License
+# for the specific language governing rights and limitations under the
+# License.
+#
+#
+# Copyright 2023 KCC project (http://www.firmwaretoolkit.org).
+# All rights reserved. Use is subject to license terms.
+#
+#
+# Contributors list :
+#
+#    William Bonnet     wllmbnnt@gmail.com, wbonnet@theitmakers.com
+#
+
+""" This module contains the loading of the YAML files (tool configuration and
+test suites). Files are loaded with the safe loader of libyaml when PyYAML has
+been built with it, otherwise with the pure Python safe loader.
+
+Loaded documents can be stored in a compiled cache, as marshal files. An entry
+is named after the hash of the path of the YAML file, and stores the size, the
+modification time and the content hash of the file. The entry is used as is if
+the size and modification time did not change, or if the content hash is still
+the same, otherwise the file is loaded again and the entry replaced.
+"""
+
+import os
+import time
+import marshal
+import hashlib
+import tempfile
+
+# Version of the cache entries. Must be increased each time their content
+# changes
+_CACHE_VERSION = 1
+
+# Extension of the cache entries
+_ENTRY_EXTENSION = ".marshal"
+
+# -----------------------------------------------------------------------------
+#
+# load_yaml
+#
+# -----------------------------------------------------------------------------
+def load_yaml(filename, logger, cache_path=None):
+  """ Load a YAML file and return the document. The loading time is logged on
+  the given logger. If cache_path is not None, it is the directory of the
+  compiled cache. Raise OSError if the file cannot be read.
+  """
+
+  start = time.perf_counter()
+  status = os.stat(filename)
+
+  entry_path = None
+  content = None
+  content_hash = None
+  if cache_path is not None:
+    name = hashlib.sha1(os.path.abspath(filename).encode()).hexdigest()
+    entry_path = os.path.join(cache_path, name + _ENTRY_EXTENSION)
+    entry = _read_entry(entry_path)
+
+    if entry is not None and entry[1] == status.st_size and entry[2] == status.st_mtime_ns:
+      logger.debug("%s loaded from the compiled cache in %.3f ms", filename,
+                   (time.perf_counter() - start) * 1000)
+      return entry[4]
+
+    with open(filename, 'rb') as working_file:
+      content = working_file.read()
+    content_hash = hashlib.sha1(content).hexdigest()
+    if entry is not None and entry[3] == content_hash:
+      _write_entry(entry_path, (_CACHE_VERSION, status.st_size, status.st_mtime_ns,
+                                content_hash, entry[4]), logger)
+      logger.debug("%s loaded from the compiled cache in %.3f ms (content unchanged)",
+                   filename, (time.perf_counter() - start) * 1000)
+      return entry[4]
+
+  # yaml is imported here since its import is slow, and not needed when the
+  # compiled cache is used
+  import yaml
+  loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+  if content is None:
+    with open(filename, 'rb') as working_file:
+      content = working_file.read()
+  document = yaml.load(content, Loader=loader)
+
+  if entry_path is not None:
+    _write_entry(entry_path, (_CACHE_VERSION, status.st_size, status.st_mtime_ns,
+                              content_hash, document), logger)
+  logger.debug("%s loaded by %s in %.3f ms", filename, loader.__name__,
+               (time.perf_counter() - start) * 1000)
+  return document
+
+
+
+# -----------------------------------------------------------------------------
+#
+# _read_entry
+#
+# -----------------------------------------------------------------------------
+def _read_entry(entry_path):
+  """ Return the (version, size, mtime, hash, document) tuple stored in a cache
+  entry, or None if the entry does not exist or is not valid
+  """
+
+  try:
+    with open(entry_path, 'rb') as working_file:
+      entry = marshal.loads(working_file.read())
+  except (OSError, EOFError, ValueError, TypeError):
+    return None
+
+  if not isinstance(entry, tuple) or len(entry) != 5 or entry[0] != _CACHE_VERSION:
+    return None
+  return entry
+
+
+
+# -----------------------------------------------------------------------------
+#
+# _write_entry
+#
+# -----------------------------------------------------------------------------
+def _write_entry(entry_path, entry, logger):
+  """ Atomically write a cache entry. Failures are only logged, since the
+  cache is an optimization. Documents containing objects marshal cannot store
+  (dates for instance) are not cached.
+  """
+
+  try:
+    content = marshal.dumps(entry)
+  except ValueError:
+    logger.debug("%s cannot be stored in the compiled cache", entry_path)
+    return
+
+  directory = os.path.dirname(entry_path)
+  try:
+    os.makedirs(directory, exist_ok=True)
+    handle, temporary_path = tempfile.mkstemp(dir=directory)
+    try:
+      with os.fdopen(handle, 'wb') as working_file:
+        working_file.write(content)
+      os.replace(temporary_path, entry_path)
+    except OSError:
+      os.unlink(temporary_path)
+      raise
+  except OSError as exception:
+    logger.debug("Cannot write the compiled cache entry %s : %s", entry_path,
+                 exception.strerror)
@@ -35,6 +35,7 @@ config = {
     'author_email': __author_email__,
     'version': __version__,
     'install_requires': [ 'pyyaml' ],
+    'extras_require': { 'corpus': [ 'numpy' ] },
     'packages': ['kcc'],
     'scripts': [ 'bin/kcc' ],
     'name': 'kcc'
@@ -0,0 +1,185 @@
+#
+# The contents of this file are subject to the Apache 2.0 license you may not
+# use this file except in compliance with the License.
+#
+# Software distributed under the License is distributed on an "AS IS" basis,
+# WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License
+# for the specific language governing rights and limitations under the
+# License.
+#
+#
+# Copyright 2023 KCC project (http://www.firmwaretoolkit.org).
+# All rights reserved. Use is subject to license terms.
+#
+#
+# Contributors list :
+#
+#    William Bonnet     wllmbnnt@gmail.com, wbonnet@theitmakers.com
+#
+
+""" Unit tests of the aggregation of the test results
+"""
+
+import io
+import unittest
+import contextlib
+from kcc import model, run_testsuite
+from kcc.aggregation import ResultAggregator
+
+# Tests of the suite : path and success of each test
+_TESTS = (((1, 1, 1), True), ((1, 1, 2), False), ((1, 2, 1), True), ((2, 1), True))
+
+# -----------------------------------------------------------------------------
+#
+# suite
+#
+# -----------------------------------------------------------------------------
+def suite():
+  """ Return the tests of the suite, in tree order
+  """
+
+  return [model.TestCase(path, ["node %s" % ".".join(str(index) for index in path[:depth])
+                                for depth in range(1, len(path) + 1)],
+                         "script.sh", [], frozenset()) for path, _ in _TESTS]
+
+
+
+# -----------------------------------------------------------------------------
+#
+# result
+#
+# -----------------------------------------------------------------------------
+def result(test, cached=False):
+  """ Return the result of a test of the suite
+  """
+
+  success = dict(_TESTS)[test.path]
+  return run_testsuite.TestResult(test, success, 0 if success else 1, "", [], 0.0, cached)
+
+
+
+# -----------------------------------------------------------------------------
+#
+# class TestAggregation
+#
+# -----------------------------------------------------------------------------
+class TestAggregation(unittest.TestCase):
+  """This class tests the nodes output by the aggregator, and when they are
+  output
+  """
+
+  # ---------------------------------------------------------------------------
+  #
+  # aggregate
+  #
+  # ---------------------------------------------------------------------------
+  def aggregate(self, aggregator, tests, done):
+    """ Read the tests through the aggregator, then add the results of the
+    given tests. Return the output lines.
+    """
+
+    with contextlib.redirect_stdout(io.StringIO()) as stdout:
+      for test in aggregator.track(tests):
+        pass
+      for test in done:
+        aggregator.add(result(test))
+      aggregator.flush()
+    return stdout.getvalue().splitlines()
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # test_streaming
+  #
+  # ---------------------------------------------------------------------------
+  def test_streaming(self):
+    """ A node is output as soon as the suite moved to the next node and its
+    tests are done, deepest nodes first
+    """
+
+    aggregator = ResultAggregator(2)
+    lines = []
+    with contextlib.redirect_stdout(io.StringIO()) as stdout:
+      for test in aggregator.track(suite()):
+        aggregator.add(result(test, cached=test.path == (1, 1, 1)))
+        lines.append(stdout.getvalue().splitlines())
+
+    self.assertEqual(lines[:2], [[], []])
+    self.assertEqual(lines[2], ["[FAIL] 1.1 node 1 / node 1.1 : 1 passed, 1 failed (1 cached)"])
+    self.assertEqual(lines[3][1:], ["[ OK ] 1.2 node 1 / node 1.2 : 1 passed",
+                                    "[FAIL] 1 node 1 : 2 passed, 1 failed (1 cached)"])
+    self.assertEqual(stdout.getvalue().splitlines()[-1], "[ OK ] 2 node 2 : 1 passed")
+    self.assertEqual(aggregator.nodes, {})
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # test_running_tests
+  #
+  # ---------------------------------------------------------------------------
+  def test_running_tests(self):
+    """ A node is not output while one of its tests is running, whatever the
+    completion order
+    """
+
+    tests = suite()
+    lines = self.aggregate(ResultAggregator(1), tests, reversed(tests))
+    self.assertEqual(lines, ["[ OK ] 2 node 2 : 1 passed",
+                             "[FAIL] 1 node 1 : 2 passed, 1 failed"])
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # test_only_errors
+  #
+  # ---------------------------------------------------------------------------
+  def test_only_errors(self):
+    """ Only the failed nodes are output if requested
+    """
+
+    tests = suite()
+    lines = self.aggregate(ResultAggregator(1, only_errors=True), tests, tests)
+    self.assertEqual(lines, ["[FAIL] 1 node 1 : 2 passed, 1 failed"])
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # test_flush
+  #
+  # ---------------------------------------------------------------------------
+  def test_flush(self):
+    """ Nodes whose tests have been cancelled are output when flushed
+    """
+
+    tests = suite()
+    lines = self.aggregate(ResultAggregator(2), tests, tests[:1])
+    self.assertEqual(lines, ["[STOP] 1.1 node 1 / node 1.1 : 1 passed, 1 not run",
+                             "[STOP] 1.2 node 1 / node 1.2 : 0 passed, 1 not run",
+                             "[STOP] 1 node 1 : 1 passed, 2 not run",
+                             "[STOP] 2 node 2 : 0 passed, 1 not run"])
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # test_status_line
+  #
+  # ---------------------------------------------------------------------------
+  def test_status_line(self):
+    """ The status line is removed before a node is output
+    """
+
+    status = io.StringIO()
+    tests = suite()
+    self.aggregate(ResultAggregator(1, status_stream=status), tests, tests)
+    self.assertTrue(status.getvalue().startswith("1 tests done, 1 node 1 : 1 passed, 2 pending\r"))
+    self.assertTrue(status.getvalue().endswith("\r"))
+
+
+
+if __name__ == '__main__':
+  unittest.main()
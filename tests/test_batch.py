@@ -0,0 +1,199 @@
+#
+# The contents of this file are subject to the Apache 2.0 license you may not
+# use this file except in compliance with the License.
+#
+# Software distributed under the License is distributed on an "AS IS" basis,
+# WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License
+# for the specific language governing rights and limitations under the
+# License.
+#
+#
+# Copyright 2023 KCC project (http://www.firmwaretoolkit.org).
+# All rights reserved. Use is subject to license terms.
+#
+#
+# Contributors list :
+#
+#    William Bonnet     wllmbnnt@gmail.com, wbonnet@theitmakers.com
+#
+
+""" Unit tests of the requests of the batch command
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from kcc.model import Configuration
+from kcc.batch import ConfigStore, RequestHandler
+
+# -----------------------------------------------------------------------------
+#
+# class TestBatch
+#
+# -----------------------------------------------------------------------------
+class TestBatch(unittest.TestCase):
+  """This class tests the responses of the request handler
+  """
+
+  # ---------------------------------------------------------------------------
+  #
+  # setUp
+  #
+  # ---------------------------------------------------------------------------
+  def setUp(self):
+    """ Create two configs and the handler
+    """
+
+    self.directory = tempfile.mkdtemp()
+    self.first = self.write("first", "CONFIG_TEST_A=y\nCONFIG_TEST_B=m\n")
+    self.second = self.write("second", "CONFIG_TEST_A=y\nCONFIG_TEST_C=y\n")
+    self.handler = RequestHandler(Configuration(), ConfigStore())
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # tearDown
+  #
+  # ---------------------------------------------------------------------------
+  def tearDown(self):
+    """ Remove the configs
+    """
+
+    shutil.rmtree(self.directory)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # write
+  #
+  # ---------------------------------------------------------------------------
+  def write(self, name, text):
+    """ Write a config in the temporary directory and return its path
+    """
+
+    path = os.path.join(self.directory, name)
+    with open(path, 'w') as working_file:
+      working_file.write(text)
+    return path
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # request
+  #
+  # ---------------------------------------------------------------------------
+  def request(self, **members):
+    """ Return the response to an except request on the two configs, with the
+    given members added
+    """
+
+    request = {"command": "except", "inputs": [self.first, self.second]}
+    request.update(members)
+    return self.handler.handle(request)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # test_operator
+  #
+  # ---------------------------------------------------------------------------
+  def test_operator(self):
+    """ The fragment is returned, or written to the output file
+    """
+
+    response = self.request(id=7)
+    self.assertEqual(response, {"id": 7, "status": "ok", "entries": 1,
+                                "fragment": "CONFIG_TEST_B=m\n"})
+
+    output = os.path.join(self.directory, "output")
+    response = self.request(output=output)
+    self.assertEqual(response["status"], "ok")
+    with open(output) as working_file:
+      self.assertEqual(working_file.read(), "CONFIG_TEST_B=m\n")
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # test_invalid_requests
+  #
+  # ---------------------------------------------------------------------------
+  def test_invalid_requests(self):
+    """ Invalid requests are answered by an error response
+    """
+
+    for members in ({"output": 1}, {"output": ["x"]}, {"minimize": "yes"}, {"kconfig": 3},
+                    {"inputs": []}, {"inputs": [1]}, {"command": "union"},
+                    {"command": "compare"}, {"command": "merge", "warn_redundant": 1}):
+      response = self.request(id=1, **members)
+      self.assertEqual(response["status"], "error", members)
+      self.assertEqual(response["id"], 1)
+      self.assertIn("error", response)
+    self.assertEqual(self.handler.handle([1, 2])["status"], "error")
+
+    # The handler is still usable
+    self.assertEqual(self.request()["status"], "ok")
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # test_missing_file
+  #
+  # ---------------------------------------------------------------------------
+  def test_missing_file(self):
+    """ A missing input is reported with its name
+    """
+
+    missing = os.path.join(self.directory, "missing")
+    response = self.request(inputs=[self.first, missing])
+    self.assertEqual(response["status"], "error")
+    self.assertIn(missing, response["error"])
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # test_unexpected_error
+  #
+  # ---------------------------------------------------------------------------
+  def test_unexpected_error(self):
+    """ An unexpected exception is turned into an error response
+    """
+
+    def fail(cfg):
+      raise TypeError("unexpected")
+
+    self.handler.process_operator = fail
+    response = self.request(id="x")
+    self.assertEqual(response["status"], "error")
+    self.assertEqual(response["id"], "x")
+    self.assertIn("TypeError", response["error"])
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # test_compare
+  #
+  # ---------------------------------------------------------------------------
+  def test_compare(self):
+    """ The differences of each file to the reference are returned
+    """
+
+    response = self.handler.handle({"command": "compare", "reference": self.first,
+                                    "inputs": [self.second]})
+    self.assertEqual(response["status"], "ok")
+    result = response["files"][0]
+    self.assertEqual((result["only_reference"], result["only_file"], result["changed"],
+                      result["common"]), (1, 1, 0, 1))
+
+
+
+if __name__ == '__main__':
+  unittest.main()
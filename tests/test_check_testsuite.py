@@ -0,0 +1,175 @@
+#
+# The contents of this file are subject to the Apache 2.0 license you may not
+# use this file except in compliance with the License.
+#
+# Software distributed under the License is distributed on an "AS IS" basis,
+# WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License
+# for the specific language governing rights and limitations under the
+# License.
+#
+#
+# Copyright 2023 KCC project (http://www.firmwaretoolkit.org).
+# All rights reserved. Use is subject to license terms.
+#
+#
+# Contributors list :
+#
+#    William Bonnet     wllmbnnt@gmail.com, wbonnet@theitmakers.com
+#
+
+""" Unit tests of the check-suite command
+"""
+
+import io
+import os
+import shutil
+import tempfile
+import unittest
+import contextlib
+from kcc.model import Configuration
+from kcc.check_testsuite import CheckTestSuite
+
+# Scripts of the library, with their declared arguments
+_SCRIPTS = {"one.sh": "# kcc-args: config",
+            "range.sh": "# kcc-args: config [arch]",
+            "free.sh": "",
+            "invalid.sh": "# kcc-args: [arch] config"}
+
+# Suite checked by the tests. The problems are the missing script, the wrong
+# number of arguments, and the node without script nor test
+_SUITE = """test-suite:
+  - description: node
+    test:
+      - description: valid
+        script: one.sh
+        args: [.config]
+      - description: optional argument
+        script: range.sh
+        args: .config arm64
+      - description: too many arguments
+        script: range.sh
+        args: [.config, arm64, extra]
+      - description: missing argument
+        script: one.sh
+      - description: undeclared arguments
+        script: free.sh
+        args: [a, b, c]
+      - description: invalid declaration
+        script: invalid.sh
+        args: 1
+  - description: suite directory
+    script: local.sh
+  - description: not in the library
+    script: missing.sh
+  - description: empty
+"""
+
+# -----------------------------------------------------------------------------
+#
+# class TestCheckTestSuite
+#
+# -----------------------------------------------------------------------------
+class TestCheckTestSuite(unittest.TestCase):
+  """This class checks a suite against a library
+  """
+
+  # ---------------------------------------------------------------------------
+  #
+  # setUp
+  #
+  # ---------------------------------------------------------------------------
+  def setUp(self):
+    """ Create the library, a script next to the suite, and the configuration
+    """
+
+    self.directory = tempfile.mkdtemp()
+    library = os.path.join(self.directory, "library")
+    os.makedirs(library)
+    for name, args in _SCRIPTS.items():
+      self.write(os.path.join(library, name),
+                 "#!/bin/sh\n# kcc-id: %s\n# kcc-description: Test\n%s\n" % (name, args))
+    self.write(os.path.join(self.directory, "local.sh"), "#!/bin/sh\n")
+
+    self.cfg = Configuration()
+    self.cfg.library = [library]
+    self.cfg.library_index_path = os.path.join(self.directory, "index")
+    self.cfg.suite_cache_path = None
+    self.cfg.suite = self.write(os.path.join(self.directory, "suite.yml"), _SUITE)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # tearDown
+  #
+  # ---------------------------------------------------------------------------
+  def tearDown(self):
+    """ Remove the temporary directory
+    """
+
+    shutil.rmtree(self.directory)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # write
+  #
+  # ---------------------------------------------------------------------------
+  @staticmethod
+  def write(path, text):
+    """ Write a file and return its path
+    """
+
+    with open(path, 'w') as working_file:
+      working_file.write(text)
+    return path
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # test_problems
+  #
+  # ---------------------------------------------------------------------------
+  def test_problems(self):
+    """ All the problems of the suite are output in suite order, then the
+    command fails
+    """
+
+    with contextlib.redirect_stdout(io.StringIO()) as stdout:
+      with self.assertRaises(SystemExit) as context:
+        CheckTestSuite(self.cfg).check_suite()
+    self.assertEqual(context.exception.code, 1)
+
+    lines = stdout.getvalue().splitlines()
+    self.assertEqual(lines[:4],
+                     ["Test 1.3 node / too many arguments : "
+                      "range.sh expects 1 to 2 arguments, 3 given",
+                      "Test 1.4 node / missing argument : one.sh expects 1 arguments, 0 given",
+                      "Test 3 not in the library : script 'missing.sh' is not in the library",
+                      "Test 4 has neither 'script' nor 'test'"])
+    self.assertTrue(lines[4].startswith("8 tests checked in "))
+    self.assertTrue(lines[4].endswith(", 4 errors"))
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # test_valid_suite
+  #
+  # ---------------------------------------------------------------------------
+  def test_valid_suite(self):
+    """ A valid suite is accepted
+    """
+
+    self.write(self.cfg.suite, "test-suite:\n  - description: valid\n    script: one.sh\n"
+                               "    args: [.config]\n")
+    with contextlib.redirect_stdout(io.StringIO()) as stdout:
+      CheckTestSuite(self.cfg).check_suite()
+    self.assertTrue(stdout.getvalue().startswith("1 tests checked in "))
+
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,182 @@
+#
+# The contents of this file are subject to the Apache 2.0 license you may not
+# use this file except in compliance with the License.
+#
+# Software distributed under the License is distributed on an "AS IS" basis,
+# WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License
+# for the specific language governing rights and limitations under the
+# License.
+#
+#
+# Copyright 2023 KCC project (http://www.firmwaretoolkit.org).
+# All rights reserved. Use is subject to license terms.
+#
+#
+# Contributors list :
+#
+#    William Bonnet     wllmbnnt@gmail.com, wbonnet@theitmakers.com
+#
+
+""" Unit tests of the compare command
+"""
+
+import io
+import os
+import csv
+import shutil
+import tempfile
+import unittest
+import contextlib
+from kcc.model import Configuration
+from kcc.compare import CompareCorpus, output_names
+
+# -----------------------------------------------------------------------------
+#
+# class TestCompare
+#
+# -----------------------------------------------------------------------------
+class TestCompare(unittest.TestCase):
+  """This class tests the summary, the matrix and the fragments of the compare
+  command
+  """
+
+  # ---------------------------------------------------------------------------
+  #
+  # setUp
+  #
+  # ---------------------------------------------------------------------------
+  def setUp(self):
+    """ Create a reference and two configs sharing their basename
+    """
+
+    self.directory = tempfile.mkdtemp()
+    self.reference = self.write("reference",
+                                "CONFIG_TEST_A=y\nCONFIG_TEST_B=m\nCONFIG_TEST_C=y\n")
+    self.first = self.write("first/config", "CONFIG_TEST_A=y\nCONFIG_TEST_B=y\n")
+    self.second = self.write("second/config",
+                             "CONFIG_TEST_A=y\nCONFIG_TEST_B=m\nCONFIG_TEST_C=y\nCONFIG_TEST_D=y\n")
+
+    self.cfg = Configuration()
+    self.cfg.reference = self.reference
+    self.cfg.inputs = [self.first, self.second]
+    self.cfg.jobs = 1
+    self.cfg.use_parse_cache = False
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # tearDown
+  #
+  # ---------------------------------------------------------------------------
+  def tearDown(self):
+    """ Remove the configs
+    """
+
+    shutil.rmtree(self.directory)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # write
+  #
+  # ---------------------------------------------------------------------------
+  def write(self, name, text):
+    """ Write a config in the temporary directory and return its path
+    """
+
+    path = os.path.join(self.directory, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as working_file:
+      working_file.write(text)
+    return path
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # compare
+  #
+  # ---------------------------------------------------------------------------
+  def compare(self):
+    """ Run the compare command and return its (stdout, stderr) outputs
+    """
+
+    stdout = io.StringIO()
+    stderr = io.StringIO()
+    with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+      CompareCorpus(self.cfg).compare()
+    return (stdout.getvalue(), stderr.getvalue())
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # test_output_names
+  #
+  # ---------------------------------------------------------------------------
+  def test_output_names(self):
+    """ Inputs sharing a basename are written to different subdirectories, and
+    the same input given twice is an error
+    """
+
+    self.assertEqual(output_names([self.first, self.second]),
+                     [os.path.join("first", "config"), os.path.join("second", "config")])
+    self.assertEqual(output_names([self.first]), ["config"])
+    with self.assertRaises(ValueError):
+      output_names([self.first, os.path.join(self.directory, "second", "..", "first", "config")])
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # test_matrix_and_summary
+  #
+  # ---------------------------------------------------------------------------
+  def test_matrix_and_summary(self):
+    """ The matrix goes to stdout as valid CSV, and the summary to stderr
+    """
+
+    stdout, stderr = self.compare()
+
+    self.assertEqual(list(csv.reader(io.StringIO(stdout))),
+                     [["symbol", "reference", self.first, self.second],
+                      ["CONFIG_TEST_B", "m", "y", ""],
+                      ["CONFIG_TEST_C", "y", "-", ""],
+                      ["CONFIG_TEST_D", "-", "-", "y"]])
+    self.assertEqual(stderr.splitlines(),
+                     ["%s : 1 only in reference, 0 only in file, 1 changed, 1 common" % self.first,
+                      "%s : 0 only in reference, 1 only in file, 0 changed, 3 common" % self.second])
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # test_matrix_file_and_fragments
+  #
+  # ---------------------------------------------------------------------------
+  def test_matrix_file_and_fragments(self):
+    """ With a matrix file, the summary goes to stdout. The fragments of the
+    inputs sharing a basename are kept apart
+    """
+
+    self.cfg.matrix = os.path.join(self.directory, "matrix.csv")
+    self.cfg.output = os.path.join(self.directory, "output")
+    stdout, _ = self.compare()
+
+    self.assertEqual(len(stdout.splitlines()), 2)
+    with open(self.cfg.matrix, newline='') as working_file:
+      self.assertEqual(len(list(csv.reader(working_file))), 4)
+
+    with open(os.path.join(self.cfg.output, "first", "config.except")) as working_file:
+      self.assertIn("CONFIG_TEST_B=y", working_file.read())
+    with open(os.path.join(self.cfg.output, "second", "config.except")) as working_file:
+      self.assertIn("CONFIG_TEST_D=y", working_file.read())
+    with open(os.path.join(self.cfg.output, "second", "config.intersect")) as working_file:
+      self.assertIn("CONFIG_TEST_C=y", working_file.read())
+
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,166 @@
+#
+# The contents of this file are subject to the Apache 2.0 license you may not
+# use this file except in compliance with the License.
+#
+# Software distributed under the License is distributed on an "AS IS" basis,
+# WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License
+# for the specific language governing rights and limitations under the
+# License.
+#
+#
+# Copyright 2023 KCC project (http://www.firmwaretoolkit.org).
+# All rights reserved. Use is subject to license terms.
+#
+#
+# Contributors list :
+#
+#    William Bonnet     wllmbnnt@gmail.com, wbonnet@theitmakers.com
+#
+
+""" Unit tests of the decoding of compressed config inputs
+"""
+
+import io
+import gzip
+import unittest
+from kcc.config_input import scan_input, scan_stream, _decompress, _gzip_decompressor, \
+                             _GZIP_MAGIC
+
+# -----------------------------------------------------------------------------
+#
+# split
+#
+# -----------------------------------------------------------------------------
+def split(data, *offsets):
+  """ Return the chunks of data cut at the given offsets
+  """
+
+  bounds = (0,) + offsets + (len(data),)
+  return [data[start:end] for start, end in zip(bounds, bounds[1:])]
+
+
+
+# -----------------------------------------------------------------------------
+#
+# class TestDecompress
+#
+# -----------------------------------------------------------------------------
+class TestDecompress(unittest.TestCase):
+  """This class tests the decompression of concatenated streams
+  """
+
+  # ---------------------------------------------------------------------------
+  #
+  # setUp
+  #
+  # ---------------------------------------------------------------------------
+  def setUp(self):
+    """ Create an input made of two gzip members
+    """
+
+    self.first = gzip.compress(b"CONFIG_TEST_A=y\n")
+    self.second = gzip.compress(b"CONFIG_TEST_B=m\n")
+    self.data = self.first + self.second
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # decompress
+  #
+  # ---------------------------------------------------------------------------
+  def decompress(self, chunks):
+    """ Return the decompressed data of a sequence of chunks
+    """
+
+    return b"".join(_decompress(chunks, _gzip_decompressor, _GZIP_MAGIC))
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # test_members
+  #
+  # ---------------------------------------------------------------------------
+  def test_members(self):
+    """ Members are decompressed wherever the chunks are cut
+    """
+
+    expected = b"CONFIG_TEST_A=y\nCONFIG_TEST_B=m\n"
+    self.assertEqual(self.decompress([self.data]), expected)
+    for offset in range(1, len(self.data)):
+      self.assertEqual(self.decompress(split(self.data, offset)), expected, offset)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # test_member_on_chunk_boundary
+  #
+  # ---------------------------------------------------------------------------
+  def test_member_on_chunk_boundary(self):
+    """ A member ending exactly at the end of a chunk does not end the input,
+    even when the magic number of the next one is split between chunks
+    """
+
+    boundary = len(self.first)
+    self.assertEqual(self.decompress(split(self.data, boundary)),
+                     b"CONFIG_TEST_A=y\nCONFIG_TEST_B=m\n")
+    self.assertEqual(self.decompress(split(self.data, boundary, boundary + 1)),
+                     b"CONFIG_TEST_A=y\nCONFIG_TEST_B=m\n")
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # test_trailing_data
+  #
+  # ---------------------------------------------------------------------------
+  def test_trailing_data(self):
+    """ Data following the last member is ignored, a truncated member is an
+    error
+    """
+
+    self.assertEqual(self.decompress([self.first, b"\x00" * 16]), b"CONFIG_TEST_A=y\n")
+    self.assertEqual(self.decompress([self.first, b"\x1f"]), b"CONFIG_TEST_A=y\n")
+    with self.assertRaises(EOFError):
+      self.decompress([self.data[:-4]])
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # test_scan_input
+  #
+  # ---------------------------------------------------------------------------
+  def test_scan_input(self):
+    """ A gzip compressed config is scanned as the plain text one
+    """
+
+    symbols = [record[1] for record in scan_input(self.data) if record[1] is not None]
+    self.assertEqual(symbols, [b"CONFIG_TEST_A", b"CONFIG_TEST_B"])
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # test_scan_stream
+  #
+  # ---------------------------------------------------------------------------
+  def test_scan_stream(self):
+    """ Compressed and plain streams are scanned, binary ones are rejected
+    """
+
+    for data in (self.data, b"CONFIG_TEST_A=y\nCONFIG_TEST_B=m"):
+      symbols = [record[1] for record in scan_stream(io.BytesIO(data))
+                 if record[1] is not None]
+      self.assertEqual(symbols, [b"CONFIG_TEST_A", b"CONFIG_TEST_B"])
+    with self.assertRaises(OSError):
+      list(scan_stream(io.BytesIO(b"\x7fELF\x00\x00"), "vmlinux"))
+    with self.assertRaises(OSError):
+      list(scan_stream(io.BytesIO(self.data[:-4])))
+
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,178 @@
+#
+# The contents of this file are subject to the Apache 2.0 license you may not
+# use this file except in compliance with the License.
+#
+# Software distributed under the License is distributed on an "AS IS" basis,
+# WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License
+# for the specific language governing rights and limitations under the
+# License.
+#
+#
+# Copyright 2023 KCC project (http://www.firmwaretoolkit.org).
+# All rights reserved. Use is subject to license terms.
+#
+#
+# Contributors list :
+#
+#    William Bonnet     wllmbnnt@gmail.com, wbonnet@theitmakers.com
+#
+
+""" Unit tests of the similarity and prevalence computed by the corpus command
+"""
+
+import os
+import random
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from kcc import corpus
+from kcc.model import Key
+from kcc.corpus import CorpusMatrix, near_identical
+
+# Configs of the corpus. The third one is identical to the first one, and the
+# fourth one only defines a symbol no other config defines
+_CONFIGS = ("CONFIG_TEST_A=y\nCONFIG_TEST_B=y\nCONFIG_TEST_C=m\n",
+            "CONFIG_TEST_A=y\nCONFIG_TEST_B=m\nCONFIG_TEST_D=y\n",
+            "CONFIG_TEST_A=y\nCONFIG_TEST_B=y\nCONFIG_TEST_C=m\n",
+            "CONFIG_TEST_E=\"text\"\n")
+
+# -----------------------------------------------------------------------------
+#
+# class TestCorpus
+#
+# -----------------------------------------------------------------------------
+@unittest.skipIf(corpus.numpy is None, "numpy is not installed")
+class TestCorpus(unittest.TestCase):
+  """This class compares the vectorized metrics to their definition
+  """
+
+  # ---------------------------------------------------------------------------
+  #
+  # setUp
+  #
+  # ---------------------------------------------------------------------------
+  def setUp(self):
+    """ Create the temporary directory of the configs
+    """
+
+    self.directory = tempfile.mkdtemp()
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # tearDown
+  #
+  # ---------------------------------------------------------------------------
+  def tearDown(self):
+    """ Remove the configs
+    """
+
+    shutil.rmtree(self.directory)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # load
+  #
+  # ---------------------------------------------------------------------------
+  def load(self, texts):
+    """ Write the configs and return their CorpusMatrix
+    """
+
+    paths = []
+    for number, text in enumerate(texts):
+      paths.append(os.path.join(self.directory, "config%03d" % number))
+      with open(paths[-1], 'w') as working_file:
+        working_file.write(text)
+    return CorpusMatrix().load(paths + [os.path.join(self.directory, "missing")])
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # test_similarity
+  #
+  # ---------------------------------------------------------------------------
+  def test_similarity(self):
+    """ Jaccard index of the settings, and number of symbols not having the
+    same value
+    """
+
+    matrix = self.load(_CONFIGS)
+    self.assertEqual(len(matrix.paths), 4)
+    self.assertEqual([path for path, _ in matrix.errors],
+                     [os.path.join(self.directory, "missing")])
+
+    jaccard = matrix.analyze(Key.METRIC_JACCARD.value).similarity(Key.METRIC_JACCARD.value)
+    self.assertEqual(jaccard.round(4).tolist(), [[1.0, 0.2, 1.0, 0.0],
+                                                 [0.2, 1.0, 0.2, 0.0],
+                                                 [1.0, 0.2, 1.0, 0.0],
+                                                 [0.0, 0.0, 0.0, 1.0]])
+    self.assertEqual(near_identical(jaccard, Key.METRIC_JACCARD.value, 0.95), [[0, 2]])
+
+    hamming = matrix.analyze(Key.METRIC_HAMMING.value).similarity(Key.METRIC_HAMMING.value)
+    self.assertEqual(hamming.tolist(), [[0, 3, 0, 4],
+                                        [3, 0, 3, 4],
+                                        [0, 3, 0, 4],
+                                        [4, 4, 4, 0]])
+    self.assertEqual(near_identical(hamming, Key.METRIC_HAMMING.value, 3), [[0, 1, 2]])
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # test_prevalence
+  #
+  # ---------------------------------------------------------------------------
+  def test_prevalence(self):
+    """ Counts, distinct values and most common value of each symbol
+    """
+
+    matrix = self.load(_CONFIGS).analyze()
+    self.assertEqual(sorted(matrix.prevalence()),
+                     [("CONFIG_TEST_A", 3, 3, 0, 0, 1, "y", 3),
+                      ("CONFIG_TEST_B", 3, 2, 1, 0, 2, "y", 2),
+                      ("CONFIG_TEST_C", 2, 0, 2, 0, 1, "m", 2),
+                      ("CONFIG_TEST_D", 1, 1, 0, 0, 1, "y", 1),
+                      ("CONFIG_TEST_E", 1, 0, 0, 0, 1, "\"text\"", 1)])
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # test_blocks
+  #
+  # ---------------------------------------------------------------------------
+  def test_blocks(self):
+    """ The metrics computed by blocks of columns match their definition on a
+    random corpus
+    """
+
+    generator = random.Random(1)
+    configs = [{"CONFIG_TEST_%02d" % symbol: generator.choice(("y", "m", "n", "1"))
+                for symbol in range(40) if generator.random() < 0.7}
+               for _ in range(12)]
+    texts = ["".join("%s=%s\n" % item for item in config.items()) for config in configs]
+
+    with mock.patch.object(corpus, "_BLOCK_COLUMNS", 7), \
+         mock.patch.object(corpus, "_PRODUCT_COLUMNS", 3):
+      matrix = self.load(texts)
+      jaccard = matrix.analyze(Key.METRIC_JACCARD.value).similarity(Key.METRIC_JACCARD.value)
+      hamming = matrix.analyze(Key.METRIC_HAMMING.value).similarity(Key.METRIC_HAMMING.value)
+
+    for row, first in enumerate(configs):
+      for column, second in enumerate(configs):
+        settings = (set(first.items()), set(second.items()))
+        self.assertAlmostEqual(jaccard[row, column],
+                               len(settings[0] & settings[1]) / len(settings[0] | settings[1]))
+        self.assertEqual(hamming[row, column],
+                         sum(1 for symbol in set(first) | set(second)
+                             if first.get(symbol) != second.get(symbol)))
+
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,218 @@
+#
+# The contents of this file are subject to the Apache 2.0 license you may not
+# use this file except in compliance with the License.
+#
+# Software distributed under the License is distributed on an "AS IS" basis,
+# WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License
+# for the specific language governing rights and limitations under the
+# License.
+#
+#
+# Copyright 2023 KCC project (http://www.firmwaretoolkit.org).
+# All rights reserved. Use is subject to license terms.
+#
+#
+# Contributors list :
+#
+#    William Bonnet     wllmbnnt@gmail.com, wbonnet@theitmakers.com
+#
+
+""" Unit tests of the operator expression language
+"""
+
+import os
+import unittest
+from kcc.model import Config
+from kcc.expression import ExpressionParser, QueryPlan
+
+# Content of the configs of the expressions, indexed by name
+CONFIGS = {"a": b"CONFIG_TEST_A=y\nCONFIG_TEST_B=y\n",
+           "b": b"CONFIG_TEST_C=y\n",
+           "c": b"CONFIG_TEST_B=y\nCONFIG_TEST_C=y\n"}
+
+# -----------------------------------------------------------------------------
+#
+# parse
+#
+# -----------------------------------------------------------------------------
+def parse(text):
+  """ Return the (output, tree) tuple of an expression
+  """
+
+  return ExpressionParser().parse(text)
+
+
+
+# -----------------------------------------------------------------------------
+#
+# class TestExpression
+#
+# -----------------------------------------------------------------------------
+class TestExpression(unittest.TestCase):
+  """This class tests the parsing of the expressions, and the sharing, fusion
+  and lazy evaluation of the plans
+  """
+
+  # ---------------------------------------------------------------------------
+  #
+  # setUp
+  #
+  # ---------------------------------------------------------------------------
+  def setUp(self):
+    """ Reset the list of the loaded files
+    """
+
+    self.loaded = []
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # load
+  #
+  # ---------------------------------------------------------------------------
+  def load(self, path):
+    """ Return the Config of a file of the expressions, and record its loading
+    """
+
+    self.loaded.append(os.path.basename(path))
+    return Config(path).load_buffer(CONFIGS[os.path.basename(path)])
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # result
+  #
+  # ---------------------------------------------------------------------------
+  def result(self, plan, output):
+    """ Evaluate the expression of an output and return the text of its result
+    """
+
+    node_id = dict(plan.outputs)[output]
+    result = plan.evaluate(node_id, self.load)
+    return result.to_config(order=plan.leaves(node_id)).to_text()
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # test_precedence
+  #
+  # ---------------------------------------------------------------------------
+  def test_precedence(self):
+    """ intersect binds tighter than except and concat, which are left
+    associative
+    """
+
+    self.assertEqual(parse("a except b concat c intersect d"),
+                     (None, ("concat", ("except", ("file", "a"), ("file", "b")),
+                             ("intersect", ("file", "c"), ("file", "d")))))
+    self.assertEqual(parse("a except (b concat c)"),
+                     (None, ("except", ("file", "a"),
+                             ("concat", ("file", "b"), ("file", "c")))))
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # test_names_and_output
+  #
+  # ---------------------------------------------------------------------------
+  def test_names_and_output(self):
+    """ Quoted names may be operator words or contain spaces, and the output is
+    given before '='
+    """
+
+    self.assertEqual(parse('"my out" = "except" concat "a (b)"'),
+                     ("my out", ("concat", ("file", "except"), ("file", "a (b)"))))
+    self.assertEqual(parse("a=b"), (None, ("file", "a=b")))
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # test_syntax_errors
+  #
+  # ---------------------------------------------------------------------------
+  def test_syntax_errors(self):
+    """ Invalid expressions raise ValueError
+    """
+
+    for text in ("a except", "(a concat b", "a b", "except a", "a concat )", '"a'):
+      with self.assertRaises(ValueError, msg=text):
+        parse(text)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # test_shared_nodes
+  #
+  # ---------------------------------------------------------------------------
+  def test_shared_nodes(self):
+    """ Identical sub-expressions are added once, thus evaluated once, and each
+    file is loaded once
+    """
+
+    plan = QueryPlan()
+    for text in ("first = (a concat b) except c", "second = a concat b",
+                 "third = a intersect c"):
+      plan.add(*parse(text))
+    self.assertEqual(len(plan.nodes), 6)
+
+    self.assertEqual(self.result(plan, "first"), "CONFIG_TEST_A=y\n")
+    self.assertEqual(self.result(plan, "second"),
+                     "CONFIG_TEST_A=y\nCONFIG_TEST_B=y\nCONFIG_TEST_C=y\n")
+    self.assertEqual(self.result(plan, "third"), "CONFIG_TEST_B=y\n")
+    self.assertEqual(sorted(self.loaded), ["a", "b", "c"])
+    self.assertEqual(plan.evaluated, 3)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # test_lazy_evaluation
+  #
+  # ---------------------------------------------------------------------------
+  def test_lazy_evaluation(self):
+    """ Only the files needed by the evaluated output are loaded
+    """
+
+    plan = QueryPlan()
+    plan.add(*parse("first = a concat b"))
+    plan.add(*parse("second = c"))
+    self.result(plan, "second")
+    self.assertEqual(self.loaded, ["c"])
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # test_fusion
+  #
+  # ---------------------------------------------------------------------------
+  def test_fusion(self):
+    """ Chains of the same operator used once are fused, the right operand of
+    except and shared intermediate results are not
+    """
+
+    plan = QueryPlan()
+    plan.add(*parse("first = (a except b) except c"))
+    plan.add(*parse("second = a except (b except c)"))
+    plan.add(*parse("third = a concat (b concat c)"))
+    plan.add(*parse("fourth = b concat c"))
+    optimized = plan.optimize()
+    outputs = dict(optimized.outputs)
+
+    self.assertEqual(len(optimized.nodes[outputs["first"]][1]), 3)
+    self.assertEqual(len(optimized.nodes[outputs["second"]][1]), 2)
+    self.assertEqual(len(optimized.nodes[outputs["third"]][1]), 2)
+
+    for output in outputs:
+      self.assertEqual(self.result(optimized, output), self.result(plan, output), output)
+
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,178 @@
+#
+# The contents of this file are subject to the Apache 2.0 license you may not
+# use this file except in compliance with the License.
+#
+# Software distributed under the License is distributed on an "AS IS" basis,
+# WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License
+# for the specific language governing rights and limitations under the
+# License.
+#
+#
+# Copyright 2023 KCC project (http://www.firmwaretoolkit.org).
+# All rights reserved. Use is subject to license terms.
+#
+#
+# Contributors list :
+#
+#    William Bonnet     wllmbnnt@gmail.com, wbonnet@theitmakers.com
+#
+
+""" Unit tests of the factor command
+"""
+
+import io
+import os
+import shutil
+import tempfile
+import unittest
+import contextlib
+from kcc import factor
+from kcc.model import Config, Configuration
+from kcc.merge import FragmentMerger
+
+# Configs of the corpus, indexed by name. Two of them share their basename
+_CONFIGS = {"first/board": "CONFIG_TEST_A=y\nCONFIG_TEST_B=y\nCONFIG_TEST_C=m\nCONFIG_TEST_D=y\n",
+            "second/board": "CONFIG_TEST_A=y\nCONFIG_TEST_B=y\nCONFIG_TEST_C=y\n",
+            "second/other": "CONFIG_TEST_A=y\nCONFIG_TEST_B=m\nCONFIG_TEST_C=m\n"
+                            "CONFIG_TEST_E=y\n"}
+
+# -----------------------------------------------------------------------------
+#
+# class TestFactor
+#
+# -----------------------------------------------------------------------------
+@unittest.skipIf(factor.numpy is None, "numpy is not installed")
+class TestFactor(unittest.TestCase):
+  """This class checks that merging each fragment into the base gives back its
+  config
+  """
+
+  # ---------------------------------------------------------------------------
+  #
+  # setUp
+  #
+  # ---------------------------------------------------------------------------
+  def setUp(self):
+    """ Create the configs of the corpus and the configuration
+    """
+
+    self.directory = tempfile.mkdtemp()
+    self.cfg = Configuration()
+    self.cfg.inputs = []
+    self.cfg.output = os.path.join(self.directory, "output")
+    self.cfg.use_parse_cache = False
+    for name, text in _CONFIGS.items():
+      self.write(name, text)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # tearDown
+  #
+  # ---------------------------------------------------------------------------
+  def tearDown(self):
+    """ Remove the temporary directory
+    """
+
+    shutil.rmtree(self.directory)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # write
+  #
+  # ---------------------------------------------------------------------------
+  def write(self, name, text):
+    """ Write a config of the corpus, and add it to the inputs
+    """
+
+    path = os.path.join(self.directory, "corpus", name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as working_file:
+      working_file.write(text)
+    self.cfg.inputs.append(path)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # factor
+  #
+  # ---------------------------------------------------------------------------
+  def factor(self, quorum):
+    """ Run the factor command, and return the settings of the base, and of
+    the merge of each fragment into the base, indexed by config name
+    """
+
+    self.cfg.quorum = quorum
+    with contextlib.redirect_stdout(io.StringIO()):
+      factor.CorpusFactorization(self.cfg).run_factor()
+
+    base = Config().load(os.path.join(self.cfg.output, "base.config"))
+    merged = {}
+    for path in self.cfg.inputs:
+      name = os.path.relpath(path, os.path.join(self.directory, "corpus"))
+      fragment = Config().load(os.path.join(self.cfg.output, name + ".except"))
+      merged[name] = dict(FragmentMerger(self.cfg).merge_configs(base, [fragment]).items())
+    return (dict(base.items()), merged)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # config
+  #
+  # ---------------------------------------------------------------------------
+  @staticmethod
+  def config(text):
+    """ Return the settings of a config content
+    """
+
+    return dict(Config().load_buffer(text.encode()).items())
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # test_round_trip
+  #
+  # ---------------------------------------------------------------------------
+  def test_round_trip(self):
+    """ With any quorum, merging a fragment into the base gives back the config
+    """
+
+    for quorum, base in ((1.0, "CONFIG_TEST_A=y\n"),
+                         (0.6, "CONFIG_TEST_A=y\nCONFIG_TEST_B=y\nCONFIG_TEST_C=m\n")):
+      result = self.factor(quorum)
+      self.assertEqual(result[0], self.config(base), quorum)
+      self.assertEqual(result[1], {name: self.config(text) for name, text in _CONFIGS.items()},
+                       quorum)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # test_missing_symbols
+  #
+  # ---------------------------------------------------------------------------
+  def test_missing_symbols(self):
+    """ A config lacking symbols of the base is reported, since the merge
+    defines them
+    """
+
+    self.write("third/board", "CONFIG_TEST_A=y\nCONFIG_TEST_C=m\n")
+    with self.assertLogs(level="WARNING") as logs:
+      base, merged = self.factor(0.5)
+    self.assertEqual(len(logs.output), 1)
+    self.assertIn("third/board does not define 1 symbols of the base", logs.output[0])
+    self.assertEqual(merged["third/board"],
+                     self.config("CONFIG_TEST_A=y\nCONFIG_TEST_B=y\nCONFIG_TEST_C=m\n"))
+    self.assertEqual(merged["first/board"], self.config(_CONFIGS["first/board"]))
+    self.assertEqual(len(base), 3)
+
+
+
+if __name__ == '__main__':
+  unittest.main()
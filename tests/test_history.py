@@ -0,0 +1,198 @@
+#
+# The contents of this file are subject to the Apache 2.0 license you may not
+# use this file except in compliance with the License.
+#
+# Software distributed under the License is distributed on an "AS IS" basis,
+# WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License
+# for the specific language governing rights and limitations under the
+# License.
+#
+#
+# Copyright 2023 KCC project (http://www.firmwaretoolkit.org).
+# All rights reserved. Use is subject to license terms.
+#
+#
+# Contributors list :
+#
+#    William Bonnet     wllmbnnt@gmail.com, wbonnet@theitmakers.com
+#
+
+""" Unit tests of the history command
+"""
+
+import io
+import os
+import shutil
+import tempfile
+import unittest
+import subprocess
+import contextlib
+from kcc.model import Configuration
+from kcc.history import ConfigHistory, GitObjectReader
+
+# Environment of the git commands, which makes the commits reproducible
+_GIT_ENVIRONMENT = {"GIT_AUTHOR_NAME": "kcc", "GIT_AUTHOR_EMAIL": "kcc@localhost",
+                    "GIT_COMMITTER_NAME": "kcc", "GIT_COMMITTER_EMAIL": "kcc@localhost",
+                    "GIT_AUTHOR_DATE": "2023-01-02T12:00:00+00:00",
+                    "GIT_COMMITTER_DATE": "2023-01-02T12:00:00+00:00"}
+
+# -----------------------------------------------------------------------------
+#
+# class TestHistory
+#
+# -----------------------------------------------------------------------------
+@unittest.skipIf(shutil.which("git") is None, "git is not installed")
+class TestHistory(unittest.TestCase):
+  """This class tests the timeline of a config stored in a temporary git
+  repository
+  """
+
+  # ---------------------------------------------------------------------------
+  #
+  # setUp
+  #
+  # ---------------------------------------------------------------------------
+  def setUp(self):
+    """ Create the repository and the history of the config
+    """
+
+    self.directory = tempfile.mkdtemp()
+    self.git("init", "-q")
+    self.commits = {}
+    self.commit("create", "configs/board", "CONFIG_TEST_A=y\nCONFIG_TEST_B=m\n")
+    self.commit("unrelated", "README", "Boards\n")
+    self.commit("update", "configs/board", "CONFIG_TEST_A=m\nCONFIG_TEST_C=y\n")
+    self.commit("comment", "configs/board", "# Board\nCONFIG_TEST_A=m\nCONFIG_TEST_C=y\n")
+    self.commit("remove", "configs/board", "CONFIG_TEST_C=y\n")
+
+    self.cfg = Configuration()
+    self.cfg.repository = self.directory
+    self.cfg.config_path = "configs/board"
+    self.cfg.revisions = "HEAD"
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # tearDown
+  #
+  # ---------------------------------------------------------------------------
+  def tearDown(self):
+    """ Remove the repository
+    """
+
+    shutil.rmtree(self.directory)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # git
+  #
+  # ---------------------------------------------------------------------------
+  def git(self, *args):
+    """ Run a git command in the repository and return its output
+    """
+
+    return subprocess.run(["git", "-C", self.directory] + list(args), check=True,
+                          stdout=subprocess.PIPE, env=dict(os.environ, **_GIT_ENVIRONMENT),
+                          universal_newlines=True).stdout.strip()
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # commit
+  #
+  # ---------------------------------------------------------------------------
+  def commit(self, subject, name, text):
+    """ Write a file and commit it. The short hash is recorded by subject
+    """
+
+    path = os.path.join(self.directory, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as working_file:
+      working_file.write(text)
+    self.git("add", name)
+    self.git("commit", "-q", "-m", subject)
+    self.commits[subject] = self.git("rev-parse", "HEAD")[:12]
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # history
+  #
+  # ---------------------------------------------------------------------------
+  def history(self):
+    """ Run the history command and return its output lines
+    """
+
+    with contextlib.redirect_stdout(io.StringIO()) as stdout:
+      ConfigHistory(self.cfg).run_history()
+    return stdout.getvalue().splitlines()
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # test_timeline
+  #
+  # ---------------------------------------------------------------------------
+  def test_timeline(self):
+    """ Only the commits changing settings are output, with their changes
+    """
+
+    self.assertEqual(self.history(),
+                     [self.commits["create"] + " 2023-01-02 create",
+                      "  + CONFIG_TEST_A=y",
+                      "  + CONFIG_TEST_B=m",
+                      self.commits["update"] + " 2023-01-02 update",
+                      "  + CONFIG_TEST_C=y",
+                      "  - CONFIG_TEST_B=m",
+                      "  ~ CONFIG_TEST_A : y -> m",
+                      self.commits["remove"] + " 2023-01-02 remove",
+                      "  - CONFIG_TEST_A=m"])
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # test_revision_range
+  #
+  # ---------------------------------------------------------------------------
+  def test_revision_range(self):
+    """ The first commit of a range is compared to the version preceding it
+    """
+
+    self.cfg.revisions = self.commits["unrelated"] + "..HEAD"
+    self.assertEqual(self.history()[0], self.commits["update"] + " 2023-01-02 update")
+
+    self.cfg.revisions = self.commits["comment"] + "..HEAD"
+    self.assertEqual(self.history(), [self.commits["remove"] + " 2023-01-02 remove",
+                                      "  - CONFIG_TEST_A=m"])
+
+    self.cfg.config_path = "configs/other"
+    self.assertEqual(self.history(), ["No commit of configs/other in %s" % self.cfg.revisions])
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # test_object_reader
+  #
+  # ---------------------------------------------------------------------------
+  def test_object_reader(self):
+    """ Contents are read in order, missing objects give None
+    """
+
+    reader = GitObjectReader(self.directory)
+    versions = list(reader.read(["HEAD:configs/board", "HEAD:missing", "HEAD:README"]))
+    self.assertEqual([content for _, content in versions],
+                     [b"CONFIG_TEST_C=y\n", None, b"Boards\n"])
+    self.assertEqual(reader.count, 2)
+
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,174 @@
+#
+# The contents of this file are subject to the Apache 2.0 license you may not
+# use this file except in compliance with the License.
+#
+# Software distributed under the License is distributed on an "AS IS" basis,
+# WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License
+# for the specific language governing rights and limitations under the
+# License.
+#
+#
+# Copyright 2023 KCC project (http://www.firmwaretoolkit.org).
+# All rights reserved. Use is subject to license terms.
+#
+#
+# Contributors list :
+#
+#    William Bonnet     wllmbnnt@gmail.com, wbonnet@theitmakers.com
+#
+
+""" Unit tests of the Kconfig parser, graph and index
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from kcc.kconfig import KconfigIndex
+
+# Files of the test tree
+_TREE = {
+  "Kconfig": 'mainmenu "Test"\n'
+             'config NETDEVICES\n'
+             '\tbool "Network devices"\n'
+             'if NETDEVICES\n'
+             'source "drivers/net/Kconfig"\n'
+             'endif\n'
+             'menu "Misc"\n'
+             '\tdepends on MISC\n'
+             'rsource "misc/Kconfig"\n'
+             'endmenu\n'
+             'source "arch/$(SRCARCH)/Kconfig"\n',
+  "drivers/net/Kconfig": 'config E1000\n'
+                         '\ttristate "Intel E1000"\n'
+                         '\tselect CRC32\n'
+                         '\thelp\n'
+                         '\t  Help text, config NOT_A_SYMBOL\n',
+  "misc/Kconfig": 'config WIDGET\n'
+                  '\tbool "Widget"\n',
+  "arch/x86/Kconfig": 'config X86_FEATURE\n'
+                      '\tdef_bool y\n'
+                      '\tdepends on X86\n',
+  "lib/Kconfig": 'config CRC32\n'
+                 '\ttristate\n',
+}
+
+# -----------------------------------------------------------------------------
+#
+# class TestKconfig
+#
+# -----------------------------------------------------------------------------
+class TestKconfig(unittest.TestCase):
+  """This class tests the graph built from a small kernel tree
+  """
+
+  # ---------------------------------------------------------------------------
+  #
+  # setUp
+  #
+  # ---------------------------------------------------------------------------
+  def setUp(self):
+    """ Create the tree and the directory of the index
+    """
+
+    self.directory = tempfile.mkdtemp()
+    self.tree = os.path.join(self.directory, "linux")
+    for name, text in _TREE.items():
+      self.write(name, text)
+    self.index = KconfigIndex(os.path.join(self.directory, "index"))
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # tearDown
+  #
+  # ---------------------------------------------------------------------------
+  def tearDown(self):
+    """ Remove the tree and the index
+    """
+
+    shutil.rmtree(self.directory)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # write
+  #
+  # ---------------------------------------------------------------------------
+  def write(self, name, text):
+    """ Create or replace a file of the tree
+    """
+
+    path = os.path.join(self.tree, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as working_file:
+      working_file.write(text)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # test_inherited_conditions
+  #
+  # ---------------------------------------------------------------------------
+  def test_inherited_conditions(self):
+    """ Symbols of sourced files inherit the conditions of the blocks around the
+    source statement
+    """
+
+    graph = self.index.load(self.tree)
+    self.assertEqual(graph.symbols["E1000"].depends, ["NETDEVICES"])
+    self.assertEqual(graph.symbols["WIDGET"].depends, ["MISC"])
+    self.assertEqual(graph.symbols["X86_FEATURE"].depends, ["X86"])
+    self.assertEqual(graph.symbols["NETDEVICES"].depends, [])
+    self.assertNotIn("NOT_A_SYMBOL", graph.symbols)
+
+    # Files which are not sourced are parsed on their own
+    self.assertEqual(graph.symbols["CRC32"].type, "tristate")
+    self.assertEqual(graph.selected_by("CRC32"), {"E1000"})
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # test_classify
+  #
+  # ---------------------------------------------------------------------------
+  def test_classify(self):
+    """ A difference whose parent also differs is derived
+    """
+
+    graph = self.index.load(self.tree)
+    self.assertEqual(graph.classify({"CONFIG_NETDEVICES", "CONFIG_E1000", "CONFIG_CRC32",
+                                     "CONFIG_WIDGET"}),
+                     {"CONFIG_NETDEVICES": [], "CONFIG_E1000": ["CONFIG_NETDEVICES"],
+                      "CONFIG_CRC32": ["CONFIG_E1000"], "CONFIG_WIDGET": []})
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # test_index
+  #
+  # ---------------------------------------------------------------------------
+  def test_index(self):
+    """ The index is reused while the tree is unchanged, and rebuilt when a file
+    is modified or added
+    """
+
+    first = self.index.load(self.tree)
+    self.assertEqual(self.index.load(self.tree).to_data(), first.to_data())
+
+    self.write("misc/Kconfig", 'config WIDGET\n\tbool "Widget"\n\tdepends on GADGET\n')
+    self.assertEqual(self.index.load(self.tree).symbols["WIDGET"].depends,
+                     ["MISC", "GADGET"])
+
+    self.write("sound/Kconfig", 'config SOUND\n\ttristate "Sound"\n')
+    self.assertIn("SOUND", self.index.load(self.tree).symbols)
+
+
+
+if __name__ == '__main__':
+  unittest.main()
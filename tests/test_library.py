@@ -0,0 +1,242 @@
+#
+# The contents of this file are subject to the Apache 2.0 license you may not
+# use this file except in compliance with the License.
+#
+# Software distributed under the License is distributed on an "AS IS" basis,
+# WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License
+# for the specific language governing rights and limitations under the
+# License.
+#
+#
+# Copyright 2023 KCC project (http://www.firmwaretoolkit.org).
+# All rights reserved. Use is subject to license terms.
+#
+#
+# Contributors list :
+#
+#    William Bonnet     wllmbnnt@gmail.com, wbonnet@theitmakers.com
+#
+
+""" Unit tests of the library index and of the check-library command
+"""
+
+import io
+import os
+import shutil
+import tempfile
+import unittest
+import contextlib
+from kcc.model import Configuration
+from kcc.library import LibraryIndex, read_metadata, parse_args
+from kcc.check_library import CheckLibrary
+
+# Metadata block of a valid script
+_VALID = "#!/bin/sh\n# kcc-id: %s\n# kcc-description: Test script\n" \
+         "# kcc-category: network drivers\n# kcc-args: config [arch]\nexit 0\n"
+
+# -----------------------------------------------------------------------------
+#
+# class TestLibrary
+#
+# -----------------------------------------------------------------------------
+class TestLibrary(unittest.TestCase):
+  """This class tests the metadata of the scripts, the incremental update of
+  the index and the problems reported by check-library
+  """
+
+  # ---------------------------------------------------------------------------
+  #
+  # setUp
+  #
+  # ---------------------------------------------------------------------------
+  def setUp(self):
+    """ Create two library directories and the index directory
+    """
+
+    self.directory = tempfile.mkdtemp()
+    self.first = os.path.join(self.directory, "first")
+    self.second = os.path.join(self.directory, "second")
+    self.index_path = os.path.join(self.directory, "index")
+    self.write(self.first, "net/check.sh", _VALID % "NET-0001")
+    self.write(self.first, "disk.sh", _VALID % "DISK-0001")
+    self.write(self.second, "net/check.sh", _VALID % "NET-0002")
+    self.write(self.second, ".hidden.sh", "exit 0\n")
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # tearDown
+  #
+  # ---------------------------------------------------------------------------
+  def tearDown(self):
+    """ Remove the temporary directory
+    """
+
+    shutil.rmtree(self.directory)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # write
+  #
+  # ---------------------------------------------------------------------------
+  @staticmethod
+  def write(directory, name, text, mode=0o755):
+    """ Write an executable script of a library directory and return its path
+    """
+
+    path = os.path.join(directory, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as working_file:
+      working_file.write(text)
+    os.chmod(path, mode)
+    return path
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # index
+  #
+  # ---------------------------------------------------------------------------
+  def index(self):
+    """ Return the updated persistent index of the library directories
+    """
+
+    return LibraryIndex([self.first, self.second], self.index_path).update()
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # test_metadata
+  #
+  # ---------------------------------------------------------------------------
+  def test_metadata(self):
+    """ Fields are read from the comment block at the top of the script, and
+    its problems are reported
+    """
+
+    metadata, errors = read_metadata(os.path.join(self.first, "disk.sh"))
+    self.assertEqual(metadata, {"id": "DISK-0001", "description": "Test script",
+                                "category": ["network", "drivers"],
+                                "args": ["config", "[arch]"]})
+    self.assertEqual(errors, [])
+
+    path = self.write(self.first, "bad.sh", "#!/bin/sh\n# kcc-id: A\n# kcc-id: B\n"
+                                            "# kcc-color: red\n# kcc-args: [a] b\n"
+                                            "exit 0\n# kcc-description: too late\n")
+    metadata, errors = read_metadata(path)
+    self.assertEqual(metadata["id"], "A")
+    self.assertEqual(errors, ["line 3 : metadata field 'id' is defined twice",
+                              "line 4 : unknown metadata field 'color'",
+                              "metadata field 'description' is missing",
+                              "mandatory arguments must be declared before the optional ones"])
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # test_parse_args
+  #
+  # ---------------------------------------------------------------------------
+  def test_parse_args(self):
+    """ The number of arguments is computed from their names
+    """
+
+    self.assertEqual(parse_args([]), (0, 0))
+    self.assertEqual(parse_args(["config", "[arch]", "[board]"]), (1, 3))
+    with self.assertRaises(ValueError):
+      parse_args(["[arch]", "config"])
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # test_lookup
+  #
+  # ---------------------------------------------------------------------------
+  def test_lookup(self):
+    """ The first directory defining a name wins, and hidden files are skipped
+    """
+
+    index = self.index()
+    self.assertEqual(index.indexed, 2)
+    self.assertEqual(index.find("net/check.sh"), os.path.join(self.first, "net", "check.sh"))
+    self.assertEqual(index.find("./net/check.sh"), os.path.join(self.first, "net", "check.sh"))
+    self.assertEqual(index.metadata("net/check.sh")["id"], "NET-0001")
+    self.assertIsNone(index.find(".hidden.sh"))
+    self.assertIsNone(index.metadata("missing.sh"))
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # test_incremental_update
+  #
+  # ---------------------------------------------------------------------------
+  def test_incremental_update(self):
+    """ Only the new or changed scripts are read again
+    """
+
+    self.assertEqual(self.index().scanned, 3)
+    self.assertEqual(self.index().scanned, 0)
+
+    self.write(self.first, "disk.sh", _VALID % "DISK-0002 ")
+    self.write(self.second, "new.sh", _VALID % "NEW-0001")
+    index = self.index()
+    self.assertEqual(index.scanned, 2)
+    self.assertEqual(index.metadata("disk.sh")["id"], "DISK-0002")
+    self.assertEqual(index.indexed, 3)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # test_errors
+  #
+  # ---------------------------------------------------------------------------
+  def test_errors(self):
+    """ Duplicate ids, scripts hidden by another one included, and scripts
+    which are not executable are reported
+    """
+
+    self.write(self.second, "other.sh", _VALID % "DISK-0001", mode=0o644)
+    errors = list(self.index().errors())
+    disk = os.path.join(self.first, "disk.sh")
+    other = os.path.join(self.second, "other.sh")
+    self.assertEqual(errors, [(other, "script is not executable"),
+                              (disk, "id 'DISK-0001' is also defined by " + other),
+                              (other, "id 'DISK-0001' is also defined by " + disk)])
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # test_check_library
+  #
+  # ---------------------------------------------------------------------------
+  def test_check_library(self):
+    """ The command exits with an error when a problem is found
+    """
+
+    cfg = Configuration()
+    cfg.library = [self.first, self.second]
+    cfg.library_index_path = self.index_path
+    with contextlib.redirect_stdout(io.StringIO()) as stdout:
+      CheckLibrary(cfg).check_library()
+    self.assertTrue(stdout.getvalue().startswith("2 scripts checked (3 read)"))
+
+    self.write(self.first, "bad.sh", "#!/bin/sh\nexit 0\n")
+    with contextlib.redirect_stdout(io.StringIO()) as stdout:
+      with self.assertRaises(SystemExit) as context:
+        CheckLibrary(cfg).check_library()
+    self.assertEqual(context.exception.code, 1)
+    self.assertIn("bad.sh : metadata field 'id' is missing", stdout.getvalue())
+
+
+
+if __name__ == '__main__':
+  unittest.main()
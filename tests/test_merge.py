@@ -0,0 +1,148 @@
+#
+# The contents of this file are subject to the Apache 2.0 license you may not
+# use this file except in compliance with the License.
+#
+# Software distributed under the License is distributed on an "AS IS" basis,
+# WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License
+# for the specific language governing rights and limitations under the
+# License.
+#
+#
+# Copyright 2023 KCC project (http://www.firmwaretoolkit.org).
+# All rights reserved. Use is subject to license terms.
+#
+#
+# Contributors list :
+#
+#    William Bonnet     wllmbnnt@gmail.com, wbonnet@theitmakers.com
+#
+
+""" Unit tests of the merge command
+"""
+
+import io
+import os
+import shutil
+import tempfile
+import unittest
+import contextlib
+from kcc.model import Config, Configuration
+from kcc.merge import FragmentMerger
+
+# -----------------------------------------------------------------------------
+#
+# config
+#
+# -----------------------------------------------------------------------------
+def config(filename, text):
+  """ Return the Config of a file content
+  """
+
+  return Config(filename).load_buffer(text.encode())
+
+
+
+# -----------------------------------------------------------------------------
+#
+# class TestMerge
+#
+# -----------------------------------------------------------------------------
+class TestMerge(unittest.TestCase):
+  """This class tests the application of fragments to a base config
+  """
+
+  # ---------------------------------------------------------------------------
+  #
+  # setUp
+  #
+  # ---------------------------------------------------------------------------
+  def setUp(self):
+    """ Create the base config and the fragments
+    """
+
+    self.cfg = Configuration()
+    self.base = config("base", "CONFIG_TEST_A=y\nCONFIG_TEST_B=m\nCONFIG_TEST_C=y\n")
+    self.first = config("first", "CONFIG_TEST_B=y\nCONFIG_TEST_D=y\n")
+    self.second = config("second", "# CONFIG_TEST_B is not set\nCONFIG_TEST_C=y\n")
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # test_last_wins
+  #
+  # ---------------------------------------------------------------------------
+  def test_last_wins(self):
+    """ The last fragment defining a symbol wins, and a redefined symbol keeps
+    its position
+    """
+
+    merger = FragmentMerger(self.cfg)
+    result = merger.merge_configs(self.base, [self.first, self.second])
+    self.assertEqual(result.to_text(), "CONFIG_TEST_A=y\n# CONFIG_TEST_B is not set\n"
+                                       "CONFIG_TEST_C=y\nCONFIG_TEST_D=y\n")
+    self.assertEqual((merger.redefined, merger.redundant), (2, 1))
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # test_messages
+  #
+  # ---------------------------------------------------------------------------
+  def test_messages(self):
+    """ Redefinitions are reported as merge_config.sh does, redundant values
+    only when requested
+    """
+
+    merger = FragmentMerger(self.cfg)
+    merger.merge_configs(self.base, [self.first, self.second])
+    self.assertEqual(merger.messages,
+                     ["Value of CONFIG_TEST_B is redefined by fragment first:\n"
+                      "Previous  value: CONFIG_TEST_B=m\n"
+                      "New value:       CONFIG_TEST_B=y",
+                      "Value of CONFIG_TEST_B is redefined by fragment second:\n"
+                      "Previous  value: CONFIG_TEST_B=y\n"
+                      "New value:       # CONFIG_TEST_B is not set"])
+
+    self.cfg.warn_redundant = True
+    merger = FragmentMerger(self.cfg)
+    merger.merge_configs(self.base, [self.second])
+    self.assertEqual(len(merger.messages), 2)
+    self.assertTrue(merger.messages[1].startswith("Value of CONFIG_TEST_C is redundant "
+                                                  "by fragment second:"))
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # test_merge_files
+  #
+  # ---------------------------------------------------------------------------
+  def test_merge_files(self):
+    """ The merge command reads the files and writes the output file
+    """
+
+    directory = tempfile.mkdtemp()
+    try:
+      self.cfg.inputs = []
+      for item in (self.base, self.first, self.second):
+        path = os.path.join(directory, item.filename)
+        item.write(path)
+        self.cfg.inputs.append(path)
+      self.cfg.output = os.path.join(directory, "output")
+      self.cfg.use_parse_cache = False
+
+      with contextlib.redirect_stdout(io.StringIO()) as stdout:
+        FragmentMerger(self.cfg).merge()
+      self.assertEqual(stdout.getvalue().count("is redefined by fragment"), 2)
+      with open(self.cfg.output) as working_file:
+        self.assertEqual(working_file.read(), "CONFIG_TEST_A=y\n# CONFIG_TEST_B is not set\n"
+                                              "CONFIG_TEST_C=y\nCONFIG_TEST_D=y\n")
+    finally:
+      shutil.rmtree(directory)
+
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,173 @@
+#
+# The contents of this file are subject to the Apache 2.0 license you may not
+# use this file except in compliance with the License.
+#
+# Software distributed under the License is distributed on an "AS IS" basis,
+# WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License
+# for the specific language governing rights and limitations under the
+# License.
+#
+#
+# Copyright 2023 KCC project (http://www.firmwaretoolkit.org).
+# All rights reserved. Use is subject to license terms.
+#
+#
+# Contributors list :
+#
+#    William Bonnet     wllmbnnt@gmail.com, wbonnet@theitmakers.com
+#
+
+""" Unit tests of the fragment minimizer
+"""
+
+import unittest
+from kcc.model import Config
+from kcc.kconfig import KconfigParser, KconfigGraph
+from kcc.minimize import FragmentMinimizer
+
+# Kconfig of the tests
+_KCONFIG = """
+config DEFAULT_Y
+\tbool "Enabled by default"
+\tdefault y
+
+config SELECTOR
+\tbool "Selector"
+\tselect SELECTED
+
+config SELECTED
+\tbool "Selected"
+
+config GATE
+\tbool "Gate"
+
+config GATED
+\tbool "Gated" if GATE
+\tdefault y
+
+config GATED_PROMPT
+\ttristate
+\tprompt "Gated prompt" if GATE
+
+config NAME
+\tstring "Name"
+\tdefault "kcc"
+"""
+
+# -----------------------------------------------------------------------------
+#
+# load
+#
+# -----------------------------------------------------------------------------
+def load(text):
+  """ Return the Config of a config file content
+  """
+
+  return Config().load_buffer(text.encode())
+
+
+
+# -----------------------------------------------------------------------------
+#
+# class TestMinimize
+#
+# -----------------------------------------------------------------------------
+class TestMinimize(unittest.TestCase):
+  """This class tests which entries of a fragment are kept
+  """
+
+  # ---------------------------------------------------------------------------
+  #
+  # setUp
+  #
+  # ---------------------------------------------------------------------------
+  def setUp(self):
+    """ Build the graph of the test Kconfig
+    """
+
+    parser = KconfigParser()
+    parser.parse_lines(_KCONFIG.splitlines(True))
+    self.minimizer = FragmentMinimizer(KconfigGraph(parser.symbols))
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # minimize
+  #
+  # ---------------------------------------------------------------------------
+  def minimize(self, target, base=None):
+    """ Return the lines of the minimized fragment of a target config, the
+    fragment beeing the whole target
+    """
+
+    target = load(target)
+    base = load(base) if base is not None else None
+    return self.minimizer.minimize(target, target, base).to_text().splitlines()
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # test_default
+  #
+  # ---------------------------------------------------------------------------
+  def test_default(self):
+    """ Entries equal to the default are dropped, unless the base sets another
+    value
+    """
+
+    self.assertEqual(self.minimize("CONFIG_DEFAULT_Y=y\nCONFIG_NAME=\"kcc\"\n"), [])
+    self.assertEqual(self.minimize("# CONFIG_DEFAULT_Y is not set\nCONFIG_NAME=\"other\"\n"),
+                     ["# CONFIG_DEFAULT_Y is not set", "CONFIG_NAME=\"other\""])
+    self.assertEqual(self.minimize("CONFIG_DEFAULT_Y=y\n", "# CONFIG_DEFAULT_Y is not set\n"),
+                     ["CONFIG_DEFAULT_Y=y"])
+    self.assertEqual(self.minimize("CONFIG_UNKNOWN=y\n"), ["CONFIG_UNKNOWN=y"])
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # test_select
+  #
+  # ---------------------------------------------------------------------------
+  def test_select(self):
+    """ A selected symbol is dropped, the symbol selecting it is kept
+    """
+
+    self.assertEqual(self.minimize("CONFIG_SELECTOR=y\nCONFIG_SELECTED=y\n"),
+                     ["CONFIG_SELECTOR=y"])
+    self.assertEqual(self.minimize("CONFIG_SELECTED=y\n"), ["CONFIG_SELECTED=y"])
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # test_conditional_prompt
+  #
+  # ---------------------------------------------------------------------------
+  def test_conditional_prompt(self):
+    """ A symbol whose prompt condition is false cannot be set, its entries are
+    dropped and the user value of the base is ignored
+    """
+
+    # Visible prompt : the entry is needed when it differs from the default
+    self.assertEqual(self.minimize("CONFIG_GATE=y\n# CONFIG_GATED is not set\n"),
+                     ["CONFIG_GATE=y", "# CONFIG_GATED is not set"])
+    self.assertEqual(self.minimize("CONFIG_GATE=y\nCONFIG_GATED_PROMPT=m\n"),
+                     ["CONFIG_GATE=y", "CONFIG_GATED_PROMPT=m"])
+
+    # Hidden prompt : the default applies whatever the fragment says
+    self.assertEqual(self.minimize("# CONFIG_GATE is not set\nCONFIG_GATED=y\n"), [])
+    self.assertEqual(self.minimize("# CONFIG_GATE is not set\n# CONFIG_GATED is not set\n"),
+                     [])
+    self.assertEqual(self.minimize("# CONFIG_GATE is not set\nCONFIG_GATED_PROMPT=m\n"), [])
+
+    # The base user value of a hidden symbol is ignored
+    self.minimizer.minimize(load(""), load(""), load("# CONFIG_GATED is not set\n"))
+    self.assertEqual(self.minimizer.computed_value(self.minimizer.graph.symbols["GATED"]), "y")
+
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,245 @@
+#
+# The contents of this file are subject to the Apache 2.0 license you may not
+# use this file except in compliance with the License.
+#
+# Software distributed under the License is distributed on an "AS IS" basis,
+# WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License
+# for the specific language governing rights and limitations under the
+# License.
+#
+#
+# Copyright 2023 KCC project (http://www.firmwaretoolkit.org).
+# All rights reserved. Use is subject to license terms.
+#
+#
+# Contributors list :
+#
+#    William Bonnet     wllmbnnt@gmail.com, wbonnet@theitmakers.com
+#
+
+""" Unit tests of the bitset operator engine
+"""
+
+import unittest
+from kcc.model import Config
+from kcc.operators import OperatorEngine, OperandSet, bitset_from_positions, bit_positions
+
+# -----------------------------------------------------------------------------
+#
+# load
+#
+# -----------------------------------------------------------------------------
+def load(text):
+  """ Return the Config of a config file content
+  """
+
+  return Config().load_buffer(text.encode())
+
+
+
+# -----------------------------------------------------------------------------
+#
+# lines
+#
+# -----------------------------------------------------------------------------
+def lines(operand, *order):
+  """ Return the lines of an operand converted to a config, in the order of
+  the given configs
+  """
+
+  return operand.to_config(order=order).to_text().splitlines()
+
+
+
+# -----------------------------------------------------------------------------
+#
+# class TestOperators
+#
+# -----------------------------------------------------------------------------
+class TestOperators(unittest.TestCase):
+  """This class tests the except, intersect and concat operators
+  """
+
+  # ---------------------------------------------------------------------------
+  #
+  # setUp
+  #
+  # ---------------------------------------------------------------------------
+  def setUp(self):
+    """ Create the engine and the configs shared by the tests
+    """
+
+    self.engine = OperatorEngine()
+    self.first = load("CONFIG_TEST_D=y\n"
+                      "CONFIG_TEST_A=m\n"
+                      "CONFIG_TEST_B=y\n"
+                      "# CONFIG_TEST_C is not set\n"
+                      "CONFIG_TEST_E=\"text\"\n")
+    self.second = load("CONFIG_TEST_A=y\n"
+                       "CONFIG_TEST_F=y\n"
+                       "# CONFIG_TEST_C is not set\n"
+                       "CONFIG_TEST_B=y\n")
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # test_except
+  #
+  # ---------------------------------------------------------------------------
+  def test_except(self):
+    """ Entries with another value, or absent from the others, are kept
+    """
+
+    result = self.engine.except_(self.first, self.second)
+    self.assertEqual(lines(result, self.first),
+                     ["CONFIG_TEST_D=y", "CONFIG_TEST_A=m", "CONFIG_TEST_E=\"text\""])
+    self.assertEqual(len(self.engine.except_(self.first, self.first)), 0)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # test_except_several
+  #
+  # ---------------------------------------------------------------------------
+  def test_except_several(self):
+    """ Entries defined with the same value by any of the others are removed
+    """
+
+    third = load("CONFIG_TEST_D=y\n")
+    result = self.engine.except_(self.first, self.second, third)
+    self.assertEqual(lines(result, self.first),
+                     ["CONFIG_TEST_A=m", "CONFIG_TEST_E=\"text\""])
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # test_intersect
+  #
+  # ---------------------------------------------------------------------------
+  def test_intersect(self):
+    """ Only the entries with the same value in all the operands are kept
+    """
+
+    result = self.engine.intersect(self.first, self.second)
+    self.assertEqual(lines(result, self.first),
+                     ["CONFIG_TEST_B=y", "# CONFIG_TEST_C is not set"])
+    self.assertEqual(len(result), 2)
+    self.assertEqual(len(self.engine.intersect(self.first, load("CONFIG_TEST_A=y\n"))), 0)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # test_concat
+  #
+  # ---------------------------------------------------------------------------
+  def test_concat(self):
+    """ The last value wins, entries keep the order of the first operand and
+    the new symbols of the others follow in their order
+    """
+
+    result = self.engine.concat(self.first, self.second)
+    self.assertEqual(lines(result, self.first, self.second),
+                     ["CONFIG_TEST_D=y", "CONFIG_TEST_A=y", "CONFIG_TEST_B=y",
+                      "# CONFIG_TEST_C is not set", "CONFIG_TEST_E=\"text\"",
+                      "CONFIG_TEST_F=y"])
+
+    result = self.engine.concat(self.second, self.first)
+    self.assertEqual(lines(result, self.second, self.first),
+                     ["CONFIG_TEST_A=m", "CONFIG_TEST_F=y", "# CONFIG_TEST_C is not set",
+                      "CONFIG_TEST_B=y", "CONFIG_TEST_D=y", "CONFIG_TEST_E=\"text\""])
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # test_order_independent_of_history
+  #
+  # ---------------------------------------------------------------------------
+  def test_order_independent_of_history(self):
+    """ The output order does not depend on the settings interned before
+    """
+
+    # Intern the settings in another order first, as a previous request of a
+    # long running process would
+    self.engine.concat(load("CONFIG_TEST_ORDER_B=y\nCONFIG_TEST_ORDER_A=y\n"))
+    config = load("CONFIG_TEST_ORDER_A=y\nCONFIG_TEST_ORDER_B=y\n")
+    self.assertEqual(lines(self.engine.concat(config), config),
+                     ["CONFIG_TEST_ORDER_A=y", "CONFIG_TEST_ORDER_B=y"])
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # test_duplicate_symbols
+  #
+  # ---------------------------------------------------------------------------
+  def test_duplicate_symbols(self):
+    """ When a symbol is defined twice in a file, the last definition is
+    used, at its position
+    """
+
+    config = load("CONFIG_TEST_DUP=y\nCONFIG_TEST_OTHER=y\nCONFIG_TEST_DUP=m\n")
+    self.assertEqual(len(config), 2)
+    self.assertEqual(lines(self.engine.intersect(config, load("CONFIG_TEST_DUP=m\n")), config),
+                     ["CONFIG_TEST_DUP=m"])
+    self.assertEqual(lines(self.engine.except_(config, load("CONFIG_TEST_DUP=y\n")), config),
+                     ["CONFIG_TEST_OTHER=y", "CONFIG_TEST_DUP=m"])
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # test_not_set
+  #
+  # ---------------------------------------------------------------------------
+  def test_not_set(self):
+    """ 'is not set' lines are settings of the value n, different from the
+    absence of the symbol and from the other values
+    """
+
+    not_set = load("# CONFIG_TEST_NS is not set\n")
+    self.assertEqual(lines(self.engine.except_(not_set, load("CONFIG_TEST_NS=y\n"))),
+                     ["# CONFIG_TEST_NS is not set"])
+    self.assertEqual(len(self.engine.except_(not_set, load("CONFIG_TEST_NS=n\n"))), 0)
+    self.assertEqual(lines(self.engine.concat(load("CONFIG_TEST_NS=y\n"), not_set)),
+                     ["# CONFIG_TEST_NS is not set"])
+    self.assertEqual(len(self.engine.intersect(not_set, load("CONFIG_TEST_OTHER=y\n"))), 0)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # test_apply
+  #
+  # ---------------------------------------------------------------------------
+  def test_apply(self):
+    """ Operators are applied by name, unknown names raise ValueError
+    """
+
+    self.assertEqual(len(self.engine.apply("intersect", [self.first, self.second])), 2)
+    self.assertRaises(ValueError, self.engine.apply, "union", [self.first])
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # test_bitsets
+  #
+  # ---------------------------------------------------------------------------
+  def test_bitsets(self):
+    """ Bitsets built from positions give the same positions back
+    """
+
+    positions = [0, 1, 7, 8, 63, 64, 1000]
+    self.assertEqual(list(bit_positions(bitset_from_positions(positions, 1001))), positions)
+    self.assertEqual(list(bit_positions(0)), [])
+    self.assertEqual(len(OperandSet()), 0)
+
+
+
+if __name__ == '__main__':
+  unittest.main()
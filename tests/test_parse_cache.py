@@ -0,0 +1,186 @@
+#
+# The contents of this file are subject to the Apache 2.0 license you may not
+# use this file except in compliance with the License.
+#
+# Software distributed under the License is distributed on an "AS IS" basis,
+# WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License
+# for the specific language governing rights and limitations under the
+# License.
+#
+#
+# Copyright 2023 KCC project (http://www.firmwaretoolkit.org).
+# All rights reserved. Use is subject to license terms.
+#
+#
+# Contributors list :
+#
+#    William Bonnet     wllmbnnt@gmail.com, wbonnet@theitmakers.com
+#
+
+""" Unit tests of the persistent cache of parsed configs
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from kcc.model import Config
+from kcc.parse_cache import ParseCache
+
+# -----------------------------------------------------------------------------
+#
+# class TestParseCache
+#
+# -----------------------------------------------------------------------------
+class TestParseCache(unittest.TestCase):
+  """This class tests the hits, the invalidation and the eviction of the parse
+  cache
+  """
+
+  # ---------------------------------------------------------------------------
+  #
+  # setUp
+  #
+  # ---------------------------------------------------------------------------
+  def setUp(self):
+    """ Create a config and the cache directory
+    """
+
+    self.directory = tempfile.mkdtemp()
+    self.cache_path = os.path.join(self.directory, "cache")
+    self.filename = os.path.join(self.directory, "config")
+    self.write("CONFIG_TEST_A=y\n# CONFIG_TEST_B is not set\nCONFIG_TEST_C=\"text\"\n"
+               "CONFIG_TEST_D=0x10\nCONFIG_TEST_A=m\n")
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # tearDown
+  #
+  # ---------------------------------------------------------------------------
+  def tearDown(self):
+    """ Remove the temporary directory
+    """
+
+    shutil.rmtree(self.directory)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # write
+  #
+  # ---------------------------------------------------------------------------
+  def write(self, text):
+    """ Write the content of the config
+    """
+
+    with open(self.filename, 'w') as working_file:
+      working_file.write(text)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # assertSameConfig
+  #
+  # ---------------------------------------------------------------------------
+  def assertSameConfig(self, config):
+    """ Check a config has the columns of the config file parsed directly
+    """
+
+    expected = Config(self.filename).load()
+    self.assertEqual(config.to_text(), expected.to_text())
+    self.assertEqual(config.tristates, expected.tristates)
+    self.assertEqual(config.types, expected.types)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # test_hit
+  #
+  # ---------------------------------------------------------------------------
+  def test_hit(self):
+    """ A config parsed once is loaded back from the cache by another instance
+    """
+
+    cache = ParseCache(self.cache_path, 1024 * 1024)
+    self.assertSameConfig(cache.load(self.filename))
+    self.assertEqual((cache.hits, cache.misses), (0, 1))
+
+    cache = ParseCache(self.cache_path, 1024 * 1024)
+    self.assertSameConfig(cache.load(self.filename))
+    self.assertEqual((cache.hits, cache.misses), (1, 0))
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # test_invalidation
+  #
+  # ---------------------------------------------------------------------------
+  def test_invalidation(self):
+    """ A modified file is parsed again, a file touched without modification is
+    still loaded from the cache
+    """
+
+    cache = ParseCache(self.cache_path, 1024 * 1024)
+    cache.load(self.filename)
+
+    self.write("CONFIG_TEST_A=y\nCONFIG_TEST_E=m\n")
+    self.assertSameConfig(cache.load(self.filename))
+    self.assertEqual((cache.hits, cache.misses), (0, 2))
+
+    status = os.stat(self.filename)
+    os.utime(self.filename, ns=(status.st_atime_ns, status.st_mtime_ns + 10 ** 9))
+    self.assertSameConfig(cache.load(self.filename))
+    self.assertEqual((cache.hits, cache.misses), (1, 2))
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # test_invalid_entry
+  #
+  # ---------------------------------------------------------------------------
+  def test_invalid_entry(self):
+    """ A corrupted entry is ignored and the file is parsed again
+    """
+
+    ParseCache(self.cache_path, 1024 * 1024).load(self.filename)
+    for entry in os.scandir(self.cache_path):
+      if entry.is_file():
+        with open(entry.path, 'r+b') as working_file:
+          working_file.truncate(10)
+
+    cache = ParseCache(self.cache_path, 1024 * 1024)
+    self.assertSameConfig(cache.load(self.filename))
+    self.assertEqual((cache.hits, cache.misses), (0, 1))
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # test_eviction
+  #
+  # ---------------------------------------------------------------------------
+  def test_eviction(self):
+    """ When the cache exceeds its size, entries are evicted below the limit
+    """
+
+    cache = ParseCache(self.cache_path, 300)
+    for number in range(10):
+      self.write("".join("CONFIG_TEST_%d_%d=y\n" % (number, line) for line in range(5)))
+      self.assertSameConfig(cache.load(self.filename))
+
+    entries = [entry for entry in os.scandir(self.cache_path) if entry.is_file()]
+    self.assertLess(len(entries), 10)
+    self.assertLessEqual(cache.size, 300)
+    self.assertEqual(cache.size, sum(entry.stat().st_size for entry in entries))
+
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,158 @@
+#
+# The contents of this file are subject to the Apache 2.0 license you may not
+# use this file except in compliance with the License.
+#
+# Software distributed under the License is distributed on an "AS IS" basis,
+# WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License
+# for the specific language governing rights and limitations under the
+# License.
+#
+#
+# Copyright 2023 KCC project (http://www.firmwaretoolkit.org).
+# All rights reserved. Use is subject to license terms.
+#
+#
+# Contributors list :
+#
+#    William Bonnet     wllmbnnt@gmail.com, wbonnet@theitmakers.com
+#
+
+""" Unit tests of the persistent cache of the test script results
+"""
+
+import os
+import time
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from kcc import result_cache
+
+# -----------------------------------------------------------------------------
+#
+# class TestResultCache
+#
+# -----------------------------------------------------------------------------
+class TestResultCache(unittest.TestCase):
+  """This class tests the keys, the time to live and the stored results of the
+  result cache
+  """
+
+  # ---------------------------------------------------------------------------
+  #
+  # setUp
+  #
+  # ---------------------------------------------------------------------------
+  def setUp(self):
+    """ Create a cache and a script in a temporary directory
+    """
+
+    self.directory = tempfile.mkdtemp()
+    self.script = os.path.join(self.directory, "script.sh")
+    with open(self.script, 'w') as working_file:
+      working_file.write("#!/bin/sh\nexit 0\n")
+    self.cache = result_cache.ResultCache(os.path.join(self.directory, "cache"),
+                                          1024 * 1024, 3600, ["KCC_TEST_VARIABLE"])
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # tearDown
+  #
+  # ---------------------------------------------------------------------------
+  def tearDown(self):
+    """ Remove the temporary directory
+    """
+
+    shutil.rmtree(self.directory)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # test_success_cached
+  #
+  # ---------------------------------------------------------------------------
+  def test_success_cached(self):
+    """ A successful result is computed once, then read from the cache
+    """
+
+    calls = []
+    key = self.cache.key(self.script, ["a"])
+    compute = lambda: calls.append(1) or (0, "output")
+    self.assertEqual(self.cache.fetch(key, compute), (0, "output", False))
+    self.assertEqual(self.cache.fetch(key, compute), (0, "output", True))
+    self.assertEqual(len(calls), 1)
+    self.assertEqual((self.cache.hits, self.cache.stored), (1, 1))
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # test_failure_not_cached
+  #
+  # ---------------------------------------------------------------------------
+  def test_failure_not_cached(self):
+    """ Failures, signals and cancelled scripts are not stored, thus the script
+    is run again
+    """
+
+    key = self.cache.key(self.script, [])
+    for result in ((1, "failed"), (-9, ""), (None, "not run")):
+      calls = []
+      compute = lambda: calls.append(1) or result
+      self.assertEqual(self.cache.fetch(key, compute), result + (False,))
+      self.assertEqual(self.cache.fetch(key, compute), result + (False,))
+      self.assertEqual(len(calls), 2)
+    self.assertIsNone(self.cache.fetch(key, lambda: None))
+    self.assertEqual(self.cache.stored, 0)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # test_ttl
+  #
+  # ---------------------------------------------------------------------------
+  def test_ttl(self):
+    """ Entries older than the time to live are ignored, then evicted
+    """
+
+    key = self.cache.key(self.script, [])
+    self.cache.put(key, 0, "output")
+    self.assertEqual(self.cache.get(key), (0, "output"))
+    with mock.patch.object(time, "time", return_value=time.time() + 7200):
+      self.assertIsNone(self.cache.get(key))
+      self.assertEqual(self.cache.evict(), 1)
+    self.assertIsNone(self.cache.get(key))
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # test_key
+  #
+  # ---------------------------------------------------------------------------
+  def test_key(self):
+    """ The key changes with the script content, the arguments and the selected
+    environment variables only
+    """
+
+    key = self.cache.key(self.script, ["a"])
+    self.assertEqual(self.cache.key(self.script, ["a"]), key)
+    self.assertNotEqual(self.cache.key(self.script, ["b"]), key)
+
+    with mock.patch.dict(os.environ, {"KCC_TEST_OTHER": "1"}):
+      self.assertEqual(self.cache.key(self.script, ["a"]), key)
+    with mock.patch.dict(os.environ, {"KCC_TEST_VARIABLE": "1"}):
+      self.assertNotEqual(self.cache.key(self.script, ["a"]), key)
+
+    with open(self.script, 'w') as working_file:
+      working_file.write("#!/bin/sh\nexit 10\n")
+    self.assertNotEqual(self.cache.key(self.script, ["a"]), key)
+
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,148 @@
+#
+# The contents of this file are subject to the Apache 2.0 license you may not
+# use this file except in compliance with the License.
+#
+# Software distributed under the License is distributed on an "AS IS" basis,
+# WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License
+# for the specific language governing rights and limitations under the
+# License.
+#
+#
+# Copyright 2023 KCC project (http://www.firmwaretoolkit.org).
+# All rights reserved. Use is subject to license terms.
+#
+#
+# Contributors list :
+#
+#    William Bonnet     wllmbnnt@gmail.com, wbonnet@theitmakers.com
+#
+
+""" Unit tests of the execution of the tests of a suite
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from kcc import model
+from kcc.library import LibraryIndex
+from kcc.run_testsuite import RunTestSuite
+
+# Scripts of the tests
+_SCRIPTS = {"pass.sh": "#!/bin/sh\nexit 0\n",
+            "fail.sh": "#!/bin/sh\necho 'HINT: check the cable'\nexit 3\n"}
+
+# -----------------------------------------------------------------------------
+#
+# class TestRunTestSuite
+#
+# -----------------------------------------------------------------------------
+class TestRunTestSuite(unittest.TestCase):
+  """This class runs small suites in the worker pool
+  """
+
+  # ---------------------------------------------------------------------------
+  #
+  # setUp
+  #
+  # ---------------------------------------------------------------------------
+  def setUp(self):
+    """ Create the scripts
+    """
+
+    self.directory = tempfile.mkdtemp()
+    for name, text in _SCRIPTS.items():
+      path = os.path.join(self.directory, name)
+      with open(path, 'w') as working_file:
+        working_file.write(text)
+      os.chmod(path, 0o755)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # tearDown
+  #
+  # ---------------------------------------------------------------------------
+  def tearDown(self):
+    """ Remove the scripts
+    """
+
+    shutil.rmtree(self.directory)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # run_tests
+  #
+  # ---------------------------------------------------------------------------
+  def run_tests(self, scripts, jobs=1, fail_fast=False):
+    """ Run one test per script, and return the identifiers and status of the
+    results, in completion order
+    """
+
+    cfg = model.Configuration()
+    cfg.jobs = jobs
+    cfg.fail_fast = fail_fast
+    cfg.use_results_cache = False
+    runner = RunTestSuite(cfg)
+    runner.index = LibraryIndex([], fallback=[self.directory])
+
+    tests = [model.TestCase((1, number), ["node", script], script, [], frozenset())
+             for number, script in enumerate(scripts, 1)]
+    return [(result.test.identifier(), result.success, result.returncode, result.hints)
+            for result in runner.execute(tests)]
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # test_results
+  #
+  # ---------------------------------------------------------------------------
+  def test_results(self):
+    """ Every test has a result, with the hints of the failures
+    """
+
+    results = sorted(self.run_tests(["pass.sh", "fail.sh", "missing.sh", "pass.sh"], jobs=2))
+    self.assertEqual(results, [("1.1", True, 0, []),
+                               ("1.2", False, 3, ["check the cable"]),
+                               ("1.3", False, None, []),
+                               ("1.4", True, 0, [])])
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # test_fail_fast
+  #
+  # ---------------------------------------------------------------------------
+  def test_fail_fast(self):
+    """ No result is returned after the first failure, even for the tests
+    already submitted
+    """
+
+    for _ in range(5):
+      results = self.run_tests(["pass.sh", "fail.sh"] + ["pass.sh"] * 8, fail_fast=True)
+      self.assertEqual([result[0] for result in results], ["1.1", "1.2"])
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # test_names
+  #
+  # ---------------------------------------------------------------------------
+  def test_names(self):
+    """ Tests are named after their position and the non empty descriptions
+    """
+
+    self.assertEqual(str(model.TestCase((2, 1), ["fs", ""], "fs.sh", [], frozenset())), "2.1 fs")
+    self.assertEqual(str(model.TestCase((2, 1), ["fs", "ext4"], "fs.sh", [], frozenset())),
+                     "2.1 fs / ext4")
+
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,154 @@
+#
+# The contents of this file are subject to the Apache 2.0 license you may not
+# use this file except in compliance with the License.
+#
+# Software distributed under the License is distributed on an "AS IS" basis,
+# WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License
+# for the specific language governing rights and limitations under the
+# License.
+#
+#
+# Copyright 2023 KCC project (http://www.firmwaretoolkit.org).
+# All rights reserved. Use is subject to license terms.
+#
+#
+# Contributors list :
+#
+#    William Bonnet     wllmbnnt@gmail.com, wbonnet@theitmakers.com
+#
+
+""" Unit tests of the kcc server
+"""
+
+import os
+import json
+import shutil
+import asyncio
+import tempfile
+import unittest
+import concurrent.futures
+from kcc.model import Configuration
+from kcc.batch import ConfigStore, RequestHandler
+from kcc.server import KccServer
+
+# -----------------------------------------------------------------------------
+#
+# class TestServer
+#
+# -----------------------------------------------------------------------------
+class TestServer(unittest.TestCase):
+  """This class sends requests to a server listening on a temporary socket
+  """
+
+  # ---------------------------------------------------------------------------
+  #
+  # setUp
+  #
+  # ---------------------------------------------------------------------------
+  def setUp(self):
+    """ Create a config and the server, without starting it
+    """
+
+    self.directory = tempfile.mkdtemp()
+    self.config = os.path.join(self.directory, "config")
+    with open(self.config, 'w') as working_file:
+      working_file.write("CONFIG_TEST_A=y\n")
+
+    cfg = Configuration()
+    cfg.socket_path = os.path.join(self.directory, "server.sock")
+    self.server = KccServer(cfg)
+    self.server.store = ConfigStore()
+    self.server.handler = RequestHandler(cfg, self.server.store)
+    self.server.executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # tearDown
+  #
+  # ---------------------------------------------------------------------------
+  def tearDown(self):
+    """ Stop the executor and remove the temporary files
+    """
+
+    self.server.executor.shutdown()
+    shutil.rmtree(self.directory)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # exchange
+  #
+  # ---------------------------------------------------------------------------
+  def exchange(self, lines):
+    """ Send request lines on a single connection, and return the decoded
+    responses
+    """
+
+    async def run():
+      path = self.server.cfg.socket_path
+      server = await asyncio.start_unix_server(self.server.handle_client, path=path)
+      async with server:
+        reader, writer = await asyncio.open_unix_connection(path)
+        responses = []
+        for line in lines:
+          writer.write(line + b"\n")
+          await writer.drain()
+          responses.append(json.loads(await reader.readline()))
+        writer.close()
+        await writer.wait_closed()
+      return responses
+
+    return asyncio.run(run())
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # test_requests
+  #
+  # ---------------------------------------------------------------------------
+  def test_requests(self):
+    """ Invalid requests are answered on the same connection as valid ones
+    """
+
+    request = json.dumps({"command": "concat", "inputs": [self.config]}).encode()
+    responses = self.exchange([b"{not json", request, b"[]", request])
+    self.assertEqual([response["status"] for response in responses],
+                     ["error", "ok", "error", "ok"])
+    self.assertEqual(responses[1]["fragment"], "CONFIG_TEST_A=y\n")
+    self.assertEqual(self.server.requests, 4)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # test_unexpected_error
+  #
+  # ---------------------------------------------------------------------------
+  def test_unexpected_error(self):
+    """ An exception raised while answering is sent as an error response, and
+    the connection stays open
+    """
+
+    answer = self.server.answer
+    calls = []
+
+    def fail_once(line):
+      calls.append(line)
+      if len(calls) == 1:
+        raise TypeError("unexpected")
+      return answer(line)
+
+    self.server.answer = fail_once
+    request = json.dumps({"command": "concat", "inputs": [self.config]}).encode()
+    responses = self.exchange([request, request])
+    self.assertEqual([response["status"] for response in responses], ["error", "ok"])
+    self.assertIn("TypeError", responses[0]["error"])
+
+
+
+if __name__ == '__main__':
+  unittest.main()
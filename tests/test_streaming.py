@@ -0,0 +1,125 @@
+#
+# The contents of this file are subject to the Apache 2.0 license you may not
+# use this file except in compliance with the License.
+#
+# Software distributed under the License is distributed on an "AS IS" basis,
+# WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License
+# for the specific language governing rights and limitations under the
+# License.
+#
+#
+# Copyright 2023 KCC project (http://www.firmwaretoolkit.org).
+# All rights reserved. Use is subject to license terms.
+#
+#
+# Contributors list :
+#
+#    William Bonnet     wllmbnnt@gmail.com, wbonnet@theitmakers.com
+#
+
+""" Unit tests of the streaming execution of the operators
+"""
+
+import io
+import unittest
+from kcc import streaming
+from kcc.model import Key
+
+# -----------------------------------------------------------------------------
+#
+# entries
+#
+# -----------------------------------------------------------------------------
+def entries(text):
+  """ Return the (symbol, value) entries of a config file content
+  """
+
+  return list(streaming.read_entries(io.BytesIO(text.encode())))
+
+
+
+# -----------------------------------------------------------------------------
+#
+# class TestStreaming
+#
+# -----------------------------------------------------------------------------
+class TestStreaming(unittest.TestCase):
+  """This class tests the sort and the merge-join of the streaming mode
+  """
+
+  # ---------------------------------------------------------------------------
+  #
+  # test_read_entries
+  #
+  # ---------------------------------------------------------------------------
+  def test_read_entries(self):
+    """ Settings and 'is not set' lines are read, comments are skipped
+    """
+
+    self.assertEqual(entries("# comment\nCONFIG_TEST_A=y\n# CONFIG_TEST_B is not set\n"),
+                     [(b"CONFIG_TEST_A", b"y"), (b"CONFIG_TEST_B", b"n")])
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # test_external_sort_last_definition
+  #
+  # ---------------------------------------------------------------------------
+  def test_external_sort_last_definition(self):
+    """ With more runs than merged at once, the last definition of a symbol
+    still wins
+    """
+
+    text = "CONFIG_DUP=\"first\"\n" + \
+           "".join("CONFIG_TEST_%03d=y\n" % number for number in range(200)) + \
+           "CONFIG_DUP=\"last\"\n"
+    for buffer_size in (1, 260, 1024 * 1024):
+      result = dict(streaming.last_definitions(streaming.external_sort(entries(text),
+                                                                       buffer_size)))
+      self.assertEqual(result[b"CONFIG_DUP"], b"\"last\"", buffer_size)
+      self.assertEqual(len(result), 201)
+
+    sorted_entries = list(streaming.external_sort(entries(text), 1))
+    self.assertEqual(sorted_entries, sorted(sorted_entries, key=lambda entry: entry[0]))
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # test_check_sorted
+  #
+  # ---------------------------------------------------------------------------
+  def test_check_sorted(self):
+    """ Inputs out of order are rejected
+    """
+
+    with self.assertRaises(ValueError):
+      list(streaming.check_sorted(entries("CONFIG_TEST_B=y\nCONFIG_TEST_A=y\n"), "input"))
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # test_merge_join
+  #
+  # ---------------------------------------------------------------------------
+  def test_merge_join(self):
+    """ The operators give the results of the in-memory engine, sorted by
+    symbol name
+    """
+
+    first = entries("CONFIG_TEST_A=y\nCONFIG_TEST_B=m\nCONFIG_TEST_C=y\n")
+    second = entries("CONFIG_TEST_B=y\nCONFIG_TEST_C=y\nCONFIG_TEST_D=y\n")
+    join = lambda operator: list(streaming.merge_join(operator, [iter(first), iter(second)]))
+    self.assertEqual(join(Key.OP_EXCEPT.value), [(b"CONFIG_TEST_A", b"y"), (b"CONFIG_TEST_B", b"m")])
+    self.assertEqual(join(Key.OP_INTERSECT.value), [(b"CONFIG_TEST_C", b"y")])
+    self.assertEqual(join(Key.OP_CONCAT.value), [(b"CONFIG_TEST_A", b"y"), (b"CONFIG_TEST_B", b"y"),
+                                      (b"CONFIG_TEST_C", b"y"), (b"CONFIG_TEST_D", b"y")])
+    with self.assertRaises(ValueError):
+      join("union")
+
+
+
+if __name__ == '__main__':
+  unittest.main()
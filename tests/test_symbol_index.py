@@ -0,0 +1,252 @@
+#
+# The contents of this file are subject to the Apache 2.0 license you may not
+# use this file except in compliance with the License.
+#
+# Software distributed under the License is distributed on an "AS IS" basis,
+# WITHOUT WARRANTY OF ANY KIND, either express or implied. See the License
+# for the specific language governing rights and limitations under the
+# License.
+#
+#
+# Copyright 2023 KCC project (http://www.firmwaretoolkit.org).
+# All rights reserved. Use is subject to license terms.
+#
+#
+# Contributors list :
+#
+#    William Bonnet     wllmbnnt@gmail.com, wbonnet@theitmakers.com
+#
+
+""" Unit tests of the incremental index of the settings of a corpus
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from kcc.symbol_index import SymbolIndex, IndexBuilder, QueryParser, write_index, \
+                             evaluate_query
+
+# Queries checked on each version of the corpus
+_QUERIES = ["CONFIG_TEST_A=y",
+            "CONFIG_TEST_B=n",
+            "CONFIG_TEST_S=\"hello world\"",
+            "CONFIG_TEST_S",
+            "not CONFIG_TEST_B",
+            "not CONFIG_TEST_S=\"hello world\" and CONFIG_TEST_A",
+            "(CONFIG_TEST_A=m or CONFIG_TEST_C=y) and not CONFIG_TEST_B=n"]
+
+# -----------------------------------------------------------------------------
+#
+# class TestSymbolIndex
+#
+# -----------------------------------------------------------------------------
+class TestSymbolIndex(unittest.TestCase):
+  """This class checks that an index updated incrementally answers the
+  queries as an index built from scratch
+  """
+
+  # ---------------------------------------------------------------------------
+  #
+  # setUp
+  #
+  # ---------------------------------------------------------------------------
+  def setUp(self):
+    """ Create the directory of the corpus and of the indexes
+    """
+
+    self.directory = tempfile.mkdtemp()
+    self.corpus = os.path.join(self.directory, "corpus")
+    os.makedirs(self.corpus)
+    self.index_path = os.path.join(self.directory, "index")
+    self.paths = []
+
+    # Modification times are set explicitly, thus a modified file is detected
+    # whatever the resolution of the file system
+    self.mtime = 1000000000
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # tearDown
+  #
+  # ---------------------------------------------------------------------------
+  def tearDown(self):
+    """ Remove the corpus and the indexes
+    """
+
+    shutil.rmtree(self.directory)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # write
+  #
+  # ---------------------------------------------------------------------------
+  def write(self, name, text):
+    """ Create or replace a config of the corpus
+    """
+
+    path = os.path.join(self.corpus, name)
+    with open(path, 'w') as working_file:
+      working_file.write(text)
+    self.mtime += 1
+    os.utime(path, ns=(self.mtime, self.mtime))
+    if path not in self.paths:
+      self.paths.append(path)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # remove
+  #
+  # ---------------------------------------------------------------------------
+  def remove(self, name):
+    """ Remove a config of the corpus
+    """
+
+    path = os.path.join(self.corpus, name)
+    os.remove(path)
+    self.paths.remove(path)
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # build
+  #
+  # ---------------------------------------------------------------------------
+  def build(self, index_path):
+    """ Create or update an index of the corpus, and return its builder
+    """
+
+    previous = None
+    if os.path.exists(index_path):
+      previous = SymbolIndex().open(index_path)
+    try:
+      builder = IndexBuilder()
+      if builder.update(previous, self.paths):
+        write_index(index_path, [self.corpus], builder.documents, builder.entries(previous))
+    finally:
+      if previous is not None:
+        previous.close()
+    return builder
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # results
+  #
+  # ---------------------------------------------------------------------------
+  def results(self, index_path):
+    """ Return the names of the configs matching each query, and the names of
+    the configs of each key of an index
+    """
+
+    index = SymbolIndex().open(index_path)
+    try:
+      queries = [sorted(os.path.basename(path) for path in
+                        index.paths(evaluate_query(QueryParser().parse(query), index)))
+                 for query in _QUERIES]
+      keys = {index[position]: sorted(os.path.basename(path) for path in
+                                      index.paths(index.posting(position)))
+              for position in range(len(index))}
+    finally:
+      index.close()
+    return queries, keys
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # check
+  #
+  # ---------------------------------------------------------------------------
+  def check(self):
+    """ Update the index, then compare it to an index built from scratch.
+    Return the results of the queries.
+    """
+
+    self.build(self.index_path)
+    fresh_path = os.path.join(self.directory, "fresh")
+    if os.path.exists(fresh_path):
+      os.remove(fresh_path)
+    self.build(fresh_path)
+
+    queries, keys = self.results(self.index_path)
+    self.assertEqual((queries, keys), self.results(fresh_path))
+    return dict(zip(_QUERIES, queries))
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # test_incremental
+  #
+  # ---------------------------------------------------------------------------
+  def test_incremental(self):
+    """ Files modified, removed and added are taken into account
+    """
+
+    self.write("one", "CONFIG_TEST_A=y\n# CONFIG_TEST_B is not set\n"
+                      "CONFIG_TEST_S=\"hello world\"\n")
+    self.write("two", "CONFIG_TEST_A=m\nCONFIG_TEST_C=y\n")
+    self.write("three", "CONFIG_TEST_A=y\nCONFIG_TEST_B=y\nCONFIG_TEST_S=\"hello\"\n")
+    results = self.check()
+    self.assertEqual(results["CONFIG_TEST_A=y"], ["one", "three"])
+    self.assertEqual(results["CONFIG_TEST_B=n"], ["one"])
+    self.assertEqual(results["CONFIG_TEST_S=\"hello world\""], ["one"])
+    self.assertEqual(results["CONFIG_TEST_S"], ["one", "three"])
+    self.assertEqual(results["not CONFIG_TEST_B"], ["two"])
+    self.assertEqual(results["not CONFIG_TEST_S=\"hello world\" and CONFIG_TEST_A"],
+                     ["three", "two"])
+
+    # Modified file
+    self.write("one", "CONFIG_TEST_A=m\nCONFIG_TEST_S=\"hello world\"\n")
+    results = self.check()
+    self.assertEqual(results["CONFIG_TEST_A=y"], ["three"])
+    self.assertEqual(results["CONFIG_TEST_B=n"], [])
+    self.assertEqual(results["not CONFIG_TEST_B"], ["one", "two"])
+
+    # Removed file, then added file reusing its slot
+    self.remove("two")
+    results = self.check()
+    self.assertEqual(results["not CONFIG_TEST_B"], ["one"])
+    self.write("four", "# CONFIG_TEST_B is not set\nCONFIG_TEST_S=\"hello world\"\n")
+    results = self.check()
+    self.assertEqual(results["CONFIG_TEST_S=\"hello world\""], ["four", "one"])
+    self.assertEqual(results["(CONFIG_TEST_A=m or CONFIG_TEST_C=y) and not CONFIG_TEST_B=n"],
+                     ["one"])
+
+    # Unchanged files are not read again
+    builder = self.build(self.index_path)
+    self.assertEqual((builder.read, builder.unchanged, builder.removed), (0, 3, 0))
+
+
+
+  # ---------------------------------------------------------------------------
+  #
+  # test_query_syntax
+  #
+  # ---------------------------------------------------------------------------
+  def test_query_syntax(self):
+    """ Quoted values may hold spaces and parentheses, invalid queries raise
+    ValueError
+    """
+
+    parser = QueryParser()
+    self.assertEqual(parser.parse("not CONFIG_TEST_S=\"a (b)\""),
+                     ("not", ("setting", b"CONFIG_TEST_S=\"a (b)\"")))
+    for query in ("CONFIG_TEST_A and", "(CONFIG_TEST_A", "CONFIG_TEST_S=\"a",
+                  "not", "CONFIG-TEST=y"):
+      with self.assertRaises(ValueError):
+        parser.parse(query)
+
+
+
+if __name__ == '__main__':
+  unittest.main()